@@ -167,6 +167,7 @@ from packages.api.sessions import router as sessions_router
 from packages.api.hitl import router as hitl_router
 from packages.api.system_extended import router as system_extended_router
 from packages.api.onboarding import router as onboarding_router
+from packages.api.governance import policy_conflict_handler
 from packages.api.governance import router as governance_router
 from packages.api.tenants import router as tenants_router
 from packages.api.voice import router as voice_router
@@ -182,6 +183,11 @@ app.include_router(governance_router)
 app.include_router(tenants_router)
 app.include_router(voice_router)
 
+# Policy changes that lose their version number to another replica
+from packages.core.governance.feed import PolicyConflictError
+
+app.add_exception_handler(PolicyConflictError, policy_conflict_handler)
+
 
 # Startup event to start background services
 @app.on_event("startup")
@@ -189,14 +195,26 @@ async def startup_event():
     """Start background services on app startup."""
     from packages.core.knowledge import start_knowledge_scheduler
     start_knowledge_scheduler()
+    from packages.core.governance.manager import get_governance_manager
+    governance = get_governance_manager()
+    governance.start_policy_watcher()
+    feed_url = app.state.settings.governance_policy_feed
+    if feed_url:
+        from packages.core.governance.feed import create_feed_transport
+        governance.attach_policy_feed(create_feed_transport(feed_url))
 
 
 # Shutdown event to stop background services
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop background services on app shutdown."""
-    from packages.core.knowledge import stop_knowledge_scheduler
+    from packages.core.knowledge import stop_ingestion_queue, stop_knowledge_scheduler
     stop_knowledge_scheduler()
+    stop_ingestion_queue()
+    from packages.core.governance.manager import get_governance_manager
+    governance = get_governance_manager()
+    governance.stop_policy_watcher()
+    governance.detach_policy_feed()
 
 
 # =============================================================================
@@ -2,17 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 from typing import Any
 
-from fastapi import APIRouter, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile, status
 from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field, field_validator
 
 from packages.core.agents import AgentConfig, get_agent_manager
 from packages.core.knowledge import (
+    IngestionJob,
     KnowledgeDocument,
     WebSource,
+    context_token_budget,
+    get_ingestion_queue,
     get_knowledge_manager,
+    pack_context,
     start_knowledge_scheduler,
 )
 from packages.core.concierge import route_to_agent, RoutingResult
@@ -88,6 +93,7 @@ class AgentQueryRequest(BaseModel):
     query: str = Field(..., min_length=1)
     use_knowledge_base: bool = True
     max_tokens: int = 1024
+    max_context_tokens: int | None = None  # Knowledge context budget (default: per model)
     user_id: str = "anonymous"  # For HITL tracking
     department: str = "General"  # For HITL tracking
 
@@ -272,8 +278,12 @@ async def disable_agent(agent_id: str) -> AgentConfig:
 
 
 @router.get("/{agent_id}/knowledge", response_model=list[KnowledgeDocument])
-async def list_knowledge(agent_id: str) -> list[KnowledgeDocument]:
-    """List all documents in an agent's knowledge base."""
+async def list_knowledge(
+    agent_id: str,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+) -> list[KnowledgeDocument]:
+    """List documents in an agent's knowledge base, optionally one page at a time."""
     # Verify agent exists
     agent_manager = get_agent_manager()
     if not agent_manager.get_agent(agent_id):
@@ -283,16 +293,15 @@ async def list_knowledge(agent_id: str) -> list[KnowledgeDocument]:
         )
 
     knowledge_manager = get_knowledge_manager()
-    return knowledge_manager.list_documents(agent_id)
+    return knowledge_manager.list_documents(agent_id, limit=limit, offset=offset)
 
 
-@router.post("/{agent_id}/knowledge", response_model=KnowledgeDocument)
-async def upload_knowledge(
-    agent_id: str,
-    file: UploadFile = File(...),
-) -> KnowledgeDocument:
-    """Upload a document to an agent's knowledge base."""
-    # Verify agent exists
+ALLOWED_UPLOAD_TYPES = {"txt", "pdf", "docx", "doc", "md"}
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB limit
+
+
+def _require_agent(agent_id: str) -> None:
+    """Raise 404 if the agent does not exist."""
     agent_manager = get_agent_manager()
     if not agent_manager.get_agent(agent_id):
         raise HTTPException(
@@ -300,17 +309,26 @@ async def upload_knowledge(
             detail=f"Agent '{agent_id}' not found",
         )
 
+
+def _llm_model(router: Any) -> str:
+    """Model the router's configured LLM client generates with."""
+    settings = router.settings
+    if settings.llm_provider == "openai":
+        return settings.default_openai_model
+    return settings.default_model
+
+
+async def _read_upload(file: UploadFile) -> bytes:
+    """Validate an uploaded file's type and read it with a size limit."""
     # Validate file type
-    allowed_types = {"txt", "pdf", "docx", "doc", "md"}
     ext = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else ""
-    if ext not in allowed_types:
+    if ext not in ALLOWED_UPLOAD_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type '{ext}' not allowed. Allowed: {allowed_types}",
+            detail=f"File type '{ext}' not allowed. Allowed: {ALLOWED_UPLOAD_TYPES}",
         )
 
     # Read file content with size limit
-    MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB limit
     content = await file.read()
 
     if len(content) > MAX_FILE_SIZE:
@@ -318,15 +336,68 @@ async def upload_knowledge(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB",
         )
+    return content
+
+
+@router.post("/{agent_id}/knowledge", response_model=KnowledgeDocument)
+async def upload_knowledge(
+    agent_id: str,
+    file: UploadFile = File(...),
+) -> KnowledgeDocument:
+    """Upload a document to an agent's knowledge base.
+
+    Large documents should use the ingestion job endpoint instead.
+    """
+    _require_agent(agent_id)
+    content = await _read_upload(file)
 
     knowledge_manager = get_knowledge_manager()
-    return knowledge_manager.add_document(
+    # Extraction and embedding are CPU-bound; keep the event loop responsive
+    return await asyncio.to_thread(
+        knowledge_manager.add_document,
         agent_id=agent_id,
         filename=file.filename or "unknown.txt",
         content=content,
     )
 
 
+@router.post(
+    "/{agent_id}/knowledge/jobs",
+    response_model=IngestionJob,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_ingestion_job(
+    agent_id: str,
+    files: list[UploadFile] = File(...),
+) -> IngestionJob:
+    """Upload one or more documents for background ingestion.
+
+    Returns immediately; poll the job for progress.
+    """
+    _require_agent(agent_id)
+    uploads = [(file.filename or "unknown.txt", await _read_upload(file)) for file in files]
+    # Submitting writes the uploads to disk; keep the event loop responsive
+    return await asyncio.to_thread(get_ingestion_queue().submit, agent_id, uploads)
+
+
+@router.get("/{agent_id}/knowledge/jobs", response_model=list[IngestionJob])
+async def list_ingestion_jobs(agent_id: str) -> list[IngestionJob]:
+    """List an agent's ingestion jobs, newest first."""
+    return get_ingestion_queue().list_jobs(agent_id)
+
+
+@router.get("/{agent_id}/knowledge/jobs/{job_id}", response_model=IngestionJob)
+async def get_ingestion_job(agent_id: str, job_id: str) -> IngestionJob:
+    """Get the progress of an ingestion job."""
+    job = get_ingestion_queue().get_job(job_id)
+    if not job or job.agent_id != agent_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ingestion job '{job_id}' not found",
+        )
+    return job
+
+
 @router.delete("/{agent_id}/knowledge/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_knowledge(agent_id: str, document_id: str) -> None:
     """Delete a document from an agent's knowledge base."""
@@ -512,10 +583,9 @@ async def query_agent(agent_id: str, request: AgentQueryRequest) -> AgentQueryRe
         sources = results
 
         if results:
-            context_parts = []
-            for r in results:
-                context_parts.append(f"[Source: {r['metadata'].get('filename', 'unknown')}]\n{r['text']}")
-            context = "\n\n---\n\n".join(context_parts)
+            # Merge overlapping chunks, drop repeats and fit the model's budget
+            budget = request.max_context_tokens or context_token_budget(_llm_model(get_router()))
+            context = pack_context(results, max_tokens=budget).text
 
     # Build system prompt
     system_prompt = agent.system_prompt
@@ -614,8 +684,12 @@ async def query_agent(agent_id: str, request: AgentQueryRequest) -> AgentQueryRe
 
 
 @router.get("/{agent_id}/web-sources", response_model=WebSourceListResponse)
-async def list_web_sources(agent_id: str) -> WebSourceListResponse:
-    """List all web sources for an agent."""
+async def list_web_sources(
+    agent_id: str,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+) -> WebSourceListResponse:
+    """List web sources for an agent, optionally one page at a time."""
     # Verify agent exists
     agent_manager = get_agent_manager()
     if not agent_manager.get_agent(agent_id):
@@ -625,8 +699,8 @@ async def list_web_sources(agent_id: str) -> WebSourceListResponse:
         )
 
     knowledge_manager = get_knowledge_manager()
-    sources = knowledge_manager.list_web_sources(agent_id)
-    return WebSourceListResponse(sources=sources, total=len(sources))
+    sources = knowledge_manager.list_web_sources(agent_id, limit=limit, offset=offset)
+    return WebSourceListResponse(sources=sources, total=knowledge_manager.count_web_sources(agent_id))
 
 
 @router.post(
@@ -723,11 +797,14 @@ async def delete_web_source(agent_id: str, source_id: str) -> None:
 
 
 @router.get("/web-sources/all", response_model=WebSourceListResponse)
-async def list_all_web_sources() -> WebSourceListResponse:
-    """List all web sources across all agents."""
+async def list_all_web_sources(
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+) -> WebSourceListResponse:
+    """List web sources across all agents, optionally one page at a time."""
     knowledge_manager = get_knowledge_manager()
-    sources = knowledge_manager.list_web_sources()
-    return WebSourceListResponse(sources=sources, total=len(sources))
+    sources = knowledge_manager.list_web_sources(limit=limit, offset=offset)
+    return WebSourceListResponse(sources=sources, total=knowledge_manager.count_web_sources())
 
 
 @router.post("/web-sources/refresh-all")
@@ -200,6 +200,7 @@ async def export_analytics(
             elif e.guardrails_triggered:
                 severity = 4
 
+            msg = e.query_text[:200].replace("=", "\\=").replace("|", "\\|")
             cef_line = (
                 f"CEF:0|HAAIS|AIOS|1.0|"
                 f"{e.id}|"
@@ -209,7 +210,7 @@ async def export_analytics(
                 f"src={e.user_id} "
                 f"suser={e.user_id} "
                 f"duser={e.agent_id} "
-                f"msg={e.query_text[:200].replace('=', '\\=').replace('|', '\\|')} "
+                f"msg={msg} "
                 f"outcome={'Success' if e.success else 'Failure'} "
                 f"cs1={e.department} cs1Label=Department "
                 f"cs2={e.hitl_mode} cs2Label=HITLMode "
@@ -357,6 +358,7 @@ async def download_siem_cef(
         elif e.guardrails_triggered:
             severity = 4
 
+        msg = e.query_text[:200].replace("=", "\\=").replace("|", "\\|").replace("\n", " ")
         cef_line = (
             f"CEF:0|HAAIS|AIOS|1.0|"
             f"{e.id}|"
@@ -366,7 +368,7 @@ async def download_siem_cef(
             f"src={e.user_id} "
             f"suser={e.user_id} "
             f"duser={e.agent_id} "
-            f"msg={e.query_text[:200].replace('=', '\\=').replace('|', '\\|').replace(chr(10), ' ')} "
+            f"msg={msg} "
             f"outcome={'Success' if e.success else 'Failure'} "
             f"cs1={e.department} cs1Label=Department "
             f"cs2={e.hitl_mode} cs2Label=HITLMode "
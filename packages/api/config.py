@@ -26,3 +26,7 @@ class Settings(BaseSettings):
 
     # CORS origins
     cors_origins: list[str] = ["*"]
+
+    # Governance policy change feed shared by replicas, e.g.
+    # "sqlite:///shared/policy_feed.db" or "file:///shared/policy_feed.log"
+    governance_policy_feed: str | None = None
@@ -11,23 +11,50 @@ Scopes:
 
 from __future__ import annotations
 
+import asyncio
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
+from packages.core.governance.feed import PolicyConflictError
 from packages.core.governance.manager import get_governance_manager
 from packages.core.governance import (
     PolicyRule,
+    PolicySet,
     RuleAction,
     RuleCondition,
     ConditionOperator,
 )
-from packages.core.schemas.models import HITLMode
+from packages.core.governance.replay import (
+    ReplayQuery,
+    queries_from_analytics,
+    queries_from_traces,
+)
+from packages.core.schemas.models import GovernanceDecision, HITLMode, UserContext
 
 router = APIRouter(prefix="/governance", tags=["Governance"])
 
 
+async def policy_conflict_handler(request: Request, exc: PolicyConflictError) -> JSONResponse:
+    """Report a change another replica won the version number for as 409.
+
+    The detail names the version this replica adopted, so clients can
+    reload it and retry their change.
+    """
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": {
+                "error": str(exc),
+                "rejected_version": exc.version_number,
+                "current_version": exc.current_version,
+            }
+        },
+    )
+
+
 # =============================================================================
 # Request/Response Models
 # =============================================================================
@@ -119,6 +146,27 @@ class GovernanceTestResponse(BaseModel):
     would_draft: bool
 
 
+class GovernanceBatchRequest(BaseModel):
+    """Request to evaluate many queries at once."""
+
+    queries: list[str] = Field(..., min_length=1, max_length=50000)
+    agent_id: str | None = None
+    domain: str = "General"
+    contexts: list[UserContext | None] | None = Field(
+        default=None,
+        description="Optional per-query user contexts, same length as queries",
+    )
+
+
+class GovernanceBatchResponse(BaseModel):
+    """Response from batch governance evaluation."""
+
+    results: list[GovernanceTestResponse]
+    total: int
+    escalations: int
+    drafts: int
+
+
 # =============================================================================
 # Prohibited Topics Endpoints
 # =============================================================================
@@ -383,6 +431,43 @@ async def test_governance(request: GovernanceTestRequest) -> GovernanceTestRespo
             domain=request.domain,
         )
 
+    return _test_response(decision)
+
+
+@router.post("/evaluate/batch", response_model=GovernanceBatchResponse)
+async def evaluate_batch(request: GovernanceBatchRequest) -> GovernanceBatchResponse:
+    """Evaluate many queries against the current policies.
+
+    Use this to pre-screen historical prompts after a policy change.
+    Results are returned in the same order as the queries.
+    """
+    governance = get_governance_manager()
+
+    try:
+        decisions = await asyncio.to_thread(
+            governance.evaluate_many,
+            queries=request.queries,
+            agent_id=request.agent_id,
+            domain=request.domain,
+            contexts=request.contexts,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+
+    results = [_test_response(decision) for decision in decisions]
+    return GovernanceBatchResponse(
+        results=results,
+        total=len(results),
+        escalations=sum(1 for r in results if r.would_escalate),
+        drafts=sum(1 for r in results if r.would_draft),
+    )
+
+
+def _test_response(decision: GovernanceDecision) -> GovernanceTestResponse:
+    """Convert a governance decision into a test response."""
     return GovernanceTestResponse(
         hitl_mode=decision.hitl_mode.value,
         tools_allowed=decision.tools_allowed,
@@ -566,6 +651,63 @@ async def compare_versions(version_id_1: str, version_id_2: str) -> dict:
     return governance.compare_versions(version_id_1, version_id_2)
 
 
+class ReplayQueryItem(BaseModel):
+    """A recorded request supplied inline for replay."""
+    query: str
+    agent_id: str | None = None
+    domain: str = "General"
+    tenant_id: str = "default"
+    user_id: str = "anonymous"
+    role: str = "employee"
+    department: str = "General"
+
+
+class ReplayRequest(BaseModel):
+    """Recorded traffic to replay against policy versions."""
+    source: str = Field(default="analytics", description="analytics, traces or inline")
+    queries: list[ReplayQueryItem] = Field(default_factory=list, description="Requests for source=inline")
+    limit: int = Field(default=100000, ge=1, le=1000000, description="Maximum recorded requests to load")
+    workers: int | None = Field(
+        default=None, ge=1, description="Worker processes (default and maximum: CPU count)"
+    )
+
+
+def _replay_corpus(request: ReplayRequest) -> list[ReplayQuery]:
+    """Load the requests to replay from the chosen source."""
+    if request.source == "inline":
+        return [ReplayQuery(**item.model_dump()) for item in request.queries]
+    if request.source == "analytics":
+        from packages.core.agents import get_agent_manager
+        from packages.core.analytics import get_analytics_manager
+
+        agent_domains = {a.id: a.domain for a in get_agent_manager().list_agents()}
+        events = get_analytics_manager().get_events(limit=request.limit)
+        return queries_from_analytics(events, agent_domains)
+    if request.source == "traces":
+        from packages.core.simulation.tracer import get_trace_store
+
+        return queries_from_traces(get_trace_store().iter_traces(limit=request.limit))
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unknown replay source: {request.source}",
+    )
+
+
+@router.post("/versions/compare/{version_id_1}/{version_id_2}/replay")
+async def replay_versions(version_id_1: str, version_id_2: str, request: ReplayRequest) -> dict:
+    """Compare two policy versions, including decision changes on recorded traffic."""
+    governance = get_governance_manager()
+    # Loading the corpus reads analytics or traces from disk, and replay is
+    # CPU-bound; keep both off the event loop
+    queries = await asyncio.to_thread(_replay_corpus, request)
+    result = await asyncio.to_thread(
+        governance.compare_versions, version_id_1, version_id_2, queries, request.workers
+    )
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
 # =============================================================================
 # D) Approval Workflow
 # =============================================================================
@@ -648,6 +790,19 @@ async def approve_change(change_id: str, request: ReviewChangeRequest) -> dict:
     return result
 
 
+@router.post("/approval/changes/{change_id}/preview")
+async def preview_change(change_id: str, request: ReplayRequest) -> dict:
+    """Replay recorded traffic to show the blast radius of a pending change."""
+    governance = get_governance_manager()
+    queries = await asyncio.to_thread(_replay_corpus, request)
+    result = await asyncio.to_thread(
+        governance.preview_change, change_id, queries, request.workers
+    )
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result.get("error"))
+    return result
+
+
 @router.post("/approval/changes/{change_id}/reject")
 async def reject_change(change_id: str, request: ReviewChangeRequest) -> dict:
     """Reject a pending policy change."""
@@ -691,6 +846,78 @@ async def sync_from_file() -> dict:
     return governance.sync_from_file()
 
 
+# =============================================================================
+# Decision Cache
+# =============================================================================
+
+
+@router.get("/cache")
+async def get_decision_cache_stats() -> dict:
+    """Get hit/miss statistics for the governance decision cache."""
+    governance = get_governance_manager()
+    return governance.get_decision_cache_stats().model_dump()
+
+
+@router.delete("/cache")
+async def clear_decision_cache() -> dict[str, str]:
+    """Drop all cached governance decisions."""
+    governance = get_governance_manager()
+    governance.clear_decision_cache()
+    return {"status": "cleared"}
+
+
+# =============================================================================
+# Tenant Policy Overlays
+# =============================================================================
+
+
+@router.get("/tenants")
+async def list_policy_tenants() -> dict:
+    """List tenants with a policy overlay."""
+    governance = get_governance_manager()
+    tenants = governance.list_policy_tenants()
+    return {"tenants": tenants, "total": len(tenants)}
+
+
+@router.get("/tenants/{tenant_id}/policies", response_model=PolicySet)
+async def get_tenant_policies(tenant_id: str) -> PolicySet:
+    """Get a tenant's policy overlay."""
+    governance = get_governance_manager()
+    policies = governance.get_tenant_policies(tenant_id)
+    if policies is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tenant '{tenant_id}' has no policy overlay",
+        )
+    return policies
+
+
+@router.put("/tenants/{tenant_id}/policies")
+async def set_tenant_policies(tenant_id: str, policies: PolicySet) -> dict:
+    """Set a tenant's policy overlay on top of the shared base policies."""
+    governance = get_governance_manager()
+    try:
+        governance.set_tenant_policies(tenant_id, policies)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+    return {"tenant_id": tenant_id, "version": governance.get_current_version()}
+
+
+@router.delete("/tenants/{tenant_id}/policies")
+async def remove_tenant_policies(tenant_id: str) -> dict[str, bool]:
+    """Remove a tenant's overlay so it uses the base policies."""
+    governance = get_governance_manager()
+    if not governance.remove_tenant_policies(tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tenant '{tenant_id}' has no policy overlay",
+        )
+    return {"removed": True}
+
+
 # =============================================================================
 # Governance Summary
 # =============================================================================
@@ -714,5 +941,6 @@ async def get_governance_summary() -> dict:
         "immutable_rules": len(governance.get_immutable_rules()),
         "pending_changes": len(governance.get_pending_changes()),
         "prohibited_topics": len(governance.list_prohibited_topics()),
+        "tenant_overlays": len(governance.list_policy_tenants()),
         "drift_status": governance.get_drift_report()["overall_status"],
     }
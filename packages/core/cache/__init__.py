@@ -12,6 +12,9 @@ from typing import Any
 
 from pydantic import BaseModel, Field
 
+from packages.core.cache.embeddings import EmbeddingCache
+from packages.core.cache.retrieval import RetrievalCache, RetrievalCacheStats
+
 
 class CacheEntry(BaseModel):
     """A cached item."""
@@ -334,5 +337,8 @@ __all__ = [
     "CacheEntry",
     "CacheStats",
     "CacheManager",
+    "EmbeddingCache",
+    "RetrievalCache",
+    "RetrievalCacheStats",
     "get_cache_manager",
 ]
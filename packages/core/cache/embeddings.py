@@ -0,0 +1,325 @@
+"""Persistent embedding cache keyed by embedding model and content hash.
+
+Each model's vectors are the rows of a float32 matrix in ``<model>.f32``,
+read through a memory map so cached vectors are not held in the Python
+heap. ``<model>.idx`` is the offset index: a JSON header line with the
+vector dimension, then the content hash of each row, one per line.
+
+Both files are append-only. Vectors are written before their index lines,
+and rows without a complete vector are never read, so an interrupted write
+never returns a torn vector; the next writer drops them. Appends happen
+under a file lock and take their row numbers from the vector file's size,
+so several processes can share one cache directory.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
+
+FLOAT32_BYTES = 4
+
+# Embedding function config that changes the vectors it produces
+MODEL_CONFIG_KEYS = ("model_name", "model", "dimensions")
+
+
+def content_hash(text: str) -> str:
+    """Hash of a chunk's text, used as its cache key."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def embedding_model_name(embedding_function: Any) -> str:
+    """Name identifying the model behind a Chroma embedding function.
+
+    Chroma's ``name()`` is the provider ("openai", "sentence_transformer"),
+    shared by every model it serves, so the configured model and output
+    dimensions are part of the name.
+    """
+    name = getattr(embedding_function, "name", None)
+    try:
+        parts = [str(name())] if callable(name) else []
+    except Exception:
+        parts = []
+    if not parts:
+        parts = [type(embedding_function).__name__]
+
+    get_config = getattr(embedding_function, "get_config", None)
+    try:
+        config = get_config() if callable(get_config) else {}
+    except Exception:
+        config = {}
+    if isinstance(config, dict):
+        parts.extend(
+            str(config[key]) for key in MODEL_CONFIG_KEYS if config.get(key) is not None
+        )
+    return ":".join(parts)
+
+
+class _VectorFile:
+    """The cached vectors of one embedding model.
+
+    Readers never modify the files. Writers hold an exclusive lock on
+    ``<model>.lock`` while they append, so processes sharing the cache
+    directory agree on which row holds which vector.
+    """
+
+    def __init__(self, directory: Path, model: str) -> None:
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.vectors_path = directory / f"{slug}.f32"
+        self.index_path = directory / f"{slug}.idx"
+        self.lock_path = directory / f"{slug}.lock"
+        self.model = model
+        self.dim: int | None = None
+        self.rows: dict[str, int] = {}
+        self._count = 0  # index lines read, including repeated keys
+        self._offset = 0  # bytes of the index read so far
+        self._map: mmap.mmap | None = None
+        self._view: memoryview | None = None
+        self.refresh()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the cross-process write lock."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _forget(self) -> None:
+        self.close()
+        self.dim = None
+        self.rows = {}
+        self._count = 0
+        self._offset = 0
+
+    def _sync(self) -> None:
+        """Read index rows appended since the last read, by any process.
+
+        Only rows whose vector is completely written are read; the rest
+        are picked up by a later read, or dropped by the next writer if
+        their writer died. Raises ValueError if the header is invalid.
+        """
+        try:
+            with open(self.index_path, "rb") as f:
+                if f.seek(0, os.SEEK_END) < self._offset:
+                    self._forget()  # cleared and recreated elsewhere
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._forget()
+            return
+
+        lines = data.split(b"\n")[:-1]  # the last piece has no newline yet
+        if self.dim is None:
+            if not lines:
+                return
+            header = json.loads(lines.pop(0))
+            dim = int(header["dim"])
+            if dim <= 0:
+                raise ValueError(f"Invalid dimension {dim}")
+            self.dim = dim
+            self._offset = len(data.split(b"\n", 1)[0]) + 1
+
+        size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        complete = size // (self.dim * FLOAT32_BYTES)
+        for line in lines:
+            if self._count >= complete:
+                break
+            key = line.decode().strip()
+            if key:
+                self.rows[key] = self._count
+            self._count += 1
+            self._offset += len(line) + 1
+
+    def refresh(self) -> None:
+        """Pick up rows other processes appended; an unreadable index reads as empty."""
+        try:
+            self._sync()
+        except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+            self._forget()
+
+    def _reset(self) -> None:
+        self._forget()
+        self.vectors_path.unlink(missing_ok=True)
+        self.index_path.unlink(missing_ok=True)
+
+    def _vectors(self, row: int) -> memoryview:
+        """Float view of the vector file, remapped if it grew past ``row``."""
+        dim = self.dim or 0
+        if self._view is None or len(self._view) < (row + 1) * dim:
+            self.close()
+            with open(self.vectors_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map).cast("f")
+        return self._view
+
+    def get(self, key: str) -> list[float] | None:
+        row = self.rows.get(key)
+        if row is None or self.dim is None:
+            return None
+        start = row * self.dim
+        return self._vectors(row)[start:start + self.dim].tolist()
+
+    def add(self, items: list[tuple[str, array[float]]]) -> None:
+        """Append vectors of the cache's dimension; others are not cached."""
+        if not items:
+            return
+        with self._locked():
+            try:
+                self._sync()
+            except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+                self._reset()
+            if self.dim is None:
+                self.dim = len(items[0][1])
+                header = json.dumps({"model": self.model, "dim": self.dim}) + "\n"
+                self.index_path.write_text(header, encoding="utf-8")
+                self._offset = len(header.encode())
+            items = [
+                (key, vector) for key, vector in items
+                if len(vector) == self.dim and key not in self.rows
+            ]
+            if not items:
+                return
+
+            # Drop rows a dead writer left half written, so appends line up again
+            with open(self.index_path, "ab") as f:
+                f.truncate(self._offset)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(self._count * self.dim * FLOAT32_BYTES)
+                first = f.seek(0, os.SEEK_END) // (self.dim * FLOAT32_BYTES)
+                for _, vector in items:
+                    f.write(vector.tobytes())
+            lines = "".join(key + "\n" for key, _ in items).encode()
+            with open(self.index_path, "ab") as f:
+                f.write(lines)
+
+            for row, (key, _) in enumerate(items, start=first):
+                self.rows[key] = row
+            self._count = first + len(items)
+            self._offset += len(lines)
+
+    def clear(self) -> int:
+        """Delete the cached vectors. Returns the number removed."""
+        with self._locked():
+            self.refresh()
+            count = len(self.rows)
+            self._reset()
+        return count
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class EmbeddingCache:
+    """Persistent cache of chunk embeddings, shared across agents and sources.
+
+    Identical chunk text embedded with the same model is only embedded
+    once, whichever document, web source or agent it appears in.
+    """
+
+    def __init__(self, storage_path: str | Path) -> None:
+        self.storage_path = Path(storage_path)
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+        self._files: dict[str, _VectorFile] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, model: str) -> _VectorFile:
+        vector_file = self._files.get(model)
+        if vector_file is None:
+            vector_file = _VectorFile(self.storage_path, model)
+            self._files[model] = vector_file
+        return vector_file
+
+    def get_many(self, model: str, texts: Sequence[str]) -> list[list[float] | None]:
+        """Cached embeddings of texts, with None for texts not cached."""
+        with self._lock:
+            vector_file = self._file(model)
+            vector_file.refresh()
+            vectors = [vector_file.get(content_hash(text)) for text in texts]
+            hits = sum(1 for vector in vectors if vector is not None)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Any]) -> None:
+        """Cache embeddings of texts."""
+        items = [
+            (content_hash(text), array("f", embedding))
+            for text, embedding in zip(texts, embeddings, strict=True)
+        ]
+        with self._lock:
+            vector_file = self._file(model)
+            vector_file.add([(key, vector) for key, vector in items if key not in vector_file.rows])
+
+    def embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        embedding_function: Callable[[list[str]], Sequence[Any]],
+    ) -> list[list[float]]:
+        """Embed texts, calling embedding_function once for the uncached ones.
+
+        Fresh embeddings are rounded to float32 like cached ones, so a
+        chunk gets the same vector whether or not it was cached.
+        """
+        vectors = self.get_many(model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = [array("f", embedding) for embedding in embedding_function(unique)]
+            self.put_many(model, unique, fresh)
+            by_text = {text: vector.tolist() for text, vector in zip(unique, fresh, strict=True)}
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return vectors  # type: ignore[return-value]
+
+    def count(self, model: str) -> int:
+        """Number of cached embeddings for a model."""
+        with self._lock:
+            return len(self._file(model).rows)
+
+    def clear(self) -> int:
+        """Delete every cached embedding. Returns the number removed."""
+        with self._lock:
+            for model in [path.stem for path in self.storage_path.glob("*.idx")]:
+                self._file(model)
+            count = sum(vector_file.clear() for vector_file in self._files.values())
+            self._files.clear()
+        return count
+
+    def close(self) -> None:
+        """Release the memory maps."""
+        with self._lock:
+            for vector_file in self._files.values():
+                vector_file.close()
+
+
+__all__ = [
+    "EmbeddingCache",
+    "content_hash",
+    "embedding_model_name",
+]
@@ -0,0 +1,130 @@
+"""Versioned LRU cache of knowledge query results.
+
+Query results depend only on the searched collections' contents, the
+normalized query and the result count. Every collection has a version
+that the knowledge manager bumps whenever chunks are added, deleted or
+refreshed, and keys include the versions of the collections searched.
+A change therefore never serves stale results, and unchanged knowledge
+serves repeated questions without an embedding call or vector search.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from typing import Any
+
+from pydantic import BaseModel
+
+DEFAULT_MAX_ENTRIES = 10000
+
+RetrievalKey = tuple[Hashable, ...]
+
+
+class RetrievalCacheStats(BaseModel):
+    """Retrieval cache statistics."""
+
+    entries: int = 0
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    hit_rate: float = 0.0
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups.
+
+    Case and runs of whitespace are ignored, so "Pay water bill" and
+    "pay  water bill " share an entry.
+    """
+    return " ".join(query.lower().split())
+
+
+def retrieval_key(
+    collections: Iterable[tuple[str, int]],
+    query: str,
+    *params: Hashable,
+) -> RetrievalKey:
+    """Build the cache key for a query.
+
+    Args:
+        collections: (collection ID, version) of each collection searched
+        query: The query text
+        params: Other arguments that change the results, e.g. n_results
+    """
+    return (tuple(collections), normalize_query(query), *params)
+
+
+def copy_results(results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Copy shared results so callers can mutate their own."""
+    return [{**result, "metadata": dict(result.get("metadata") or {})} for result in results]
+
+
+class RetrievalCache:
+    """Thread-safe LRU cache of query results."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[RetrievalKey, list[dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: RetrievalKey) -> list[dict[str, Any]] | None:
+        """Return a copy of the cached results, or None on a miss."""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return copy_results(results)
+
+    def put(self, key: RetrievalKey, results: list[dict[str, Any]]) -> None:
+        """Store a private copy of results, evicting the least recently used."""
+        if self.max_entries <= 0:
+            return
+        stored = copy_results(results)
+        with self._lock:
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def stats(self) -> RetrievalCacheStats:
+        """Get cache statistics."""
+        with self._lock:
+            total = self._hits + self._misses
+            return RetrievalCacheStats(
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                hit_rate=self._hits / total if total > 0 else 0.0,
+            )
+
+
+__all__ = [
+    "RetrievalCache",
+    "RetrievalCacheStats",
+    "copy_results",
+    "normalize_query",
+    "retrieval_key",
+]
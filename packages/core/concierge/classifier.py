@@ -6,6 +6,7 @@ import re
 from dataclasses import dataclass, field
 from re import Pattern
 
+from packages.core.scanner import ScanResult, TextScanner, get_text_scanner
 from packages.core.schemas.models import Intent, RiskSignals
 
 
@@ -356,20 +357,30 @@ class RoutingResult:
 class IntentClassifier:
     """Classifies user requests into intents."""
 
-    def __init__(self, patterns: list[IntentPattern] | None = None) -> None:
+    def __init__(
+        self,
+        patterns: list[IntentPattern] | None = None,
+        scanner: TextScanner | None = None,
+    ) -> None:
         self.patterns = patterns if patterns is not None else DEFAULT_INTENT_PATTERNS
+        self.scanner = scanner or get_text_scanner()
+        # (regex feature ids, keyword feature ids) per pattern
+        self._features = [
+            (self.scanner.regexes(p.patterns), self.scanner.keywords(p.keywords))
+            for p in self.patterns
+        ]
 
     def classify_intent(self, text: str) -> Intent:
         """Classify the intent of a text input."""
         if not text or not text.strip():
             return Intent(domain="General", task="unknown", confidence=0.1)
 
-        text_lower = text.lower()
+        scan = self.scanner.scan(text)
         best_match: IntentPattern | None = None
         best_score = 0.0
 
-        for pattern in self.patterns:
-            score = self._score_pattern(text, text_lower, pattern)
+        for pattern, features in zip(self.patterns, self._features, strict=True):
+            score = self._score_pattern(scan, *features)
             if score > best_score:
                 best_score = score
                 best_match = pattern
@@ -394,11 +405,11 @@ class IntentClassifier:
         if not text or not text.strip():
             return [(Intent(domain="General", task="unknown", confidence=0.1), 0.1)]
 
-        text_lower = text.lower()
+        scan = self.scanner.scan(text)
         scored_intents: list[tuple[Intent, float]] = []
 
-        for pattern in self.patterns:
-            score = self._score_pattern(text, text_lower, pattern)
+        for pattern, features in zip(self.patterns, self._features, strict=True):
+            score = self._score_pattern(scan, *features)
             if score > 0.15:  # Lower threshold for secondary intents
                 intent = Intent(
                     domain=pattern.domain,
@@ -417,29 +428,29 @@ class IntentClassifier:
 
         return scored_intents
 
-    def _score_pattern(self, text: str, text_lower: str, pattern: IntentPattern) -> float:
-        """Score how well a pattern matches the text."""
+    def _score_pattern(
+        self,
+        scan: ScanResult,
+        regex_features: list[int],
+        keyword_features: list[int],
+    ) -> float:
+        """Score how well a pattern matches the scanned text."""
         score = 0.0
 
-        # Check regex patterns (higher weight)
-        pattern_matches = 0
-        for regex in pattern.patterns:
-            if regex.search(text):
-                pattern_matches += 1
-                score += 0.35
-
-        # Check keywords (lower weight, with diminishing returns)
-        keyword_matches = 0
-        for keyword in pattern.keywords:
-            if keyword.lower() in text_lower:
-                keyword_matches += 1
-                # Diminishing returns for multiple keyword matches
-                if keyword_matches <= 2:
-                    score += 0.15
-                elif keyword_matches <= 4:
-                    score += 0.08
-                else:
-                    score += 0.03
+        # Regex patterns (higher weight)
+        pattern_matches = scan.count(regex_features)
+        for _ in range(pattern_matches):
+            score += 0.35
+
+        # Keywords (lower weight, with diminishing returns)
+        keyword_matches = scan.count(keyword_features)
+        for n in range(1, keyword_matches + 1):
+            if n <= 2:
+                score += 0.15
+            elif n <= 4:
+                score += 0.08
+            else:
+                score += 0.03
 
         # Bonus for combined regex + keyword match (high confidence)
         if pattern_matches > 0 and keyword_matches > 0:
@@ -555,29 +566,29 @@ class AgentRouter:
 class RiskDetector:
     """Detects risk signals in user requests."""
 
-    def __init__(self, patterns: list[RiskPattern] | None = None) -> None:
+    def __init__(
+        self,
+        patterns: list[RiskPattern] | None = None,
+        scanner: TextScanner | None = None,
+    ) -> None:
         self.patterns = patterns if patterns is not None else DEFAULT_RISK_PATTERNS
+        self.scanner = scanner or get_text_scanner()
+        # Regex and keyword feature ids per pattern
+        self._features = [
+            self.scanner.regexes(p.patterns) + self.scanner.keywords(p.keywords)
+            for p in self.patterns
+        ]
 
     def detect_risks(self, text: str) -> RiskSignals:
         """Detect risk signals in text."""
         if not text or not text.strip():
             return RiskSignals(signals=[])
 
-        text_lower = text.lower()
-        detected: list[str] = []
-
-        for pattern in self.patterns:
-            if self._matches_pattern(text, text_lower, pattern):
-                detected.append(pattern.signal)
+        scan = self.scanner.scan(text)
+        detected = [
+            pattern.signal
+            for pattern, features in zip(self.patterns, self._features, strict=True)
+            if scan.any(features)
+        ]
 
         return RiskSignals(signals=detected)
-
-    def _matches_pattern(self, text: str, text_lower: str, pattern: RiskPattern) -> bool:
-        """Check if pattern matches text."""
-        # Check regex patterns
-        for regex in pattern.patterns:
-            if regex.search(text):
-                return True
-
-        # Check keywords
-        return any(keyword.lower() in text_lower for keyword in pattern.keywords)
@@ -266,6 +266,64 @@ __all__ = [
     "evaluate_governance",
 ]
 
+# Compiled evaluation engine
+from packages.core.governance.compiler import (  # noqa: E402
+    CompiledPolicySet,
+    compile_policy_set,
+)
+
+__all__ += [
+    "CompiledPolicySet",
+    "compile_policy_set",
+]
+
+# Scoped prohibited-topic index
+from packages.core.governance.prohibitions import ProhibitionIndex  # noqa: E402
+
+__all__ += [
+    "ProhibitionIndex",
+]
+
+# Versioned decision cache
+from packages.core.governance.cache import DecisionCache, DecisionCacheStats  # noqa: E402
+
+__all__ += [
+    "DecisionCache",
+    "DecisionCacheStats",
+]
+
+# Cluster policy change feed
+from packages.core.governance.feed import (  # noqa: E402
+    LocalFeedTransport,
+    PolicyChangeEvent,
+    PolicyConflictError,
+    PolicyFeedTransport,
+    SQLiteFeedTransport,
+    create_feed_transport,
+)
+
+__all__ += [
+    "LocalFeedTransport",
+    "PolicyChangeEvent",
+    "PolicyConflictError",
+    "PolicyFeedTransport",
+    "SQLiteFeedTransport",
+    "create_feed_transport",
+]
+
+# Behavioral replay of recorded traffic
+from packages.core.governance.replay import (  # noqa: E402
+    ReplayQuery,
+    ReplayReport,
+    replay_queries,
+)
+
+__all__ += [
+    "ReplayQuery",
+    "ReplayReport",
+    "replay_queries",
+]
+
 # Import manager for convenience access
 from packages.core.governance.manager import (
     GovernanceManager,
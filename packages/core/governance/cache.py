@@ -0,0 +1,150 @@
+"""Versioned LRU cache of governance decisions.
+
+Decisions depend only on the policy version, the agent and domain, the
+lowercased query and the UserContext fields, so identical requests can
+reuse an earlier decision. Keys include the compiled policy version, and
+the cache is cleared whenever the manager recompiles for a new version,
+so a policy change never serves a stale decision.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from pydantic import BaseModel
+
+from packages.core.schemas.models import GovernanceDecision, UserContext
+
+DEFAULT_MAX_ENTRIES = 10000
+
+DecisionKey = tuple[Hashable, ...]
+
+
+class DecisionCacheStats(BaseModel):
+    """Decision cache statistics."""
+
+    entries: int = 0
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    hit_rate: float = 0.0
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups.
+
+    Governance matching is case-insensitive and ignores surrounding
+    whitespace, so those differences map to the same entry.
+    """
+    return query.strip().lower()
+
+
+def context_key(ctx: UserContext) -> tuple[Any, ...]:
+    """Hashable key of the UserContext fields that rules can test."""
+    return (ctx.tenant_id, ctx.user_id, ctx.role, ctx.department)
+
+
+def decision_key(
+    version: Hashable,
+    agent_id: str | None,
+    domain: str,
+    query: str,
+    ctx: UserContext,
+) -> DecisionKey:
+    """Build the cache key for a governance evaluation."""
+    return (version, agent_id, domain, normalize_query(query), context_key(ctx))
+
+
+def copy_decision(decision: GovernanceDecision) -> GovernanceDecision:
+    """Copy a shared decision so callers can mutate their own result."""
+    return decision.model_copy(update={
+        "policy_trigger_ids": list(decision.policy_trigger_ids),
+        "provider_constraints": decision.provider_constraints.model_copy(deep=True),
+    })
+
+
+class DecisionCache:
+    """Thread-safe LRU cache of governance decisions."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[DecisionKey, GovernanceDecision] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Hashable = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: DecisionKey) -> GovernanceDecision | None:
+        """Return a copy of the cached decision, or None on a miss."""
+        with self._lock:
+            decision = self._entries.get(key)
+            if decision is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return copy_decision(decision)
+
+    def put(self, key: DecisionKey, decision: GovernanceDecision) -> None:
+        """Store a private copy of a decision, evicting the least recently used."""
+        if self.max_entries <= 0:
+            return
+        stored = copy_decision(decision)
+        with self._lock:
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, version: Hashable) -> None:
+        """Drop every entry if the policy version changed."""
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            if self._entries:
+                self._entries.clear()
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._invalidations = 0
+
+    def stats(self) -> DecisionCacheStats:
+        """Get cache statistics."""
+        with self._lock:
+            total = self._hits + self._misses
+            return DecisionCacheStats(
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                invalidations=self._invalidations,
+                hit_rate=self._hits / total if total > 0 else 0.0,
+            )
+
+
+__all__ = [
+    "DecisionCache",
+    "DecisionCacheStats",
+    "copy_decision",
+    "decision_key",
+    "normalize_query",
+]
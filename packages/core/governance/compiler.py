@@ -0,0 +1,318 @@
+"""Compiled, indexed policy evaluation.
+
+A PolicySet is compiled once into a CompiledPolicySet. Evaluation then
+only touches rules that can match the request:
+
+- Rules are bucketed by the (field, value) of one indexable condition
+  (``risk.contains`` or an ``eq`` test on an intent/ctx field).
+- Condition accessors are resolved at compile time instead of splitting
+  ``condition.field`` on every call.
+- Rules are presorted by effective priority (tier boost + priority), so
+  matching rules merge in order without a per-request sort.
+
+A compiled set can be layered over a parent (``compile_policy_set(overlay,
+parent=base)``). The overlay only compiles its own rules and references the
+parent's indexes, so per-tenant policies cost memory and compile time in
+proportion to their delta. Overlay rules evaluate after parent rules of the
+same tier and effective priority, exactly as if they were appended to the
+parent's rule lists.
+
+Decisions are identical to ``evaluate_governance`` over the merged rules.
+"""
+
+from __future__ import annotations
+
+import copy
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any
+
+from packages.core.governance import (
+    ConditionOperator,
+    PolicyRule,
+    PolicySet,
+    RuleCondition,
+    _merge_action,
+)
+from packages.core.schemas.models import (
+    GovernanceDecision,
+    HITLMode,
+    Intent,
+    ProviderConstraints,
+    RiskSignals,
+    UserContext,
+)
+
+# Effective priority boost per tier (matches evaluate_governance)
+CONSTITUTIONAL_BOOST = 10000
+ORGANIZATION_BOOST = 5000
+DEPARTMENT_BOOST = 0
+
+# Tie-break rank per tier; earlier tiers come first in the merged rule lists
+CONSTITUTIONAL_TIER = 0
+ORGANIZATION_TIER = 1
+DEPARTMENT_TIER = 2
+
+# Pseudo-field used to index risk.contains conditions
+RISK_FIELD = "risk.contains"
+
+Predicate = Callable[[Intent, RiskSignals, UserContext], bool]
+Accessor = Callable[[Intent, UserContext], Any]
+
+
+def _never(intent: Intent, risk: RiskSignals, ctx: UserContext) -> bool:
+    return False
+
+
+def _compile_accessor(field_name: str) -> Accessor | None:
+    """Resolve an ``intent.*``/``ctx.*`` field into an accessor."""
+    parts = field_name.split(".")
+    if len(parts) < 2:
+        return None
+    source, attr = parts[0], parts[1]
+    if source == "intent":
+        return lambda intent, ctx: getattr(intent, attr, None)
+    if source == "ctx":
+        return lambda intent, ctx: getattr(ctx, attr, None)
+    return None
+
+
+def _compile_condition(condition: RuleCondition) -> Predicate:
+    """Compile a condition into a predicate with the same semantics."""
+    parts = condition.field.split(".")
+    if len(parts) >= 2 and parts[0] == "risk" and parts[1] == "contains":
+        signal = str(condition.value)
+        return lambda intent, risk, ctx: risk.contains(signal)
+
+    accessor = _compile_accessor(condition.field)
+    if accessor is None:
+        return _never
+
+    value = condition.value
+    if condition.operator == ConditionOperator.EQUALS:
+        return lambda intent, risk, ctx: bool(accessor(intent, ctx) == value)
+    if condition.operator == ConditionOperator.NOT_EQUALS:
+        return lambda intent, risk, ctx: bool(accessor(intent, ctx) != value)
+    if condition.operator == ConditionOperator.CONTAINS:
+        return lambda intent, risk, ctx: value in str(accessor(intent, ctx))
+
+    return _never
+
+
+def _index_key(condition: RuleCondition) -> tuple[str, Hashable] | None:
+    """Return the (field, value) bucket key for an indexable condition."""
+    parts = condition.field.split(".")
+    if len(parts) >= 2 and parts[0] == "risk" and parts[1] == "contains":
+        return RISK_FIELD, str(condition.value)
+
+    if condition.operator != ConditionOperator.EQUALS:
+        return None
+    if _compile_accessor(condition.field) is None:
+        return None
+    try:
+        hash(condition.value)
+    except TypeError:
+        return None
+    return f"{parts[0]}.{parts[1]}", condition.value
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """A rule with precompiled predicates and its global evaluation order.
+
+    ``order`` is (-effective priority, tier, layer, position) and sorts
+    rules of every layer into the order evaluate_governance would use.
+    """
+
+    order: tuple[int, int, int, int]
+    effective_priority: int
+    rule: PolicyRule
+    predicates: tuple[Predicate, ...]
+
+    def matches(self, intent: Intent, risk: RiskSignals, ctx: UserContext) -> bool:
+        return all(p(intent, risk, ctx) for p in self.predicates)
+
+
+@dataclass
+class RuleIndex:
+    """Rules of one scope bucketed by the (field, value) they test."""
+
+    buckets: dict[str, dict[Hashable, list[CompiledRule]]] = field(default_factory=dict)
+    scan: list[CompiledRule] = field(default_factory=list)
+    accessors: dict[str, Accessor] = field(default_factory=dict)
+    size: int = 0
+
+    def add(self, compiled: CompiledRule, key: tuple[str, Hashable] | None) -> None:
+        self.size += 1
+        if key is None:
+            self.scan.append(compiled)
+            return
+        field_name, value = key
+        self.buckets.setdefault(field_name, {}).setdefault(value, []).append(compiled)
+        if field_name != RISK_FIELD and field_name not in self.accessors:
+            accessor = _compile_accessor(field_name)
+            if accessor is not None:
+                self.accessors[field_name] = accessor
+
+    def candidates(
+        self,
+        intent: Intent,
+        risk: RiskSignals,
+        ctx: UserContext,
+        out: list[CompiledRule],
+    ) -> None:
+        """Append every rule whose index key is satisfied by the request."""
+        out.extend(self.scan)
+        risk_buckets = self.buckets.get(RISK_FIELD)
+        if risk_buckets:
+            for signal in set(risk.signals):
+                hits = risk_buckets.get(signal)
+                if hits:
+                    out.extend(hits)
+        for field_name, accessor in self.accessors.items():
+            actual = accessor(intent, ctx)
+            try:
+                hits = self.buckets[field_name].get(actual)
+            except TypeError:  # unhashable attribute value
+                continue
+            if hits:
+                out.extend(hits)
+
+
+class CompiledPolicySet:
+    """Indexed, presorted decision structure built from a PolicySet.
+
+    Compiled objects are immutable once built; recompile when the
+    underlying PolicySet changes.
+    """
+
+    def __init__(
+        self,
+        policy_set: PolicySet,
+        version: Any = None,
+        parent: CompiledPolicySet | None = None,
+    ) -> None:
+        self.version = version
+        self.parent = parent
+        self.layer = parent.layer + 1 if parent is not None else 0
+        self.base = RuleIndex()
+        self.departments: dict[str, RuleIndex] = {}
+
+        tiers: list[tuple[int, int, str | None, list[PolicyRule]]] = [
+            (CONSTITUTIONAL_BOOST, CONSTITUTIONAL_TIER, None, policy_set.constitutional_rules),
+            (ORGANIZATION_BOOST, ORGANIZATION_TIER, None, policy_set.organization_rules.default),
+        ]
+        for dept, dept_rules in policy_set.department_rules.items():
+            tiers.append((DEPARTMENT_BOOST, DEPARTMENT_TIER, dept, dept_rules.defaults))
+
+        # Global order mirrors the stable priority sort of evaluate_governance
+        seq = 0
+        for boost, tier, dept, rules in tiers:
+            for rule in rules:
+                seq += 1
+                if not rule.conditions:  # rules without conditions never match
+                    continue
+                effective = rule.priority + boost
+                key: tuple[str, Hashable] | None = None
+                predicates: list[Predicate] = []
+                for cond in rule.conditions:
+                    cond_key = _index_key(cond) if key is None else None
+                    if cond_key is not None:
+                        # The bucket lookup already proves this condition
+                        key = cond_key
+                        continue
+                    predicates.append(_compile_condition(cond))
+                compiled = CompiledRule(
+                    order=(-effective, tier, self.layer, seq),
+                    effective_priority=effective,
+                    rule=rule,
+                    predicates=tuple(predicates),
+                )
+                index = self.base if dept is None else self.departments.setdefault(dept, RuleIndex())
+                index.add(compiled, key)
+
+    def with_version(
+        self,
+        version: Any,
+        parent: CompiledPolicySet | None = None,
+    ) -> CompiledPolicySet:
+        """This layer's compiled rules under a new version, sharing its indexes.
+
+        An overlay may be moved onto a parent at the same layer, e.g. the
+        re-versioned base it was compiled against.
+        """
+        clone = copy.copy(self)
+        clone.version = version
+        if parent is not None:
+            if parent.layer != self.layer - 1:
+                raise ValueError("parent must be at the layer below this one")
+            clone.parent = parent
+        return clone
+
+    @property
+    def rule_count(self) -> int:
+        """Indexed rules in this layer and every parent layer."""
+        count = self.base.size + sum(idx.size for idx in self.departments.values())
+        if self.parent is not None:
+            count += self.parent.rule_count
+        return count
+
+    def matching_rules(
+        self,
+        intent: Intent,
+        risk: RiskSignals,
+        ctx: UserContext,
+    ) -> list[PolicyRule]:
+        """Return the matching rules in effective-priority order."""
+        candidates: list[CompiledRule] = []
+        layer: CompiledPolicySet | None = self
+        while layer is not None:
+            layer.base.candidates(intent, risk, ctx, candidates)
+            dept_index = layer.departments.get(intent.domain)
+            if dept_index is not None:
+                dept_index.candidates(intent, risk, ctx, candidates)
+            layer = layer.parent
+
+        if not candidates:
+            return []
+
+        # Each rule lives in exactly one bucket, so candidates are unique
+        candidates.sort(key=lambda c: c.order)
+        return [c.rule for c in candidates if c.matches(intent, risk, ctx)]
+
+    def evaluate(
+        self,
+        intent: Intent,
+        risk: RiskSignals,
+        ctx: UserContext,
+    ) -> GovernanceDecision:
+        """Evaluate the compiled policies and return a decision."""
+        decision = GovernanceDecision(
+            hitl_mode=HITLMode.INFORM,
+            tools_allowed=True,
+            approval_required=False,
+            provider_constraints=ProviderConstraints(),
+        )
+        for rule in self.matching_rules(intent, risk, ctx):
+            _merge_action(decision, rule.action, rule.id)
+        return decision
+
+
+def compile_policy_set(
+    policy_set: PolicySet,
+    version: Any = None,
+    parent: CompiledPolicySet | None = None,
+) -> CompiledPolicySet:
+    """Compile a PolicySet into an indexed decision structure.
+
+    With a parent, only policy_set's rules are compiled and the result
+    evaluates them together with the parent's.
+    """
+    return CompiledPolicySet(policy_set, version=version, parent=parent)
+
+
+__all__ = [
+    "CompiledPolicySet",
+    "CompiledRule",
+    "compile_policy_set",
+]
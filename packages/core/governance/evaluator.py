@@ -0,0 +1,236 @@
+"""Decision logic shared by the governance manager and policy replay.
+
+PolicyEvaluator classifies a query, detects risk signals and evaluates the
+rules of a PolicySnapshot, using the requesting tenant's overlay if it has
+one. It holds no policy state, so the manager, batch evaluation and replay
+workers in other processes all decide the same way.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from packages.core.governance.cache import context_key
+from packages.core.governance.prohibitions import (
+    GLOBAL_SCOPE,
+    agent_scope,
+    domain_scope,
+)
+from packages.core.governance.snapshot import PolicySnapshot
+from packages.core.scanner import TextScanner, get_text_scanner
+from packages.core.schemas.models import (
+    GovernanceDecision,
+    HITLMode,
+    Intent,
+    RiskSignals,
+    UserContext,
+)
+
+# Risk signal patterns
+RISK_PATTERNS: dict[str, list[str]] = {
+    "PII": [
+        r"\b(ssn|social security)\b",
+        r"\b(credit card|ccn)\b",
+        r"\b(password|credential)\b",
+        r"\bconfidential\b",
+    ],
+    "FINANCIAL": [
+        r"\b(salary|compensation|pay)\b",
+        r"\b(budget|funding)\b",
+        r"\b(contract|procurement)\b",
+    ],
+    "LEGAL": [
+        r"\b(lawsuit|litigation)\b",
+        r"\b(attorney|lawyer)\b",
+        r"\b(legal advice)\b",
+    ],
+    "PERSONNEL": [
+        r"\b(fire|terminate|disciplin)\b",
+        r"\b(performance review)\b",
+        r"\b(employee complaint)\b",
+    ],
+}
+
+# Intent keywords used by classify_intent
+HIGH_IMPACT_KEYWORDS = ["delete", "remove", "terminate", "approve", "authorize", "grant"]
+MEDIUM_IMPACT_KEYWORDS = ["update", "change", "modify", "submit", "create"]
+EXTERNAL_AUDIENCE_KEYWORDS = ["public", "citizen", "resident", "community"]
+
+# Task keywords, checked in order; the first matching task wins
+TASK_KEYWORDS: list[tuple[str, list[str]]] = [
+    ("inquiry", ["how", "what", "when", "where", "why"]),
+    ("create", ["create", "add", "new"]),
+    ("update", ["update", "change", "modify"]),
+    ("delete", ["delete", "remove"]),
+]
+
+
+class PolicyEvaluator:
+    """Evaluates queries against policy snapshots."""
+
+    def __init__(self, scanner: TextScanner | None = None) -> None:
+        scanner = scanner or get_text_scanner()
+        self._scanner = scanner
+        self._high_impact_features = scanner.keywords(HIGH_IMPACT_KEYWORDS)
+        self._medium_impact_features = scanner.keywords(MEDIUM_IMPACT_KEYWORDS)
+        self._external_audience_features = scanner.keywords(EXTERNAL_AUDIENCE_KEYWORDS)
+        self._task_features = [
+            (task, scanner.keywords(keywords)) for task, keywords in TASK_KEYWORDS
+        ]
+        self._risk_features = [
+            (signal_type, scanner.regexes(patterns, re.IGNORECASE, lowercase=True))
+            for signal_type, patterns in RISK_PATTERNS.items()
+        ]
+
+    def classify_intent(self, query: str, domain: str = "General") -> Intent:
+        """Quick intent classification from query text.
+
+        For more sophisticated classification, this should integrate
+        with the LLM router. This provides basic keyword-based classification.
+        """
+        scan = self._scanner.scan(query)
+
+        # Determine impact level
+        impact = "low"
+        if scan.any(self._high_impact_features):
+            impact = "high"
+        elif scan.any(self._medium_impact_features):
+            impact = "medium"
+
+        # Determine audience
+        audience = "internal"
+        if scan.any(self._external_audience_features):
+            audience = "external"
+
+        # Determine task type
+        task = "inquiry"
+        for task_name, features in self._task_features:
+            if scan.any(features):
+                task = task_name
+                break
+
+        return Intent(
+            domain=domain,
+            task=task,
+            audience=audience,
+            impact=impact,
+            confidence=0.8,
+        )
+
+    def risk_signals(self, query: str, prohibited: list[str]) -> RiskSignals:
+        """Build risk signals from pattern matches and matched global topics."""
+        scan = self._scanner.scan(query)
+        signals = [
+            signal_type
+            for signal_type, features in self._risk_features
+            if scan.any(features)
+        ]
+
+        # Prohibited topics matched by the prohibition index
+        for topic in prohibited:
+            signals.append(f"PROHIBITED_TOPIC:{topic}")
+
+        return RiskSignals(signals=signals)
+
+    def decide(
+        self,
+        snapshot: PolicySnapshot,
+        query: str,
+        agent_id: str | None,
+        domain: str,
+        user_context: UserContext,
+        memo: dict[tuple[Any, ...], GovernanceDecision] | None = None,
+    ) -> GovernanceDecision:
+        """Evaluate one query; agent and domain prohibitions need an agent_id."""
+        decision = self.prohibition_decision(snapshot, query, agent_id, domain)
+        if decision is not None:
+            return decision
+
+        # No global topic matched, so the risk signals are pattern-only
+        intent = self.classify_intent(query, domain)
+        risk = self.risk_signals(query, [])
+        return self.rule_decision(snapshot, intent, risk, user_context, memo)
+
+    def prohibition_decision(
+        self,
+        snapshot: PolicySnapshot,
+        query: str,
+        agent_id: str | None,
+        domain: str,
+    ) -> GovernanceDecision | None:
+        """Escalation for a matched prohibited topic, or None if none matched."""
+        # One pass over the query finds matches in every prohibition scope
+        prohibited = snapshot.prohibitions.match(query)
+
+        if agent_id is not None:
+            # Check agent-specific prohibitions
+            agent_topics = prohibited.get(agent_scope(agent_id))
+            if agent_topics:
+                topic = agent_topics[0]
+                return GovernanceDecision(
+                    hitl_mode=HITLMode.ESCALATE,
+                    tools_allowed=False,
+                    approval_required=True,
+                    escalation_reason=f"This agent cannot provide information about: {topic}",
+                    policy_trigger_ids=[f"agent-prohibition:{agent_id}:{topic}"],
+                )
+
+            # Check domain-specific prohibitions
+            domain_topics = prohibited.get(domain_scope(domain))
+            if domain_topics:
+                topic = domain_topics[0]
+                return GovernanceDecision(
+                    hitl_mode=HITLMode.ESCALATE,
+                    tools_allowed=False,
+                    approval_required=True,
+                    escalation_reason=f"This domain cannot provide information about: {topic}",
+                    policy_trigger_ids=[f"domain-prohibition:{domain}:{topic}"],
+                )
+
+        # Check global prohibited topics
+        global_topics = prohibited.get(GLOBAL_SCOPE, [])
+        if global_topics:
+            return GovernanceDecision(
+                hitl_mode=HITLMode.ESCALATE,
+                tools_allowed=False,
+                approval_required=True,
+                escalation_reason=f"Query involves prohibited topic: {global_topics[0]}",
+                policy_trigger_ids=["prohibited-topic"],
+            )
+        return None
+
+    def rule_decision(
+        self,
+        snapshot: PolicySnapshot,
+        intent: Intent,
+        risk: RiskSignals,
+        user_context: UserContext,
+        memo: dict[tuple[Any, ...], GovernanceDecision] | None = None,
+    ) -> GovernanceDecision:
+        """Evaluate the tenant's rules; memo shares results across queries."""
+        compiled = snapshot.compiled_for(user_context.tenant_id)
+        if memo is None:
+            return compiled.evaluate(intent, risk, user_context)
+
+        # Rule evaluation depends only on intent, risk signals and context
+        signature = (
+            intent.domain,
+            intent.task,
+            intent.audience,
+            intent.impact,
+            intent.confidence,
+            tuple(risk.signals),
+            context_key(user_context),
+        )
+        decision = memo.get(signature)
+        if decision is None:
+            decision = compiled.evaluate(intent, risk, user_context)
+            memo[signature] = decision
+        return decision
+
+
+__all__ = [
+    "RISK_PATTERNS",
+    "PolicyEvaluator",
+]
@@ -0,0 +1,413 @@
+"""Cluster-wide policy change feed.
+
+When several API replicas run, each GovernanceManager publishes every
+policy version it saves as a PolicyChangeEvent (version number, hash and
+the delta against the previous version). Other replicas subscribe to the
+feed, apply the events in version order and publish the result as a new
+snapshot. They never re-read the policy file or recompute the policy hash
+for a change that arrived on the feed.
+
+Transports are pluggable:
+
+- LocalFeedTransport: an append-only JSON lines file on a shared disk, with
+  Unix datagram sockets to wake subscribers on the same host.
+- SQLiteFeedTransport: a table in a shared SQLite database.
+
+Use ``create_feed_transport()`` to build one from a URL such as
+``file:///var/aios/policy_feed.log`` or ``sqlite:///var/aios/policy_feed.db``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
+
+DEFAULT_WAIT_SECONDS = 1.0
+DEFAULT_SQLITE_POLL_SECONDS = 0.01
+
+
+@dataclass(frozen=True)
+class PolicyChangeEvent:
+    """One policy version, encoded as a delta against its base version."""
+
+    version_number: int
+    policy_hash: str
+    base_version: int
+    base_hash: str
+    delta: list[dict[str, Any]]
+    origin: str
+    description: str = ""
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> PolicyChangeEvent:
+        return cls(**json.loads(raw))
+
+
+class PolicyConflictError(RuntimeError):
+    """A policy change lost its version number to another replica's change.
+
+    ``current_version`` is the version the replica adopted instead.
+    """
+
+    def __init__(self, message: str, version_number: int, current_version: int) -> None:
+        super().__init__(message)
+        self.version_number = version_number
+        self.current_version = current_version
+
+
+# =============================================================================
+# Transports
+# =============================================================================
+
+
+class PolicyFeedTransport(ABC):
+    """Ordered store of policy change events shared by all replicas."""
+
+    @abstractmethod
+    def publish(self, event: PolicyChangeEvent) -> bool:
+        """Append an event. Returns False if its version was already published."""
+
+    @abstractmethod
+    def read_since(self, version_number: int) -> list[PolicyChangeEvent]:
+        """Events newer than version_number, oldest first."""
+
+    @abstractmethod
+    def wait(self, timeout: float) -> bool:
+        """Block until new events may be available or timeout expires.
+
+        Returns True if woken by a change. Spurious wake-ups are allowed.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release transport resources."""
+
+
+class LocalFeedTransport(PolicyFeedTransport):
+    """Feed stored as an append-only JSON lines file.
+
+    Each subscriber binds a Unix datagram socket in ``socket_dir``;
+    publishers send a one-byte datagram to every socket there, so
+    subscribers on the same host wake up immediately instead of polling.
+    Without Unix sockets, ``wait`` degrades to sleeping for the timeout.
+
+    Only events past the last ``read_since`` cursor are kept in memory;
+    older ones are read back from the file if asked for again.
+    """
+
+    def __init__(self, path: Path, socket_dir: Path | None = None) -> None:
+        self.path = Path(path)
+        self.socket_dir = Path(socket_dir) if socket_dir else self.path.with_name(self.path.name + ".d")
+        self._lock = threading.Lock()
+        # Events not yet read past, in file order, and the byte offset after
+        # the last complete line. Events at or below _floor were dropped once
+        # the subscriber's cursor passed them.
+        self._events: OrderedDict[int, PolicyChangeEvent] = OrderedDict()
+        self._floor = 0
+        self._ordered = True  # whether file order is version order so far
+        self._offset = 0
+        self._socket: socket.socket | None = None
+        self._socket_path: Path | None = None
+        self._bind()
+
+    def _bind(self) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            return
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        path = self.socket_dir / f"{uuid.uuid4().hex[:12]}.sock"
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(str(path))
+        except OSError:
+            sock.close()
+            return
+        self._socket, self._socket_path = sock, path
+
+    def _read(self, offset: int) -> Iterator[tuple[int, PolicyChangeEvent | None]]:
+        """Yield (end offset, event) for complete lines after offset.
+
+        The event is None for a line that does not parse.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written; read it next time
+                offset += len(line)
+                try:
+                    event = PolicyChangeEvent.from_json(line)
+                except (ValueError, TypeError):
+                    event = None
+                yield offset, event
+
+    def _scan(self) -> None:
+        """Read lines appended since the last scan."""
+        for offset, event in self._read(self._offset):
+            self._offset = offset
+            if event is None:
+                continue
+            version = event.version_number
+            # The first event written for a version wins
+            if version <= self._floor or version in self._events:
+                continue
+            if self._events and version < next(reversed(self._events)):
+                self._ordered = False
+            self._events[version] = event
+
+    def _read_all(self) -> dict[int, PolicyChangeEvent]:
+        """Every event in the feed, including those already dropped."""
+        events: dict[int, PolicyChangeEvent] = {}
+        for _, event in self._read(0):
+            if event is not None:
+                events.setdefault(event.version_number, event)
+        return events
+
+    def _drop_through(self, version_number: int) -> None:
+        """Forget leading events the subscriber has read past."""
+        while self._events and next(iter(self._events)) <= version_number:
+            version, _ = self._events.popitem(last=False)
+            self._floor = max(self._floor, version)
+
+    def publish(self, event: PolicyChangeEvent) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)  # serialize check-and-append across processes
+                self._scan()
+                if event.version_number in self._events or (
+                    event.version_number <= self._floor
+                    and event.version_number in self._read_all()
+                ):
+                    return False
+                # A single O_APPEND write keeps concurrent appends whole
+                os.write(fd, event.to_json().encode() + b"\n")
+            finally:
+                os.close(fd)
+        self._notify()
+        return True
+
+    def _notify(self) -> None:
+        if not hasattr(socket, "AF_UNIX") or not self.socket_dir.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            for peer in self.socket_dir.glob("*.sock"):
+                if peer == self._socket_path:
+                    continue
+                try:
+                    sender.sendto(b"1", str(peer))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    peer.unlink(missing_ok=True)  # subscriber went away
+                except OSError:
+                    pass  # peer buffer full; it already has a pending wake-up
+
+    def read_since(self, version_number: int) -> list[PolicyChangeEvent]:
+        with self._lock:
+            self._scan()
+            if version_number < self._floor:
+                # Asked for events already dropped; read them back
+                events = [e for v, e in self._read_all().items() if v > version_number]
+                events.sort(key=lambda e: e.version_number)
+            else:
+                events = [e for v, e in self._events.items() if v > version_number]
+                if not self._ordered:
+                    events.sort(key=lambda e: e.version_number)
+            self._drop_through(version_number)
+            return events
+
+    def wait(self, timeout: float) -> bool:
+        sock = self._socket
+        if sock is None:
+            time.sleep(timeout)
+            return False
+        sock.settimeout(timeout)
+        try:
+            sock.recv(16)
+        except (TimeoutError, OSError):
+            return False
+        # Collapse a burst of notifications into one wake-up
+        sock.setblocking(False)
+        try:
+            while sock.recv(16):
+                pass
+        except OSError:
+            pass
+        return True
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._socket_path is not None:
+            self._socket_path.unlink(missing_ok=True)
+            self._socket_path = None
+
+
+class SQLiteFeedTransport(PolicyFeedTransport):
+    """Feed stored in a shared SQLite database.
+
+    Subscribers poll ``PRAGMA data_version``, which only changes when
+    another connection commits, so an idle wait costs no table reads.
+    """
+
+    def __init__(self, path: Path, poll_interval: float = DEFAULT_SQLITE_POLL_SECONDS) -> None:
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS policy_changes ("
+            "version_number INTEGER PRIMARY KEY, "
+            "event TEXT NOT NULL)"
+        )
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def publish(self, event: PolicyChangeEvent) -> bool:
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO policy_changes (version_number, event) VALUES (?, ?)",
+                    (event.version_number, event.to_json()),
+                )
+            except sqlite3.IntegrityError:
+                return False
+        return True
+
+    def read_since(self, version_number: int) -> list[PolicyChangeEvent]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT event FROM policy_changes WHERE version_number > ? ORDER BY version_number",
+                (version_number,),
+            ).fetchall()
+        return [PolicyChangeEvent.from_json(row[0]) for row in rows]
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._read_data_version()
+            if current != self._data_version:
+                self._data_version = current
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_feed_transport(url: str) -> PolicyFeedTransport:
+    """Build a transport from a ``file://`` or ``sqlite://`` URL.
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    scheme, sep, location = url.partition("://")
+    if not sep or not location:
+        raise ValueError(f"Invalid policy feed URL: {url}")
+    if scheme == "file":
+        return LocalFeedTransport(Path(location))
+    if scheme == "sqlite":
+        return SQLiteFeedTransport(Path(location))
+    raise ValueError(f"Unsupported policy feed scheme: {scheme}")
+
+
+# =============================================================================
+# Subscriber
+# =============================================================================
+
+
+class PolicyFeedSubscriber:
+    """Applies feed events to a replica in a background thread."""
+
+    def __init__(
+        self,
+        transport: PolicyFeedTransport,
+        apply: Callable[[PolicyChangeEvent], bool],
+        current_version: Callable[[], int],
+        wait_seconds: float = DEFAULT_WAIT_SECONDS,
+    ) -> None:
+        self.transport = transport
+        self.wait_seconds = wait_seconds
+        self._apply = apply
+        self._current_version = current_version
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def poll(self) -> int:
+        """Apply every pending event. Returns the number applied."""
+        applied = 0
+        for event in self.transport.read_since(self._current_version()):
+            if self._apply(event):
+                applied += 1
+        return applied
+
+    def _run_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.transport.wait(self.wait_seconds)
+                if not self._stop.is_set():
+                    self.poll()
+            except Exception:
+                self._stop.wait(self.wait_seconds)  # back off, then retry
+
+    def start(self) -> None:
+        """Start applying events in a background thread."""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.wait_seconds + 5)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+__all__ = [
+    "LocalFeedTransport",
+    "PolicyChangeEvent",
+    "PolicyConflictError",
+    "PolicyFeedSubscriber",
+    "PolicyFeedTransport",
+    "SQLiteFeedTransport",
+    "create_feed_transport",
+]
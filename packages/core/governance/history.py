@@ -0,0 +1,427 @@
+"""Append-only, delta-encoded policy version history.
+
+Each policy version is one line in the history log::
+
+    <metadata JSON>\\t<payload JSON>\\n
+
+The payload is either a full snapshot (a checkpoint, written for the first
+version and then every ``checkpoint_interval`` versions) or a list of delta
+operations against the previous version. Appending a version writes one
+line instead of rewriting the whole history.
+
+Only the metadata half of each line is parsed when the history is first
+accessed. Snapshots are materialized on demand by replaying deltas from
+the nearest checkpoint.
+
+Several processes may share one log. Readers never modify it; writers
+append under an exclusive lock on ``<log>.lock``, index what others
+appended first, and drop a torn trailing line before writing theirs.
+
+Histories written by older releases (a single ``{"versions": [...]}`` JSON
+document) are migrated to the log format on first load.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
+
+CHECKPOINT_INTERVAL = 50
+
+CHECKPOINT = "checkpoint"
+DELTA = "delta"
+
+_SEPARATOR = b"\t"
+
+# Metadata fields stored for every version
+META_FIELDS = (
+    "version_id",
+    "version_number",
+    "created_at",
+    "created_by",
+    "change_description",
+    "policy_hash",
+)
+
+
+# =============================================================================
+# Delta Encoding
+# =============================================================================
+
+
+def _same_key_order(old: dict[str, Any], new: dict[str, Any]) -> bool:
+    """True if applying key-level ops to old reproduces new's key order."""
+    kept_old = [k for k in old if k in new]
+    kept_new = [k for k in new if k in old]
+    if kept_old != kept_new:
+        return False
+    # Added keys are appended on apply, so they must come last in new
+    return list(new)[: len(kept_new)] == kept_new
+
+
+def diff_snapshots(old: Any, new: Any, path: list[Any] | None = None) -> list[dict[str, Any]]:
+    """Return the operations that turn old into new."""
+    ops: list[dict[str, Any]] = []
+    _diff(old, new, path or [], ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: list[Any], ops: list[dict[str, Any]]) -> None:
+    if old == new and type(old) is type(new):
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict) and _same_key_order(old, new):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "del", "path": [*path, key]})
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, [*path, key], ops)
+            else:
+                ops.append({"op": "set", "path": [*path, key], "value": value})
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        # Trim the common prefix and suffix; most edits touch one element
+        limit = min(len(old), len(new))
+        start = 0
+        while start < limit and old[start] == new[start]:
+            start += 1
+        end = 0
+        while end < limit - start and old[-1 - end] == new[-1 - end]:
+            end += 1
+        ops.append({
+            "op": "splice",
+            "path": path,
+            "start": start,
+            "delete": len(old) - start - end,
+            "insert": new[start:len(new) - end],
+        })
+        return
+
+    ops.append({"op": "set", "path": path, "value": new})
+
+
+def apply_delta(snapshot: Any, ops: list[dict[str, Any]]) -> Any:
+    """Apply delta operations to a snapshot in place and return it."""
+    for op in ops:
+        path = op["path"]
+        if not path:
+            if op["op"] == "set":
+                snapshot = copy.deepcopy(op["value"])
+                continue
+            target, last = None, None
+        else:
+            target = snapshot
+            for key in path[:-1]:
+                target = target[key]
+            last = path[-1]
+
+        if op["op"] == "set":
+            target[last] = copy.deepcopy(op["value"])
+        elif op["op"] == "del":
+            del target[last]
+        elif op["op"] == "splice":
+            container = snapshot if not path else target[last]
+            start = op["start"]
+            container[start:start + op["delete"]] = copy.deepcopy(op["insert"])
+        else:
+            raise ValueError(f"Unknown history operation: {op['op']}")
+    return snapshot
+
+
+# =============================================================================
+# History Log
+# =============================================================================
+
+
+@dataclass(frozen=True)
+class HistoryEntry:
+    """Metadata of one stored version and where its payload lives."""
+
+    version_id: str
+    version_number: int
+    created_at: str
+    created_by: str
+    change_description: str
+    policy_hash: str
+    kind: str
+    offset: int
+
+    def metadata(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in META_FIELDS}
+
+
+class PolicyHistoryLog:
+    """Append-only policy history with lazily materialized snapshots.
+
+    Safe to share between threads: the index is rebuilt aside and
+    published in one step, under a lock readers also take.
+    """
+
+    def __init__(self, path: Path, checkpoint_interval: int = CHECKPOINT_INTERVAL) -> None:
+        self.path = Path(path)
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.RLock()
+        self._entries: list[HistoryEntry] | None = None
+        self._end = 0  # bytes of the log indexed so far
+        self._by_id: dict[str, int] = {}
+        self._by_number: dict[int, int] = {}
+        # Most recently materialized (position, snapshot) to speed up replays
+        self._cursor: tuple[int, Any] | None = None
+
+    # -------------------------------------------------------------------------
+    # Loading
+    # -------------------------------------------------------------------------
+
+    def _load(self) -> list[HistoryEntry]:
+        with self._lock:
+            if self._entries is None:
+                if self.path.exists() and self._is_legacy():
+                    with self._locked():
+                        if self._is_legacy():  # another process may have migrated it
+                            self._migrate_legacy()
+                self._scan()
+            assert self._entries is not None
+            return self._entries
+
+    def refresh(self) -> None:
+        """Index versions other processes appended since the last read."""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            else:
+                self._scan()
+
+    def _scan(self) -> None:
+        """Index lines appended since the last scan, by any process.
+
+        A line without its newline is still being written, or was torn by
+        an interrupted append; it is left for the next writer to repair.
+        """
+        with self._lock:
+            entries = self._entries or []
+            end = self._end
+            added: list[HistoryEntry] = []
+            if self.path.exists():
+                with open(self.path, "rb") as f:
+                    if f.seek(0, os.SEEK_END) < end:  # replaced by another process
+                        entries, end = [], 0
+                    f.seek(end)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        line_offset = end
+                        end += len(line)
+                        meta_raw, sep, _ = line.partition(_SEPARATOR)
+                        if not sep:
+                            continue
+                        try:
+                            meta = json.loads(meta_raw)
+                        except ValueError:
+                            continue
+                        added.append(HistoryEntry(
+                            **{name: meta[name] for name in META_FIELDS},
+                            kind=meta.get("kind", CHECKPOINT),
+                            offset=line_offset,
+                        ))
+            self._publish(entries, added, end)
+
+    def _publish(self, entries: list[HistoryEntry], added: list[HistoryEntry], end: int) -> None:
+        """Replace the index with entries plus added, indexed up to byte end."""
+        extends = entries is self._entries
+        if extends and not added:
+            self._end = end
+            return
+        by_id = dict(self._by_id) if extends else {}
+        by_number = dict(self._by_number) if extends else {}
+        entries = list(entries)
+        for entry in added:
+            by_id[entry.version_id] = len(entries)
+            by_number[entry.version_number] = len(entries)
+            entries.append(entry)
+        if not extends:
+            self._cursor = None
+        self._entries, self._by_id, self._by_number, self._end = entries, by_id, by_number, end
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the exclusive lock that serializes writers across processes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _is_legacy(self) -> bool:
+        with open(self.path, "rb") as f:
+            first_line = f.readline()
+        return bool(first_line.strip()) and _SEPARATOR not in first_line
+
+    def _migrate_legacy(self) -> None:
+        """Rewrite a legacy single-document history as a log."""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            versions = data.get("versions", [])
+        except (ValueError, AttributeError):
+            versions = []
+
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        previous: Any = None
+        with open(tmp_path, "wb") as f:
+            for position, version in enumerate(versions):
+                snapshot = version.get("policy_snapshot", {})
+                if position % self.checkpoint_interval:
+                    f.write(_encode(version, DELTA, diff_snapshots(previous, snapshot)))
+                else:
+                    f.write(_encode(version, CHECKPOINT, snapshot))
+                previous = snapshot
+        os.replace(tmp_path, self.path)
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    def entries(self) -> list[HistoryEntry]:
+        """Metadata of every stored version, oldest first."""
+        return list(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def find(self, version_id: str) -> HistoryEntry | None:
+        with self._lock:
+            entries = self._load()
+            position = self._by_id.get(version_id)
+            return entries[position] if position is not None else None
+
+    def find_by_number(self, version_number: int) -> HistoryEntry | None:
+        with self._lock:
+            entries = self._load()
+            position = self._by_number.get(version_number)
+            return entries[position] if position is not None else None
+
+    def _read_payload(self, f: Any, entry: HistoryEntry) -> Any:
+        f.seek(entry.offset)
+        _, _, payload = f.readline().partition(_SEPARATOR)
+        return json.loads(payload)
+
+    def _materialize(self, position: int, f: Any) -> Any:
+        entries = self._load()
+        start = position
+        while entries[start].kind != CHECKPOINT and start > 0:
+            start -= 1
+
+        if self._cursor is not None and start <= self._cursor[0] <= position:
+            current, snapshot = self._cursor[0], copy.deepcopy(self._cursor[1])
+        else:
+            current, snapshot = start, self._read_payload(f, entries[start])
+
+        for pos in range(current + 1, position + 1):
+            payload = self._read_payload(f, entries[pos])
+            if entries[pos].kind == CHECKPOINT:
+                snapshot = payload
+            else:
+                snapshot = apply_delta(snapshot, payload)
+
+        self._cursor = (position, copy.deepcopy(snapshot))
+        return snapshot
+
+    def snapshot(self, version_number: int) -> dict[str, Any] | None:
+        """Materialize the full snapshot for a version."""
+        return self.snapshots([version_number]).get(version_number)
+
+    def snapshots(self, version_numbers: list[int]) -> dict[str, Any]:
+        """Materialize several snapshots in a single forward replay."""
+        with self._lock:
+            entries = self._load()
+            positions = sorted(
+                self._by_number[n] for n in set(version_numbers) if n in self._by_number
+            )
+            if not positions:
+                return {}
+            result: dict[int, Any] = {}
+            with open(self.path, "rb") as f:
+                for position in positions:
+                    result[entries[position].version_number] = self._materialize(position, f)
+            return result  # type: ignore[return-value]
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+
+    def append(self, metadata: dict[str, Any], snapshot: dict[str, Any]) -> HistoryEntry:
+        """Append a version, stored as a delta unless a checkpoint is due.
+
+        Versions other processes appended are indexed first, so the delta
+        is against the latest stored version.
+        """
+        with self._lock:
+            self._load()
+            with self._locked():
+                return self._append(metadata, snapshot)
+
+    def _append(self, metadata: dict[str, Any], snapshot: dict[str, Any]) -> HistoryEntry:
+        """Append while holding the writer lock."""
+        self._scan()
+        entries = self._load()
+
+        kind = CHECKPOINT
+        payload: Any = snapshot
+        if entries:
+            last_checkpoint = len(entries) - 1
+            while entries[last_checkpoint].kind != CHECKPOINT and last_checkpoint > 0:
+                last_checkpoint -= 1
+            if len(entries) - last_checkpoint < self.checkpoint_interval:
+                with open(self.path, "rb") as f:
+                    previous = self._materialize(len(entries) - 1, f)
+                kind = DELTA
+                payload = diff_snapshots(previous, snapshot)
+
+        line = _encode(metadata, kind, payload)
+        with open(self.path, "ab") as f:
+            # Drop a torn line left by an interrupted append
+            f.truncate(self._end)
+            f.write(line)
+        self._scan()
+
+        entries = self._load()
+        self._cursor = (len(entries) - 1, copy.deepcopy(snapshot))
+        return entries[-1]
+
+
+def _encode(metadata: dict[str, Any], kind: str, payload: Any) -> bytes:
+    """One history log line."""
+    meta = {name: metadata[name] for name in META_FIELDS}
+    meta["kind"] = kind
+    return (
+        json.dumps(meta, separators=(",", ":")).encode()
+        + _SEPARATOR
+        + json.dumps(payload, separators=(",", ":")).encode()
+        + b"\n"
+    )
+
+
+__all__ = [
+    "CHECKPOINT_INTERVAL",
+    "HistoryEntry",
+    "PolicyHistoryLog",
+    "apply_delta",
+    "diff_snapshots",
+]
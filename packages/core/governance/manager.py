@@ -8,17 +8,21 @@ This module provides a singleton governance manager that:
 - Tracks policy versions and change history
 - Supports approval workflow for policy changes
 - Detects configuration drift
+- Layers per-tenant policy overlays over the shared base policies
 """
 
 from __future__ import annotations
 
+import copy
+import functools
 import hashlib
 import json
-import re
+import threading
 import uuid
 from datetime import datetime
+from collections.abc import Callable, Iterable
 from pathlib import Path
-from typing import Any
+from typing import Any, TypeVar
 
 from packages.core.governance import (
     PolicyLoader,
@@ -27,7 +31,38 @@ from packages.core.governance import (
     RuleAction,
     RuleCondition,
     ConditionOperator,
-    evaluate_governance,
+)
+from packages.core.governance.cache import (
+    DecisionCache,
+    DecisionCacheStats,
+    context_key,
+    copy_decision,
+    decision_key,
+)
+from packages.core.governance.compiler import CompiledPolicySet
+from packages.core.governance.evaluator import RISK_PATTERNS, PolicyEvaluator
+from packages.core.governance.feed import (
+    PolicyChangeEvent,
+    PolicyConflictError,
+    PolicyFeedSubscriber,
+    PolicyFeedTransport,
+)
+from packages.core.governance.history import (
+    HistoryEntry,
+    PolicyHistoryLog,
+    apply_delta,
+    diff_snapshots,
+)
+from packages.core.governance.prohibitions import (
+    GLOBAL_SCOPE,
+    agent_scope,
+    domain_scope,
+)
+from packages.core.governance.replay import ReplayQuery, replay_queries
+from packages.core.governance.snapshot import (
+    PolicyFileWatcher,
+    PolicySnapshot,
+    build_snapshot,
 )
 from packages.core.schemas.models import (
     GovernanceDecision,
@@ -115,7 +150,10 @@ class PolicyChange:
 
 
 class PolicyVersion:
-    """Represents a point-in-time snapshot of policies."""
+    """Represents a point-in-time snapshot of policies.
+
+    Versions read from history materialize their snapshot on first access.
+    """
 
     def __init__(
         self,
@@ -125,7 +163,8 @@ class PolicyVersion:
         created_by: str,
         change_description: str,
         policy_hash: str,
-        policy_snapshot: dict,
+        policy_snapshot: dict | None = None,
+        snapshot_loader: Callable[[], dict | None] | None = None,
     ):
         self.version_id = version_id
         self.version_number = version_number
@@ -133,7 +172,15 @@ class PolicyVersion:
         self.created_by = created_by
         self.change_description = change_description
         self.policy_hash = policy_hash
-        self.policy_snapshot = policy_snapshot
+        self._policy_snapshot = policy_snapshot
+        self._snapshot_loader = snapshot_loader
+
+    @property
+    def policy_snapshot(self) -> dict:
+        if self._policy_snapshot is None:
+            loaded = self._snapshot_loader() if self._snapshot_loader else None
+            self._policy_snapshot = loaded or {}
+        return self._policy_snapshot
 
     def to_dict(self) -> dict:
         return {
@@ -159,30 +206,19 @@ class PolicyVersion:
         )
 
 
-# Risk signal patterns
-RISK_PATTERNS: dict[str, list[str]] = {
-    "PII": [
-        r"\b(ssn|social security)\b",
-        r"\b(credit card|ccn)\b",
-        r"\b(password|credential)\b",
-        r"\bconfidential\b",
-    ],
-    "FINANCIAL": [
-        r"\b(salary|compensation|pay)\b",
-        r"\b(budget|funding)\b",
-        r"\b(contract|procurement)\b",
-    ],
-    "LEGAL": [
-        r"\b(lawsuit|litigation)\b",
-        r"\b(attorney|lawyer)\b",
-        r"\b(legal advice)\b",
-    ],
-    "PERSONNEL": [
-        r"\b(fire|terminate|disciplin)\b",
-        r"\b(performance review)\b",
-        r"\b(employee complaint)\b",
-    ],
-}
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def _writer(method: _F) -> _F:
+    """Serialize a policy-mutating method against other writers.
+
+    Readers never take this lock; they read the published snapshot.
+    """
+    @functools.wraps(method)
+    def wrapper(self: GovernanceManager, *args: Any, **kwargs: Any) -> Any:
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper  # type: ignore[return-value]
 
 
 class GovernanceManager:
@@ -198,6 +234,10 @@ class GovernanceManager:
     - Approval workflow for policy changes
     - Drift detection
     - Override prevention with immutable rules
+
+    Concurrency: writers serialize on a lock and mutate private working
+    state, then publish an immutable PolicySnapshot. Readers (evaluation
+    and getters) use the current snapshot and never block.
     """
 
     _instance: GovernanceManager | None = None
@@ -206,15 +246,29 @@ class GovernanceManager:
         self._policy_path = policy_path or DEFAULT_POLICY_PATH
         self._history_path = POLICY_HISTORY_PATH
         self._pending_path = PENDING_POLICY_PATH
+        self._write_lock = threading.RLock()
+        # Working state, only touched by writers
         self._policy_set = PolicySet()
         self._loader = PolicyLoader()
         self._prohibited_topics: list[str] = []
         self._immutable_rules: set[str] = set()  # Rule IDs that cannot be modified
+        self._tenant_policies: dict[str, PolicySet] = {}  # Per-tenant overlays
         self._current_version: int = 0
         self._policy_hash: str = ""
-        self._versions: list[PolicyVersion] = []
+        self._history = PolicyHistoryLog(self._history_path)
         self._pending_changes: list[PolicyChange] = []
         self._require_approval: bool = True  # Require approval for policy changes
+        self._decision_cache = DecisionCache()
+        # Published state, read by request handlers
+        self._snapshot: PolicySnapshot = build_snapshot(PolicySet(), [], [], 0, "")
+        self._watcher = PolicyFileWatcher(self._policy_path, self.reload_policies)
+        # Cluster change feed; _feed_base is the serialized current version
+        self._node_id = uuid.uuid4().hex
+        self._feed: PolicyFeedSubscriber | None = None
+        self._feed_base: dict[str, Any] | None = None
+        self._feed_conflicts = 0
+        self._dry_run = False
+        self._evaluator = PolicyEvaluator()
         self._load_policies()
         self._load_history()
         self._load_pending_changes()
@@ -229,6 +283,8 @@ class GovernanceManager:
     @classmethod
     def reset_instance(cls) -> None:
         """Reset the singleton (for testing)."""
+        if cls._instance is not None:
+            cls._instance.stop_policy_watcher()
         cls._instance = None
 
     def _load_policies(self) -> None:
@@ -239,6 +295,7 @@ class GovernanceManager:
                 self._policy_set = self._loader.load_from_dict(raw)
                 self._prohibited_topics = raw.get("prohibited_topics", [])
                 self._immutable_rules = set(raw.get("immutable_rules", []))
+                self._tenant_policies = self._load_tenant_policies(raw)
                 self._current_version = raw.get("version", 0)
                 self._require_approval = raw.get("require_approval", True)
                 self._policy_hash = self._compute_policy_hash()
@@ -246,25 +303,45 @@ class GovernanceManager:
                 self._policy_set = PolicySet()
                 self._prohibited_topics = []
                 self._immutable_rules = set()
+                self._tenant_policies = {}
+            self._feed_base = self._version_snapshot_dict() if self._feed else None
+            self._watcher.mark()
+            self._publish()
         else:
             self._init_default_policies()
 
-    def _load_history(self) -> None:
-        """Load policy version history from disk."""
-        if self._history_path.exists():
-            try:
-                data = json.loads(self._history_path.read_text(encoding="utf-8"))
-                self._versions = [PolicyVersion.from_dict(v) for v in data.get("versions", [])]
-            except Exception:
-                self._versions = []
-        else:
-            self._versions = []
+    def _load_tenant_policies(self, data: dict[str, Any]) -> dict[str, PolicySet]:
+        """Parse the tenant overlays of a policy file or version snapshot."""
+        return {
+            tenant_id: self._loader.load_from_dict(raw)
+            for tenant_id, raw in data.get("tenant_policies", {}).items()
+        }
+
+    def _serialize_tenant_policies(self) -> dict[str, Any]:
+        """Serialize tenant overlays; empty when no tenant has one."""
+        if not self._tenant_policies:
+            return {}
+        return {
+            "tenant_policies": {
+                tenant_id: self._serialize_policy_set(overlay)
+                for tenant_id, overlay in sorted(self._tenant_policies.items())
+            }
+        }
 
-    def _save_history(self) -> None:
-        """Save policy version history to disk."""
-        self._history_path.parent.mkdir(parents=True, exist_ok=True)
-        data = {"versions": [v.to_dict() for v in self._versions]}
-        self._history_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    def _load_history(self) -> None:
+        """Open the policy version history (entries are indexed on first use)."""
+        self._history = PolicyHistoryLog(self._history_path)
+
+    def _version_from_entry(
+        self, entry: HistoryEntry, snapshot: dict | None = None
+    ) -> PolicyVersion:
+        """Wrap a history entry; the snapshot is materialized lazily."""
+        history = self._history
+        return PolicyVersion(
+            **entry.metadata(),
+            policy_snapshot=snapshot,
+            snapshot_loader=lambda: history.snapshot(entry.version_number),
+        )
 
     def _load_pending_changes(self) -> None:
         """Load pending policy changes from disk."""
@@ -287,37 +364,69 @@ class GovernanceManager:
         """Compute a hash of the current policy state for drift detection."""
         policy_data = self._serialize_policy_set()
         policy_data["prohibited_topics"] = sorted(self._prohibited_topics)
+        policy_data.update(self._serialize_tenant_policies())
         policy_str = json.dumps(policy_data, sort_keys=True)
         return hashlib.sha256(policy_str.encode()).hexdigest()[:16]
 
     def _create_version_snapshot(self, description: str, created_by: str = "system") -> PolicyVersion:
-        """Create a version snapshot of current policies."""
-        self._current_version += 1
-        version = PolicyVersion(
+        """Describe the working policies as the next version.
+
+        The version is not recorded until _save_policies has confirmed its
+        number with the change feed.
+        """
+        return PolicyVersion(
             version_id=str(uuid.uuid4()),
-            version_number=self._current_version,
+            version_number=self._current_version + 1,
             created_at=datetime.utcnow().isoformat(),
             created_by=created_by,
             change_description=description,
             policy_hash=self._compute_policy_hash(),
-            policy_snapshot=self._serialize_policy_set(),
+            policy_snapshot=self._version_snapshot_dict(),
         )
-        version.policy_snapshot["prohibited_topics"] = list(self._prohibited_topics)
-        version.policy_snapshot["immutable_rules"] = list(self._immutable_rules)
-        self._versions.append(version)
-        self._save_history()
-        return version
+
+    def _version_snapshot_dict(self) -> dict[str, Any]:
+        """Serialize the working policies in the version history format."""
+        snapshot = self._serialize_policy_set()
+        snapshot["prohibited_topics"] = list(self._prohibited_topics)
+        snapshot["immutable_rules"] = list(self._immutable_rules)
+        snapshot.update(self._serialize_tenant_policies())
+        return snapshot
 
     def _save_policies(self, description: str = "Policy update", changed_by: str = "system") -> None:
-        """Persist policies to disk with versioning."""
+        """Persist policies to disk with versioning.
+
+        With a change feed attached, the feed allocates the version number:
+        if another replica already published it, the change is discarded,
+        this replica adopts the winning version and PolicyConflictError is
+        raised.
+        """
+        if self._dry_run:
+            return  # previewing a change; leave disk and readers untouched
         self._policy_path.parent.mkdir(parents=True, exist_ok=True)
+        base_version, base_hash = self._current_version, self._policy_hash
+
+        version = self._create_version_snapshot(description, changed_by)
+        if not self._publish_change(version, base_version, base_hash):
+            self._adopt_winning_version(base_version)
+            raise PolicyConflictError(
+                f"Policy version {version.version_number} was already published "
+                "by another replica; the change was discarded. Retry it.",
+                version_number=version.version_number,
+                current_version=self._current_version,
+            )
 
-        # Create version snapshot before saving
-        self._create_version_snapshot(description, changed_by)
+        self._history.append(version.to_dict(), version.policy_snapshot)
+        self._current_version = version.version_number
+        self._policy_hash = version.policy_hash
+        self._write_policy_file(changed_by)
+        self._publish()
 
+    def _write_policy_file(self, changed_by: str) -> None:
+        """Write the working policies to the policy file."""
         data = self._serialize_policy_set()
         data["prohibited_topics"] = self._prohibited_topics
         data["immutable_rules"] = list(self._immutable_rules)
+        data.update(self._serialize_tenant_policies())
         data["version"] = self._current_version
         data["require_approval"] = self._require_approval
         data["last_modified"] = datetime.utcnow().isoformat()
@@ -327,10 +436,27 @@ class GovernanceManager:
             json.dumps(data, indent=2),
             encoding="utf-8",
         )
-        self._policy_hash = self._compute_policy_hash()
+        self._watcher.mark()
+
+    def _publish(self) -> None:
+        """Snapshot the working policies and atomically swap them in."""
+        snapshot = build_snapshot(
+            self._policy_set,
+            self._prohibited_topics,
+            self._immutable_rules,
+            self._current_version,
+            self._policy_hash,
+            self._tenant_policies,
+            previous=self._snapshot,
+        )
+        self._snapshot = snapshot
+        self._decision_cache.invalidate(snapshot.key)
+
+    def _serialize_policy_set(self, policy_set: PolicySet | None = None) -> dict[str, Any]:
+        """Serialize policy set (default: the working base policies) to dict for storage."""
+        if policy_set is None:
+            policy_set = self._policy_set
 
-    def _serialize_policy_set(self) -> dict[str, Any]:
-        """Serialize policy set to dict for storage."""
         def serialize_rule(rule: PolicyRule) -> dict[str, Any]:
             conditions = []
             for cond in rule.conditions:
@@ -363,16 +489,16 @@ class GovernanceManager:
 
         return {
             "constitutional_rules": [
-                serialize_rule(r) for r in self._policy_set.constitutional_rules
+                serialize_rule(r) for r in policy_set.constitutional_rules
             ],
             "organization_rules": {
                 "default": [
-                    serialize_rule(r) for r in self._policy_set.organization_rules.default
+                    serialize_rule(r) for r in policy_set.organization_rules.default
                 ],
             },
             "department_rules": {
                 dept: {"defaults": [serialize_rule(r) for r in rules.defaults]}
-                for dept, rules in self._policy_set.department_rules.items()
+                for dept, rules in policy_set.department_rules.items()
             },
         }
 
@@ -462,6 +588,7 @@ class GovernanceManager:
     # B) Override Prevention - Immutable Rules
     # =========================================================================
 
+    @_writer
     def mark_rule_immutable(self, rule_id: str) -> bool:
         """Mark a rule as immutable (cannot be modified or deleted)."""
         # Check if rule exists
@@ -484,6 +611,7 @@ class GovernanceManager:
         self._save_policies(f"Marked rule {rule_id} as immutable", "system")
         return True
 
+    @_writer
     def unmark_rule_immutable(
         self,
         rule_id: str,
@@ -537,18 +665,18 @@ class GovernanceManager:
 
     def is_rule_immutable(self, rule_id: str) -> bool:
         """Check if a rule is immutable."""
-        return rule_id in self._immutable_rules
+        return rule_id in self._snapshot.immutable_rules
 
     def get_immutable_rules(self) -> list[str]:
         """Get list of immutable rule IDs."""
-        return list(self._immutable_rules)
+        return list(self._snapshot.immutable_rules)
 
     def check_override_conflict(self, new_rule: PolicyRule) -> dict | None:
         """Check if a new rule would conflict with higher-priority rules.
 
         Returns conflict details or None if no conflict.
         """
-        for const_rule in self._policy_set.constitutional_rules:
+        for const_rule in self._snapshot.policy_set.constitutional_rules:
             if const_rule.priority > new_rule.priority:
                 # Check for overlapping conditions
                 for new_cond in new_rule.conditions:
@@ -571,27 +699,31 @@ class GovernanceManager:
 
     def get_current_version(self) -> int:
         """Get the current policy version number."""
-        return self._current_version
+        return self._snapshot.version
 
     def get_version_history(self, limit: int = 50) -> list[dict]:
         """Get policy version history."""
-        versions = sorted(self._versions, key=lambda v: v.version_number, reverse=True)[:limit]
-        return [v.to_dict() for v in versions]
+        entries = sorted(
+            self._history.entries(), key=lambda e: e.version_number, reverse=True
+        )[:limit]
+        # Materialize all requested snapshots in one forward replay
+        snapshots = self._history.snapshots([e.version_number for e in entries])
+        return [
+            self._version_from_entry(e, snapshots.get(e.version_number)).to_dict()
+            for e in entries
+        ]
 
     def get_version(self, version_id: str) -> PolicyVersion | None:
         """Get a specific version by ID."""
-        for v in self._versions:
-            if v.version_id == version_id:
-                return v
-        return None
+        entry = self._history.find(version_id)
+        return self._version_from_entry(entry) if entry else None
 
     def get_version_by_number(self, version_number: int) -> PolicyVersion | None:
         """Get a specific version by version number."""
-        for v in self._versions:
-            if v.version_number == version_number:
-                return v
-        return None
+        entry = self._history.find_by_number(version_number)
+        return self._version_from_entry(entry) if entry else None
 
+    @_writer
     def rollback_to_version(self, version_id: str, rolled_back_by: str = "admin") -> bool:
         """Rollback policies to a previous version."""
         version = self.get_version(version_id)
@@ -603,6 +735,7 @@ class GovernanceManager:
         self._policy_set = self._loader.load_from_dict(snapshot)
         self._prohibited_topics = snapshot.get("prohibited_topics", [])
         self._immutable_rules = set(snapshot.get("immutable_rules", []))
+        self._tenant_policies = self._load_tenant_policies(snapshot)
 
         # Save with new version (rollback creates a new version)
         self._save_policies(
@@ -611,8 +744,18 @@ class GovernanceManager:
         )
         return True
 
-    def compare_versions(self, version_id_1: str, version_id_2: str) -> dict:
-        """Compare two policy versions."""
+    def compare_versions(
+        self,
+        version_id_1: str,
+        version_id_2: str,
+        queries: Iterable[ReplayQuery] | None = None,
+        workers: int | None = None,
+    ) -> dict:
+        """Compare two policy versions.
+
+        If recorded queries are given, they are replayed against both
+        versions and the decision changes are reported under "behavior".
+        """
         v1 = self.get_version(version_id_1)
         v2 = self.get_version(version_id_2)
 
@@ -644,12 +787,17 @@ class GovernanceManager:
         for topic in v1_topics - v2_topics:
             diff["changes"].append({"type": "removed", "tier": "prohibited_topic", "topic": topic})
 
+        if queries is not None:
+            report = replay_queries(v1.policy_snapshot, v2.policy_snapshot, queries, workers)
+            diff["behavior"] = report.model_dump()
+
         return diff
 
     # =========================================================================
     # D) Approval Workflow for Policy Changes
     # =========================================================================
 
+    @_writer
     def set_require_approval(self, require: bool) -> None:
         """Enable or disable approval requirement for policy changes."""
         self._require_approval = require
@@ -662,6 +810,7 @@ class GovernanceManager:
         """Check if approval is required for policy changes."""
         return self._require_approval
 
+    @_writer
     def propose_rule_change(
         self,
         change_type: str,
@@ -693,6 +842,7 @@ class GovernanceManager:
                 return c
         return None
 
+    @_writer
     def approve_change(
         self,
         change_id: str,
@@ -709,15 +859,7 @@ class GovernanceManager:
 
         # Apply the change based on type
         try:
-            if change.change_type == PolicyChangeType.ADD_RULE:
-                self._apply_add_rule(change.data, reviewed_by)
-            elif change.change_type == PolicyChangeType.REMOVE_RULE:
-                self._apply_remove_rule(change.data, reviewed_by)
-            elif change.change_type == PolicyChangeType.ADD_PROHIBITION:
-                self._apply_add_prohibition(change.data, reviewed_by)
-            elif change.change_type == PolicyChangeType.REMOVE_PROHIBITION:
-                self._apply_remove_prohibition(change.data, reviewed_by)
-            else:
+            if not self._apply_change(change, reviewed_by):
                 return {"success": False, "error": f"Unknown change type: {change.change_type}"}
 
             # Update change status
@@ -732,6 +874,7 @@ class GovernanceManager:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    @_writer
     def reject_change(
         self,
         change_id: str,
@@ -754,6 +897,70 @@ class GovernanceManager:
 
         return {"success": True, "message": f"Change {change_id} rejected"}
 
+    def preview_change(
+        self,
+        change_id: str,
+        queries: Iterable[ReplayQuery],
+        workers: int | None = None,
+    ) -> dict:
+        """Replay recorded queries to show what approving a change would do."""
+        change = self.get_change(change_id)
+        if not change:
+            return {"success": False, "error": "Change not found"}
+
+        try:
+            base_version, current, proposed = self._dry_run_change(change)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+        # Replay outside the write lock; it can take a while on large corpora
+        report = replay_queries(current, proposed, queries, workers)
+        return {
+            "success": True,
+            "change_id": change_id,
+            "base_version": base_version,
+            "behavior": report.model_dump(),
+        }
+
+    @_writer
+    def _dry_run_change(self, change: PolicyChange) -> tuple[int, dict, dict]:
+        """Apply a change to a scratch copy of the policies.
+
+        Returns the current version number and the current and proposed
+        snapshots. Nothing is saved or published.
+
+        Raises:
+            ValueError: If the change is invalid or of an unknown type
+        """
+        current = self._version_snapshot_dict()
+        saved = (self._policy_set, self._prohibited_topics, self._immutable_rules)
+        self._policy_set = self._policy_set.model_copy(deep=True)
+        self._prohibited_topics = list(self._prohibited_topics)
+        self._immutable_rules = set(self._immutable_rules)
+        self._dry_run = True
+        try:
+            if not self._apply_change(change, "preview"):
+                raise ValueError(f"Unknown change type: {change.change_type}")
+            proposed = self._version_snapshot_dict()
+        finally:
+            self._dry_run = False
+            self._policy_set, self._prohibited_topics, self._immutable_rules = saved
+        return self._current_version, current, proposed
+
+    def _apply_change(self, change: PolicyChange, applied_by: str) -> bool:
+        """Apply a change by type. Returns False for unknown change types."""
+        if change.change_type == PolicyChangeType.ADD_RULE:
+            self._apply_add_rule(change.data, applied_by)
+        elif change.change_type == PolicyChangeType.REMOVE_RULE:
+            self._apply_remove_rule(change.data, applied_by)
+        elif change.change_type == PolicyChangeType.ADD_PROHIBITION:
+            self._apply_add_prohibition(change.data, applied_by)
+        elif change.change_type == PolicyChangeType.REMOVE_PROHIBITION:
+            self._apply_remove_prohibition(change.data, applied_by)
+        else:
+            return False
+        return True
+
     def _apply_add_rule(self, data: dict, applied_by: str) -> None:
         """Apply an add rule change."""
         tier = data.get("tier", "organization")
@@ -826,8 +1033,9 @@ class GovernanceManager:
 
     def get_policy_hash(self) -> str:
         """Get the current policy hash for drift detection."""
-        return self._policy_hash
+        return self._snapshot.policy_hash
 
+    @_writer
     def check_drift(self) -> dict:
         """Check if policies have drifted from the stored hash.
 
@@ -853,7 +1061,11 @@ class GovernanceManager:
         }
 
     def check_file_drift(self) -> dict:
-        """Check if the policy file has been modified externally."""
+        """Check if the policy file has been modified externally.
+
+        The file is only read and hashed when its stat signature changed
+        since policies were last loaded or saved.
+        """
         if not self._policy_path.exists():
             return {
                 "drift_detected": True,
@@ -861,6 +1073,15 @@ class GovernanceManager:
                 "message": "Policy file not found!",
             }
 
+        if not self._watcher.changed():
+            return {
+                "drift_detected": False,
+                "status": "ok",
+                "message": "File and memory are in sync",
+            }
+
+        snapshot = self._snapshot
+
         # Load file and compute hash
         try:
             raw = json.loads(self._policy_path.read_text(encoding="utf-8"))
@@ -878,9 +1099,9 @@ class GovernanceManager:
 
             # Compute hash of in-memory contents
             mem_data = {
-                "constitutional_rules": [{"id": r.id} for r in self._policy_set.constitutional_rules],
-                "organization_rules": {"default": [{"id": r.id} for r in self._policy_set.organization_rules.default]},
-                "prohibited_topics": sorted(self._prohibited_topics),
+                "constitutional_rules": [{"id": r.id} for r in snapshot.policy_set.constitutional_rules],
+                "organization_rules": {"default": [{"id": r.id} for r in snapshot.policy_set.organization_rules.default]},
+                "prohibited_topics": sorted(snapshot.prohibited_topics),
             }
             mem_str = json.dumps(mem_data, sort_keys=True)
             mem_hash = hashlib.sha256(mem_str.encode()).hexdigest()[:16]
@@ -907,6 +1128,7 @@ class GovernanceManager:
                 "message": f"Error checking file drift: {str(e)}",
             }
 
+    @_writer
     def sync_from_file(self) -> dict:
         """Reload policies from file to resolve drift."""
         try:
@@ -928,25 +1150,262 @@ class GovernanceManager:
 
     def get_drift_report(self) -> dict:
         """Get a comprehensive drift report."""
+        snapshot = self._snapshot
         memory_drift = self.check_drift()
         file_drift = self.check_file_drift()
 
         return {
             "timestamp": datetime.utcnow().isoformat(),
-            "current_version": self._current_version,
-            "policy_hash": self._policy_hash,
+            "current_version": snapshot.version,
+            "policy_hash": snapshot.policy_hash,
             "memory_drift": memory_drift,
             "file_drift": file_drift,
             "overall_status": "ok" if not (memory_drift["drift_detected"] or file_drift["drift_detected"]) else "drift_detected",
         }
 
+    def start_policy_watcher(self, interval_seconds: float = 1.0) -> None:
+        """Reload policies automatically when the policy file changes on disk."""
+        self._watcher.interval_seconds = interval_seconds
+        self._watcher.start()
+
+    def stop_policy_watcher(self) -> None:
+        """Stop watching the policy file."""
+        self._watcher.stop()
+
+    def is_policy_watcher_running(self) -> bool:
+        """Check if the policy file watcher is running."""
+        return self._watcher.is_running()
+
+    # =========================================================================
+    # F) Cluster Policy Feed
+    # =========================================================================
+
+    def attach_policy_feed(
+        self,
+        transport: PolicyFeedTransport,
+        wait_seconds: float = 1.0,
+        start: bool = True,
+    ) -> None:
+        """Share policy changes with other replicas through a change feed.
+
+        Every saved version is published to the feed, and versions
+        published by other replicas are applied in order. Missed events are
+        caught up from the feed (and from the version history if the feed
+        cannot bridge the gap) before this returns.
+        """
+        self.detach_policy_feed()
+        with self._write_lock:
+            self._feed_base = self._version_snapshot_dict()
+            self._feed = PolicyFeedSubscriber(
+                transport,
+                self.apply_policy_change,
+                self.get_current_version,
+                wait_seconds=wait_seconds,
+            )
+        self._feed.poll()
+        if start:
+            self._feed.start()
+
+    def detach_policy_feed(self) -> None:
+        """Stop following the change feed and close its transport."""
+        feed = self._feed
+        if feed is None:
+            return
+        feed.stop()
+        with self._write_lock:
+            self._feed = None
+            self._feed_base = None
+        feed.transport.close()
+
+    def get_policy_feed_status(self) -> dict:
+        """Get the state of the cluster change feed."""
+        feed = self._feed
+        return {
+            "attached": feed is not None,
+            "running": feed.is_running() if feed else False,
+            "node_id": self._node_id,
+            "current_version": self._snapshot.version,
+            "conflicts": self._feed_conflicts,
+        }
+
+    def _publish_change(self, version: PolicyVersion, base_version: int, base_hash: str) -> bool:
+        """Publish a version to the change feed, if one is attached.
+
+        Returns False if another replica already published its number.
+        """
+        if self._feed is None:
+            return True
+        snapshot = version.policy_snapshot
+        if self._feed_base is not None:
+            delta = diff_snapshots(self._feed_base, snapshot)
+        else:
+            delta = [{"op": "set", "path": [], "value": snapshot}]
+        event = PolicyChangeEvent(
+            version_number=version.version_number,
+            policy_hash=version.policy_hash,
+            base_version=base_version,
+            base_hash=base_hash,
+            delta=delta,
+            origin=self._node_id,
+            description=version.change_description,
+            created_at=version.created_at,
+        )
+        if not self._feed.transport.publish(event):
+            self._feed_conflicts += 1
+            return False
+        self._feed_base = snapshot
+        return True
+
+    def _adopt_winning_version(self, base_version: int) -> None:
+        """Replace a discarded local change with the versions that won.
+
+        Applies the feed's newer versions, or restores the base version if
+        none is readable yet, and rewrites the policy file if it is older
+        than the adopted version.
+        """
+        assert self._feed is not None
+        self._feed.poll()
+        if self._current_version == base_version and self._feed_base is not None:
+            self._set_working_policies(self._feed_base)
+
+        try:
+            written = json.loads(self._policy_path.read_text(encoding="utf-8")).get("version", 0)
+        except (OSError, ValueError, AttributeError):
+            written = 0
+        if written < self._current_version:
+            entry = self._history.find_by_number(self._current_version)
+            self._write_policy_file(entry.created_by if entry else "system")
+        self._publish()
+
+    def _set_working_policies(self, snapshot: dict[str, Any]) -> None:
+        """Load the working policies from a version history snapshot."""
+        self._policy_set = self._loader.load_from_dict(snapshot)
+        self._prohibited_topics = list(snapshot.get("prohibited_topics", []))
+        self._immutable_rules = set(snapshot.get("immutable_rules", []))
+        self._tenant_policies = self._load_tenant_policies(snapshot)
+
+    @_writer
+    def apply_policy_change(self, event: PolicyChangeEvent) -> bool:
+        """Apply a version published by another replica.
+
+        Events for versions at or below the current one are ignored. The
+        delta is applied to the current version when it is the event's base;
+        otherwise the version is loaded from the shared version history, or
+        from the policy file as a last resort.
+
+        Returns True if the policies changed.
+        """
+        if event.version_number <= self._current_version:
+            return False
+
+        # Another replica appended to the history, so index its versions
+        self._history.refresh()
+        base = self._feed_base
+        if (
+            base is not None
+            and event.base_version == self._current_version
+            and event.base_hash == self._policy_hash
+        ):
+            snapshot = apply_delta(copy.deepcopy(base), event.delta)
+        else:
+            snapshot = self._history.snapshot(event.version_number)
+            if snapshot is None:
+                self._load_policies()
+                return True
+
+        self._set_working_policies(snapshot)
+        self._current_version = event.version_number
+        self._policy_hash = event.policy_hash
+        self._feed_base = snapshot
+        # The origin already wrote the shared policy file
+        self._watcher.mark()
+        self._publish()
+        return True
+
+    # =========================================================================
+    # G) Tenant Policy Overlays
+    # =========================================================================
+
+    @_writer
+    def set_tenant_policies(
+        self,
+        tenant_id: str,
+        policies: PolicySet,
+        changed_by: str = "admin",
+    ) -> None:
+        """Set a tenant's policy overlay, replacing any previous one.
+
+        The overlay's organization and department rules apply on top of the
+        shared base policies to requests whose UserContext.tenant_id matches.
+        Only the overlay is compiled per tenant; the base is shared.
+
+        Raises:
+            ValueError: If the overlay has constitutional rules, duplicate
+                rule IDs, or rule IDs that exist in the base policies
+        """
+        if policies.constitutional_rules:
+            raise ValueError(
+                "Tenant policies cannot contain constitutional rules. "
+                "Constitutional rules are shared by all tenants."
+            )
+
+        base_ids = self._get_all_rule_ids() | self._immutable_rules
+        seen: set[str] = set()
+        overlay_rules = list(policies.organization_rules.default)
+        for dept_rules in policies.department_rules.values():
+            overlay_rules.extend(dept_rules.defaults)
+        for rule in overlay_rules:
+            if rule.id in base_ids:
+                raise ValueError(
+                    f"Rule ID '{rule.id}' already exists in the base policies. "
+                    "Tenant rules cannot shadow base rules."
+                )
+            if rule.id in seen:
+                raise ValueError(
+                    f"Tenant rule '{rule.id}' is defined more than once. "
+                    "Cannot add duplicate rules."
+                )
+            seen.add(rule.id)
+
+        self._tenant_policies[tenant_id] = policies.model_copy(deep=True)
+        self._save_policies(f"Updated tenant policies: {tenant_id}", changed_by)
+
+    @_writer
+    def remove_tenant_policies(self, tenant_id: str, changed_by: str = "admin") -> bool:
+        """Remove a tenant's overlay so it falls back to the base policies."""
+        if tenant_id not in self._tenant_policies:
+            return False
+        del self._tenant_policies[tenant_id]
+        self._save_policies(f"Removed tenant policies: {tenant_id}", changed_by)
+        return True
+
+    def get_tenant_policies(self, tenant_id: str) -> PolicySet | None:
+        """Get a tenant's overlay (read-only), or None if it has none."""
+        return self._snapshot.tenant_policies.get(tenant_id)
+
+    def list_policy_tenants(self) -> list[str]:
+        """List the tenants that have a policy overlay."""
+        return sorted(self._snapshot.tenant_policies)
+
     # =========================================================================
     # Policy Query & Evaluation
     # =========================================================================
 
+    def get_policy_snapshot(self) -> PolicySnapshot:
+        """Get the current immutable policy snapshot."""
+        return self._snapshot
+
     def get_policy_set(self) -> PolicySet:
-        """Get the current policy set."""
-        return self._policy_set
+        """Get the current policy set (read-only; use the management API to change it)."""
+        return self._snapshot.policy_set
+
+    def get_compiled_policies(self, tenant_id: str | None = None) -> CompiledPolicySet:
+        """Get the compiled decision structure for the current policy set.
+
+        With a tenant_id, returns that tenant's overlay compiled over the
+        shared base (or the base itself if the tenant has no overlay).
+        """
+        return self._snapshot.compiled_for(tenant_id)
 
     def classify_intent(self, query: str, domain: str = "General") -> Intent:
         """Quick intent classification from query text.
@@ -954,65 +1413,12 @@ class GovernanceManager:
         For more sophisticated classification, this should integrate
         with the LLM router. This provides basic keyword-based classification.
         """
-        query_lower = query.lower()
-
-        # Determine impact level
-        impact = "low"
-        high_impact_keywords = ["delete", "remove", "terminate", "approve", "authorize", "grant"]
-        medium_impact_keywords = ["update", "change", "modify", "submit", "create"]
-
-        for kw in high_impact_keywords:
-            if kw in query_lower:
-                impact = "high"
-                break
-        else:
-            for kw in medium_impact_keywords:
-                if kw in query_lower:
-                    impact = "medium"
-                    break
-
-        # Determine audience
-        audience = "internal"
-        if any(kw in query_lower for kw in ["public", "citizen", "resident", "community"]):
-            audience = "external"
-
-        # Determine task type
-        task = "inquiry"
-        if any(kw in query_lower for kw in ["how", "what", "when", "where", "why"]):
-            task = "inquiry"
-        elif any(kw in query_lower for kw in ["create", "add", "new"]):
-            task = "create"
-        elif any(kw in query_lower for kw in ["update", "change", "modify"]):
-            task = "update"
-        elif any(kw in query_lower for kw in ["delete", "remove"]):
-            task = "delete"
-
-        return Intent(
-            domain=domain,
-            task=task,
-            audience=audience,
-            impact=impact,
-            confidence=0.8,
-        )
+        return self._evaluator.classify_intent(query, domain)
 
     def detect_risk_signals(self, query: str) -> RiskSignals:
         """Detect risk signals in the query text."""
-        signals: list[str] = []
-        query_lower = query.lower()
-
-        for signal_type, patterns in RISK_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower, re.IGNORECASE):
-                    if signal_type not in signals:
-                        signals.append(signal_type)
-                    break
-
-        # Check prohibited topics
-        for topic in self._prohibited_topics:
-            if topic.lower() in query_lower:
-                signals.append(f"PROHIBITED_TOPIC:{topic}")
-
-        return RiskSignals(signals=signals)
+        prohibited = self._snapshot.prohibitions.match(query).get(GLOBAL_SCOPE, [])
+        return self._evaluator.risk_signals(query, prohibited)
 
     def evaluate(
         self,
@@ -1025,30 +1431,15 @@ class GovernanceManager:
         This is the main entry point for governance evaluation.
         Returns a GovernanceDecision indicating how the request should be handled.
         """
-        intent = self.classify_intent(query, domain)
-        risk = self.detect_risk_signals(query)
-
         if user_context is None:
             user_context = UserContext(tenant_id="default")
-
-        # Check for prohibited topics first
-        for signal in risk.signals:
-            if signal.startswith("PROHIBITED_TOPIC:"):
-                topic = signal.split(":", 1)[1]
-                return GovernanceDecision(
-                    hitl_mode=HITLMode.ESCALATE,
-                    tools_allowed=False,
-                    approval_required=True,
-                    escalation_reason=f"Query involves prohibited topic: {topic}",
-                    policy_trigger_ids=["prohibited-topic"],
-                )
-
-        return evaluate_governance(intent, risk, user_context, self._policy_set)
+        return self._cached_decide(query, None, domain, user_context)
 
     # =========================================================================
     # Policy Management API
     # =========================================================================
 
+    @_writer
     def add_prohibited_topic(self, topic: str) -> None:
         """Add a topic that should be blocked across all agents.
 
@@ -1059,6 +1450,7 @@ class GovernanceManager:
             self._prohibited_topics.append(topic)
             self._save_policies()
 
+    @_writer
     def remove_prohibited_topic(self, topic: str) -> bool:
         """Remove a prohibited topic."""
         if topic in self._prohibited_topics:
@@ -1069,12 +1461,13 @@ class GovernanceManager:
 
     def list_prohibited_topics(self) -> list[str]:
         """List all prohibited topics."""
-        return list(self._prohibited_topics)
+        return list(self._snapshot.prohibited_topics)
 
     # =========================================================================
     # Agent-Specific Governance
     # =========================================================================
 
+    @_writer
     def add_agent_prohibition(self, agent_id: str, topic: str) -> None:
         """Prohibit a topic for a specific agent only.
 
@@ -1085,6 +1478,7 @@ class GovernanceManager:
             self._prohibited_topics.append(key)
             self._save_policies()
 
+    @_writer
     def remove_agent_prohibition(self, agent_id: str, topic: str) -> bool:
         """Remove a topic prohibition from a specific agent."""
         key = f"agent:{agent_id}:{topic}"
@@ -1096,13 +1490,9 @@ class GovernanceManager:
 
     def get_agent_prohibitions(self, agent_id: str) -> list[str]:
         """Get all prohibited topics for a specific agent."""
-        prefix = f"agent:{agent_id}:"
-        return [
-            topic.replace(prefix, "")
-            for topic in self._prohibited_topics
-            if topic.startswith(prefix)
-        ]
+        return self._snapshot.prohibitions.topics(agent_scope(agent_id))
 
+    @_writer
     def add_domain_prohibition(self, domain: str, topic: str) -> None:
         """Prohibit a topic for all agents in a domain.
 
@@ -1113,6 +1503,7 @@ class GovernanceManager:
             self._prohibited_topics.append(key)
             self._save_policies()
 
+    @_writer
     def remove_domain_prohibition(self, domain: str, topic: str) -> bool:
         """Remove a topic prohibition from a domain."""
         key = f"domain:{domain}:{topic}"
@@ -1124,48 +1515,7 @@ class GovernanceManager:
 
     def get_domain_prohibitions(self, domain: str) -> list[str]:
         """Get all prohibited topics for a domain."""
-        prefix = f"domain:{domain}:"
-        return [
-            topic.replace(prefix, "")
-            for topic in self._prohibited_topics
-            if topic.startswith(prefix)
-        ]
-
-    def _topic_matches(self, topic: str, query: str) -> bool:
-        """Check if a topic matches within the query.
-
-        Uses fuzzy matching to handle:
-        - Singular/plural variations (vaccine/vaccines)
-        - Word boundaries
-        - Case insensitivity
-        """
-        topic_lower = topic.lower().strip()
-        query_lower = query.lower()
-
-        # Direct substring match
-        if topic_lower in query_lower:
-            return True
-
-        # Handle singular/plural - check if topic stem matches
-        # Remove common suffixes for matching
-        topic_stem = topic_lower.rstrip('s').rstrip('es').rstrip('ies') + 'y' if topic_lower.endswith('ies') else topic_lower.rstrip('s')
-
-        # Build pattern with word boundary awareness
-        words = query_lower.split()
-        for word in words:
-            word_clean = re.sub(r'[^\w]', '', word)  # Remove punctuation
-            word_stem = word_clean.rstrip('s')
-
-            # Check if stems match
-            if topic_stem == word_stem or topic_lower == word_clean:
-                return True
-
-            # Check if topic is contained in word or vice versa
-            if len(topic_stem) >= 3:
-                if topic_stem in word_clean or word_clean in topic_stem:
-                    return True
-
-        return False
+        return self._snapshot.prohibitions.topics(domain_scope(domain))
 
     def evaluate_for_agent(
         self,
@@ -1182,48 +1532,78 @@ class GovernanceManager:
         3. Global prohibited topics
         4. All policy rules
         """
-        intent = self.classify_intent(query, domain)
-        risk = self.detect_risk_signals(query)
-
         if user_context is None:
             user_context = UserContext(tenant_id="default")
+        return self._cached_decide(query, agent_id, domain, user_context)
 
-        # Check agent-specific prohibitions
-        for topic in self.get_agent_prohibitions(agent_id):
-            if self._topic_matches(topic, query):
-                return GovernanceDecision(
-                    hitl_mode=HITLMode.ESCALATE,
-                    tools_allowed=False,
-                    approval_required=True,
-                    escalation_reason=f"This agent cannot provide information about: {topic}",
-                    policy_trigger_ids=[f"agent-prohibition:{agent_id}:{topic}"],
-                )
+    def evaluate_many(
+        self,
+        queries: list[str],
+        agent_id: str | None = None,
+        domain: str = "General",
+        contexts: list[UserContext | None] | None = None,
+    ) -> list[GovernanceDecision]:
+        """Evaluate a batch of queries against one policy snapshot.
 
-        # Check domain-specific prohibitions
-        for topic in self.get_domain_prohibitions(domain):
-            if self._topic_matches(topic, query):
-                return GovernanceDecision(
-                    hitl_mode=HITLMode.ESCALATE,
-                    tools_allowed=False,
-                    approval_required=True,
-                    escalation_reason=f"This domain cannot provide information about: {topic}",
-                    policy_trigger_ids=[f"domain-prohibition:{domain}:{topic}"],
-                )
+        Decisions match calling ``evaluate_for_agent`` (or ``evaluate`` when
+        no agent_id is given) per query. Repeated queries and queries with the
+        same intent, risk signals and context share a single evaluation.
 
-        # Check global prohibited topics
-        for signal in risk.signals:
-            if signal.startswith("PROHIBITED_TOPIC:"):
-                topic = signal.split(":", 1)[1]
-                return GovernanceDecision(
-                    hitl_mode=HITLMode.ESCALATE,
-                    tools_allowed=False,
-                    approval_required=True,
-                    escalation_reason=f"Query involves prohibited topic: {topic}",
-                    policy_trigger_ids=["prohibited-topic"],
-                )
+        Args:
+            queries: Query texts to evaluate
+            agent_id: Agent whose prohibitions apply, if any
+            domain: Domain for all queries
+            contexts: Optional per-query user contexts (same length as queries)
 
-        return evaluate_governance(intent, risk, user_context, self._policy_set)
+        Raises:
+            ValueError: If contexts does not match the number of queries
+        """
+        if contexts is not None and len(contexts) != len(queries):
+            raise ValueError(
+                f"Expected {len(queries)} contexts, got {len(contexts)}"
+            )
 
+        snapshot = self._snapshot
+        default_context = UserContext(tenant_id="default")
+        by_query: dict[tuple[str, tuple[Any, ...]], GovernanceDecision] = {}
+        by_signature: dict[tuple[Any, ...], GovernanceDecision] = {}
+
+        results: list[GovernanceDecision] = []
+        for i, query in enumerate(queries):
+            ctx = (contexts[i] if contexts is not None else None) or default_context
+            key = (query, context_key(ctx))
+            decision = by_query.get(key)
+            if decision is None:
+                decision = self._evaluator.decide(snapshot, query, agent_id, domain, ctx, by_signature)
+                by_query[key] = decision
+            results.append(copy_decision(decision))
+        return results
+
+    def _cached_decide(
+        self,
+        query: str,
+        agent_id: str | None,
+        domain: str,
+        user_context: UserContext,
+    ) -> GovernanceDecision:
+        """Evaluate one query through the decision cache."""
+        snapshot = self._snapshot
+        key = decision_key(snapshot.key, agent_id, domain, query, user_context)
+        decision = self._decision_cache.get(key)
+        if decision is None:
+            decision = self._evaluator.decide(snapshot, query, agent_id, domain, user_context)
+            self._decision_cache.put(key, decision)
+        return decision
+
+    def get_decision_cache_stats(self) -> DecisionCacheStats:
+        """Get hit/miss statistics for the governance decision cache."""
+        return self._decision_cache.stats()
+
+    def clear_decision_cache(self) -> None:
+        """Drop all cached decisions and reset the counters."""
+        self._decision_cache.clear()
+
+    @_writer
     def add_constitutional_rule(self, rule: PolicyRule) -> None:
         """Add a new constitutional (Tier 1) rule.
 
@@ -1257,6 +1637,7 @@ class GovernanceManager:
         self._policy_set.constitutional_rules.append(rule)
         self._save_policies(f"Added constitutional rule: {rule.id}", "system")
 
+    @_writer
     def add_organization_rule(self, rule: PolicyRule) -> None:
         """Add a new organization-wide (Tier 2) rule.
 
@@ -1283,6 +1664,7 @@ class GovernanceManager:
         self._policy_set.organization_rules.default.append(rule)
         self._save_policies(f"Added organization rule: {rule.id}", "system")
 
+    @_writer
     def add_department_rule(self, department: str, rule: PolicyRule) -> None:
         """Add a new department-specific (Tier 3) rule.
 
@@ -1347,6 +1729,7 @@ class GovernanceManager:
 
         return rule_ids
 
+    @_writer
     def remove_rule(self, rule_id: str, force: bool = False) -> bool:
         """Remove a rule by ID from any tier.
 
@@ -1390,15 +1773,17 @@ class GovernanceManager:
 
     def get_all_rules(self) -> dict[str, list[PolicyRule]]:
         """Get all rules organized by tier."""
+        policy_set = self._snapshot.policy_set
         return {
-            "constitutional": self._policy_set.constitutional_rules,
-            "organization": self._policy_set.organization_rules.default,
+            "constitutional": policy_set.constitutional_rules,
+            "organization": policy_set.organization_rules.default,
             "department": {
                 dept: rules.defaults
-                for dept, rules in self._policy_set.department_rules.items()
+                for dept, rules in policy_set.department_rules.items()
             },
         }
 
+    @_writer
     def reload_policies(self) -> None:
         """Reload policies from disk (useful after external edits)."""
         self._load_policies()
@@ -0,0 +1,259 @@
+"""Scoped prohibited-topic index.
+
+Prohibited topics are stored in GovernanceManager as flat keys:
+
+- ``<topic>`` for global prohibitions
+- ``agent:<agent_id>:<topic>`` for agent prohibitions
+- ``domain:<domain>:<topic>`` for domain prohibitions
+
+ProhibitionIndex keeps those keys grouped by scope and compiles the
+(pre-stemmed) topics into a single Aho-Corasick automaton, so one pass over
+the lowercased query finds every matching topic in every scope.
+
+Global topics match as plain substrings. Agent and domain topics use the
+fuzzy rules of the original ``_topic_matches``: substring, singular/plural
+stem equality, stem inside a query word, and query word inside the stem.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from packages.core.scanner import Automaton
+
+GLOBAL_SCOPE = "global"
+
+# Minimum length for the containment checks of fuzzy matching
+MIN_STEM_LENGTH = 3
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Pattern kinds stored in the automaton
+_SUBSTRING = 0
+_STEM_IN_WORD = 1
+
+
+def stem_topic(topic_lower: str) -> str:
+    """Reduce a lowercased topic to the stem used for fuzzy matching."""
+    if topic_lower.endswith("ies"):
+        return topic_lower.rstrip("s").rstrip("es").rstrip("ies") + "y"
+    return topic_lower.rstrip("s")
+
+
+def parse_prohibition_key(key: str) -> tuple[str, str]:
+    """Split a stored prohibition key into (scope, topic)."""
+    for prefix in ("agent:", "domain:"):
+        if key.startswith(prefix):
+            parts = key.split(":", 2)
+            if len(parts) == 3:
+                return f"{parts[0]}:{parts[1]}", parts[2]
+    return GLOBAL_SCOPE, key
+
+
+@dataclass(frozen=True)
+class ProhibitionEntry:
+    """A single prohibited topic within a scope."""
+
+    key: str
+    scope: str
+    topic: str
+    order: int
+    topic_lower: str
+    stem: str
+
+    @property
+    def fuzzy(self) -> bool:
+        return self.scope != GLOBAL_SCOPE
+
+
+class ProhibitionIndex:
+    """Prohibited topics indexed by scope and matched in a single pass."""
+
+    def __init__(self, keys: list[str] | None = None) -> None:
+        self._entries: dict[str, ProhibitionEntry] = {}
+        self._by_scope: dict[str, list[ProhibitionEntry]] = {}
+        self._automaton = Automaton()
+        # pattern -> (entry, kind) pairs reachable through the automaton
+        self._patterns: dict[str, list[tuple[ProhibitionEntry, int]]] = {}
+        # Word-level lookups for fuzzy entries
+        self._by_stem: dict[str, list[ProhibitionEntry]] = {}
+        self._by_word: dict[str, list[ProhibitionEntry]] = {}
+        self._by_stem_fragment: dict[str, list[ProhibitionEntry]] = {}
+        self._next_order = 0
+        for key in keys or []:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    # -------------------------------------------------------------------------
+    # Mutation
+    # -------------------------------------------------------------------------
+
+    def add(self, key: str) -> bool:
+        """Index a prohibition key. Returns False if already present."""
+        if key in self._entries:
+            return False
+
+        scope, topic = parse_prohibition_key(key)
+        topic_lower = topic.lower().strip()
+        entry = ProhibitionEntry(
+            key=key,
+            scope=scope,
+            topic=topic,
+            order=self._next_order,
+            topic_lower=topic_lower,
+            stem=stem_topic(topic_lower),
+        )
+        self._next_order += 1
+        self._entries[key] = entry
+        self._by_scope.setdefault(scope, []).append(entry)
+
+        for pattern, kind in self._automaton_patterns(entry):
+            self._patterns.setdefault(pattern, []).append((entry, kind))
+            self._automaton.add(pattern)
+
+        if entry.fuzzy:
+            self._by_stem.setdefault(entry.stem, []).append(entry)
+            self._by_word.setdefault(topic_lower, []).append(entry)
+            for fragment in self._stem_fragments(entry.stem):
+                self._by_stem_fragment.setdefault(fragment, []).append(entry)
+        return True
+
+    def remove(self, key: str) -> bool:
+        """Remove a prohibition key. Returns False if it was not indexed."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        self._by_scope[entry.scope].remove(entry)
+        if not self._by_scope[entry.scope]:
+            del self._by_scope[entry.scope]
+
+        for pattern, kind in self._automaton_patterns(entry):
+            payloads = self._patterns.get(pattern, [])
+            if (entry, kind) in payloads:
+                payloads.remove((entry, kind))
+            if not payloads:
+                self._patterns.pop(pattern, None)
+                self._automaton.discard(pattern)
+
+        if entry.fuzzy:
+            self._discard(self._by_stem, entry.stem, entry)
+            self._discard(self._by_word, entry.topic_lower, entry)
+            for fragment in self._stem_fragments(entry.stem):
+                self._discard(self._by_stem_fragment, fragment, entry)
+        return True
+
+    def copy(self) -> ProhibitionIndex:
+        """Independent index with the same entries, without re-stemming them."""
+        clone = ProhibitionIndex()
+        clone._entries = dict(self._entries)
+        clone._by_scope = {scope: list(entries) for scope, entries in self._by_scope.items()}
+        clone._automaton = self._automaton.copy()
+        clone._patterns = {pattern: list(payloads) for pattern, payloads in self._patterns.items()}
+        clone._by_stem = {key: list(entries) for key, entries in self._by_stem.items()}
+        clone._by_word = {key: list(entries) for key, entries in self._by_word.items()}
+        clone._by_stem_fragment = {
+            key: list(entries) for key, entries in self._by_stem_fragment.items()
+        }
+        clone._next_order = self._next_order
+        return clone
+
+    @staticmethod
+    def _discard(
+        table: dict[str, list[ProhibitionEntry]],
+        key: str,
+        entry: ProhibitionEntry,
+    ) -> None:
+        bucket = table.get(key)
+        if bucket and entry in bucket:
+            bucket.remove(entry)
+            if not bucket:
+                del table[key]
+
+    @staticmethod
+    def _automaton_patterns(entry: ProhibitionEntry) -> list[tuple[str, int]]:
+        patterns: list[tuple[str, int]] = []
+        if entry.topic_lower:
+            patterns.append((entry.topic_lower, _SUBSTRING))
+        if (
+            entry.fuzzy
+            and len(entry.stem) >= MIN_STEM_LENGTH
+            and not any(ch.isspace() for ch in entry.stem)
+        ):
+            patterns.append((entry.stem, _STEM_IN_WORD))
+        return patterns
+
+    @staticmethod
+    def _stem_fragments(stem: str) -> set[str]:
+        """Substrings of a stem that a query word may equal."""
+        if len(stem) < MIN_STEM_LENGTH:
+            return set()
+        return {
+            stem[i:j]
+            for i in range(len(stem))
+            for j in range(i + MIN_STEM_LENGTH, len(stem) + 1)
+        }
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+
+    def topics(self, scope: str) -> list[str]:
+        """Topics prohibited in a scope, in insertion order."""
+        return [entry.topic for entry in self._by_scope.get(scope, [])]
+
+    def scopes(self) -> list[str]:
+        """All scopes that currently have prohibitions."""
+        return list(self._by_scope)
+
+    def match(self, query: str) -> dict[str, list[str]]:
+        """Return every matching topic, grouped by scope.
+
+        Topics within a scope are returned in the order they were added.
+        """
+        if not self._entries:
+            return {}
+
+        query_lower = query.lower()
+        hits: set[ProhibitionEntry] = set()
+
+        for pattern in self._automaton.search(query_lower):
+            hits.update(entry for entry, _ in self._patterns.get(pattern, []))
+
+        if self._by_stem:
+            for word in _PUNCTUATION.sub("", query_lower).split():
+                hits.update(self._by_stem.get(word.rstrip("s"), ()))
+                hits.update(self._by_word.get(word, ()))
+                hits.update(self._by_stem_fragment.get(word, ()))
+
+        grouped: dict[str, list[str]] = {}
+        for entry in sorted(hits, key=lambda e: e.order):
+            grouped.setdefault(entry.scope, []).append(entry.topic)
+        return grouped
+
+
+def agent_scope(agent_id: str) -> str:
+    """Scope key for an agent's prohibitions."""
+    return f"agent:{agent_id}"
+
+
+def domain_scope(domain: str) -> str:
+    """Scope key for a domain's prohibitions."""
+    return f"domain:{domain}"
+
+
+__all__ = [
+    "GLOBAL_SCOPE",
+    "ProhibitionEntry",
+    "ProhibitionIndex",
+    "agent_scope",
+    "domain_scope",
+    "parse_prohibition_key",
+    "stem_topic",
+]
@@ -0,0 +1,315 @@
+"""Behavioral what-if replay of recorded queries against two policy versions.
+
+``compare_versions`` diffs rule structure; replay answers what that diff
+does to real traffic. Each recorded query is evaluated against both
+versions and the report lists which decisions change (HITL mode,
+tools_allowed, triggered policy IDs), with counts and examples.
+
+Identical requests are evaluated once and weighted by how often they
+occurred. Large corpora are split into chunks and evaluated in a process
+pool; each worker builds its own snapshots and PolicyEvaluator once.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from packages.core.governance import PolicyLoader
+from packages.core.governance.cache import normalize_query
+from packages.core.governance.evaluator import PolicyEvaluator
+from packages.core.governance.snapshot import PolicySnapshot, build_snapshot
+from packages.core.scanner import TextScanner
+from packages.core.schemas.models import GovernanceDecision, UserContext
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_MAX_EXAMPLES = 20
+
+# Below this many distinct requests a process pool costs more than it saves
+MIN_PARALLEL_REQUESTS = 5000
+
+# (query, agent_id, domain, tenant_id, user_id, role, department)
+_Request = tuple[str, str | None, str, str, str, str, str]
+# (hitl_mode, tools_allowed, policy_trigger_ids)
+_Outcome = tuple[str, bool, tuple[str, ...]]
+
+
+@dataclass(frozen=True)
+class ReplayQuery:
+    """A recorded request to replay."""
+
+    query: str
+    agent_id: str | None = None
+    domain: str = "General"
+    tenant_id: str = "default"
+    user_id: str = "anonymous"
+    role: str = "employee"
+    department: str = "General"
+
+
+def queries_from_analytics(
+    events: Iterable[Any],
+    agent_domains: dict[str, str] | None = None,
+) -> list[ReplayQuery]:
+    """Replay queries from analytics QueryEvents.
+
+    Agent queries are evaluated in the agent's domain, so pass the
+    agent_id -> domain mapping to reproduce domain prohibitions.
+    """
+    agent_domains = agent_domains or {}
+    return [
+        ReplayQuery(
+            query=event.query_text,
+            agent_id=event.agent_id,
+            domain=agent_domains.get(event.agent_id, "General"),
+            user_id=event.user_id,
+        )
+        for event in events
+        if event.query_text
+    ]
+
+
+def queries_from_traces(traces: Iterable[Any]) -> list[ReplayQuery]:
+    """Replay queries from execution traces (evaluated without an agent)."""
+    return [
+        ReplayQuery(
+            query=trace.request_text,
+            tenant_id=trace.tenant_id,
+            user_id=trace.user_id,
+        )
+        for trace in traces
+        if trace.request_text
+    ]
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+
+class DecisionOutcome(BaseModel):
+    """The parts of a decision that replay compares."""
+
+    hitl_mode: str
+    tools_allowed: bool
+    policy_trigger_ids: list[str] = Field(default_factory=list)
+
+
+class DecisionChangeExample(BaseModel):
+    """One request whose decision changed."""
+
+    query: str
+    agent_id: str | None = None
+    domain: str = "General"
+    occurrences: int = 1
+    before: DecisionOutcome
+    after: DecisionOutcome
+
+
+class ReplayReport(BaseModel):
+    """Behavioral difference between two policy versions."""
+
+    total_queries: int = 0
+    unique_queries: int = 0
+    changed_queries: int = 0
+    change_rate: float = 0.0
+    hitl_mode_changes: dict[str, int] = Field(default_factory=dict)
+    tools_allowed_changes: dict[str, int] = Field(default_factory=dict)
+    triggers_added: dict[str, int] = Field(default_factory=dict)
+    triggers_removed: dict[str, int] = Field(default_factory=dict)
+    examples: list[DecisionChangeExample] = Field(default_factory=list)
+
+
+# =============================================================================
+# Replay
+# =============================================================================
+
+
+def snapshot_from_dict(data: dict[str, Any], version: int = 0, policy_hash: str = "") -> PolicySnapshot:
+    """Build a PolicySnapshot from a version history snapshot."""
+    loader = PolicyLoader()
+    return build_snapshot(
+        loader.load_from_dict(data),
+        data.get("prohibited_topics", []),
+        data.get("immutable_rules", []),
+        version,
+        policy_hash,
+        {
+            tenant_id: loader.load_from_dict(raw)
+            for tenant_id, raw in data.get("tenant_policies", {}).items()
+        },
+    )
+
+
+class _Replayer:
+    """Evaluates requests against a before and an after snapshot."""
+
+    def __init__(self, before: dict[str, Any], after: dict[str, Any]) -> None:
+        # A private scanner keeps workers independent of inherited locks
+        self.evaluator = PolicyEvaluator(scanner=TextScanner())
+        self.before = snapshot_from_dict(before, 1)
+        self.after = snapshot_from_dict(after, 2)
+
+    def run(self, requests: list[_Request]) -> list[tuple[int, _Outcome, _Outcome]]:
+        """Return (index, before, after) for the requests whose decision changed."""
+        evaluator = self.evaluator
+        before_memo: dict = {}
+        after_memo: dict = {}
+        changed = []
+        for i, request in enumerate(requests):
+            query, agent_id, domain, tenant_id, user_id, role, department = request
+            before = evaluator.prohibition_decision(self.before, query, agent_id, domain)
+            after = evaluator.prohibition_decision(self.after, query, agent_id, domain)
+            if before is None or after is None:
+                # Intent and risk signals do not depend on the version
+                intent = evaluator.classify_intent(query, domain)
+                risk = evaluator.risk_signals(query, [])
+                ctx = UserContext(
+                    tenant_id=tenant_id, user_id=user_id, role=role, department=department
+                )
+                if before is None:
+                    before = evaluator.rule_decision(self.before, intent, risk, ctx, before_memo)
+                if after is None:
+                    after = evaluator.rule_decision(self.after, intent, risk, ctx, after_memo)
+            before_outcome, after_outcome = _outcome(before), _outcome(after)
+            if before_outcome != after_outcome:
+                changed.append((i, before_outcome, after_outcome))
+        return changed
+
+
+def _outcome(decision: GovernanceDecision) -> _Outcome:
+    return (
+        decision.hitl_mode.value,
+        decision.tools_allowed,
+        tuple(decision.policy_trigger_ids),
+    )
+
+
+_worker: _Replayer | None = None
+
+
+def _init_worker(before: dict[str, Any], after: dict[str, Any]) -> None:
+    global _worker
+    _worker = _Replayer(before, after)
+
+
+def _run_chunk(chunk: list[_Request]) -> list[tuple[int, _Outcome, _Outcome]]:
+    assert _worker is not None
+    return _worker.run(chunk)
+
+
+def _outcome_model(outcome: _Outcome) -> DecisionOutcome:
+    return DecisionOutcome(
+        hitl_mode=outcome[0],
+        tools_allowed=outcome[1],
+        policy_trigger_ids=list(outcome[2]),
+    )
+
+
+def replay_queries(
+    before: dict[str, Any],
+    after: dict[str, Any],
+    queries: Iterable[ReplayQuery],
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_examples: int = DEFAULT_MAX_EXAMPLES,
+) -> ReplayReport:
+    """Replay queries against two version snapshots and report changed decisions.
+
+    Args:
+        before: Snapshot of the baseline version (version history format)
+        after: Snapshot of the candidate version
+        queries: Recorded requests
+        workers: Worker processes; defaults to, and is capped at, the CPU
+            count. Small corpora and ``workers=1`` are evaluated in this
+            process.
+        chunk_size: Requests sent to a worker at a time
+        max_examples: Maximum number of changed requests to include
+    """
+    # Requests that normalize to the same cache key decide the same way;
+    # the first occurrence is evaluated and weighted by the group's size
+    groups: dict[_Request, list[Any]] = {}
+    for q in queries:
+        request = (q.query, q.agent_id, q.domain, q.tenant_id, q.user_id, q.role, q.department)
+        key = (normalize_query(q.query), *request[1:])
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [request, 1]
+        else:
+            group[1] += 1
+    requests: list[_Request] = [group[0] for group in groups.values()]
+    weights: list[int] = [group[1] for group in groups.values()]
+
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, cpus)
+    chunk_size = max(1, chunk_size)
+    if workers <= 1 or len(requests) < MIN_PARALLEL_REQUESTS:
+        changed = _Replayer(before, after).run(requests)
+    else:
+        chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        changed = []
+        # spawn: workers must not inherit the parent's threads and locks
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(before, after),
+        ) as pool:
+            for n, result in enumerate(pool.map(_run_chunk, chunks)):
+                offset = n * chunk_size
+                changed.extend((offset + i, b, a) for i, b, a in result)
+
+    total = sum(weights)
+    report = ReplayReport(total_queries=total, unique_queries=len(requests))
+    hitl_changes: Counter[str] = Counter()
+    tools_changes: Counter[str] = Counter()
+    added: Counter[str] = Counter()
+    removed: Counter[str] = Counter()
+
+    for index, before_outcome, after_outcome in changed:
+        request = requests[index]
+        weight = weights[index]
+        report.changed_queries += weight
+        if before_outcome[0] != after_outcome[0]:
+            hitl_changes[f"{before_outcome[0]}->{after_outcome[0]}"] += weight
+        if before_outcome[1] != after_outcome[1]:
+            tools_changes[f"{before_outcome[1]}->{after_outcome[1]}"] += weight
+        for trigger in set(after_outcome[2]) - set(before_outcome[2]):
+            added[trigger] += weight
+        for trigger in set(before_outcome[2]) - set(after_outcome[2]):
+            removed[trigger] += weight
+        if len(report.examples) < max_examples:
+            report.examples.append(DecisionChangeExample(
+                query=request[0],
+                agent_id=request[1],
+                domain=request[2],
+                occurrences=weight,
+                before=_outcome_model(before_outcome),
+                after=_outcome_model(after_outcome),
+            ))
+
+    report.change_rate = report.changed_queries / total if total else 0.0
+    report.hitl_mode_changes = dict(hitl_changes.most_common())
+    report.tools_allowed_changes = dict(tools_changes.most_common())
+    report.triggers_added = dict(added.most_common())
+    report.triggers_removed = dict(removed.most_common())
+    return report
+
+
+__all__ = [
+    "DecisionChangeExample",
+    "DecisionOutcome",
+    "ReplayQuery",
+    "ReplayReport",
+    "queries_from_analytics",
+    "queries_from_traces",
+    "replay_queries",
+    "snapshot_from_dict",
+]
@@ -0,0 +1,218 @@
+"""Immutable policy snapshots and policy file watching.
+
+GovernanceManager publishes its policies as a PolicySnapshot. Request
+handlers read ``manager._snapshot`` once and use that object for the whole
+evaluation, so a concurrent policy change can never mix old rules with new
+prohibitions. Writers build a new snapshot and swap the reference; readers
+take no locks.
+
+A snapshot also carries the per-tenant policy overlays. Each overlay is
+compiled on top of the snapshot's compiled base, so every tenant shares the
+constitutional and organization indexes instead of holding its own copy.
+Publishing derives the next snapshot from the previous one: unchanged
+policy sets keep their compiled indexes and the prohibition index is
+edited in place of a rebuild, so a one-topic change costs one topic.
+
+PolicyFileWatcher detects external edits of the policy file by comparing
+``os.stat`` signatures instead of re-reading and hashing the file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+
+from packages.core.governance import PolicySet
+from packages.core.governance.compiler import CompiledPolicySet, compile_policy_set
+from packages.core.governance.prohibitions import ProhibitionIndex
+
+# (mtime_ns, size, inode) of a file, or None if it does not exist
+FileSignature = tuple[int, int, int] | None
+
+
+@dataclass(frozen=True)
+class PolicySnapshot:
+    """Immutable, versioned view of the governance policies.
+
+    The policy sets are private copies; treat them as read-only.
+    """
+
+    version: int
+    policy_hash: str
+    policy_set: PolicySet
+    prohibited_topics: tuple[str, ...]
+    immutable_rules: frozenset[str]
+    compiled: CompiledPolicySet
+    prohibitions: ProhibitionIndex
+    tenant_policies: Mapping[str, PolicySet] = field(default_factory=lambda: MappingProxyType({}))
+    tenants: Mapping[str, CompiledPolicySet] = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def key(self) -> tuple[int, str]:
+        """Identity of this snapshot for caches."""
+        return (self.version, self.policy_hash)
+
+    def compiled_for(self, tenant_id: str | None) -> CompiledPolicySet:
+        """Compiled policies for a tenant; tenants without an overlay use the base."""
+        if tenant_id is None:
+            return self.compiled
+        return self.tenants.get(tenant_id, self.compiled)
+
+
+def _derive_prohibitions(
+    previous: PolicySnapshot | None,
+    topics: tuple[str, ...],
+) -> ProhibitionIndex:
+    """Prohibition index for topics, edited from the previous snapshot's."""
+    if previous is None:
+        return ProhibitionIndex(list(topics))
+    if topics == previous.prohibited_topics:
+        return previous.prohibitions
+
+    old, new = set(previous.prohibited_topics), set(topics)
+    kept = [topic for topic in previous.prohibited_topics if topic in new]
+    added = [topic for topic in topics if topic not in old]
+    if list(topics) != kept + added:
+        # Reordered (e.g. an edited policy file); order decides match order
+        return ProhibitionIndex(list(topics))
+
+    index = previous.prohibitions.copy()
+    for topic in old - new:
+        index.remove(topic)
+    for topic in added:
+        index.add(topic)
+    return index
+
+
+def build_snapshot(
+    policy_set: PolicySet,
+    prohibited_topics: Iterable[str],
+    immutable_rules: Iterable[str],
+    version: int,
+    policy_hash: str,
+    tenant_policies: Mapping[str, PolicySet] | None = None,
+    previous: PolicySnapshot | None = None,
+) -> PolicySnapshot:
+    """Copy working policies into a new immutable snapshot.
+
+    The base policy set is compiled once; each tenant overlay compiles only
+    its own rules on top of it. Given the previous snapshot, policy sets
+    equal to its copies are reused with their compiled indexes, and the
+    prohibition index is edited instead of rebuilt.
+    """
+    version_key = (version, policy_hash)
+    topics = tuple(prohibited_topics)
+    if previous is not None and policy_set == previous.policy_set:
+        frozen_set = previous.policy_set
+        compiled = previous.compiled.with_version(version_key)
+    else:
+        frozen_set = policy_set.model_copy(deep=True)
+        compiled = compile_policy_set(frozen_set, version=version_key)
+
+    prior_overlays = previous.tenant_policies if previous is not None else {}
+    prior_compiled = previous.tenants if previous is not None else {}
+    frozen_tenants: dict[str, PolicySet] = {}
+    tenants: dict[str, CompiledPolicySet] = {}
+    for tenant_id, overlay in (tenant_policies or {}).items():
+        prior = prior_overlays.get(tenant_id)
+        if prior is not None and overlay == prior:
+            frozen_tenants[tenant_id] = prior
+            tenants[tenant_id] = prior_compiled[tenant_id].with_version(
+                version_key, parent=compiled
+            )
+            continue
+        frozen_overlay = overlay.model_copy(deep=True)
+        frozen_tenants[tenant_id] = frozen_overlay
+        tenants[tenant_id] = compile_policy_set(
+            frozen_overlay, version=version_key, parent=compiled
+        )
+    return PolicySnapshot(
+        version=version,
+        policy_hash=policy_hash,
+        policy_set=frozen_set,
+        prohibited_topics=topics,
+        immutable_rules=frozenset(immutable_rules),
+        compiled=compiled,
+        prohibitions=_derive_prohibitions(previous, topics),
+        tenant_policies=MappingProxyType(frozen_tenants),
+        tenants=MappingProxyType(tenants),
+    )
+
+
+def file_signature(path: Path) -> FileSignature:
+    """Cheap change signature of a file from ``os.stat``."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class PolicyFileWatcher:
+    """Polls a policy file's stat signature and reports external changes."""
+
+    def __init__(
+        self,
+        path: Path,
+        on_change: Callable[[], None],
+        interval_seconds: float = 1.0,
+    ) -> None:
+        self.path = Path(path)
+        self.interval_seconds = interval_seconds
+        self._on_change = on_change
+        self._signature: FileSignature = file_signature(self.path)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def mark(self) -> None:
+        """Record the current file state as known (e.g. after our own write)."""
+        self._signature = file_signature(self.path)
+
+    def changed(self) -> bool:
+        """True if the file changed since the last mark."""
+        return file_signature(self.path) != self._signature
+
+    def check(self) -> bool:
+        """Invoke the callback if the file changed. Returns True if it did."""
+        signature = file_signature(self.path)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        self._on_change()
+        return True
+
+    def _run_loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            with contextlib.suppress(Exception):  # keep watching; the next change retries
+                self.check()
+
+    def start(self) -> None:
+        """Start watching in a background thread."""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+__all__ = [
+    "PolicyFileWatcher",
+    "PolicySnapshot",
+    "build_snapshot",
+    "file_signature",
+]
@@ -1,31 +1,70 @@
-"""Knowledge base management with Chroma vector DB."""
+"""Knowledge base management with pluggable vector backends (Chroma by default)."""
 
 from __future__ import annotations
 
+import contextlib
 import hashlib
+import heapq
 import json
 import os
+import random
 import shutil
 import threading
 import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any
 from urllib.parse import urlparse
 
-import chromadb
+from chromadb.utils import embedding_functions
 from pydantic import BaseModel, Field
 
-# Document processing imports
-try:
-    from PyPDF2 import PdfReader
-except ImportError:
-    PdfReader = None
-
-try:
-    from docx import Document as DocxDocument
-except ImportError:
-    DocxDocument = None
+from packages.core.cache.embeddings import EmbeddingCache, embedding_model_name
+from packages.core.cache.retrieval import RetrievalCache, retrieval_key
+from packages.core.knowledge.backends import (
+    ChromaBackend,
+    LocalVectorBackend,
+    VectorBackend,
+    VectorCollection,
+)
+from packages.core.knowledge.context import (
+    ContextPassage,
+    PackedContext,
+    context_token_budget,
+    pack_context,
+)
+from packages.core.knowledge.dedupe import ChunkFingerprintIndex
+from packages.core.knowledge.ingest import (
+    IngestionFile,
+    IngestionJob,
+    IngestionQueue,
+    get_ingestion_queue,
+    stop_ingestion_queue,
+)
+from packages.core.knowledge.lexical import (
+    LexicalCollection,
+    LexicalIndex,
+    LexicalQuery,
+    fuse_results,
+    parse_query,
+)
+from packages.core.knowledge.metadata import (
+    DOCUMENT_KIND,
+    WEB_SOURCE_KIND,
+    KnowledgeMetadataStore,
+)
+from packages.core.knowledge.pgvector import PgVectorBackend
+from packages.core.knowledge.refresh import WebRefreshEngine
+from packages.core.knowledge.text import (
+    EMBED_BATCH_SIZE,
+    batched,
+    chunk_text,
+    extract_text,
+    iter_chunks,
+    iter_text,
+)
 
 # Web scraping imports
 try:
@@ -35,6 +74,22 @@ try:
 except ImportError:
     HAS_WEB_SCRAPING = False
 
+# lxml parses HTML several times faster than the stdlib parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Web fetch limits
+FETCH_CONNECT_TIMEOUT_SECONDS = 10
+FETCH_TIMEOUT_SECONDS = 30  # Read timeout, and deadline for the whole download
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+# Failed refreshes are retried after this delay, doubling per consecutive
+# failure up to the source's refresh interval
+REFRESH_RETRY_BASE_SECONDS = 15 * 60
+
 
 class WebSource(BaseModel):
     """A web source for knowledge ingestion."""
@@ -52,6 +107,21 @@ class WebSource(BaseModel):
     metadata: dict[str, Any] = Field(default_factory=dict)
     auto_refresh: bool = True
     selector: str | None = None  # CSS selector to extract specific content
+    # Validators for conditional refreshes
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None  # Hash of the extracted text
+    consecutive_failures: int = 0
+
+
+class FetchedPage(BaseModel):
+    """Result of fetching a web source."""
+
+    text: str = ""
+    title: str = ""
+    etag: str | None = None
+    last_modified: str | None = None
+    not_modified: bool = False  # Server answered 304; text is empty
 
 
 class KnowledgeDocument(BaseModel):
@@ -82,13 +152,53 @@ SHARED_CANON_ID = "shared_canon"
 
 
 class KnowledgeManager:
-    """Manages knowledge bases for agents using Chroma.
+    """Manages knowledge bases for agents in a vector backend (Chroma by default).
 
     Supports a "Shared Canon" - organization-wide knowledge that all agents can access.
     When querying, agents get results from both their specific knowledge AND the shared canon.
+
+    Queries are embedded once by the manager and searched by vector, so
+    the canon and agent collections reuse the same query embedding.
+
+    Chunks are embedded through a persistent EmbeddingCache, so text that
+    recurs across documents, agents and refreshes is only embedded once.
+
+    The vector backend is "chroma" (a Chroma PersistentClient), "local" (the
+    in-process LocalVectorBackend, with the shared canon int8-quantized),
+    "pgvector" (PostgreSQL at KNOWLEDGE_DATABASE_URL, shared by all replicas)
+    or any VectorBackend instance.
+
+    With hybrid search, each collection also keeps a BM25 index of its
+    chunks. Query results fuse the lexical and vector rankings, and queries
+    whose identifiers (ordinance numbers, form IDs) decisively match chunks
+    are answered from the lexical index without embedding the query (see
+    packages.core.knowledge.lexical). The index lives in this
+    process, so hybrid search is off by default for pgvector, whose
+    collections other replicas also write to.
+
+    Query results are cached in a RetrievalCache keyed by the versions of
+    the collections searched. Adding, deleting or refreshing chunks bumps
+    the collection's version, so cached results are never stale. Versions
+    are also kept in this process, so the cache is off by default for
+    pgvector too.
+
+    With chunk deduplication, a chunk that nearly duplicates one already in
+    its collection is stored once: the stored chunk records it as another
+    reference instead of embedding and storing it again (see
+    ChunkFingerprintIndex). The fingerprint index is a local SQLite file,
+    so deduplication is off by default for pgvector as well.
     """
 
-    def __init__(self, storage_path: str | None = None):
+    def __init__(
+        self,
+        storage_path: str | None = None,
+        embedding_function: Any | None = None,
+        embedding_cache: EmbeddingCache | None = None,
+        vector_backend: VectorBackend | str = "chroma",
+        hybrid_search: bool | None = None,
+        retrieval_cache: RetrievalCache | None = None,
+        dedupe_chunks: bool | None = None,
+    ):
         if storage_path is None:
             storage_path = os.path.join(
                 os.path.dirname(__file__), "..", "..", "..", "data", "knowledge"
@@ -96,100 +206,235 @@ class KnowledgeManager:
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
 
-        # Initialize Chroma client with persistent storage (new API)
-        chroma_path = self.storage_path / "chroma"
-        chroma_path.mkdir(parents=True, exist_ok=True)
-        self._client = chromadb.PersistentClient(path=str(chroma_path))
+        self._embedding_function = (
+            embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        )
+        self._embedding_model = embedding_model_name(self._embedding_function)
+        self._embedding_cache = embedding_cache or EmbeddingCache(self.storage_path / "embeddings")
+
+        if isinstance(vector_backend, str):
+            vector_backend = self._create_backend(vector_backend)
+        self._backend = vector_backend
+        if hybrid_search is None:
+            hybrid_search = not isinstance(vector_backend, PgVectorBackend)
+        self.hybrid_search = hybrid_search
+
+        # Query results by collection version; writes bump the version
+        if retrieval_cache is None and not isinstance(vector_backend, PgVectorBackend):
+            retrieval_cache = RetrievalCache()
+        self._retrieval_cache = retrieval_cache
+        self._collection_versions: dict[str, int] = {}
+        self._versions_lock = threading.Lock()
+
+        # Near-duplicate chunks are stored once per collection
+        if dedupe_chunks is None:
+            dedupe_chunks = not isinstance(vector_backend, PgVectorBackend)
+        self._fingerprints = (
+            ChunkFingerprintIndex(self.storage_path / "fingerprints.db") if dedupe_chunks else None
+        )
+
+        # Collection handles by agent ID (get_or_create is a round trip)
+        self._collections: dict[str, VectorCollection] = {}
+        self._collections_lock = threading.Lock()
 
-        # Document metadata storage
-        self._docs_path = self.storage_path / "documents.json"
-        self._documents: dict[str, KnowledgeDocument] = {}
-        self._load_documents()
+        # Searches the canon while the caller searches the agent collection
+        self._query_pool = ThreadPoolExecutor(thread_name_prefix="knowledge-query")
+
+        # Document and web source records
+        self._metadata = KnowledgeMetadataStore(self.storage_path / "metadata.db")
+        self._migrate_json_metadata()
 
         # Files storage
         self._files_path = self.storage_path / "files"
         self._files_path.mkdir(exist_ok=True)
 
-    def _load_documents(self) -> None:
-        """Load document metadata from storage."""
-        import json
-
-        if self._docs_path.exists():
+        self._http = threading.local()  # One requests.Session per thread
+        self._source_listeners: list[Callable[[str], None]] = []
+
+    def _migrate_json_metadata(self) -> None:
+        """Import records from the JSON files used before the metadata store."""
+        for filename, key, kind, model in (
+            ("documents.json", "documents", DOCUMENT_KIND, KnowledgeDocument),
+            ("web_sources.json", "sources", WEB_SOURCE_KIND, WebSource),
+        ):
+            path = self.storage_path / filename
+            if not path.exists():
+                continue
             try:
-                with open(self._docs_path) as f:
-                    data = json.load(f)
-                    for doc_data in data.get("documents", []):
-                        doc = KnowledgeDocument(**doc_data)
-                        self._documents[doc.id] = doc
+                with open(path) as f:
+                    records = [model(**data) for data in json.load(f).get(key, [])]
             except Exception:
-                self._documents = {}
-
-    def _save_documents(self) -> None:
-        """Save document metadata to storage."""
-        import json
-
-        data = {"documents": [doc.model_dump() for doc in self._documents.values()]}
-        with open(self._docs_path, "w") as f:
-            json.dump(data, f, indent=2)
-
-    def _get_collection(self, agent_id: str) -> chromadb.Collection:
-        """Get or create a Chroma collection for an agent."""
-        collection_name = f"agent_{agent_id.replace('-', '_')}"
-        return self._client.get_or_create_collection(
-            name=collection_name,
-            metadata={"agent_id": agent_id},
-        )
+                records = []
+            if kind == WEB_SOURCE_KIND:
+                self._save_web_sources(records)
+            else:
+                self._save_documents(records)
+            path.rename(path.with_name(path.name + ".migrated"))
+
+    def _save_documents(self, docs: list[KnowledgeDocument]) -> None:
+        """Save document records in one transaction."""
+        self._metadata.put(DOCUMENT_KIND, docs)
+
+    def _create_backend(self, name: str) -> VectorBackend:
+        """Create a vector backend by name, stored under the storage path."""
+        if name == "chroma":
+            return ChromaBackend(self.storage_path / "chroma", self._embedding_function)
+        if name == "local":
+            return LocalVectorBackend(self.storage_path / "vectors", quantized_agents=[SHARED_CANON_ID])
+        if name == "pgvector":
+            dsn = os.environ.get("KNOWLEDGE_DATABASE_URL")
+            if not dsn:
+                raise ValueError("KNOWLEDGE_DATABASE_URL is required for the pgvector backend")
+            return PgVectorBackend(
+                dsn,
+                dimensions=len(self._embed_chunks(["dimension probe"])[0]),
+                citywide_departments=[SHARED_CANON_ID],
+            )
+        raise ValueError(f"Unknown vector backend '{name}'")
+
+    def _get_collection(self, agent_id: str) -> VectorCollection:
+        """Get or create the vector collection for an agent (cached)."""
+        collection = self._collections.get(agent_id)
+        if collection is not None:
+            return collection
+        with self._collections_lock:
+            collection = self._collections.get(agent_id)
+            if collection is None:
+                collection = self._backend.get_collection(agent_id)
+                if self.hybrid_search:
+                    collection = LexicalCollection(collection)
+                self._collections[agent_id] = collection
+        return collection
+
+    def _bump_version(self, agent_id: str) -> None:
+        """Mark an agent's collection as changed, retiring its cached results."""
+        with self._versions_lock:
+            self._collection_versions[agent_id] = self._collection_versions.get(agent_id, 0) + 1
+
+    def _cached_query(
+        self,
+        agent_ids: list[str],
+        query_text: str,
+        params: tuple[Any, ...],
+        search: Callable[[], list[dict[str, Any]]],
+    ) -> list[dict[str, Any]]:
+        """Run a search through the retrieval cache."""
+        cache = self._retrieval_cache
+        if cache is None:
+            return search()
+
+        # Versions are read before searching, so results that raced a write
+        # are stored under the old version and never served
+        with self._versions_lock:
+            versions = [(agent_id, self._collection_versions.get(agent_id, 0)) for agent_id in agent_ids]
+        key = retrieval_key(versions, query_text, *params)
+        results = cache.get(key)
+        if results is None:
+            results = search()
+            if results:  # Empty results may be a transient embedding or backend error
+                cache.put(key, results)
+        return results
 
-    def _extract_text(self, file_path: Path, file_type: str) -> str:
-        """Extract text from a document."""
-        if file_type == "txt":
-            return file_path.read_text(encoding="utf-8", errors="ignore")
-
-        elif file_type == "pdf" and PdfReader:
-            reader = PdfReader(str(file_path))
-            text_parts = []
-            for page in reader.pages:
-                text_parts.append(page.extract_text() or "")
-            return "\n".join(text_parts)
-
-        elif file_type == "docx" and DocxDocument:
-            doc = DocxDocument(str(file_path))
-            text_parts = []
-            for para in doc.paragraphs:
-                text_parts.append(para.text)
-            return "\n".join(text_parts)
+    def _embed_query(self, query_text: str) -> Any:
+        """Embed a query with the collections' embedding function."""
+        return self._embedding_function([query_text])[0]
 
-        else:
-            # Try to read as text
-            try:
-                return file_path.read_text(encoding="utf-8", errors="ignore")
-            except Exception:
-                return ""
+    def _embed_chunks(self, chunks: list[str]) -> list[list[float]]:
+        """Embed chunks, reusing cached embeddings of identical text."""
+        return self._embedding_cache.embed(self._embedding_model, chunks, self._embedding_function)
 
-    def _chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
-        """Split text into overlapping chunks."""
-        if not text:
+    def _search(
+        self,
+        agent_id: str,
+        embedding: Any,
+        n_results: int,
+        source_type: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Search one collection by query embedding and format the hits."""
+        try:
+            collection = self._get_collection(agent_id)
+            results = collection.query(
+                query_embeddings=[embedding],
+                n_results=n_results,
+            )
+        except Exception:
             return []
 
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
+        formatted = []
+        if results["documents"] and results["documents"][0]:
+            for i, doc_text in enumerate(results["documents"][0]):
+                metadata = results["metadatas"][0][i] if results["metadatas"] else {}
+                distance = results["distances"][0][i] if results["distances"] else 0
+                formatted.append(self._format_hit(doc_text, metadata, distance, source_type))
+        return formatted
 
-            # Try to break at sentence boundary
-            if end < len(text):
-                last_period = chunk.rfind(".")
-                last_newline = chunk.rfind("\n")
-                break_point = max(last_period, last_newline)
-                if break_point > chunk_size // 2:
-                    chunk = chunk[: break_point + 1]
-                    end = start + break_point + 1
+    def _lexical_search(
+        self,
+        agent_id: str,
+        query: LexicalQuery,
+        n_results: int,
+        source_type: str | None = None,
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """Search one collection's BM25 index.
+
+        Returns (hits ranked by BM25 score, hits containing every identifier
+        of the query). Each hit's relevance is its BM25 score.
+        """
+        if not self.hybrid_search:
+            return [], []
+        try:
+            collection = self._get_collection(agent_id)
+            hits = collection.search(query, n_results)
+            if not hits:
+                return [], []
+            stored = collection.get(ids=[hit.id for hit in hits])
+        except Exception:
+            return [], []
+
+        by_id = {
+            chunk_id: (text, metadata)
+            for chunk_id, text, metadata in zip(
+                stored["ids"],
+                stored["documents"],
+                stored["metadatas"] or [{}] * len(stored["ids"]),
+                strict=True,
+            )
+        }
+        ranked, exact = [], []
+        for hit in hits:
+            if hit.id not in by_id:
+                continue
+            result = self._format_hit(*by_id[hit.id], 0.0, source_type)
+            result["relevance"] = hit.score
+            ranked.append(result)
+            if hit.exact:
+                exact.append(result)
+        return ranked, exact
+
+    def _format_hit(
+        self,
+        text: str,
+        metadata: dict[str, Any] | None,
+        distance: float,
+        source_type: str | None = None,
+    ) -> dict[str, Any]:
+        """Format a search hit as a query result."""
+        if source_type is not None:
+            metadata = dict(metadata or {})
+            metadata["source_type"] = source_type
+        return {
+            "text": text,
+            "metadata": metadata,
+            "relevance": 1 - distance,  # Convert distance to relevance
+        }
 
-            chunks.append(chunk.strip())
-            start = end - overlap
+    def _extract_text(self, file_path: Path, file_type: str) -> str:
+        """Extract text from a document."""
+        return extract_text(file_path, file_type)
 
-        return [c for c in chunks if c]
+    def _chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+        """Split text into overlapping chunks."""
+        return chunk_text(text, chunk_size, overlap)
 
     def add_document(
         self,
@@ -198,7 +443,24 @@ class KnowledgeManager:
         content: bytes,
         metadata: dict[str, Any] | None = None,
     ) -> KnowledgeDocument:
-        """Add a document to an agent's knowledge base."""
+        """Add a document to an agent's knowledge base.
+
+        Runs inline; use the IngestionQueue for large or many uploads.
+        """
+        doc_id, ext, file_path = self._store_upload(agent_id, filename, content)
+        file_size = len(content)
+        del content
+
+        # Stream pages through the chunker and store chunks a batch at a time
+        chunk_count = 0
+        for batch in batched(iter_chunks(iter_text(file_path, ext)), EMBED_BATCH_SIZE):
+            self._add_document_chunks(agent_id, doc_id, filename, batch, start_index=chunk_count)
+            chunk_count += len(batch)
+
+        return self._record_document(agent_id, doc_id, filename, ext, file_size, chunk_count, metadata)
+
+    def _store_upload(self, agent_id: str, filename: str, content: bytes) -> tuple[str, str, Path]:
+        """Save an uploaded file. Returns (document_id, file_type, file_path)."""
         # Determine file type
         ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "txt"
 
@@ -209,76 +471,141 @@ class KnowledgeManager:
         # Save file
         file_path = self._files_path / f"{doc_id}.{ext}"
         file_path.write_bytes(content)
+        return doc_id, ext, file_path
 
-        # Extract text
-        text = self._extract_text(file_path, ext)
-
-        # Chunk text
-        chunks = self._chunk_text(text)
-
-        # Get collection and add chunks
-        collection = self._get_collection(agent_id)
-
-        chunk_ids = []
-        chunk_texts = []
-        chunk_metadatas = []
+    def _add_document_chunks(
+        self,
+        agent_id: str,
+        doc_id: str,
+        filename: str,
+        chunks: list[str],
+        embeddings: list[Any] | None = None,
+        start_index: int = 0,
+    ) -> None:
+        """Store a batch of a document's chunks, embedding them unless embeddings are given."""
+        if not chunks:
+            return
+        chunk_ids, chunk_metadatas = self._document_chunk_records(
+            agent_id, doc_id, filename, len(chunks), start_index
+        )
+        keep = self._claim_chunks(agent_id, chunk_ids, chunks, chunk_metadatas)
+        documents = [chunks[i] for i in keep]
+        if embeddings is None:
+            embeddings = self._embed_chunks(documents) if documents else []
+        else:
+            embeddings = [embeddings[i] for i in keep]
+        self._store_chunks(
+            agent_id,
+            [chunk_ids[i] for i in keep],
+            documents,
+            [chunk_metadatas[i] for i in keep],
+            embeddings,
+        )
 
-        for i, chunk_text in enumerate(chunks):
-            chunk_id = f"{doc_id}_chunk_{i}"
-            chunk_ids.append(chunk_id)
-            chunk_texts.append(chunk_text)
-            chunk_metadatas.append({
+    def _document_chunk_records(
+        self,
+        agent_id: str,
+        doc_id: str,
+        filename: str,
+        count: int,
+        start_index: int = 0,
+    ) -> tuple[list[str], list[dict[str, Any]]]:
+        """Chunk IDs and metadata of a batch of a document's chunks."""
+        indexes = range(start_index, start_index + count)
+        chunk_ids = [f"{doc_id}_chunk_{i}" for i in indexes]
+        chunk_metadatas = [
+            {
                 "document_id": doc_id,
                 "chunk_index": i,
                 "filename": filename,
                 "agent_id": agent_id,
-            })
+            }
+            for i in indexes
+        ]
+        return chunk_ids, chunk_metadatas
 
-        if chunk_ids:
-            collection.add(
-                ids=chunk_ids,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas,
-            )
+    def _claim_chunks(
+        self,
+        agent_id: str,
+        chunk_ids: list[str],
+        chunks: list[str],
+        metadatas: list[dict[str, Any]],
+    ) -> list[int]:
+        """Indexes of the chunks to store; near-duplicates become references."""
+        if self._fingerprints is None:
+            return list(range(len(chunks)))
+        return self._fingerprints.claim(agent_id, chunk_ids, chunks, metadatas)
+
+    def _store_chunks(
+        self,
+        agent_id: str,
+        chunk_ids: list[str],
+        chunks: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[Any],
+    ) -> None:
+        """Add embedded chunks to an agent's collection."""
+        if not chunk_ids:
+            return
+        collection = self._get_collection(agent_id)
+        collection.add(
+            ids=chunk_ids,
+            documents=chunks,
+            metadatas=metadatas,
+            embeddings=embeddings,
+        )
+        self._bump_version(agent_id)
 
-        # Create document record
+    def _record_document(
+        self,
+        agent_id: str,
+        doc_id: str,
+        filename: str,
+        file_type: str,
+        file_size: int,
+        chunk_count: int,
+        metadata: dict[str, Any] | None = None,
+        save: bool = True,
+    ) -> KnowledgeDocument:
+        """Create the document record for stored chunks."""
         doc = KnowledgeDocument(
             id=doc_id,
             agent_id=agent_id,
             filename=filename,
-            file_type=ext,
-            file_size=len(content),
-            chunk_count=len(chunks),
+            file_type=file_type,
+            file_size=file_size,
+            chunk_count=chunk_count,
             metadata=metadata or {},
         )
-        self._documents[doc_id] = doc
-        self._save_documents()
+        if save:
+            self._save_documents([doc])
 
         return doc
 
-    def list_documents(self, agent_id: str) -> list[KnowledgeDocument]:
-        """List all documents for an agent."""
-        return [doc for doc in self._documents.values() if doc.agent_id == agent_id]
+    def list_documents(
+        self,
+        agent_id: str,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> list[KnowledgeDocument]:
+        """List an agent's documents in upload order, optionally one page of them."""
+        return self._metadata.list(DOCUMENT_KIND, KnowledgeDocument, agent_id, limit, offset)
+
+    def count_documents(self, agent_id: str) -> int:
+        """Number of documents in an agent's knowledge base."""
+        return self._metadata.count(DOCUMENT_KIND, agent_id)
 
     def get_document(self, document_id: str) -> KnowledgeDocument | None:
         """Get a document by ID."""
-        return self._documents.get(document_id)
+        return self._metadata.get(DOCUMENT_KIND, document_id, KnowledgeDocument)
 
     def delete_document(self, document_id: str) -> bool:
         """Delete a document from the knowledge base."""
-        doc = self._documents.get(document_id)
+        doc = self.get_document(document_id)
         if not doc:
             return False
 
-        # Delete from Chroma
-        collection = self._get_collection(doc.agent_id)
-        try:
-            # Get all chunk IDs for this document
-            results = collection.get(where={"document_id": document_id})
-            if results["ids"]:
-                collection.delete(ids=results["ids"])
-        except Exception:
-            pass
+        self._delete_document_chunks(doc.agent_id, document_id)
 
         # Delete file
         for ext in ["txt", "pdf", "docx", "doc"]:
@@ -288,8 +615,7 @@ class KnowledgeManager:
                 break
 
         # Remove from metadata
-        del self._documents[document_id]
-        self._save_documents()
+        self._metadata.delete(DOCUMENT_KIND, document_id)
 
         return True
 
@@ -300,29 +626,45 @@ class KnowledgeManager:
         n_results: int = 5,
     ) -> list[dict[str, Any]]:
         """Query an agent's knowledge base (agent-specific only)."""
-        collection = self._get_collection(agent_id)
+        return self._cached_query(
+            [agent_id],
+            query_text,
+            ("query", n_results),
+            lambda: self._query(agent_id, query_text, n_results),
+        )
+
+    def _query(self, agent_id: str, query_text: str, n_results: int) -> list[dict[str, Any]]:
+        """Search an agent's collection, bypassing the retrieval cache."""
+        lexical, exact = self._lexical_search(agent_id, parse_query(query_text), n_results)
+        if exact:
+            return self._lexical_answer(exact, n_results)
 
         try:
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-            )
+            embedding = self._embed_query(query_text)
         except Exception:
-            return []
-
-        # Format results
-        formatted = []
-        if results["documents"] and results["documents"][0]:
-            for i, doc_text in enumerate(results["documents"][0]):
-                metadata = results["metadatas"][0][i] if results["metadatas"] else {}
-                distance = results["distances"][0][i] if results["distances"] else 0
-                formatted.append({
-                    "text": doc_text,
-                    "metadata": metadata,
-                    "relevance": 1 - distance,  # Convert distance to relevance
-                })
+            return self._lexical_answer(lexical, n_results)
+        return self._fuse(self._search(agent_id, embedding, n_results), lexical, n_results)
+
+    def _lexical_answer(self, results: list[dict[str, Any]], n_results: int) -> list[dict[str, Any]]:
+        """Top lexical results, with relevance scaled to the best BM25 score."""
+        results = sorted(results, key=lambda x: x["relevance"], reverse=True)[:n_results]
+        best = results[0]["relevance"] if results else 0
+        for result in results:
+            result["relevance"] = result["relevance"] / best if best > 0 else 0.0
+        return results
 
-        return formatted
+    def _fuse(
+        self,
+        vector: list[dict[str, Any]],
+        lexical: list[dict[str, Any]],
+        n_results: int,
+    ) -> list[dict[str, Any]]:
+        """Fuse vector results (by relevance) with lexical results (by BM25 score)."""
+        vector = sorted(vector, key=lambda x: x["relevance"], reverse=True)
+        if not lexical:
+            return vector[:n_results]
+        lexical = sorted(lexical, key=lambda x: x["relevance"], reverse=True)
+        return fuse_results([vector, lexical], n_results)
 
     def query_with_canon(
         self,
@@ -345,56 +687,80 @@ class KnowledgeManager:
         Returns:
             Combined results from both canon and agent knowledge, sorted by relevance.
         """
+        agent_ids = [agent_id] if agent_id == SHARED_CANON_ID else [agent_id, SHARED_CANON_ID]
+        return self._cached_query(
+            agent_ids,
+            query_text,
+            ("query_with_canon", n_results, canon_weight),
+            lambda: self._query_with_canon(agent_id, query_text, n_results, canon_weight),
+        )
+
+    def _query_with_canon(
+        self,
+        agent_id: str,
+        query_text: str,
+        n_results: int,
+        canon_weight: float,
+    ) -> list[dict[str, Any]]:
+        """Search the agent's collection and the canon, bypassing the retrieval cache."""
         # Calculate how many results to get from each source
         canon_count = max(1, int(n_results * canon_weight))
         agent_count = max(1, n_results - canon_count)
 
-        all_results = []
+        # Exact identifier matches answer the query without vector search
+        query = parse_query(query_text)
+        lexical, exact = self._lexical_search(agent_id, query, agent_count, "agent")
+        if agent_id != SHARED_CANON_ID:
+            canon_lexical, canon_exact = self._lexical_search(
+                SHARED_CANON_ID, query, canon_count, "canon"
+            )
+            lexical += canon_lexical
+            exact += canon_exact
+        if exact:
+            return self._lexical_answer(exact, n_results)
 
-        # Query shared canon (if it exists and has content)
-        if agent_id != SHARED_CANON_ID:  # Don't double-query canon from canon itself
+        try:
+            embedding = self._embed_query(query_text)
+        except Exception:
+            return self._lexical_answer(lexical, n_results)
+        return self._fuse(
+            self._vector_search_with_canon(agent_id, embedding, canon_count, agent_count),
+            lexical,
+            n_results,
+        )
+
+    def _vector_search_with_canon(
+        self,
+        agent_id: str,
+        embedding: Any,
+        canon_count: int,
+        agent_count: int,
+    ) -> list[dict[str, Any]]:
+        """Search the agent's collection and the shared canon by vector."""
+
+        # Backends that can search both scopes in one round trip do so
+        query_scoped = getattr(self._backend, "query_scoped", None)
+        if query_scoped is not None:
+            shared_count = canon_count if agent_id != SHARED_CANON_ID else 0
             try:
-                canon_collection = self._get_collection(SHARED_CANON_ID)
-                canon_results = canon_collection.query(
-                    query_texts=[query_text],
-                    n_results=canon_count,
-                )
-                if canon_results["documents"] and canon_results["documents"][0]:
-                    for i, doc_text in enumerate(canon_results["documents"][0]):
-                        metadata = canon_results["metadatas"][0][i] if canon_results["metadatas"] else {}
-                        distance = canon_results["distances"][0][i] if canon_results["distances"] else 0
-                        metadata["source_type"] = "canon"  # Mark as canon source
-                        all_results.append({
-                            "text": doc_text,
-                            "metadata": metadata,
-                            "relevance": 1 - distance,
-                        })
+                hits = query_scoped(agent_id, embedding, agent_count, shared_count)
             except Exception:
-                pass  # Canon might not exist yet
+                return []
+            return [self._format_hit(*hit) for hit in hits]
 
-        # Query agent-specific knowledge
-        try:
-            agent_collection = self._get_collection(agent_id)
-            agent_results = agent_collection.query(
-                query_texts=[query_text],
-                n_results=agent_count,
+        # Search the shared canon in the background; canon might not exist yet
+        canon_search = None
+        if agent_id != SHARED_CANON_ID:  # Don't double-query canon from canon itself
+            canon_search = self._query_pool.submit(
+                self._search, SHARED_CANON_ID, embedding, canon_count, "canon"
             )
-            if agent_results["documents"] and agent_results["documents"][0]:
-                for i, doc_text in enumerate(agent_results["documents"][0]):
-                    metadata = agent_results["metadatas"][0][i] if agent_results["metadatas"] else {}
-                    distance = agent_results["distances"][0][i] if agent_results["distances"] else 0
-                    metadata["source_type"] = "agent"  # Mark as agent-specific source
-                    all_results.append({
-                        "text": doc_text,
-                        "metadata": metadata,
-                        "relevance": 1 - distance,
-                    })
-        except Exception:
-            pass
 
-        # Sort by relevance (highest first) and return top n_results
-        all_results.sort(key=lambda x: x["relevance"], reverse=True)
-        return all_results[:n_results]
+        # Query agent-specific knowledge with the same embedding
+        agent_results = self._search(agent_id, embedding, agent_count, "agent")
+
+        all_results = canon_search.result() if canon_search is not None else []
+        all_results.extend(agent_results)
+        return all_results
 
     # =========================================================================
     # Shared Canon Management
@@ -485,44 +851,104 @@ class KnowledgeManager:
     # Web Source Management
     # =========================================================================
 
-    def _load_web_sources(self) -> None:
-        """Load web sources from storage."""
-        sources_path = self.storage_path / "web_sources.json"
-        if sources_path.exists():
-            try:
-                with open(sources_path) as f:
-                    data = json.load(f)
-                    self._web_sources = {
-                        s["id"]: WebSource(**s) for s in data.get("sources", [])
-                    }
-            except Exception:
-                self._web_sources = {}
-        else:
-            self._web_sources = {}
+    def _save_web_sources(self, sources: list[WebSource], existing_only: bool = False) -> None:
+        """Save web source records in one transaction, indexed by next refresh time.
 
-    def _save_web_sources(self) -> None:
-        """Save web sources to storage."""
-        sources_path = self.storage_path / "web_sources.json"
-        data = {"sources": [s.model_dump() for s in self._web_sources.values()]}
-        with open(sources_path, "w") as f:
-            json.dump(data, f, indent=2)
+        Refreshes pass ``existing_only`` so sources deleted meanwhile stay deleted.
+        """
+        self._metadata.put(WEB_SOURCE_KIND, sources, self.next_refresh_time, existing_only)
 
     def _fetch_url_content(self, url: str, selector: str | None = None) -> tuple[str, str]:
         """Fetch content from a URL.
 
         Returns: (text_content, title)
         """
+        page = self._fetch_web_page(url, selector)
+        return page.text, page.title
+
+    def _fetch_web_page(
+        self,
+        url: str,
+        selector: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> FetchedPage:
+        """Fetch a web page, conditionally if validators are given.
+
+        Returns a page with ``not_modified`` set when the server answers
+        304 to If-None-Match/If-Modified-Since.
+        """
         if not HAS_WEB_SCRAPING:
             raise RuntimeError("Web scraping not available. Install requests and beautifulsoup4.")
 
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        with self._http_session().get(
+            url,
+            headers=headers,
+            timeout=(FETCH_CONNECT_TIMEOUT_SECONDS, FETCH_TIMEOUT_SECONDS),
+            stream=True,
+        ) as response:
+            if response.status_code == 304:
+                return FetchedPage(
+                    etag=response.headers.get("ETag", etag),
+                    last_modified=response.headers.get("Last-Modified", last_modified),
+                    not_modified=True,
+                )
+            response.raise_for_status()
+            content = self._read_limited(response)
+
+        text, title = self._parse_html(content, url, selector)
+        return FetchedPage(
+            text=text,
+            title=title,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
 
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+    def _http_session(self) -> Any:
+        """Per-thread HTTP session, so connections to a host are reused."""
+        session = getattr(self._http, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._http.session = session
+        return session
 
-        soup = BeautifulSoup(response.content, "html.parser")
+    def _read_limited(
+        self,
+        response: Any,
+        max_bytes: int = MAX_PAGE_BYTES,
+        deadline_seconds: float = FETCH_TIMEOUT_SECONDS,
+    ) -> bytes:
+        """Stream a response body, refusing oversized or slow downloads.
+
+        Raises:
+            ValueError: If the body exceeds max_bytes
+            TimeoutError: If the download takes longer than deadline_seconds
+        """
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ValueError(f"Page is {declared} bytes (limit {max_bytes})")
+
+        deadline = time.monotonic() + deadline_seconds
+        body = bytearray()
+        for block in response.iter_content(chunk_size=64 * 1024):
+            body.extend(block)
+            if len(body) > max_bytes:
+                raise ValueError(f"Page exceeds {max_bytes} bytes")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Download exceeded {deadline_seconds}s")
+        return bytes(body)
+
+    def _parse_html(self, content: bytes, url: str, selector: str | None = None) -> tuple[str, str]:
+        """Extract the readable text and title of an HTML page."""
+        soup = BeautifulSoup(content, HTML_PARSER)
 
         # Get title
         title = soup.title.string if soup.title else urlparse(url).netloc
@@ -552,6 +978,101 @@ class KnowledgeManager:
 
         return text, title
 
+    def _sync_web_chunks(self, source: WebSource, chunks: list[str]) -> tuple[int, int]:
+        """Make a source's stored chunks match ``chunks``.
+
+        Chunk IDs are derived from a hash of the chunk text, so unchanged
+        chunks keep their ID and embedding. Only new chunks are embedded and
+        added, and only chunks that disappeared are deleted. New chunks that
+        nearly duplicate a stored chunk are registered as references to it.
+
+        Returns: (chunks_added, chunks_removed)
+        """
+        collection = self._get_collection(source.agent_id)
+
+        chunk_ids = []
+        chunk_metadatas = []
+        occurrences: dict[str, int] = {}
+        for i, chunk in enumerate(chunks):
+            content_hash = hashlib.sha256(chunk.encode()).hexdigest()[:16]
+            n = occurrences.get(content_hash, 0)
+            occurrences[content_hash] = n + 1
+            chunk_ids.append(f"{source.id}_{content_hash}" + (f"_{n}" if n else ""))
+            chunk_metadatas.append({
+                "source_id": source.id,
+                "source_type": "web",
+                "chunk_index": i,
+                "content_hash": content_hash,
+                "url": source.url,
+                "agent_id": source.agent_id,
+            })
+
+        # The source's registered chunks (stored or referencing a stored
+        # near-duplicate), and chunks stored before fingerprinting
+        refs = self._fingerprints.refs(source.agent_id, source.id) if self._fingerprints else {}
+        holders = set(refs.values())
+        existing = collection.get(where={"source_id": source.id}, include=["metadatas"])
+        existing_index = {
+            chunk_id: (metadata or {}).get("chunk_index")
+            for chunk_id, metadata in zip(existing["ids"], existing["metadatas"] or [], strict=False)
+            if chunk_id not in holders
+        }
+
+        # New chunks are stored before stale ones are removed, so a failed
+        # embedding leaves the source's previous content in place
+        added = [
+            i for i, chunk_id in enumerate(chunk_ids)
+            if chunk_id not in refs and chunk_id not in existing_index
+        ]
+        if added:
+            added_ids = [chunk_ids[i] for i in added]
+            keep = self._claim_chunks(
+                source.agent_id,
+                added_ids,
+                [chunks[i] for i in added],
+                [chunk_metadatas[i] for i in added],
+            )
+            stored = [added[k] for k in keep]
+            documents = [chunks[i] for i in stored]
+            try:
+                self._store_chunks(
+                    source.agent_id,
+                    [chunk_ids[i] for i in stored],
+                    documents,
+                    [chunk_metadatas[i] for i in stored],
+                    self._embed_chunks(documents) if documents else [],
+                )
+            except Exception:
+                self._remove_chunks(source.agent_id, source.id, stored_ids=[], chunk_ids=added_ids)
+                raise
+
+        new_ids = set(chunk_ids)
+        stale = [chunk_id for chunk_id in [*refs, *existing_index] if chunk_id not in new_ids]
+        if stale:
+            self._remove_chunks(
+                source.agent_id,
+                source.id,
+                stored_ids=[chunk_id for chunk_id in stale if chunk_id in existing_index],
+                chunk_ids=[chunk_id for chunk_id in stale if chunk_id in refs],
+            )
+
+        # Unchanged chunks that moved only need their position updated
+        moved = {
+            chunk_ids[i]: chunk_metadatas[i] for i, chunk_id in enumerate(chunk_ids)
+            if chunk_id in existing_index and existing_index[chunk_id] != i
+        }
+        if self._fingerprints is not None:
+            moved.update(self._fingerprints.update(source.agent_id, {
+                chunk_id: metadata
+                for chunk_id, metadata in zip(chunk_ids, chunk_metadatas, strict=True)
+                if chunk_id in refs
+            }))
+        if moved:
+            collection.update(ids=list(moved), metadatas=list(moved.values()))
+            self._bump_version(source.agent_id)
+
+        return len(added), len(stale)
+
     def add_web_source(
         self,
         agent_id: str,
@@ -571,204 +1092,272 @@ class KnowledgeManager:
         source_id = f"web_{agent_id}_{url_hash}"
 
         # Check if already exists
-        if source_id in self._web_sources:
+        if self.get_web_source(source_id) is not None:
             # Refresh existing source
             return self.refresh_web_source(source_id)
 
-        # Fetch content
-        try:
-            text, title = self._fetch_url_content(url, selector)
-            status = "success"
-        except Exception as e:
-            text = ""
-            title = name or urlparse(url).netloc
-            status = f"error: {str(e)[:100]}"
-
-        # Use title as name if not provided
-        if not name:
-            name = title
-
-        # Chunk and store content
-        chunks = self._chunk_text(text)
-        collection = self._get_collection(agent_id)
-
-        chunk_ids = []
-        chunk_texts = []
-        chunk_metadatas = []
-
-        for i, chunk_text in enumerate(chunks):
-            chunk_id = f"{source_id}_chunk_{i}"
-            chunk_ids.append(chunk_id)
-            chunk_texts.append(chunk_text)
-            chunk_metadatas.append({
-                "source_id": source_id,
-                "source_type": "web",
-                "chunk_index": i,
-                "url": url,
-                "agent_id": agent_id,
-            })
-
-        if chunk_ids:
-            collection.add(
-                ids=chunk_ids,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas,
-            )
-
         # Create source record
         source = WebSource(
             id=source_id,
             agent_id=agent_id,
             url=url,
-            name=name,
+            name=name or urlparse(url).netloc,
             description=description,
             refresh_interval_hours=refresh_interval_hours,
-            last_refreshed=datetime.utcnow().isoformat(),
-            last_refresh_status=status,
-            chunk_count=len(chunks),
             auto_refresh=auto_refresh,
             selector=selector,
         )
 
-        self._web_sources[source_id] = source
-        self._save_web_sources()
+        # Fetch, chunk and store content
+        page, status = self._fetch_for_refresh(source)
+        self._apply_refresh(source, page, status)
+
+        # Use title as name if not provided
+        if not name and page is not None and page.title:
+            source.name = page.title
+
+        self._save_web_sources([source])
+        self._notify_source_changed(source_id)
 
         return source
 
     def refresh_web_source(self, source_id: str) -> WebSource:
-        """Refresh a web source by re-fetching its content."""
-        source = self._web_sources.get(source_id)
+        """Refresh a web source by re-fetching its content.
+
+        The page is requested conditionally with the stored ETag and
+        Last-Modified validators. Unchanged pages are skipped entirely, and
+        changed pages only re-embed the chunks whose text changed. If the
+        fetch fails, the previously ingested chunks are kept.
+        """
+        source = self.get_web_source(source_id)
         if not source:
             raise ValueError(f"Web source '{source_id}' not found")
 
-        # Delete old chunks
-        collection = self._get_collection(source.agent_id)
-        try:
-            results = collection.get(where={"source_id": source_id})
-            if results["ids"]:
-                collection.delete(ids=results["ids"])
-        except Exception:
-            pass
+        page, status = self._fetch_for_refresh(source)
+        self._apply_refresh(source, page, status)
+        self._save_web_sources([source], existing_only=True)
+        self._notify_source_changed(source_id)
+
+        return source
 
-        # Fetch new content
+    def _fetch_for_refresh(self, source: WebSource) -> tuple[FetchedPage | None, str]:
+        """Fetch a source's page conditionally. Returns (page or None, status)."""
         try:
-            text, _ = self._fetch_url_content(source.url, source.selector)
-            status = "success"
+            page = self._fetch_web_page(
+                source.url, source.selector, source.etag, source.last_modified
+            )
+            return page, "success"
         except Exception as e:
-            text = ""
-            status = f"error: {str(e)[:100]}"
-
-        # Chunk and store
-        chunks = self._chunk_text(text)
-
-        chunk_ids = []
-        chunk_texts = []
-        chunk_metadatas = []
-
-        for i, chunk_text in enumerate(chunks):
-            chunk_id = f"{source_id}_chunk_{i}"
-            chunk_ids.append(chunk_id)
-            chunk_texts.append(chunk_text)
-            chunk_metadatas.append({
-                "source_id": source_id,
-                "source_type": "web",
-                "chunk_index": i,
-                "url": source.url,
-                "agent_id": source.agent_id,
-            })
+            return None, f"error: {str(e)[:100]}"
 
-        if chunk_ids:
-            collection.add(
-                ids=chunk_ids,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas,
-            )
+    def _apply_refresh(self, source: WebSource, page: FetchedPage | None, status: str) -> None:
+        """Store a fetched page's changed chunks and update the source record.
 
-        # Update source record
+        Does not save the source; callers save once per batch.
+        """
+        if page is not None and not page.not_modified:
+            content_hash = hashlib.sha256(page.text.encode()).hexdigest()
+            if content_hash != source.content_hash:
+                try:
+                    chunks = self._chunk_text(page.text)
+                    self._sync_web_chunks(source, chunks)
+                except Exception as e:
+                    # Keep the old validators so the page is fetched in full again
+                    page, status = None, f"error: {str(e)[:100]}"
+                else:
+                    source.chunk_count = len(chunks)
+                    source.content_hash = content_hash
+        if page is not None:
+            source.etag = page.etag
+            source.last_modified = page.last_modified
+        self._record_refresh_status(source, status)
+
+    def _record_refresh_status(self, source: WebSource, status: str) -> None:
+        """Record a refresh attempt's outcome, counting consecutive failures."""
         source.last_refreshed = datetime.utcnow().isoformat()
         source.last_refresh_status = status
-        source.chunk_count = len(chunks)
-        self._save_web_sources()
+        if status == "success":
+            source.consecutive_failures = 0
+        else:
+            source.consecutive_failures += 1
 
-        return source
+    def list_web_sources(
+        self,
+        agent_id: str | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> list[WebSource]:
+        """List web sources, optionally filtered by agent and paginated."""
+        return self._metadata.list(WEB_SOURCE_KIND, WebSource, agent_id or None, limit, offset)
 
-    def list_web_sources(self, agent_id: str | None = None) -> list[WebSource]:
-        """List web sources, optionally filtered by agent."""
-        if agent_id:
-            return [s for s in self._web_sources.values() if s.agent_id == agent_id]
-        return list(self._web_sources.values())
+    def count_web_sources(self, agent_id: str | None = None) -> int:
+        """Number of web sources, optionally of one agent."""
+        return self._metadata.count(WEB_SOURCE_KIND, agent_id or None)
 
     def get_web_source(self, source_id: str) -> WebSource | None:
         """Get a web source by ID."""
-        return self._web_sources.get(source_id)
+        return self._metadata.get(WEB_SOURCE_KIND, source_id, WebSource)
 
     def delete_web_source(self, source_id: str) -> bool:
         """Delete a web source and its chunks."""
-        source = self._web_sources.get(source_id)
+        source = self.get_web_source(source_id)
         if not source:
             return False
 
-        # Delete chunks from Chroma
-        collection = self._get_collection(source.agent_id)
+        # Delete chunks from the vector store
+        self._delete_owner_chunks(source.agent_id, "source_id", source_id)
+
+        # Remove from storage
+        self._metadata.delete(WEB_SOURCE_KIND, source_id)
+        self._notify_source_changed(source_id)
+
+        return True
+
+    def _delete_document_chunks(self, agent_id: str, document_id: str) -> None:
+        """Delete a document's chunks from the vector store."""
+        self._delete_owner_chunks(agent_id, "document_id", document_id)
+
+    def _delete_owner_chunks(self, agent_id: str, key: str, owner_id: str) -> None:
+        """Delete every chunk of a document or web source."""
+        collection = self._get_collection(agent_id)
         try:
-            results = collection.get(where={"source_id": source_id})
-            if results["ids"]:
-                collection.delete(ids=results["ids"])
+            results = collection.get(where={key: owner_id}, include=["metadatas"])
+            self._remove_chunks(agent_id, owner_id, results["ids"])
         except Exception:
             pass
 
-        # Remove from storage
-        del self._web_sources[source_id]
-        self._save_web_sources()
+    def _remove_chunks(
+        self,
+        agent_id: str,
+        owner_id: str,
+        stored_ids: list[str],
+        chunk_ids: list[str] | None = None,
+    ) -> None:
+        """Remove chunks of a document or web source.
 
-        return True
+        Stored chunks that other documents or sources still reference are
+        kept for one of those references, with its metadata and, where its
+        text differs, its own text embedded in place of the removed text.
 
-    def get_sources_needing_refresh(self) -> list[WebSource]:
-        """Get web sources that need to be refreshed."""
-        now = datetime.utcnow()
-        sources_to_refresh = []
+        Args:
+            agent_id: The collection's agent
+            owner_id: The document or web source ID
+            stored_ids: The owner's chunks in the collection to remove
+            chunk_ids: The owner's registered chunks to release (default: all)
+        """
+        doomed: list[str] = []
+        transfers: dict[str, tuple[dict[str, Any], str | None]] = {}
+        if self._fingerprints is not None:
+            doomed, transfers = self._fingerprints.release(agent_id, owner_id, chunk_ids)
+        doomed = list(dict.fromkeys([
+            *(chunk_id for chunk_id in stored_ids if chunk_id not in transfers), *doomed
+        ]))
+        relabeled = {chunk_id: metadata for chunk_id, (metadata, text) in transfers.items() if text is None}
+        restored = {chunk_id: transfer for chunk_id, transfer in transfers.items() if transfer[1] is not None}
+
+        embeddings: list[list[float]] = []
+        if restored:
+            try:
+                embeddings = self._embed_chunks([text for _, text in restored.values()])
+            except Exception:
+                # Dropping the chunks beats serving a removed document's text
+                doomed += list(restored)
+                restored = {}
 
-        for source in self._web_sources.values():
-            if not source.auto_refresh:
-                continue
+        collection = self._get_collection(agent_id)
+        if doomed or restored:
+            collection.delete(ids=[*doomed, *restored])
+        if relabeled:
+            collection.update(ids=list(relabeled), metadatas=list(relabeled.values()))
+        if restored:
+            self._store_chunks(
+                agent_id,
+                list(restored),
+                [text for _, text in restored.values()],
+                [metadata for metadata, _ in restored.values()],
+                embeddings,
+            )
+        if doomed or transfers:
+            self._bump_version(agent_id)
 
-            if not source.last_refreshed:
-                sources_to_refresh.append(source)
-                continue
+    def add_source_listener(self, callback: Callable[[str], None]) -> None:
+        """Add a callback to be called when a web source is added, refreshed or deleted.
 
-            last_refresh = datetime.fromisoformat(source.last_refreshed)
-            next_refresh = last_refresh + timedelta(hours=source.refresh_interval_hours)
+        Callback signature: (source_id)
+        """
+        self._source_listeners.append(callback)
+
+    def _notify_source_changed(self, source_id: str) -> None:
+        for callback in self._source_listeners:
+            with contextlib.suppress(Exception):
+                callback(source_id)
 
-            if now >= next_refresh:
-                sources_to_refresh.append(source)
+    def next_refresh_time(self, source: WebSource) -> datetime | None:
+        """When a source is next due for refresh (UTC), or None if it is not auto-refreshed.
+
+        Sources whose last refresh failed are retried with exponential
+        backoff, capped at their regular refresh interval.
+        """
+        if not source.auto_refresh:
+            return None
+        if not source.last_refreshed:
+            return datetime.utcnow()
+
+        interval = timedelta(hours=source.refresh_interval_hours)
+        if source.consecutive_failures:
+            exponent = min(source.consecutive_failures - 1, 32)
+            retry = timedelta(seconds=REFRESH_RETRY_BASE_SECONDS * 2 ** exponent)
+            interval = min(interval, retry)
+        return datetime.fromisoformat(source.last_refreshed) + interval
 
-        return sources_to_refresh
+    def get_sources_needing_refresh(self) -> list[WebSource]:
+        """Get web sources that need to be refreshed, most overdue first."""
+        return self._metadata.due(WEB_SOURCE_KIND, WebSource, datetime.utcnow())
 
     def refresh_all_due_sources(self) -> dict[str, str]:
         """Refresh all sources that are due for refresh.
 
+        Sources are fetched concurrently (see WebRefreshEngine).
+
         Returns: Dict mapping source_id to status
         """
-        results = {}
-        for source in self.get_sources_needing_refresh():
-            try:
-                self.refresh_web_source(source.id)
-                results[source.id] = "success"
-            except Exception as e:
-                results[source.id] = f"error: {str(e)[:100]}"
-        return results
+        return WebRefreshEngine(self).refresh(self.get_sources_needing_refresh())
 
 
 class KnowledgeScheduler:
-    """Background scheduler for refreshing web sources."""
+    """Background scheduler for refreshing web sources.
+
+    Sources are kept in a heap keyed by their next due time, and the loop
+    sleeps until the earliest one is due. Due times get random jitter so
+    sources added together do not refresh together, and failing sources
+    back off exponentially (see KnowledgeManager.next_refresh_time).
+    The manager notifies the scheduler when sources change; every
+    ``check_interval_seconds`` the heap is also rebuilt from the manager.
+    """
 
-    def __init__(self, manager: KnowledgeManager, check_interval_seconds: int = 3600):
+    def __init__(
+        self,
+        manager: KnowledgeManager,
+        check_interval_seconds: int = 3600,
+        jitter: float = 0.1,
+    ):
         self.manager = manager
         self.check_interval = check_interval_seconds
+        self.jitter = jitter  # Up to this fraction of the delay is added
         self._running = False
         self._thread: threading.Thread | None = None
         self._callbacks: list[Callable[[str, str], None]] = []
 
+        # (due, seq, source_id) on the monotonic clock; entries whose due
+        # time no longer matches _due are stale and skipped when popped
+        self._heap: list[tuple[float, int, str]] = []
+        self._due: dict[str, float] = {}
+        self._seq = 0
+        self._next_rebuild = 0.0
+        self._wakeup = threading.Condition()
+
+        manager.add_source_listener(self.reschedule)
+
     def add_callback(self, callback: Callable[[str, str], None]) -> None:
         """Add a callback to be called when a source is refreshed.
 
@@ -776,11 +1365,104 @@ class KnowledgeScheduler:
         """
         self._callbacks.append(callback)
 
+    def trigger(self, source_id: str) -> bool:
+        """Refresh a source as soon as possible.
+
+        Returns: False if the source does not exist
+        """
+        if self.manager.get_web_source(source_id) is None:
+            return False
+        with self._wakeup:
+            self._push(source_id, time.monotonic())
+            self._wakeup.notify()
+        return True
+
+    def reschedule(self, source_id: str) -> None:
+        """Recompute a source's due time after it was added, refreshed or deleted."""
+        source = self.manager.get_web_source(source_id)
+        with self._wakeup:
+            if source is None:
+                self._due.pop(source_id, None)
+            else:
+                self._schedule(source)
+            self._wakeup.notify()
+
+    def next_due(self) -> tuple[str, float] | None:
+        """The next source to refresh and the seconds until it is due."""
+        with self._wakeup:
+            self._discard_stale()
+            if not self._heap:
+                return None
+            due, _, source_id = self._heap[0]
+            return source_id, max(0.0, due - time.monotonic())
+
+    def _schedule(self, source: WebSource) -> None:
+        """Push a source at its next refresh time plus jitter (lock held)."""
+        next_refresh = self.manager.next_refresh_time(source)
+        if next_refresh is None:
+            self._due.pop(source.id, None)
+            return
+
+        delay = (next_refresh - datetime.utcnow()).total_seconds()
+        if source.last_refreshed:
+            period = (next_refresh - datetime.fromisoformat(source.last_refreshed)).total_seconds()
+            delay += random.uniform(0, self.jitter * period)
+        self._push(source.id, time.monotonic() + max(0.0, delay))
+
+    def _push(self, source_id: str, due: float) -> None:
+        self._seq += 1
+        self._due[source_id] = due
+        heapq.heappush(self._heap, (due, self._seq, source_id))
+
+    def _discard_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _rebuild(self) -> None:
+        """Reschedule every source from the manager (lock held)."""
+        self._heap.clear()
+        self._due.clear()
+        for source in self.manager.list_web_sources():
+            self._schedule(source)
+        self._next_rebuild = time.monotonic() + self.check_interval
+
+    def _pop_due(self) -> list[str] | None:
+        """Wait until sources are due and pop them; None once stopped."""
+        with self._wakeup:
+            while self._running:
+                now = time.monotonic()
+                if now >= self._next_rebuild:
+                    self._rebuild()
+                self._discard_stale()
+
+                if self._heap and self._heap[0][0] <= now:
+                    due = []
+                    while self._heap and self._heap[0][0] <= now:
+                        _, _, source_id = heapq.heappop(self._heap)
+                        if self._due.get(source_id) is not None:
+                            del self._due[source_id]
+                            due.append(source_id)
+                    return due
+
+                timeout = self._next_rebuild - now
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - now)
+                self._wakeup.wait(timeout)
+        return None
+
     def _run_loop(self) -> None:
         """Main scheduler loop."""
         while self._running:
+            source_ids = self._pop_due()
+            if not source_ids:
+                continue
             try:
-                results = self.manager.refresh_all_due_sources()
+                sources = [
+                    source
+                    for source in map(self.manager.get_web_source, source_ids)
+                    if source is not None
+                ]
+                results = WebRefreshEngine(self.manager).refresh(sources)
                 for source_id, status in results.items():
                     for callback in self._callbacks:
                         try:
@@ -790,11 +1472,11 @@ class KnowledgeScheduler:
             except Exception:
                 pass
 
-            # Sleep in small increments to allow quick shutdown
-            for _ in range(self.check_interval):
-                if not self._running:
-                    break
-                time.sleep(1)
+            # Retry sources whose refresh did not report back later
+            with self._wakeup:
+                for source_id in source_ids:
+                    if source_id not in self._due and self.manager.get_web_source(source_id):
+                        self._push(source_id, time.monotonic() + REFRESH_RETRY_BASE_SECONDS)
 
     def start(self) -> None:
         """Start the scheduler in a background thread."""
@@ -802,12 +1484,15 @@ class KnowledgeScheduler:
             return
 
         self._running = True
+        self._next_rebuild = 0.0
         self._thread = threading.Thread(target=self._run_loop, daemon=True)
         self._thread.start()
 
     def stop(self) -> None:
         """Stop the scheduler."""
-        self._running = False
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
         if self._thread:
             self._thread.join(timeout=5)
             self._thread = None
@@ -826,10 +1511,9 @@ def get_knowledge_manager() -> KnowledgeManager:
     """Get the knowledge manager singleton."""
     global _knowledge_manager
     if _knowledge_manager is None:
-        _knowledge_manager = KnowledgeManager()
-        # Load web sources
-        _knowledge_manager._web_sources = {}
-        _knowledge_manager._load_web_sources()
+        _knowledge_manager = KnowledgeManager(
+            vector_backend=os.environ.get("KNOWLEDGE_VECTOR_BACKEND", "chroma")
+        )
     return _knowledge_manager
 
 
@@ -857,12 +1541,38 @@ def stop_knowledge_scheduler() -> None:
 
 __all__ = [
     "SHARED_CANON_ID",
+    "ChromaBackend",
+    "ChunkFingerprintIndex",
+    "ContextPassage",
+    "IngestionFile",
+    "IngestionJob",
+    "IngestionQueue",
     "KnowledgeDocument",
-    "WebSource",
     "KnowledgeManager",
+    "KnowledgeMetadataStore",
     "KnowledgeScheduler",
+    "LexicalCollection",
+    "LexicalIndex",
+    "LexicalQuery",
+    "LocalVectorBackend",
+    "PackedContext",
+    "PgVectorBackend",
+    "VectorBackend",
+    "VectorCollection",
+    "WebRefreshEngine",
+    "WebSource",
+    "chunk_text",
+    "context_token_budget",
+    "extract_text",
+    "fuse_results",
+    "get_ingestion_queue",
     "get_knowledge_manager",
     "get_knowledge_scheduler",
+    "iter_chunks",
+    "iter_text",
+    "pack_context",
+    "parse_query",
     "start_knowledge_scheduler",
+    "stop_ingestion_queue",
     "stop_knowledge_scheduler",
 ]
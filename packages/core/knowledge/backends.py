@@ -0,0 +1,597 @@
+"""Vector storage backends for the KnowledgeManager.
+
+The manager stores each agent's chunks in a collection and uses a small,
+Chroma-compatible subset of the collection API (add, get, update, delete,
+query with ``where`` equality filters). Backends provide those collections:
+
+- ChromaBackend: Chroma's PersistentClient (the default).
+- LocalVectorBackend: an in-process store for many small collections. Each
+  collection keeps its vectors in a memory-mapped float32 (or int8
+  quantized) matrix file and its ids, documents and metadata in an
+  append-only log. Small collections are searched by brute force with one
+  matrix-vector product; large ones through an HNSW graph when hnswlib is
+  installed. Filters on ``document_id`` and ``source_id`` use an inverted
+  index.
+
+Distances are squared L2, Chroma's default, so relevance scores are
+comparable across backends.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any, Protocol
+
+import chromadb
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Collections with at least this many live chunks are searched through HNSW
+DEFAULT_HNSW_THRESHOLD = 20_000
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Metadata keys with an inverted index for where filters
+INDEXED_METADATA_KEYS = ("document_id", "source_id")
+
+# The log is compacted once deleted rows are this fraction of all rows
+COMPACT_DEAD_FRACTION = 0.5
+
+
+def collection_name(agent_id: str) -> str:
+    """Name of an agent's collection."""
+    return f"agent_{agent_id.replace('-', '_')}"
+
+
+class VectorCollection(Protocol):
+    """The subset of Chroma's collection API the KnowledgeManager uses."""
+
+    def add(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[Any] | None = None,
+    ) -> None: ...
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+        include: list[str] | None = None,
+    ) -> dict[str, Any]: ...
+
+    def update(self, ids: list[str], metadatas: list[dict[str, Any]]) -> None: ...
+
+    def delete(self, ids: list[str] | None = None, where: dict[str, Any] | None = None) -> None: ...
+
+    def query(
+        self,
+        query_embeddings: list[Any],
+        n_results: int = 10,
+        where: dict[str, Any] | None = None,
+    ) -> dict[str, Any]: ...
+
+
+class VectorBackend(Protocol):
+    """Provides a collection per agent."""
+
+    def get_collection(self, agent_id: str) -> VectorCollection: ...
+
+
+class ChromaBackend:
+    """Collections in a Chroma PersistentClient."""
+
+    def __init__(self, path: str | Path, embedding_function: Any) -> None:
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self.client = chromadb.PersistentClient(path=str(path))
+        self.embedding_function = embedding_function
+
+    def get_collection(self, agent_id: str) -> VectorCollection:
+        return self.client.get_or_create_collection(
+            name=collection_name(agent_id),
+            metadata={"agent_id": agent_id},
+            embedding_function=self.embedding_function,
+        )
+
+
+def _where_terms(where: dict[str, Any] | None) -> list[tuple[str, Any]]:
+    """Flatten an equality filter to (key, value) terms that must all match.
+
+    Supports ``{"key": value}``, ``{"key": {"$eq": value}}`` and ``$and``.
+    """
+    if not where:
+        return []
+    terms = []
+    for key, value in where.items():
+        if key == "$and":
+            for clause in value:
+                terms.extend(_where_terms(clause))
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported where operator: {key}")
+        elif isinstance(value, dict):
+            if set(value) != {"$eq"}:
+                raise ValueError(f"Unsupported where clause for '{key}': {value}")
+            terms.append((key, value["$eq"]))
+        else:
+            terms.append((key, value))
+    return terms
+
+
+class LocalCollection:
+    """One collection of the LocalVectorBackend.
+
+    Files in the collection directory:
+
+    - ``meta.json``: vector dimension and whether vectors are quantized
+    - ``vectors.f32``: float32 rows, or ``vectors.i8`` plus ``scales.f32``
+      (int8 codes and one scale per row) when quantized
+    - ``log.jsonl``: add/update/delete records; the n-th add is row n
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        quantize: bool = False,
+        hnsw_threshold: int = DEFAULT_HNSW_THRESHOLD,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("The local vector backend requires numpy.")
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.hnsw_threshold = hnsw_threshold
+        self._meta_path = path / "meta.json"
+        self._log_path = path / "log.jsonl"
+        self._lock = threading.RLock()
+
+        self.dim: int | None = None
+        self.quantized = quantize
+        self._reset_state()
+        self._load()
+
+    def _reset_state(self) -> None:
+        self._ids: list[str | None] = []  # Row -> id, None once deleted
+        self._documents: list[str | None] = []
+        self._metadatas: list[dict[str, Any] | None] = []
+        self._rows: dict[str, int] = {}
+        self._dead: list[int] = []  # Deleted rows, until the next compaction
+        self._postings: dict[tuple[str, Any], set[int]] = {}
+        self._norms = np.zeros(0, dtype=np.float32)  # Squared norm per row
+        self._matrix: Any = None  # Memory map, reopened after appends
+        self._scales: Any = None
+        self._hnsw: Any = None  # Built on first large search; rows change on compaction
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / ("vectors.i8" if self.quantized else "vectors.f32")
+
+    @property
+    def _scales_path(self) -> Path:
+        return self.path / "scales.f32"
+
+    def count(self) -> int:
+        """Number of live chunks."""
+        return len(self._rows)
+
+    # -- Persistence ---------------------------------------------------------
+
+    def _load(self) -> None:
+        if self._meta_path.exists():
+            meta = json.loads(self._meta_path.read_text())
+            self.dim = meta["dim"]
+            self.quantized = meta["quantized"]
+        if self.dim is None or not self._log_path.exists():
+            return
+
+        stored_rows = self._file_size(self._vectors_path) // self._row_bytes()
+        if self.quantized:
+            stored_rows = min(stored_rows, self._file_size(self._scales_path) // 4)
+        adds = 0
+        consistent = True
+        with open(self._log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    consistent = False  # Torn final write
+                    break
+                if record["op"] == "add":
+                    if adds >= stored_rows:
+                        consistent = False
+                        break
+                    self._append_row(record["id"], record["document"], record["metadata"])
+                    adds += 1
+                elif record["op"] == "update":
+                    self._apply_update(record["id"], record["metadata"])
+                elif record["op"] == "delete":
+                    self._apply_delete(record["ids"])
+
+        if adds != stored_rows:
+            consistent = False
+        self._norms = self._compute_norms(adds)
+        if not consistent or self._should_compact():
+            self._compact(adds)
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        return path.stat().st_size if path.exists() else 0
+
+    def _row_bytes(self) -> int:
+        return (self.dim or 0) * (1 if self.quantized else 4)
+
+    def _write_log(self, records: Iterable[dict[str, Any]]) -> None:
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _open_matrix(self) -> tuple[Any, Any]:
+        """Memory-mapped (vectors, scales) covering every stored row."""
+        rows = len(self._ids)
+        if self._matrix is None or len(self._matrix) < rows:
+            if rows == 0:
+                return np.zeros((0, self.dim or 0), dtype=np.float32), None
+            dtype = np.int8 if self.quantized else np.float32
+            self._matrix = np.memmap(self._vectors_path, dtype=dtype, mode="r", shape=(rows, self.dim))
+            if self.quantized:
+                self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(rows,))
+        return self._matrix, self._scales
+
+    def _dequantize(self, rows: Any) -> Any:
+        """Float32 vectors of the given rows."""
+        matrix, scales = self._open_matrix()
+        vectors = np.asarray(matrix[rows], dtype=np.float32)
+        if self.quantized:
+            vectors *= scales[rows][:, None]
+        return vectors
+
+    def _compute_norms(self, rows: int, start: int = 0, block: int = 4096) -> Any:
+        norms = [self._norms[:start]]
+        for begin in range(start, rows, block):
+            vectors = self._dequantize(slice(begin, min(rows, begin + block)))
+            norms.append(np.einsum("ij,ij->i", vectors, vectors))
+        return np.concatenate(norms).astype(np.float32) if len(norms) > 1 else norms[0]
+
+    def _should_compact(self) -> bool:
+        dead = len(self._ids) - len(self._rows)
+        return dead > 0 and dead >= COMPACT_DEAD_FRACTION * len(self._ids)
+
+    def _compact(self, rows: int | None = None) -> None:
+        """Rewrite the files with only the live rows."""
+        rows = len(self._ids) if rows is None else rows
+        live = [row for row in range(rows) if self._ids[row] is not None]
+        matrix, scales = self._open_matrix() if rows else (None, None)
+
+        tmp_vectors = self._vectors_path.with_suffix(".tmp")
+        tmp_scales = self._scales_path.with_suffix(".tmp")
+        tmp_log = self._log_path.with_suffix(".tmp")
+        with open(tmp_vectors, "wb") as f:
+            for begin in range(0, len(live), 4096):
+                f.write(np.asarray(matrix[live[begin:begin + 4096]]).tobytes())
+        if self.quantized:
+            with open(tmp_scales, "wb") as f:
+                f.write(np.asarray(scales[live] if live else [], dtype=np.float32).tobytes())
+        with open(tmp_log, "w", encoding="utf-8") as f:
+            for row in live:
+                record = {
+                    "op": "add",
+                    "id": self._ids[row],
+                    "document": self._documents[row],
+                    "metadata": self._metadatas[row],
+                }
+                f.write(json.dumps(record) + "\n")
+
+        ids = [self._ids[row] for row in live]
+        documents = [self._documents[row] for row in live]
+        metadatas = [self._metadatas[row] for row in live]
+        norms = self._norms[live] if live else np.zeros(0, dtype=np.float32)
+
+        self._matrix = self._scales = None
+        os.replace(tmp_vectors, self._vectors_path)
+        if self.quantized:
+            os.replace(tmp_scales, self._scales_path)
+        os.replace(tmp_log, self._log_path)
+
+        self._reset_state()
+        for chunk_id, document, metadata in zip(ids, documents, metadatas, strict=True):
+            self._append_row(chunk_id, document, metadata)
+        self._norms = norms
+
+    # -- In-memory state -----------------------------------------------------
+
+    def _append_row(self, chunk_id: str, document: str, metadata: dict[str, Any] | None) -> None:
+        row = len(self._ids)
+        self._ids.append(chunk_id)
+        self._documents.append(document)
+        self._metadatas.append(metadata)
+        self._rows[chunk_id] = row
+        self._index(row, metadata)
+
+    def _index(self, row: int, metadata: dict[str, Any] | None) -> None:
+        for key in INDEXED_METADATA_KEYS:
+            if metadata and key in metadata:
+                self._postings.setdefault((key, metadata[key]), set()).add(row)
+
+    def _unindex(self, row: int, metadata: dict[str, Any] | None) -> None:
+        for key in INDEXED_METADATA_KEYS:
+            if metadata and key in metadata:
+                self._postings.get((key, metadata[key]), set()).discard(row)
+
+    def _apply_update(self, chunk_id: str, metadata: dict[str, Any]) -> None:
+        row = self._rows.get(chunk_id)
+        if row is None:
+            return
+        self._unindex(row, self._metadatas[row])
+        self._metadatas[row] = metadata
+        self._index(row, metadata)
+
+    def _apply_delete(self, ids: Iterable[str]) -> None:
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is None:
+                continue
+            self._unindex(row, self._metadatas[row])
+            self._dead.append(row)
+            self._ids[row] = None
+            self._documents[row] = None
+            self._metadatas[row] = None
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(row)
+
+    def _match(self, ids: list[str] | None, where: dict[str, Any] | None) -> list[int]:
+        """Live rows matching ids and an equality filter, in row order."""
+        terms = _where_terms(where)
+        if ids is not None:
+            rows = {self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows}
+        else:
+            indexed = [term for term in terms if term[0] in INDEXED_METADATA_KEYS]
+            if indexed:
+                rows = set.intersection(*(self._postings.get(term, set()) for term in indexed))
+            else:
+                rows = set(self._rows.values())
+        return sorted(
+            row for row in rows
+            if all((self._metadatas[row] or {}).get(key) == value for key, value in terms)
+        )
+
+    # -- Collection API ------------------------------------------------------
+
+    def add(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[Any] | None = None,
+    ) -> None:
+        if embeddings is None:
+            raise ValueError("The local vector backend needs precomputed embeddings")
+        with self._lock:
+            # Existing IDs are ignored, as in Chroma
+            new: list[int] = []
+            seen: set[str] = set()
+            for i, chunk_id in enumerate(ids):
+                if chunk_id not in self._rows and chunk_id not in seen:
+                    seen.add(chunk_id)
+                    new.append(i)
+            if not new:
+                return
+            vectors = np.asarray([embeddings[i] for i in new], dtype=np.float32)
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._meta_path.write_text(json.dumps({"dim": self.dim, "quantized": self.quantized}))
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match {self.dim}")
+
+            # Vectors first, so a crash never leaves log rows without vectors
+            if self.quantized:
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                codes = np.round(vectors / scales[:, None]).astype(np.int8)
+                with open(self._vectors_path, "ab") as f:
+                    f.write(codes.tobytes())
+                with open(self._scales_path, "ab") as f:
+                    f.write(scales.astype(np.float32).tobytes())
+                stored = codes.astype(np.float32) * scales[:, None]
+            else:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                stored = vectors
+            self._write_log(
+                {"op": "add", "id": ids[i], "document": documents[i], "metadata": metadatas[i]}
+                for i in new
+            )
+
+            first_row = len(self._ids)
+            for i in new:
+                self._append_row(ids[i], documents[i], metadatas[i])
+            self._norms = np.concatenate([self._norms, np.einsum("ij,ij->i", stored, stored)])
+            if self._hnsw is not None:
+                self._hnsw_add(stored, np.arange(first_row, len(self._ids)))
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+        include: list[str] | None = None,
+    ) -> dict[str, Any]:
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            rows = self._match(ids, where)
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._documents[row] for row in rows] if "documents" in include else None,
+                "metadatas": [self._metadatas[row] for row in rows] if "metadatas" in include else None,
+            }
+
+    def update(self, ids: list[str], metadatas: list[dict[str, Any]]) -> None:
+        with self._lock:
+            records = [
+                {"op": "update", "id": chunk_id, "metadata": metadata}
+                for chunk_id, metadata in zip(ids, metadatas, strict=True)
+                if chunk_id in self._rows
+            ]
+            self._write_log(records)
+            for record in records:
+                self._apply_update(record["id"], record["metadata"])
+
+    def delete(self, ids: list[str] | None = None, where: dict[str, Any] | None = None) -> None:
+        with self._lock:
+            doomed = [self._ids[row] for row in self._match(ids, where)]
+            if not doomed:
+                return
+            self._write_log([{"op": "delete", "ids": doomed}])
+            self._apply_delete(doomed)
+            if self._should_compact():
+                self._compact()
+
+    def query(
+        self,
+        query_embeddings: list[Any],
+        n_results: int = 10,
+        where: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        result: dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            candidates = self._match(None, where) if where else None
+            for embedding in query_embeddings:
+                rows, distances = self._nearest(np.asarray(embedding, dtype=np.float32), n_results, candidates)
+                result["ids"].append([self._ids[row] for row in rows])
+                result["documents"].append([self._documents[row] for row in rows])
+                result["metadatas"].append([self._metadatas[row] for row in rows])
+                result["distances"].append([float(d) for d in distances])
+        return result
+
+    # -- Search --------------------------------------------------------------
+
+    def _nearest(self, query: Any, k: int, candidates: list[int] | None) -> tuple[list[int], list[float]]:
+        """The k nearest live rows (optionally among candidates) by squared L2."""
+        live = len(self._rows) if candidates is None else len(candidates)
+        k = min(k, live)
+        if k <= 0:
+            return [], []
+        if candidates is None and hnswlib is not None and live >= self.hnsw_threshold:
+            found = self._hnsw_search(query, k)
+            if found is not None:
+                return found
+
+        if candidates is None:
+            rows = None
+            distances = self._norms + float(query @ query) - 2 * self._dots(query)
+            distances[self._dead] = np.inf
+        else:
+            rows = np.asarray(candidates)
+            distances = self._norms[rows] + float(query @ query) - 2 * self._dots(query, rows)
+
+        top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        top = top[np.argsort(distances[top])]
+        found = top if rows is None else rows[top]
+        return [int(row) for row in found], [max(0.0, float(distances[i])) for i in top]
+
+    def _dots(self, query: Any, rows: Any = None, block: int = 16384) -> Any:
+        """Dot products of the query with the given rows, or with every row.
+
+        Float32 rows are multiplied straight from the memory map, in one
+        BLAS product when no rows are given. Candidate rows and int8 rows
+        are gathered or converted a block at a time, so the matrix is
+        never copied whole.
+        """
+        matrix, scales = self._open_matrix()
+        count = len(self._ids) if rows is None else len(rows)
+        if rows is None and not self.quantized:
+            return np.asarray(matrix[:count] @ query)
+        dots = np.empty(count, dtype=np.float32)
+        for begin in range(0, count, block):
+            end = min(count, begin + block)
+            part = slice(begin, end) if rows is None else rows[begin:end]
+            if self.quantized:
+                dots[begin:end] = (matrix[part].astype(np.float32) @ query) * scales[part]
+            else:
+                dots[begin:end] = matrix[part] @ query
+        return dots
+
+    def _hnsw_search(self, query: Any, k: int) -> tuple[list[int], list[float]] | None:
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space="l2", dim=self.dim)
+            self._hnsw.init_index(
+                max_elements=max(len(self._ids) * 2, 1024), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION
+            )
+            for begin in range(0, len(self._ids), 4096):
+                rows = np.arange(begin, min(len(self._ids), begin + 4096))
+                self._hnsw.add_items(self._dequantize(rows), rows)
+            for row, chunk_id in enumerate(self._ids):
+                if chunk_id is None:
+                    self._hnsw.mark_deleted(row)
+        self._hnsw.set_ef(max(HNSW_EF_SEARCH, k))
+        try:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+        except RuntimeError:
+            return None  # Too few reachable elements; fall back to brute force
+        return [int(row) for row in labels[0]], [float(d) for d in distances[0]]
+
+    def _hnsw_add(self, vectors: Any, rows: Any) -> None:
+        needed = int(rows[-1]) + 1
+        if needed > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(needed * 2)
+        self._hnsw.add_items(vectors, rows)
+
+
+class LocalVectorBackend:
+    """In-process vector collections stored under one directory."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        quantize: bool = False,
+        quantized_agents: Sequence[str] = (),
+        hnsw_threshold: int = DEFAULT_HNSW_THRESHOLD,
+    ) -> None:
+        """
+        Args:
+            path: Directory holding one subdirectory per collection
+            quantize: Store every new collection's vectors as int8
+            quantized_agents: Agents whose new collections are int8 even if quantize is off
+            hnsw_threshold: Live chunk count from which searches use HNSW
+        """
+        if np is None:
+            raise RuntimeError("The local vector backend requires numpy.")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.quantize = quantize
+        self.quantized_agents = set(quantized_agents)
+        self.hnsw_threshold = hnsw_threshold
+        self._collections: dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(self, agent_id: str) -> LocalCollection:
+        with self._lock:
+            collection = self._collections.get(agent_id)
+            if collection is None:
+                collection = LocalCollection(
+                    self.path / collection_name(agent_id),
+                    quantize=self.quantize or agent_id in self.quantized_agents,
+                    hnsw_threshold=self.hnsw_threshold,
+                )
+                self._collections[agent_id] = collection
+            return collection
+
+
+__all__ = [
+    "DEFAULT_HNSW_THRESHOLD",
+    "ChromaBackend",
+    "LocalCollection",
+    "LocalVectorBackend",
+    "VectorBackend",
+    "VectorCollection",
+    "collection_name",
+]
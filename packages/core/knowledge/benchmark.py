@@ -0,0 +1,575 @@
+"""Retrieval latency and recall benchmarks for the KnowledgeManager.
+
+A benchmark builds a corpus, either synthetic or the files of a fixture
+directory, and ingests it through KnowledgeManager.add_document and
+add_to_canon. It then measures:
+
+- ingest throughput (chunks and documents per second);
+- p50/p95/p99 latency of ``query`` and ``query_with_canon``;
+- recall@k of both against brute-force ground truth.
+
+Everything runs offline. Chunks are embedded with HashingEmbedding, a
+deterministic feature-hashing embedding. Synthetic corpora and query sets
+come from a seed, so two runs with the same BenchmarkConfig search the
+same vectors. Reports are JSON, and compare_reports lists regressions
+against a saved baseline.
+
+Ground truth is each query's exact nearest chunks by squared L2, the
+backends' distance. They are found by scanning the float32 vectors the
+manager cached when it embedded the chunks. A result is a hit when its
+exact distance is within the k-th nearest distance, so tied chunks count
+either way. Recall therefore measures what approximate search,
+quantization and result merging lose.
+
+Hybrid search fuses BM25 hits into the results, so it is off unless the
+config asks for it. The retrieval cache is always bypassed, so every
+timed query is searched.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import platform
+import random
+import re
+import tempfile
+import time
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from pydantic import BaseModel
+
+from packages.core.cache.retrieval import RetrievalCache
+from packages.core.knowledge import SHARED_CANON_ID, KnowledgeDocument, KnowledgeManager
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BENCHMARK_AGENT_ID = "benchmark"
+DEFAULT_DIMENSIONS = 128
+
+# Synthetic corpus shape
+VOCABULARY_SIZE = 5000
+TOPICS = 50
+TOPIC_WORDS = 200
+TOPIC_WORD_FRACTION = 0.6  # Of each paragraph's words; the rest are common words
+WORDS_PER_PARAGRAPH = 140
+WORDS_PER_SENTENCE = 14
+QUERY_WORDS = 12
+QUERY_DROP_FRACTION = 0.25
+
+WARMUP_QUERIES = 10
+GROUND_TRUTH_BLOCK = 4096  # Stored chunks scored per block
+DISTANCE_TOLERANCE = 1e-5
+
+WORD_PATTERN = re.compile(r"\w+")
+SYLLABLES = [
+    "ba", "be", "bi", "bo", "bu", "da", "de", "di", "do", "du", "fa", "fe", "fi", "fo",
+    "ka", "ke", "ki", "ko", "ku", "la", "le", "li", "lo", "lu", "ma", "me", "mi", "mo",
+    "mu", "na", "ne", "ni", "no", "nu", "pa", "pe", "pi", "po", "pu", "ra", "re", "ri",
+    "ro", "ru", "sa", "se", "si", "so", "su", "ta", "te", "ti", "to", "tu", "va", "ve",
+    "vi", "vo", "za", "ze", "zi", "zo",
+]
+
+
+class HashingEmbedding(EmbeddingFunction):
+    """Deterministic offline embedding by signed feature hashing of words.
+
+    Texts sharing words get nearby vectors, which is all a retrieval
+    benchmark needs, with no model to download and nothing random.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS) -> None:
+        self.dimensions = dimensions
+        self._features: dict[str, tuple[int, float]] = {}
+
+    def __call__(self, input: Documents) -> Embeddings:  # noqa: A002 - Chroma's signature
+        vectors = []
+        for text in input:
+            vector = [0.0] * self.dimensions
+            for word in WORD_PATTERN.findall(text.lower()):
+                feature = self._features.get(word)
+                if feature is None:
+                    h = zlib.crc32(word.encode())
+                    feature = (h % self.dimensions, 1.0 if h & 0x80000000 else -1.0)
+                    self._features[word] = feature
+                vector[feature[0]] += feature[1]
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "benchmark-hashing"
+
+    def get_config(self) -> dict[str, Any]:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: dict[str, Any]) -> HashingEmbedding:
+        return HashingEmbedding(config.get("dimensions", DEFAULT_DIMENSIONS))
+
+
+# =============================================================================
+# Corpora
+# =============================================================================
+
+class BenchmarkConfig(BaseModel):
+    """What a benchmark ingests and how it queries.
+
+    Runs with equal configs are comparable; compare_reports refuses others.
+    """
+
+    corpus: str = "synthetic"  # "synthetic" or a fixture directory
+    chunks: int = 1000  # Stop ingesting once this many chunks are stored
+    chunks_per_document: int = 20  # Synthetic documents' paragraphs
+    canon_fraction: float = 0.2  # Documents added to the shared canon
+    backend: str = "chroma"
+    dimensions: int = DEFAULT_DIMENSIONS
+    hybrid_search: bool = False
+    queries: int = 200
+    k: int = 5
+    seed: int = 0
+
+
+def _zipf_weights(count: int) -> list[float]:
+    """Cumulative Zipf weights, for random.choices."""
+    total, weights = 0.0, []
+    for rank in range(count):
+        total += 1 / (rank + 1)
+        weights.append(total)
+    return weights
+
+
+class SyntheticCorpus:
+    """Seeded generator of topical documents in a made-up language.
+
+    Each document has a topic. Its paragraphs mix Zipf-distributed words
+    of that topic with common words, so documents of a topic share
+    vocabulary the way a department's pages do.
+    """
+
+    def __init__(self, seed: int = 0, paragraphs_per_document: int = 20) -> None:
+        self.paragraphs_per_document = paragraphs_per_document
+        self._rng = random.Random(seed)
+        words: dict[str, None] = {}
+        while len(words) < VOCABULARY_SIZE:
+            words["".join(self._rng.choices(SYLLABLES, k=self._rng.randint(2, 4)))] = None
+        self.vocabulary = list(words)
+        self._topics = [self._rng.sample(self.vocabulary, TOPIC_WORDS) for _ in range(TOPICS)]
+        self._common_weights = _zipf_weights(VOCABULARY_SIZE)
+        self._topic_weights = _zipf_weights(TOPIC_WORDS)
+
+    def paragraph(self, topic: int) -> str:
+        rng = self._rng
+        topical = int(WORDS_PER_PARAGRAPH * TOPIC_WORD_FRACTION)
+        words = rng.choices(self._topics[topic], cum_weights=self._topic_weights, k=topical)
+        words += rng.choices(
+            self.vocabulary, cum_weights=self._common_weights, k=WORDS_PER_PARAGRAPH - topical
+        )
+        rng.shuffle(words)
+        sentences = [
+            " ".join(words[i:i + WORDS_PER_SENTENCE]).capitalize() + "."
+            for i in range(0, len(words), WORDS_PER_SENTENCE)
+        ]
+        return " ".join(sentences)
+
+    def documents(self) -> Iterator[tuple[str, bytes]]:
+        """Endless (filename, content) pairs."""
+        for number in itertools.count():
+            topic = self._rng.randrange(TOPICS)
+            text = "\n\n".join(self.paragraph(topic) for _ in range(self.paragraphs_per_document))
+            yield f"synthetic-{number:07d}.txt", text.encode()
+
+
+def fixture_corpus(directory: str | Path) -> Iterator[tuple[str, bytes]]:
+    """(filename, content) of the files under a directory, in path order."""
+    root = Path(directory)
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and not any(part.startswith(".") for part in path.relative_to(root).parts):
+            yield path.name, path.read_bytes()
+
+
+# =============================================================================
+# Reports
+# =============================================================================
+
+class IngestResult(BaseModel):
+    """Ingest throughput."""
+
+    documents: int = 0
+    chunks: int = 0
+    canon_chunks: int = 0
+    seconds: float = 0.0
+    chunks_per_second: float = 0.0
+    documents_per_second: float = 0.0
+
+
+class LatencyStats(BaseModel):
+    """Latency percentiles in milliseconds."""
+
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    mean_ms: float = 0.0
+
+
+class QueryResult(BaseModel):
+    """Latency and recall@k of one query method."""
+
+    queries: int = 0
+    latency: LatencyStats = LatencyStats()
+    recall: float = 0.0
+
+
+class BenchmarkReport(BaseModel):
+    """The results of one benchmark run."""
+
+    config: BenchmarkConfig
+    environment: dict[str, str]
+    created_at: str
+    ingest: IngestResult
+    query: QueryResult
+    query_with_canon: QueryResult
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def latency_stats(seconds: list[float]) -> LatencyStats:
+    millis = [s * 1000 for s in seconds]
+    return LatencyStats(
+        p50_ms=percentile(millis, 50),
+        p95_ms=percentile(millis, 95),
+        p99_ms=percentile(millis, 99),
+        mean_ms=sum(millis) / len(millis) if millis else 0.0,
+    )
+
+
+def _environment() -> dict[str, str]:
+    try:
+        import hnswlib  # noqa: F401
+        has_hnswlib = "yes"
+    except ImportError:
+        has_hnswlib = "no"
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": np.__version__ if np is not None else "no",
+        "hnswlib": has_hnswlib,
+    }
+
+
+def compare_reports(
+    baseline: BenchmarkReport,
+    current: BenchmarkReport,
+    latency_tolerance: float = 0.2,
+    throughput_tolerance: float = 0.2,
+    recall_tolerance: float = 0.01,
+) -> list[str]:
+    """Regressions of a run against a baseline run of the same config.
+
+    Args:
+        latency_tolerance: Allowed fractional increase of p50/p95/p99 latency
+        throughput_tolerance: Allowed fractional decrease of ingest throughput
+        recall_tolerance: Allowed absolute decrease of recall@k
+
+    Raises:
+        ValueError: If the runs' configs differ
+    """
+    if baseline.config != current.config:
+        raise ValueError("Benchmark configs differ; results are not comparable")
+
+    regressions = []
+    allowed = baseline.ingest.chunks_per_second * (1 - throughput_tolerance)
+    if current.ingest.chunks_per_second < allowed:
+        regressions.append(
+            f"ingest: {current.ingest.chunks_per_second:.1f} chunks/s "
+            f"(baseline {baseline.ingest.chunks_per_second:.1f})"
+        )
+    for method in ("query", "query_with_canon"):
+        before: QueryResult = getattr(baseline, method)
+        after: QueryResult = getattr(current, method)
+        for field in ("p50_ms", "p95_ms", "p99_ms"):
+            old, new = getattr(before.latency, field), getattr(after.latency, field)
+            if new > old * (1 + latency_tolerance):
+                regressions.append(f"{method} {field}: {new:.2f} ms (baseline {old:.2f} ms)")
+        if after.recall < before.recall - recall_tolerance:
+            regressions.append(
+                f"{method} recall@{current.config.k}: {after.recall:.3f} (baseline {before.recall:.3f})"
+            )
+    return regressions
+
+
+# =============================================================================
+# Ground truth
+# =============================================================================
+
+def _squared_distance(a: list[float], b: list[float]) -> float:
+    return sum((x - y) * (x - y) for x, y in zip(a, b, strict=True))
+
+
+class _Collection:
+    """A collection's stored chunk texts, for queries and ground truth."""
+
+    def __init__(self, manager: KnowledgeManager, agent_id: str) -> None:
+        self.manager = manager
+        self.agent_id = agent_id
+        self.documents: list[KnowledgeDocument] = []
+
+    def texts(self, batch_size: int = GROUND_TRUTH_BLOCK) -> Iterator[list[str]]:
+        """Stored chunk texts in batches (near-duplicates were stored once)."""
+        collection = self.manager._get_collection(self.agent_id)
+        ids: list[str] = []
+        for doc in self.documents:
+            ids += self.manager._document_chunk_records(
+                self.agent_id, doc.id, doc.filename, doc.chunk_count
+            )[0]
+            while len(ids) >= batch_size:
+                yield collection.get(ids=ids[:batch_size], include=["documents"])["documents"]
+                ids = ids[batch_size:]
+        if ids:
+            yield collection.get(ids=ids, include=["documents"])["documents"]
+
+    def vectors(self, texts: list[str]) -> list[list[float]]:
+        """The cached (float32) embeddings the chunks were stored with."""
+        manager = self.manager
+        return [
+            vector if vector is not None else manager._embed_chunks([text])[0]
+            for text, vector in zip(
+                texts,
+                manager._embedding_cache.get_many(manager._embedding_model, texts),
+                strict=True,
+            )
+        ]
+
+    def kth_distances(self, queries: list[list[float]], k: int) -> list[float]:
+        """Each query's squared L2 distance to its k-th nearest stored chunk.
+
+        Collections with fewer than k chunks give their farthest chunk.
+        """
+        nearest: list[list[float]] = [[] for _ in queries]
+        matrix = np.asarray(queries, dtype=np.float64) if np is not None else None
+        for texts in self.texts():
+            vectors = self.vectors(texts)
+            if matrix is not None:
+                block = np.asarray(vectors, dtype=np.float64)
+                distances = (
+                    (matrix ** 2).sum(axis=1)[:, None]
+                    - 2 * matrix @ block.T
+                    + (block ** 2).sum(axis=1)[None, :]
+                )
+                top = min(k, block.shape[0])
+                rows = np.partition(distances, top - 1, axis=1)[:, :top].tolist()
+            else:
+                rows = [
+                    heapq.nsmallest(k, (_squared_distance(query, vector) for vector in vectors))
+                    for query in queries
+                ]
+            for i, row in enumerate(rows):
+                nearest[i] = heapq.nsmallest(k, nearest[i] + row)
+        return [row[-1] if row else math.inf for row in nearest]
+
+
+def _recall(
+    query: list[float],
+    results: list[dict[str, Any]],
+    vectors: list[list[float]],
+    kth: dict[str, float],
+    expected: int,
+) -> float:
+    """Fraction of the expected hits among results.
+
+    Args:
+        kth: k-th nearest distance per collection (by agent ID)
+        expected: How many results ground truth has
+    """
+    if not expected:
+        return 1.0
+    hits = 0
+    for result, vector in zip(results, vectors, strict=True):
+        agent_id = (result.get("metadata") or {}).get("agent_id")
+        if agent_id in kth and _squared_distance(query, vector) <= kth[agent_id] + DISTANCE_TOLERANCE:
+            hits += 1
+    return min(hits, expected) / expected
+
+
+# =============================================================================
+# Runs
+# =============================================================================
+
+def _sample_queries(collections: list[_Collection], count: int, rng: random.Random) -> list[str]:
+    """Queries made of words from random stored chunks, some dropped."""
+    texts = [text for collection in collections for batch in collection.texts() for text in batch]
+    if not texts:
+        return []
+    queries = []
+    for _ in range(count):
+        words = WORD_PATTERN.findall(rng.choice(texts))
+        start = rng.randrange(max(1, len(words) - QUERY_WORDS))
+        window = words[start:start + QUERY_WORDS]
+        kept = [word for word in window if rng.random() >= QUERY_DROP_FRACTION]
+        queries.append(" ".join(kept or window))
+    return queries
+
+
+def _ingest(
+    manager: KnowledgeManager,
+    documents: Iterable[tuple[str, bytes]],
+    agent: _Collection,
+    canon: _Collection,
+    config: BenchmarkConfig,
+    rng: random.Random,
+) -> IngestResult:
+    result = IngestResult()
+    for filename, content in documents:
+        if result.chunks + result.canon_chunks >= config.chunks:
+            break
+        started = time.perf_counter()
+        if rng.random() < config.canon_fraction:
+            doc = manager.add_to_canon(filename, content)
+            canon.documents.append(doc)
+            result.canon_chunks += doc.chunk_count
+        else:
+            doc = manager.add_document(BENCHMARK_AGENT_ID, filename, content)
+            agent.documents.append(doc)
+            result.chunks += doc.chunk_count
+        result.seconds += time.perf_counter() - started
+        result.documents += 1
+
+    if result.seconds > 0:
+        result.chunks_per_second = (result.chunks + result.canon_chunks) / result.seconds
+        result.documents_per_second = result.documents / result.seconds
+    return result
+
+
+def _time_queries(
+    manager: KnowledgeManager,
+    search: Callable[[str], list[dict[str, Any]]],
+    queries: list[str],
+    kth: list[dict[str, float]],
+    expected: int,
+    embeddings: list[list[float]],
+) -> QueryResult:
+    for text in queries[:WARMUP_QUERIES]:
+        search(text)
+
+    seconds, recalls = [], []
+    for text, embedding, distances in zip(queries, embeddings, kth, strict=True):
+        started = time.perf_counter()
+        results = search(text)
+        seconds.append(time.perf_counter() - started)
+
+        vectors = manager._embedding_cache.get_many(
+            manager._embedding_model, [result["text"] for result in results]
+        )
+        found = [(r, v) for r, v in zip(results, vectors, strict=True) if v is not None]
+        recalls.append(
+            _recall(embedding, [r for r, _ in found], [v for _, v in found], distances, expected)
+        )
+
+    return QueryResult(
+        queries=len(queries),
+        latency=latency_stats(seconds),
+        recall=sum(recalls) / len(recalls) if recalls else 0.0,
+    )
+
+
+def run_benchmark(config: BenchmarkConfig, storage_path: str | Path | None = None) -> BenchmarkReport:
+    """Ingest a corpus into a fresh KnowledgeManager and measure it.
+
+    Args:
+        config: The corpus, backend and query settings
+        storage_path: Where to keep the knowledge base (default: a
+            temporary directory, removed afterwards)
+    """
+    if storage_path is None:
+        with tempfile.TemporaryDirectory(prefix="knowledge-benchmark-") as directory:
+            return run_benchmark(config, directory)
+
+    manager = KnowledgeManager(
+        storage_path=str(storage_path),
+        embedding_function=HashingEmbedding(config.dimensions),
+        vector_backend=config.backend,
+        hybrid_search=config.hybrid_search,
+        retrieval_cache=RetrievalCache(max_entries=0),
+    )
+    rng = random.Random(config.seed)
+    if config.corpus == "synthetic":
+        documents = SyntheticCorpus(config.seed, config.chunks_per_document).documents()
+    else:
+        documents = fixture_corpus(config.corpus)
+
+    agent = _Collection(manager, BENCHMARK_AGENT_ID)
+    canon = _Collection(manager, SHARED_CANON_ID)
+    ingest = _ingest(manager, documents, agent, canon, config, rng)
+
+    queries = _sample_queries([agent, canon], config.queries, rng)
+    embeddings = [manager._embed_query(text) for text in queries]
+
+    # query_with_canon takes half its results from each collection by default
+    canon_count = max(1, int(config.k * 0.5))
+    agent_count = max(1, config.k - canon_count)
+    agent_kth = agent.kth_distances(embeddings, config.k)
+    agent_share_kth = agent.kth_distances(embeddings, agent_count)
+    canon_share_kth = canon.kth_distances(embeddings, canon_count)
+
+    query = _time_queries(
+        manager,
+        lambda text: manager.query(BENCHMARK_AGENT_ID, text, n_results=config.k),
+        queries,
+        [{BENCHMARK_AGENT_ID: kth} for kth in agent_kth],
+        min(config.k, ingest.chunks),
+        embeddings,
+    )
+    with_canon = _time_queries(
+        manager,
+        lambda text: manager.query_with_canon(BENCHMARK_AGENT_ID, text, n_results=config.k),
+        queries,
+        [
+            {BENCHMARK_AGENT_ID: agent_kth_, SHARED_CANON_ID: canon_kth_}
+            for agent_kth_, canon_kth_ in zip(agent_share_kth, canon_share_kth, strict=True)
+        ],
+        min(agent_count, ingest.chunks) + min(canon_count, ingest.canon_chunks),
+        embeddings,
+    )
+
+    return BenchmarkReport(
+        config=config,
+        environment=_environment(),
+        created_at=datetime.utcnow().isoformat(),
+        ingest=ingest,
+        query=query,
+        query_with_canon=with_canon,
+    )
+
+
+__all__ = [
+    "BENCHMARK_AGENT_ID",
+    "BenchmarkConfig",
+    "BenchmarkReport",
+    "HashingEmbedding",
+    "IngestResult",
+    "LatencyStats",
+    "QueryResult",
+    "SyntheticCorpus",
+    "compare_reports",
+    "fixture_corpus",
+    "latency_stats",
+    "percentile",
+    "run_benchmark",
+]
@@ -0,0 +1,228 @@
+"""Pack retrieved chunks into a token-budgeted prompt context.
+
+Query results repeat text: consecutive chunks of a document share a
+200-character overlap, and the same boilerplate often comes back from both
+the canon and an agent. pack_context:
+
+1. Merges chunks of the same document that are adjacent or overlap into one
+   passage, removing the repeated text.
+2. Drops passages whose text mostly repeats a more relevant passage.
+3. Adds passages by relevance until the model's token budget is spent,
+   truncating the last one at a sentence boundary if enough room is left.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+# Context token budgets by model name prefix (longest match wins)
+CONTEXT_TOKEN_BUDGETS = {
+    "gpt-4o-mini": 3000,
+    "gpt-4o": 6000,
+    "gpt-4-turbo": 6000,
+    "o1": 6000,
+    "o3": 6000,
+    "claude": 8000,
+}
+DEFAULT_CONTEXT_TOKENS = 3000
+
+CHARS_PER_TOKEN = 4  # Same estimate as LLMAdapter.estimate_tokens
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Fraction of a passage's shingles already used
+SHINGLE_WORDS = 5
+MIN_TRUNCATED_TOKENS = 64  # Smallest useful truncated passage
+MIN_OVERLAP_CHARS = 20  # Shorter shared text is not treated as chunk overlap
+
+SEPARATOR = "\n\n---\n\n"
+
+
+class ContextPassage(BaseModel):
+    """Merged text from one document, as placed in the context."""
+
+    text: str
+    label: str
+    relevance: float
+    results: list[dict[str, Any]] = Field(default_factory=list)  # Query results merged into it
+    truncated: bool = False
+
+
+class PackedContext(BaseModel):
+    """A prompt context built from query results."""
+
+    text: str = ""
+    passages: list[ContextPassage] = Field(default_factory=list)
+    token_count: int = 0
+    token_budget: int = 0
+    merged_chunks: int = 0  # Chunks folded into another chunk's passage
+    dropped_duplicates: int = 0
+    dropped_over_budget: int = 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of text."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def context_token_budget(model: str | None) -> int:
+    """Context token budget for a model."""
+    if model:
+        matches = [prefix for prefix in CONTEXT_TOKEN_BUDGETS if model.startswith(prefix)]
+        if matches:
+            return CONTEXT_TOKEN_BUDGETS[max(matches, key=len)]
+    return DEFAULT_CONTEXT_TOKENS
+
+
+def _document_key(metadata: dict[str, Any]) -> str | None:
+    return metadata.get("document_id") or metadata.get("source_id")
+
+
+def _label(metadata: dict[str, Any]) -> str:
+    return metadata.get("filename") or metadata.get("url") or "unknown"
+
+
+def merge_overlap(first: str, second: str) -> str | None:
+    """Join two texts if the start of ``second`` repeats the end of ``first``.
+
+    Returns None when they do not overlap by at least MIN_OVERLAP_CHARS.
+    """
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return first if probe and probe in first else None
+    start = first.find(probe)
+    while start != -1:
+        tail = first[start:]
+        if second.startswith(tail):
+            return first + second[len(tail):]
+        if tail.startswith(second):
+            return first  # second is already part of first
+        start = first.find(probe, start + 1)
+    return None
+
+
+def _merge_document(results: list[dict[str, Any]]) -> list[ContextPassage]:
+    """Merge one document's results that are adjacent or overlapping."""
+    results = sorted(results, key=lambda r: r["metadata"].get("chunk_index", 0))
+    passages: list[ContextPassage] = []
+    last_index: int | None = None
+    for result in results:
+        text = result["text"].strip()
+        index = result["metadata"].get("chunk_index")
+        if passages:
+            current = passages[-1]
+            merged = merge_overlap(current.text, text)
+            if merged is None and index is not None and last_index is not None and index == last_index + 1:
+                merged = current.text + "\n" + text
+            if merged is not None:
+                current.text = merged
+                current.relevance = max(current.relevance, result["relevance"])
+                current.results.append(result)
+                last_index = index
+                continue
+        passages.append(ContextPassage(
+            text=text,
+            label=_label(result["metadata"]),
+            relevance=result["relevance"],
+            results=[result],
+        ))
+        last_index = index
+    return passages
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut text to max_chars, at the last sentence or line end if there is one."""
+    cut = text[:max_chars]
+    end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n"))
+    if end > max_chars // 2:
+        cut = cut[: end + 1]
+    return cut.rstrip()
+
+
+def pack_context(
+    results: list[dict[str, Any]],
+    max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+    duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+) -> PackedContext:
+    """Build a prompt context from query results within a token budget.
+
+    Args:
+        results: Results of KnowledgeManager.query or query_with_canon
+        max_tokens: Token budget for the whole context
+        duplicate_threshold: Drop passages with at least this fraction of
+            their word shingles already in the context
+
+    Returns:
+        The packed context; ``text`` is empty if nothing fits
+    """
+    packed = PackedContext(token_budget=max_tokens)
+
+    # Merge chunks of the same document
+    by_document: dict[str, list[dict[str, Any]]] = {}
+    passages: list[ContextPassage] = []
+    for result in results:
+        key = _document_key(result.get("metadata") or {})
+        if key is None:
+            passages.append(ContextPassage(
+                text=result["text"].strip(),
+                label=_label(result.get("metadata") or {}),
+                relevance=result["relevance"],
+                results=[result],
+            ))
+        else:
+            by_document.setdefault(key, []).append({**result, "metadata": result.get("metadata") or {}})
+    for document_results in by_document.values():
+        passages.extend(_merge_document(document_results))
+    packed.merged_chunks = len(results) - len(passages)
+
+    # Add passages by relevance, skipping near-duplicates
+    passages.sort(key=lambda p: p.relevance, reverse=True)
+    seen: set[tuple[str, ...]] = set()
+    parts: list[str] = []
+    used = 0
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if shingles and len(shingles & seen) >= duplicate_threshold * len(shingles):
+            packed.dropped_duplicates += 1
+            continue
+
+        block = f"[Source: {passage.label}]\n{passage.text}"
+        cost = estimate_tokens(block) + (estimate_tokens(SEPARATOR) if parts else 0)
+        remaining = max_tokens - used
+        if cost > remaining:
+            header_cost = cost - estimate_tokens(passage.text)
+            room = remaining - header_cost
+            if room < MIN_TRUNCATED_TOKENS:
+                packed.dropped_over_budget += 1
+                continue
+            passage.text = _truncate(passage.text, room * CHARS_PER_TOKEN)
+            passage.truncated = True
+            block = f"[Source: {passage.label}]\n{passage.text}"
+            cost = estimate_tokens(block) + (estimate_tokens(SEPARATOR) if parts else 0)
+
+        parts.append(block)
+        packed.passages.append(passage)
+        seen |= shingles
+        used += cost
+
+    packed.text = SEPARATOR.join(parts)
+    packed.token_count = estimate_tokens(packed.text)
+    return packed
+
+
+__all__ = [
+    "CONTEXT_TOKEN_BUDGETS",
+    "ContextPassage",
+    "PackedContext",
+    "context_token_budget",
+    "estimate_tokens",
+    "merge_overlap",
+    "pack_context",
+]
@@ -0,0 +1,365 @@
+"""Near-duplicate chunk suppression.
+
+The same city page is often ingested by several agents' sources, by the
+canon, and by documents that quote it. ChunkFingerprintIndex keeps a
+MinHash signature of every stored chunk per collection. A new chunk whose
+estimated Jaccard similarity to a stored chunk (over 3-word shingles) is
+at least NEAR_DUPLICATE_JACCARD is not embedded or stored again; it
+becomes a reference to the stored ("holder") chunk instead.
+
+Near-duplicates that differ in any number ("$25" and "$40", "Ord. 115"
+and "Ord. 116") are never folded: they usually state different facts.
+
+Every holder also references itself, and each reference keeps the text
+and metadata its chunk would have had. When the document or source a
+holder came from is deleted but other references remain, the holder is
+kept for one of them: it takes over that reference's metadata and, if the
+texts differ, its text, which the manager embeds and stores in place of
+the deleted text. Results never show text from a deleted document.
+
+Candidates are found by locality-sensitive hashing: signatures are split
+into BANDS bands, and chunks sharing any band are compared. At the
+default threshold a true near-duplicate is missed with probability
+below 0.1%.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+from array import array
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+NEAR_DUPLICATE_JACCARD = 0.8
+SHINGLE_WORDS = 3
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(0x5EED)
+_A = [_rng.randrange(1, _PRIME) for _ in range(NUM_PERMUTATIONS)]
+_B = [_rng.randrange(0, _PRIME) for _ in range(NUM_PERMUTATIONS)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS holders (
+    agent_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    ref_id TEXT NOT NULL,
+    PRIMARY KEY (agent_id, chunk_id)
+);
+CREATE TABLE IF NOT EXISTS bands (
+    agent_id TEXT NOT NULL,
+    band_key INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_by_key ON bands (agent_id, band_key);
+CREATE INDEX IF NOT EXISTS bands_by_chunk ON bands (agent_id, chunk_id);
+CREATE TABLE IF NOT EXISTS refs (
+    agent_id TEXT NOT NULL,
+    ref_id TEXT NOT NULL,
+    owner_id TEXT NOT NULL,
+    holder_id TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (agent_id, ref_id)
+);
+CREATE INDEX IF NOT EXISTS refs_by_owner ON refs (agent_id, owner_id);
+CREATE INDEX IF NOT EXISTS refs_by_holder ON refs (agent_id, holder_id);
+"""
+
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _numbers(text: str) -> frozenset[str]:
+    return frozenset(NUMBER_PATTERN.findall(text))
+
+
+def _normalized(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _shingle_hashes(text: str) -> list[int]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) > SHINGLE_WORDS:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    else:
+        shingles = {" ".join(words)}
+    return [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "big")
+        for shingle in shingles
+    ]
+
+
+def minhash(text: str) -> list[int]:
+    """MinHash signature of a text's word shingles."""
+    hashes = _shingle_hashes(text)
+    if HAS_NUMPY:
+        x = np.array(hashes, dtype=np.uint64)
+        a = np.array(_A, dtype=np.uint64)[:, None]
+        b = np.array(_B, dtype=np.uint64)[:, None]
+        return ((a * x + b) % _PRIME).min(axis=1).tolist()
+    return [min((a * x + b) % _PRIME for x in hashes) for a, b in zip(_A, _B, strict=True)]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b, strict=True) if x == y) / len(a)
+
+
+def _band_keys(signature: list[int]) -> list[int]:
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def _owner(metadata: dict[str, Any]) -> str:
+    return metadata.get("document_id") or metadata.get("source_id") or ""
+
+
+class ChunkFingerprintIndex:
+    """Per-collection index of chunk MinHash signatures and their references."""
+
+    def __init__(self, path: str | Path, threshold: float = NEAR_DUPLICATE_JACCARD) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(refs)")}
+        if columns and "text" not in columns:
+            # Indexes from before references kept their text are rebuilt from
+            # scratch; chunks stored before are handled as unregistered
+            self._conn.executescript("DROP TABLE refs; DROP TABLE holders; DROP TABLE bands;")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _find_holder(
+        self,
+        conn: sqlite3.Connection,
+        agent_id: str,
+        text: str,
+        signature: list[int],
+    ) -> str | None:
+        keys = _band_keys(signature)
+        rows = conn.execute(
+            "SELECT DISTINCT h.chunk_id, h.signature, r.text FROM bands b "
+            "JOIN holders h ON h.agent_id = b.agent_id AND h.chunk_id = b.chunk_id "
+            "JOIN refs r ON r.agent_id = h.agent_id AND r.ref_id = h.ref_id "
+            f"WHERE b.agent_id = ? AND b.band_key IN ({', '.join('?' * len(keys))})",
+            (agent_id, *keys),
+        ).fetchall()
+        numbers = _numbers(text)
+        best = None
+        for chunk_id, stored, stored_text in rows:
+            if _numbers(stored_text) != numbers:
+                continue
+            score = similarity(signature, array("I", stored).tolist())
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, chunk_id)
+        return best[1] if best else None
+
+    def _add_holder(
+        self,
+        conn: sqlite3.Connection,
+        agent_id: str,
+        chunk_id: str,
+        signature: list[int],
+        ref_id: str | None = None,
+    ) -> None:
+        conn.execute(
+            "INSERT INTO holders VALUES (?, ?, ?, ?)",
+            (agent_id, chunk_id, array("I", signature).tobytes(), ref_id or chunk_id),
+        )
+        conn.executemany(
+            "INSERT INTO bands VALUES (?, ?, ?)",
+            [(agent_id, key, chunk_id) for key in _band_keys(signature)],
+        )
+
+    def _remove_holder(self, conn: sqlite3.Connection, agent_id: str, chunk_id: str) -> None:
+        conn.execute("DELETE FROM holders WHERE agent_id = ? AND chunk_id = ?", (agent_id, chunk_id))
+        conn.execute("DELETE FROM bands WHERE agent_id = ? AND chunk_id = ?", (agent_id, chunk_id))
+
+    def claim(
+        self,
+        agent_id: str,
+        chunk_ids: list[str],
+        texts: list[str],
+        metadatas: list[dict[str, Any]],
+    ) -> list[int]:
+        """Register new chunks, returning the indexes of those to store.
+
+        Chunks that are near-duplicates of a stored chunk (or of an earlier
+        chunk in the same call) become references to it and are not
+        returned. Chunk IDs that are already registered are skipped.
+        Chunks whose numbers differ are never near-duplicates.
+        """
+        signatures = [minhash(text) for text in texts]
+        keep = []
+        with self._transaction() as conn:
+            for i, (chunk_id, text, metadata) in enumerate(zip(chunk_ids, texts, metadatas, strict=True)):
+                known = conn.execute(
+                    "SELECT 1 FROM refs WHERE agent_id = ? AND ref_id = ?", (agent_id, chunk_id)
+                ).fetchone()
+                if known:
+                    continue
+                holder = self._find_holder(conn, agent_id, text, signatures[i])
+                if holder is None:
+                    holder = chunk_id
+                    self._add_holder(conn, agent_id, chunk_id, signatures[i])
+                    keep.append(i)
+                conn.execute(
+                    "INSERT INTO refs VALUES (?, ?, ?, ?, ?, ?)",
+                    (agent_id, chunk_id, _owner(metadata), holder, json.dumps(metadata), text),
+                )
+        return keep
+
+    def refs(self, agent_id: str, owner_id: str) -> dict[str, str]:
+        """Chunk IDs registered for a document or source, mapped to their holders."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ref_id, holder_id FROM refs WHERE agent_id = ? AND owner_id = ?",
+                (agent_id, owner_id),
+            ).fetchall()
+        return dict(rows)
+
+    def release(
+        self,
+        agent_id: str,
+        owner_id: str,
+        chunk_ids: list[str] | None = None,
+    ) -> tuple[list[str], dict[str, tuple[dict[str, Any], str | None]]]:
+        """Drop a document's or source's references (all, or ``chunk_ids``).
+
+        Returns:
+            (holders to delete, holders to keep mapped to their new metadata
+            and, when it differs from the stored text, their new text)
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT ref_id, holder_id, text FROM refs WHERE agent_id = ? AND owner_id = ?",
+                (agent_id, owner_id),
+            ).fetchall()
+            if chunk_ids is not None:
+                wanted = set(chunk_ids)
+                rows = [row for row in rows if row[0] in wanted]
+            conn.executemany(
+                "DELETE FROM refs WHERE agent_id = ? AND ref_id = ?",
+                [(agent_id, ref_id) for ref_id, _, _ in rows],
+            )
+
+            released = {ref_id: text for ref_id, _, text in rows}
+            doomed, transfers = [], {}
+            for holder_id in dict.fromkeys(holder for _, holder, _ in rows):
+                current = conn.execute(
+                    "SELECT ref_id FROM holders WHERE agent_id = ? AND chunk_id = ?",
+                    (agent_id, holder_id),
+                ).fetchone()
+                if current is None or current[0] not in released:
+                    continue  # The holder carries another reference's text and metadata
+                successor = conn.execute(
+                    "SELECT ref_id, metadata, text FROM refs WHERE agent_id = ? AND holder_id = ? "
+                    "ORDER BY rowid LIMIT 1",
+                    (agent_id, holder_id),
+                ).fetchone()
+                if successor is None:
+                    self._remove_holder(conn, agent_id, holder_id)
+                    doomed.append(holder_id)
+                    continue
+                ref_id, metadata, text = successor
+                changed = _normalized(text) != _normalized(released[current[0]])
+                if changed:
+                    # Match later chunks against the text the holder will store
+                    self._remove_holder(conn, agent_id, holder_id)
+                    self._add_holder(conn, agent_id, holder_id, minhash(text), ref_id)
+                else:
+                    conn.execute(
+                        "UPDATE holders SET ref_id = ? WHERE agent_id = ? AND chunk_id = ?",
+                        (ref_id, agent_id, holder_id),
+                    )
+                transfers[holder_id] = (json.loads(metadata), text if changed else None)
+        return doomed, transfers
+
+    def update(
+        self,
+        agent_id: str,
+        metadatas: dict[str, dict[str, Any]],
+    ) -> dict[str, dict[str, Any]]:
+        """Update registered chunks' metadata.
+
+        Returns: Holders whose stored metadata must change, mapped to it
+        """
+        changed = {}
+        with self._transaction() as conn:
+            for ref_id, metadata in metadatas.items():
+                encoded = json.dumps(metadata)
+                row = conn.execute(
+                    "SELECT holder_id, metadata FROM refs WHERE agent_id = ? AND ref_id = ?",
+                    (agent_id, ref_id),
+                ).fetchone()
+                if row is None or row[1] == encoded:
+                    continue
+                conn.execute(
+                    "UPDATE refs SET metadata = ? WHERE agent_id = ? AND ref_id = ?",
+                    (encoded, agent_id, ref_id),
+                )
+                current = conn.execute(
+                    "SELECT ref_id FROM holders WHERE agent_id = ? AND chunk_id = ?",
+                    (agent_id, row[0]),
+                ).fetchone()
+                if current is not None and current[0] == ref_id:
+                    changed[row[0]] = metadata
+        return changed
+
+    def count(self, agent_id: str) -> tuple[int, int]:
+        """(stored chunks, registered chunks) of a collection."""
+        with self._lock:
+            holders = self._conn.execute(
+                "SELECT count(*) FROM holders WHERE agent_id = ?", (agent_id,)
+            ).fetchone()[0]
+            refs = self._conn.execute(
+                "SELECT count(*) FROM refs WHERE agent_id = ?", (agent_id,)
+            ).fetchone()[0]
+        return holders, refs
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+__all__ = [
+    "ChunkFingerprintIndex",
+    "minhash",
+    "similarity",
+]
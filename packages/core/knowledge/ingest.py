@@ -0,0 +1,441 @@
+"""Background document ingestion.
+
+Uploading a large document used to extract, chunk and embed it inside the
+request. IngestionQueue instead accepts files, returns a job immediately
+and processes it in two stages:
+
+- Extraction: PDF/DOCX text extraction and chunking run in a process pool,
+  so CPU-heavy parsing neither blocks the API nor holds the GIL.
+- Embedding: a single thread collects extracted chunks from every pending
+  document, embeds them in large batches and stores each batch. Chunks
+  already in the manager's embedding cache are not embedded again.
+
+Workers stream pages through the chunker into a spool file of JSON lines,
+which the embedder reads back a batch at a time, so memory stays bounded
+by the batch size rather than the document size.
+
+Jobs are kept in memory and their progress can be polled with get_job.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import (
+    CancelledError,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from datetime import datetime
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+from pydantic import BaseModel, Field
+
+from packages.core.knowledge.text import EMBED_BATCH_SIZE, iter_chunks, iter_text
+
+if TYPE_CHECKING:
+    from packages.core.knowledge import KnowledgeManager
+
+MAX_FINISHED_JOBS = 500
+
+
+class IngestionFile(BaseModel):
+    """Progress of one file in an ingestion job."""
+
+    filename: str
+    file_size: int = 0
+    status: str = "queued"  # queued, extracting, embedding, completed, failed
+    document_id: str | None = None
+    chunk_count: int = 0
+    error: str | None = None
+
+
+class IngestionJob(BaseModel):
+    """A batch of uploaded files being added to an agent's knowledge base."""
+
+    id: str
+    agent_id: str
+    status: str = "queued"  # queued, running, completed, failed
+    files: list[IngestionFile] = Field(default_factory=list)
+    total_files: int = 0
+    processed_files: int = 0
+    failed_files: int = 0
+    total_chunks: int = 0
+    embedded_chunks: int = 0
+    created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    completed_at: str | None = None
+
+
+def spool_chunks(file_path: str, file_type: str, spool_path: str) -> int:
+    """Extract and chunk a stored upload into a spool file (runs in a worker process).
+
+    Returns: Number of chunks written
+    """
+    count = 0
+    with open(spool_path, "w", encoding="utf-8") as spool:
+        for chunk in iter_chunks(iter_text(Path(file_path), file_type)):
+            spool.write(json.dumps(chunk) + "\n")
+            count += 1
+    return count
+
+
+class _Extracted:
+    """A document whose spooled chunks are waiting to be embedded."""
+
+    def __init__(
+        self,
+        job: IngestionJob,
+        file: IngestionFile,
+        file_type: str,
+        metadata: dict[str, Any] | None,
+        spool_path: Path,
+    ) -> None:
+        self.job = job
+        self.file = file
+        self.file_type = file_type
+        self.metadata = metadata
+        self.spool_path = spool_path
+        self.stored = 0  # Chunks embedded and stored so far
+        self.finished = False
+        self._spool: IO[str] | None = None
+
+    def next_chunk(self) -> str | None:
+        """Read the next spooled chunk, or None once all have been read."""
+        if self._spool is None:
+            self._spool = self.spool_path.open(encoding="utf-8")
+        line = self._spool.readline()
+        if not line:
+            self.finished = True
+            return None
+        return json.loads(line)
+
+    def close(self) -> None:
+        """Close and delete the spool file."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        self.spool_path.unlink(missing_ok=True)
+
+
+class IngestionQueue:
+    """Extracts uploads in a process pool and embeds them in batches."""
+
+    def __init__(
+        self,
+        manager: KnowledgeManager,
+        extract_workers: int | None = None,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+    ) -> None:
+        self.manager = manager
+        self.spool_dir = manager.storage_path / "ingest"
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.embed_batch_size = max(1, embed_batch_size)
+        self._extract_pool: Executor | None = None
+        self._embed_queue: queue.Queue[_Extracted] = queue.Queue()
+        self._embed_thread: threading.Thread | None = None
+        self._jobs: dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        agent_id: str,
+        files: list[tuple[str, bytes]],
+        metadata: dict[str, Any] | None = None,
+    ) -> IngestionJob:
+        """Queue (filename, content) pairs for ingestion and return the job."""
+        job = IngestionJob(
+            id=f"ingest_{uuid.uuid4().hex[:12]}",
+            agent_id=agent_id,
+            status="running" if files else "queued",
+            files=[IngestionFile(filename=name, file_size=len(content)) for name, content in files],
+            total_files=len(files),
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_jobs()
+            self._finish_job(job)
+
+        pool = self._start()
+        for index, (entry, (filename, content)) in enumerate(zip(job.files, files, strict=True)):
+            try:
+                doc_id, ext, file_path = self.manager._store_upload(agent_id, filename, content)
+            except Exception as e:
+                self._fail(job, entry, e)
+                continue
+
+            with self._lock:
+                entry.document_id = doc_id
+                entry.status = "extracting"
+            # Identical files share a document ID, so the index keeps spools apart
+            spool_path = self.spool_dir / f"{job.id}_{index}_{doc_id}.jsonl"
+            future = pool.submit(spool_chunks, str(file_path), ext, str(spool_path))
+            future.add_done_callback(
+                lambda f, entry=entry, ext=ext, spool_path=spool_path: self._extracted(
+                    job, entry, ext, metadata, spool_path, f
+                )
+            )
+
+        return self.get_job(job.id) or job
+
+    def get_job(self, job_id: str) -> IngestionJob | None:
+        """Get a snapshot of a job's progress."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    def list_jobs(self, agent_id: str | None = None) -> list[IngestionJob]:
+        """List jobs, newest first, optionally filtered by agent."""
+        with self._lock:
+            jobs = [
+                job.model_copy(deep=True)
+                for job in self._jobs.values()
+                if agent_id is None or job.agent_id == agent_id
+            ]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def shutdown(self) -> None:
+        """Stop the extraction pool (queued extractions are cancelled)."""
+        with self._lock:
+            pool, self._extract_pool = self._extract_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # =========================================================================
+    # Pipeline
+    # =========================================================================
+
+    def _start(self) -> Executor:
+        """Create the extraction pool and embedding thread on first use."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._extract_pool is None:
+                if self.extract_workers <= 1:
+                    self._extract_pool = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="knowledge-extract"
+                    )
+                else:
+                    # spawn: workers must not inherit the parent's threads and locks
+                    self._extract_pool = ProcessPoolExecutor(
+                        max_workers=self.extract_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+            if self._embed_thread is None or not self._embed_thread.is_alive():
+                self._embed_thread = threading.Thread(
+                    target=self._embed_loop, name="knowledge-embed", daemon=True
+                )
+                self._embed_thread.start()
+            return self._extract_pool
+
+    def _extracted(
+        self,
+        job: IngestionJob,
+        entry: IngestionFile,
+        file_type: str,
+        metadata: dict[str, Any] | None,
+        spool_path: Path,
+        future: Future[int],
+    ) -> None:
+        try:
+            chunk_count = future.result()
+        except (CancelledError, Exception) as e:
+            # Cancelled when the pool shut down before the file was extracted
+            spool_path.unlink(missing_ok=True)
+            if isinstance(e, CancelledError):
+                e = RuntimeError("Extraction was cancelled")
+            self._fail(job, entry, e)
+            return
+
+        with self._lock:
+            entry.status = "embedding"
+            entry.chunk_count = chunk_count
+            job.total_chunks += chunk_count
+        self._embed_queue.put(_Extracted(job, entry, file_type, metadata, spool_path))
+
+    def _embed_loop(self) -> None:
+        """Embed chunks from pending documents in shared batches."""
+        pending: list[_Extracted] = []
+        while True:
+            if not pending:
+                pending.append(self._embed_queue.get())
+            while True:
+                try:
+                    pending.append(self._embed_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                pending = self._embed_step(pending)
+            except Exception as e:
+                # Never let an error stop the thread and strand queued jobs
+                for item in pending:
+                    self._abandon(item, e)
+                pending = []
+
+    def _embed_step(self, pending: list[_Extracted]) -> list[_Extracted]:
+        """Embed and store one batch. Returns the documents still pending."""
+        # Fill one batch from the pending documents in arrival order
+        batch: list[tuple[_Extracted, list[str]]] = []
+        failed: list[_Extracted] = []
+        size = 0
+        for item in pending:
+            texts: list[str] = []
+            try:
+                while size < self.embed_batch_size:
+                    text = item.next_chunk()
+                    if text is None:
+                        break
+                    texts.append(text)
+                    size += 1
+            except Exception as e:
+                self._abandon(item, e)
+                failed.append(item)
+                continue
+            if texts:
+                batch.append((item, texts))
+            if size >= self.embed_batch_size:
+                break
+
+        try:
+            self._store_batch(batch)
+        except Exception as e:
+            for item, _ in batch:
+                self._abandon(item, e)
+            failed += [item for item, _ in batch]
+
+        pending = [item for item in pending if item not in failed]
+        done = [item for item in pending if item.finished]
+        try:
+            self._record(done)
+        except Exception as e:
+            for item in done:
+                self._abandon(item, e)
+        return [item for item in pending if not item.finished]
+
+    def _store_batch(self, batch: list[tuple[_Extracted, list[str]]]) -> None:
+        """Embed a batch with one call and store each document's part.
+
+        Near-duplicates of stored chunks are registered before embedding,
+        so only the chunks that will be stored are embedded.
+        """
+        if not batch:
+            return
+        manager = self.manager
+        parts = []
+        for item, texts in batch:
+            chunk_ids, metadatas = manager._document_chunk_records(
+                item.job.agent_id, item.file.document_id, item.file.filename, len(texts), item.stored
+            )
+            keep = manager._claim_chunks(item.job.agent_id, chunk_ids, texts, metadatas)
+            parts.append((
+                [chunk_ids[i] for i in keep],
+                [texts[i] for i in keep],
+                [metadatas[i] for i in keep],
+            ))
+
+        documents = [text for _, kept, _ in parts for text in kept]
+        embeddings = manager._embed_chunks(documents) if documents else []
+        offset = 0
+        for (item, texts), (chunk_ids, kept, metadatas) in zip(batch, parts, strict=True):
+            manager._store_chunks(
+                item.job.agent_id, chunk_ids, kept, metadatas, embeddings[offset:offset + len(kept)]
+            )
+            offset += len(kept)
+            item.stored += len(texts)
+            with self._lock:
+                item.job.embedded_chunks += len(texts)
+
+    def _record(self, items: list[_Extracted]) -> None:
+        """Record fully stored documents and save them in one transaction."""
+        if not items:
+            return
+        docs = []
+        for item in items:
+            item.close()
+            docs.append(self.manager._record_document(
+                item.job.agent_id,
+                item.file.document_id,
+                item.file.filename,
+                item.file_type,
+                item.file.file_size,
+                item.stored,
+                item.metadata,
+                save=False,
+            ))
+        self.manager._save_documents(docs)
+
+        with self._lock:
+            for item in items:
+                item.file.status = "completed"
+                item.job.processed_files += 1
+                self._finish_job(item.job)
+
+    def _abandon(self, item: _Extracted, error: Exception) -> None:
+        """Fail a document and remove the chunks stored so far."""
+        try:
+            item.close()
+            if item.stored:
+                self.manager._delete_document_chunks(item.job.agent_id, item.file.document_id)
+        except Exception:
+            pass  # The document is failed either way; leftovers go with a re-upload
+        self._fail(item.job, item.file, error)
+
+    def _fail(self, job: IngestionJob, entry: IngestionFile, error: Exception) -> None:
+        with self._lock:
+            entry.status = "failed"
+            entry.error = str(error)[:200]
+            job.processed_files += 1
+            job.failed_files += 1
+            self._finish_job(job)
+
+    def _finish_job(self, job: IngestionJob) -> None:
+        """Mark a job finished once every file is processed (lock held)."""
+        if job.processed_files < job.total_files:
+            return
+        if job.total_files and job.failed_files == job.total_files:
+            job.status = "failed"
+        else:
+            job.status = "completed"
+        job.completed_at = datetime.utcnow().isoformat()
+
+    def _prune_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS (lock held)."""
+        finished = [j for j in self._jobs.values() if j.completed_at is not None]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+
+# Singleton instance
+_ingestion_queue: IngestionQueue | None = None
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Get the ingestion queue singleton."""
+    global _ingestion_queue
+    if _ingestion_queue is None:
+        from packages.core.knowledge import get_knowledge_manager
+
+        _ingestion_queue = IngestionQueue(get_knowledge_manager())
+    return _ingestion_queue
+
+
+def stop_ingestion_queue() -> None:
+    """Stop the ingestion queue's worker processes."""
+    if _ingestion_queue:
+        _ingestion_queue.shutdown()
+
+
+__all__ = [
+    "IngestionFile",
+    "IngestionJob",
+    "IngestionQueue",
+    "get_ingestion_queue",
+    "spool_chunks",
+    "stop_ingestion_queue",
+]
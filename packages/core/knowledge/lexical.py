@@ -0,0 +1,327 @@
+"""BM25 lexical index kept alongside each vector collection.
+
+Civic questions are often exact-term lookups: an ordinance number, a form
+ID, a street address. Embeddings blur such identifiers, so the knowledge
+manager also scores chunks by BM25 over an in-memory inverted index and
+fuses the two rankings by reciprocal rank fusion.
+
+A query term is an identifier when it joins words with ``-``, ``.``, ``/``
+or ``:`` ("W-9", "367.01", "2024/115") or is a number-bearing word of at
+least three characters ("1200", "ord115"); words in double quotes are
+identifiers too ('"Euclid Avenue"'). Chunks containing every identifier
+of a query are its answer, and the query embedding and vector search are
+skipped, only when the match is decisive:
+
+- the query has a compound or quoted identifier, or a plain number that
+  is rare in the collection ("311" in a city's pages is not), and
+- the best such chunk outscores every other chunk by EXACT_SCORE_MARGIN,
+  so the identifier rather than the rest of the query decides.
+
+Otherwise the matching chunks are ranked by BM25 and fused like any other
+lexical hits.
+
+LexicalCollection wraps a VectorCollection and keeps its index in step
+with the collection's adds and deletes. The index is built from the
+collection on first search, so it always reflects the stored chunks.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from packages.core.knowledge.backends import VectorCollection
+
+# BM25 parameters (the usual Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal rank fusion constant; larger values flatten the rank weights
+RRF_K = 60
+
+# Shorter numbers ("5 pm", "12 months") are too common to be identifiers
+MIN_IDENTIFIER_LENGTH = 3
+
+# A plain-number identifier is decisive only in at most this fraction of chunks
+RARE_IDENTIFIER_FRACTION = 0.01
+
+# Identifier matches skip vector search only when their best BM25 score is
+# this many times that of any chunk missing an identifier
+EXACT_SCORE_MARGIN = 1.5
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+SEPARATOR_PATTERN = re.compile(r"[-./:]")
+QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "my", "of", "on", "or", "the", "to", "what", "when",
+    "where", "which", "who", "why", "will", "with", "you", "your",
+})
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased terms of text.
+
+    Compound identifiers are kept whole and also split into their parts,
+    so "ORD-2024-115" matches queries for "ord-2024-115" and for "2024".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if SEPARATOR_PATTERN.search(token):
+            terms.extend(part for part in SEPARATOR_PATTERN.split(token) if part not in STOPWORDS)
+    return terms
+
+
+def _is_identifier(term: str) -> bool:
+    if SEPARATOR_PATTERN.search(term):
+        return True
+    return len(term) >= MIN_IDENTIFIER_LENGTH and any(c.isdigit() for c in term)
+
+
+@dataclass(frozen=True)
+class LexicalQuery:
+    """A query's search terms and the identifiers among them."""
+
+    terms: tuple[str, ...]
+    identifiers: frozenset[str]
+    # Compound or quoted identifiers, decisive however common
+    strong_identifiers: frozenset[str] = frozenset()
+
+
+def parse_query(query_text: str) -> LexicalQuery:
+    """Split a query into BM25 terms and exact-match identifiers."""
+    terms = tokenize(query_text)
+    identifiers = {term for term in terms if _is_identifier(term)}
+    strong = {term for term in identifiers if SEPARATOR_PATTERN.search(term)}
+    for phrase in QUOTED_PATTERN.findall(query_text):
+        quoted = tokenize(phrase)
+        identifiers.update(quoted)
+        strong.update(quoted)
+    return LexicalQuery(
+        terms=tuple(dict.fromkeys(terms)),
+        identifiers=frozenset(identifiers),
+        strong_identifiers=frozenset(strong),
+    )
+
+
+@dataclass(frozen=True)
+class LexicalHit:
+    """A chunk matching a lexical query."""
+
+    id: str
+    score: float
+    exact: bool  # Contains every identifier of the query, and the match is decisive
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index of chunk texts by chunk ID."""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, int]] = {}  # term -> {chunk ID: term frequency}
+        self._terms: dict[str, tuple[str, ...]] = {}  # chunk ID -> distinct terms
+        self._lengths: dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, ids: Iterable[str], documents: Iterable[str]) -> None:
+        """Index chunks, replacing any already indexed under the same ID."""
+        with self._lock:
+            for chunk_id, text in zip(ids, documents, strict=True):
+                self._remove(chunk_id)
+                counts = Counter(tokenize(text or ""))
+                for term, count in counts.items():
+                    self._postings.setdefault(term, {})[chunk_id] = count
+                length = sum(counts.values())
+                self._terms[chunk_id] = tuple(counts)
+                self._lengths[chunk_id] = length
+                self._total_length += length
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Remove chunks from the index."""
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+
+    def _remove(self, chunk_id: str) -> None:
+        terms = self._terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(chunk_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: LexicalQuery, n_results: int) -> list[LexicalHit]:
+        """Top chunks by BM25 score.
+
+        When chunks containing every identifier of the query decisively
+        answer it, they are marked exact and ranked first.
+        """
+        with self._lock:
+            count = len(self._lengths)
+            if not count or not query.terms:
+                return []
+            average = self._total_length / count or 1.0
+            scores: dict[str, float] = {}
+            for term in query.terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            exact: set[str] = set()
+            if query.identifiers and self._decisive_identifier(query, count):
+                matching = [self._postings.get(term, {}) for term in query.identifiers]
+                smallest = min(matching, key=len)
+                exact = {chunk_id for chunk_id in smallest if all(chunk_id in p for p in matching)}
+                best_exact = max((scores[chunk_id] for chunk_id in exact), default=0.0)
+                best_other = max(
+                    (score for chunk_id, score in scores.items() if chunk_id not in exact), default=0.0
+                )
+                if best_exact < EXACT_SCORE_MARGIN * best_other:
+                    exact = set()
+
+        top = heapq.nlargest(
+            n_results, scores.items(), key=lambda item: (item[0] in exact, item[1])
+        )
+        return [LexicalHit(id=chunk_id, score=score, exact=chunk_id in exact) for chunk_id, score in top]
+
+    def _decisive_identifier(self, query: LexicalQuery, count: int) -> bool:
+        """Whether the query has a compound, quoted or rare identifier (lock held)."""
+        if query.strong_identifiers:
+            return True
+        rare = RARE_IDENTIFIER_FRACTION * count
+        return any(len(self._postings.get(term, ())) <= rare for term in query.identifiers)
+
+
+class LexicalCollection:
+    """A VectorCollection with a BM25 index of its chunks."""
+
+    def __init__(self, collection: VectorCollection) -> None:
+        self.collection = collection
+        self._index: LexicalIndex | None = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def _built_index(self) -> LexicalIndex:
+        """The index, built from the stored chunks on first use."""
+        index = self._index
+        if index is None:
+            with self._lock:
+                index = self._index
+                if index is None:
+                    index = LexicalIndex()
+                    stored = self.collection.get(include=["documents"])
+                    index.add(stored["ids"], stored["documents"] or [])
+                    self._index = index
+        return index
+
+    def add(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[Any],
+    ) -> None:
+        with self._lock:
+            self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            if self._index is not None:
+                self._index.add(ids, documents)
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+        include: list[str] | None = None,
+    ) -> dict[str, Any]:
+        if include is None:
+            return self.collection.get(ids=ids, where=where)
+        return self.collection.get(ids=ids, where=where, include=include)
+
+    def update(self, ids: list[str], metadatas: list[dict[str, Any]]) -> None:
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: list[str] | None = None, where: dict[str, Any] | None = None) -> None:
+        with self._lock:
+            if self._index is not None and where is not None:
+                ids = self.collection.get(ids=ids, where=where, include=["metadatas"])["ids"]
+                where = None
+            self.collection.delete(ids=ids, where=where)
+            if self._index is not None and ids:
+                self._index.remove(ids)
+
+    def query(
+        self,
+        query_embeddings: list[Any],
+        n_results: int,
+        where: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        if where is None:
+            return self.collection.query(query_embeddings=query_embeddings, n_results=n_results)
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+
+    def search(self, query: LexicalQuery, n_results: int) -> list[LexicalHit]:
+        """Top chunks for a lexical query."""
+        return self._built_index().search(query, n_results)
+
+
+def result_key(result: dict[str, Any]) -> tuple[Any, ...]:
+    """Identity of a query result's chunk, for fusing rankings."""
+    metadata = result.get("metadata") or {}
+    document = metadata.get("document_id") or metadata.get("source_id")
+    if document is None:
+        return (result["text"],)
+    return (metadata.get("agent_id"), document, metadata.get("chunk_index"))
+
+
+def fuse_results(rankings: list[list[dict[str, Any]]], n_results: int, k: int = RRF_K) -> list[dict[str, Any]]:
+    """Fuse ranked result lists by reciprocal rank fusion.
+
+    Each result's relevance becomes its fused score scaled so that ranking
+    first in every list gives 1.0.
+    """
+    scores: dict[tuple[Any, ...], float] = {}
+    fused: dict[tuple[Any, ...], dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            key = result_key(result)
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank + 1)
+            fused.setdefault(key, result)
+
+    best = sum(1 for ranking in rankings if ranking) / (k + 1)
+    top = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+    return [{**fused[key], "relevance": score / best} for key, score in top]
+
+
+__all__ = [
+    "LexicalCollection",
+    "LexicalHit",
+    "LexicalIndex",
+    "LexicalQuery",
+    "fuse_results",
+    "parse_query",
+    "tokenize",
+]
@@ -0,0 +1,177 @@
+"""SQLite index of knowledge document and web source records.
+
+Records are pydantic models stored as JSON in one ``records`` table, keyed
+by ID and indexed by (kind, agent) for paginated listing and by next
+refresh time for finding due web sources. Writes are small transactions,
+so recording one upload no longer rewrites every record, and the database
+runs in WAL mode so readers are not blocked by a writer.
+
+Listing order is insertion order; updating a record keeps its position.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+DOCUMENT_KIND = "document"
+WEB_SOURCE_KIND = "web"
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    next_refresh_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_by_agent ON records (kind, agent_id, seq);
+CREATE INDEX IF NOT EXISTS records_by_next_refresh ON records (next_refresh_at)
+    WHERE next_refresh_at IS NOT NULL;
+"""
+
+
+def _timestamp(when: datetime | None) -> float | None:
+    """Epoch seconds of a naive UTC datetime."""
+    if when is None:
+        return None
+    return when.replace(tzinfo=UTC).timestamp()
+
+
+class KnowledgeMetadataStore:
+    """Transactional store of document and web source records."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; safe in WAL mode
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def put(
+        self,
+        kind: str,
+        records: Iterable[Any],
+        next_refresh: Callable[[Any], datetime | None] | None = None,
+        existing_only: bool = False,
+    ) -> None:
+        """Insert or replace records in one transaction.
+
+        Args:
+            kind: DOCUMENT_KIND or WEB_SOURCE_KIND
+            records: Models with ``id`` and ``agent_id`` fields
+            next_refresh: When each record is next due for refresh, if ever
+            existing_only: Only update records that still exist, so a record
+                deleted while it was being refreshed is not re-created
+        """
+        rows = [
+            (
+                record.id,
+                kind,
+                record.agent_id,
+                _timestamp(next_refresh(record)) if next_refresh else None,
+                record.model_dump_json(),
+            )
+            for record in records
+        ]
+        if not rows:
+            return
+        with self._transaction() as conn:
+            if existing_only:
+                conn.executemany(
+                    "UPDATE records SET agent_id = ?, next_refresh_at = ?, data = ? "
+                    "WHERE id = ? AND kind = ?",
+                    [(agent_id, due, data, record_id, kind) for record_id, kind, agent_id, due, data in rows],
+                )
+                return
+            conn.executemany(
+                "INSERT INTO records (id, kind, agent_id, next_refresh_at, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET kind = excluded.kind, agent_id = excluded.agent_id, "
+                "next_refresh_at = excluded.next_refresh_at, data = excluded.data",
+                rows,
+            )
+
+    def get(self, kind: str, record_id: str, model: type[ModelT]) -> ModelT | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM records WHERE id = ? AND kind = ?", (record_id, kind)
+            ).fetchone()
+        return model.model_validate_json(row[0]) if row else None
+
+    def delete(self, kind: str, record_id: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM records WHERE id = ? AND kind = ?", (record_id, kind))
+        return cursor.rowcount > 0
+
+    def list(
+        self,
+        kind: str,
+        model: type[ModelT],
+        agent_id: str | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> list[ModelT]:
+        """Records of a kind, optionally of one agent, in insertion order."""
+        query = "SELECT data FROM records WHERE kind = ?"
+        params: list[Any] = [kind]
+        if agent_id is not None:
+            query += " AND agent_id = ?"
+            params.append(agent_id)
+        query += " ORDER BY seq LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [model.model_validate_json(row[0]) for row in rows]
+
+    def count(self, kind: str, agent_id: str | None = None) -> int:
+        query = "SELECT count(*) FROM records WHERE kind = ?"
+        params: list[Any] = [kind]
+        if agent_id is not None:
+            query += " AND agent_id = ?"
+            params.append(agent_id)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def due(self, kind: str, model: type[ModelT], now: datetime) -> list[ModelT]:
+        """Records whose next refresh time has passed, earliest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM records WHERE next_refresh_at <= ? AND kind = ? "
+                "ORDER BY next_refresh_at",
+                (_timestamp(now), kind),
+            ).fetchall()
+        return [model.model_validate_json(row[0]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+__all__ = [
+    "DOCUMENT_KIND",
+    "WEB_SOURCE_KIND",
+    "KnowledgeMetadataStore",
+]
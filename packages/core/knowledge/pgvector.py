@@ -0,0 +1,434 @@
+"""PostgreSQL/pgvector vector backend.
+
+Stores knowledge in the tables of ``sql/knowledge-layer-schema.sql`` so that
+every API replica can share one store:
+
+- Each agent is a department; its collection is the department's rows.
+- Each document or web source the manager stores chunks for is a
+  ``documents`` row, keyed by a UUID derived from its ``document_id`` or
+  ``source_id``. Documents of the ``citywide_departments`` (the shared
+  canon) have visibility ``citywide``; all others are ``private``.
+- Each chunk is a ``document_chunks`` row, keyed by a UUID derived from
+  the department and chunk ID. The manager's chunk ID and metadata are kept
+  in the ``metadata`` column.
+
+Chunks are bulk loaded with COPY into a staging table and merged with one
+INSERT. query_scoped searches an agent's own documents and the citywide or
+shared documents it may see, within a sensitivity ceiling, in a single SQL
+statement. Every transaction sets ``app.org_id`` to the department, so the
+schema's row-level security policies apply to non-owner roles.
+
+The schema indexes embeddings for cosine distance. Distances are reported
+as twice the cosine distance, which equals the squared L2 distance the
+other backends report for the unit-length vectors embedding models produce.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import uuid
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    psycopg = None
+    ConnectionPool = None
+
+from packages.core.knowledge.backends import _where_terms
+
+SCHEMA_PATH = Path(__file__).resolve().parents[3] / "sql" / "knowledge-layer-schema.sql"
+SCHEMA_DIMENSIONS = 1536  # Embedding width declared in the schema file
+
+# Namespace for the UUIDs of documents and chunks
+KNOWLEDGE_NAMESPACE = uuid.UUID("6c1f3c9e-8f43-4a8e-9d0f-2b7b8f1d5a21")
+
+SENSITIVITY_TIERS = ("public", "internal", "confidential", "restricted", "privileged")
+DEFAULT_SENSITIVITY = "internal"
+
+HNSW_EF_SEARCH = 64
+IVFFLAT_PROBES = 10
+
+# Metadata keys that name the document a chunk belongs to
+DOCUMENT_KEYS = ("document_id", "source_id")
+
+
+def _document_uuid(key: str) -> uuid.UUID:
+    return uuid.uuid5(KNOWLEDGE_NAMESPACE, f"document:{key}")
+
+
+def _chunk_uuid(department_id: str, chunk_id: str) -> uuid.UUID:
+    return uuid.uuid5(KNOWLEDGE_NAMESPACE, f"chunk:{department_id}:{chunk_id}")
+
+
+def _vector_literal(embedding: Iterable[float]) -> str:
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+def _allowed_tiers(max_sensitivity: str) -> list[str]:
+    if max_sensitivity not in SENSITIVITY_TIERS:
+        raise ValueError(f"Unknown sensitivity tier '{max_sensitivity}'")
+    return list(SENSITIVITY_TIERS[: SENSITIVITY_TIERS.index(max_sensitivity) + 1])
+
+
+class PgVectorBackend:
+    """Knowledge collections in PostgreSQL with pgvector."""
+
+    def __init__(
+        self,
+        dsn: str,
+        dimensions: int = SCHEMA_DIMENSIONS,
+        citywide_departments: Sequence[str] = (),
+        index_type: str = "hnsw",
+        schema: str | None = None,
+        min_connections: int = 1,
+        max_connections: int = 10,
+        create_schema: bool = True,
+    ) -> None:
+        """
+        Args:
+            dsn: PostgreSQL connection string
+            dimensions: Embedding width (replaces the schema's 1536 when creating tables)
+            citywide_departments: Departments whose documents every agent can see
+            index_type: "hnsw" or "ivfflat" (the schema's index)
+            schema: PostgreSQL schema for the tables (default: the search path)
+            min_connections: Connections the pool keeps open
+            max_connections: Most connections the pool opens
+            create_schema: Create the tables and indexes if they do not exist
+        """
+        if psycopg is None:
+            raise RuntimeError("pgvector backend not available. Install psycopg and psycopg-pool.")
+        if index_type not in ("hnsw", "ivfflat"):
+            raise ValueError(f"Unknown index type '{index_type}'")
+
+        self.dimensions = dimensions
+        self.citywide_departments = set(citywide_departments)
+        self.index_type = index_type
+        self.schema = schema
+
+        kwargs: dict[str, Any] = {}
+        if schema:
+            kwargs["options"] = f"-c search_path={schema},public"
+        self.pool = ConnectionPool(
+            dsn, min_size=min_connections, max_size=max_connections, kwargs=kwargs, open=True
+        )
+        self._departments: set[str] = set()
+        self._departments_lock = threading.Lock()
+        if create_schema:
+            self.create_schema()
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        self.pool.close()
+
+    # -- Schema --------------------------------------------------------------
+
+    def create_schema(self) -> None:
+        """Create the knowledge layer tables if missing, and the vector index."""
+        with self.pool.connection() as conn:
+            if self.schema:
+                conn.execute(sql.SQL("create schema if not exists {}").format(sql.Identifier(self.schema)))
+            exists = conn.execute("select to_regclass('document_chunks')").fetchone()[0]
+            if exists is None:
+                ddl = SCHEMA_PATH.read_text()
+                ddl = ddl.replace(f"vector({SCHEMA_DIMENSIONS})", f"vector({self.dimensions})")
+                conn.execute(ddl)
+
+            if self.index_type == "hnsw":
+                # An IVFFlat index built before the data is loaded has poor recall
+                conn.execute("drop index if exists document_chunks_embedding_idx")
+                conn.execute(
+                    "create index if not exists document_chunks_embedding_hnsw_idx "
+                    "on document_chunks using hnsw (embedding vector_cosine_ops)"
+                )
+
+    def rebuild_index(self) -> None:
+        """Rebuild the IVFFlat index with lists sized to the data (after bulk loads)."""
+        if self.index_type != "ivfflat":
+            return
+        with self.pool.connection() as conn:
+            rows = conn.execute("select count(*) from document_chunks").fetchone()[0]
+            lists = max(1, int(rows ** 0.5))
+            conn.execute("drop index if exists document_chunks_embedding_idx")
+            conn.execute(
+                sql.SQL(
+                    "create index document_chunks_embedding_idx on document_chunks "
+                    "using ivfflat (embedding vector_cosine_ops) with (lists = {})"
+                ).format(sql.Literal(lists))
+            )
+
+    # -- Helpers -------------------------------------------------------------
+
+    def _begin(self, conn: Any, department_id: str, k: int = 0) -> None:
+        """Scope a transaction to a department and tune the index search."""
+        conn.execute("select set_config('app.org_id', %s, true)", (department_id,))
+        if k:
+            if self.index_type == "hnsw":
+                conn.execute(
+                    sql.SQL("set local hnsw.ef_search = {}").format(sql.Literal(max(HNSW_EF_SEARCH, k)))
+                )
+            else:
+                conn.execute(sql.SQL("set local ivfflat.probes = {}").format(sql.Literal(IVFFLAT_PROBES)))
+
+    def _ensure_department(self, department_id: str) -> None:
+        """Create the department row (committed on its own, then remembered)."""
+        if department_id in self._departments:
+            return
+        with self.pool.connection() as conn:
+            conn.execute(
+                "insert into departments (id, name) values (%s, %s) on conflict (id) do nothing",
+                (department_id, department_id),
+            )
+        with self._departments_lock:
+            self._departments.add(department_id)
+
+    def get_collection(self, agent_id: str) -> PgVectorCollection:
+        return PgVectorCollection(self, agent_id)
+
+    def query_scoped(
+        self,
+        agent_id: str,
+        embedding: Any,
+        agent_count: int,
+        shared_count: int,
+        max_sensitivity: str = DEFAULT_SENSITIVITY,
+    ) -> list[tuple[str, dict[str, Any], float, str]]:
+        """Search an agent's knowledge and the citywide/shared knowledge it can see.
+
+        One statement returns up to ``agent_count`` of the agent's own chunks
+        and up to ``shared_count`` chunks of other departments' citywide or
+        shared documents, limited to documents at or below max_sensitivity.
+
+        Returns: (text, metadata, distance, scope) tuples, scope being
+        "agent" or "canon"
+        """
+        query = sql.SQL("""
+            with eligible as (
+              select d.id from documents d
+              where (d.department_id = %(dept)s
+                     or (%(shared)s and d.visibility_scope = 'citywide')
+                     or (%(shared)s and d.visibility_scope = 'shared' and %(dept)s = any(d.shared_with)))
+                and d.sensitivity_tier = any(%(tiers)s)
+            )
+            (select dc.content, dc.metadata, dc.embedding <=> %(q)s::vector as distance, 'agent' as scope
+               from document_chunks dc join eligible e on e.id = dc.document_id
+              where dc.department_id = %(dept)s and dc.embedding is not null
+              order by distance limit %(agent_count)s)
+            union all
+            (select dc.content, dc.metadata, dc.embedding <=> %(q)s::vector as distance, 'canon' as scope
+               from document_chunks dc join eligible e on e.id = dc.document_id
+              where dc.department_id <> %(dept)s and dc.embedding is not null
+              order by distance limit %(shared_count)s)
+        """)
+        params = {
+            "dept": agent_id,
+            "shared": shared_count > 0,
+            "tiers": _allowed_tiers(max_sensitivity),
+            "q": _vector_literal(embedding),
+            "agent_count": agent_count,
+            "shared_count": shared_count,
+        }
+        with self.pool.connection() as conn:
+            self._begin(conn, agent_id, max(agent_count, shared_count))
+            rows = conn.execute(query, params).fetchall()
+        return [
+            (content, _public_metadata(metadata), 2 * float(distance), scope)
+            for content, metadata, distance, scope in rows
+        ]
+
+
+def _chunk_id(row_id: uuid.UUID, metadata: dict[str, Any] | None) -> str:
+    """The manager's ID of a chunk (the row UUID for rows written by other tools)."""
+    return (metadata or {}).get("chunk_id") or str(row_id)
+
+
+def _public_metadata(metadata: dict[str, Any] | None) -> dict[str, Any]:
+    """Chunk metadata as the manager stored it."""
+    metadata = dict(metadata or {})
+    metadata.pop("chunk_id", None)
+    return metadata
+
+
+class PgVectorCollection:
+    """One agent's (department's) chunks in the pgvector backend."""
+
+    def __init__(self, backend: PgVectorBackend, department_id: str) -> None:
+        self.backend = backend
+        self.department_id = department_id
+
+    def _filter(self, ids: list[str] | None, where: dict[str, Any] | None) -> tuple[sql.Composed, list[Any]]:
+        """WHERE clause selecting this department's chunks by id and metadata."""
+        clauses = [sql.SQL("dc.department_id = %s")]
+        params: list[Any] = [self.department_id]
+        if ids is not None:
+            clauses.append(sql.SQL("dc.id = any(%s)"))
+            params.append([_chunk_uuid(self.department_id, chunk_id) for chunk_id in ids])
+        terms = _where_terms(where)
+        for key, value in terms:
+            if key in DOCUMENT_KEYS:
+                clauses.append(sql.SQL("dc.document_id = %s"))
+                params.append(_document_uuid(str(value)))
+        if terms:
+            clauses.append(sql.SQL("dc.metadata @> %s::jsonb"))
+            params.append(json.dumps(dict(terms)))
+        return sql.SQL(" and ").join(clauses), params
+
+    def add(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[Any] | None = None,
+    ) -> None:
+        if embeddings is None:
+            raise ValueError("The pgvector backend needs precomputed embeddings")
+        department = self.department_id
+        visibility = "citywide" if department in self.backend.citywide_departments else "private"
+
+        owners: dict[str, dict[str, Any]] = {}
+        rows = []
+        for chunk_id, text, metadata, embedding in zip(ids, documents, metadatas, embeddings, strict=True):
+            metadata = metadata or {}
+            key = next((str(metadata[k]) for k in DOCUMENT_KEYS if k in metadata), chunk_id)
+            owners.setdefault(key, metadata)
+            rows.append((
+                _chunk_uuid(department, chunk_id),
+                _document_uuid(key),
+                department,
+                int(metadata.get("chunk_index", 0)),
+                text,
+                _vector_literal(embedding),
+                json.dumps({**metadata, "chunk_id": chunk_id}),
+            ))
+
+        self.backend._ensure_department(department)
+        with self.backend.pool.connection() as conn:
+            self.backend._begin(conn, department)
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    insert into documents (id, department_id, title, source_path,
+                                           visibility_scope, sensitivity_tier)
+                    values (%s, %s, %s, %s, %s, %s)
+                    on conflict (id) do nothing
+                    """,
+                    [
+                        (
+                            _document_uuid(key),
+                            department,
+                            metadata.get("filename") or metadata.get("url") or key,
+                            metadata.get("url") or metadata.get("filename"),
+                            visibility,
+                            metadata.get("sensitivity_tier", DEFAULT_SENSITIVITY),
+                        )
+                        for key, metadata in owners.items()
+                    ],
+                )
+                cur.execute(
+                    "create temp table chunk_stage (like document_chunks including defaults) on commit drop"
+                )
+                with cur.copy(
+                    "copy chunk_stage (id, document_id, department_id, chunk_index, content, embedding, metadata) "
+                    "from stdin"
+                ) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                # Existing IDs are ignored, as in Chroma
+                cur.execute("insert into document_chunks select * from chunk_stage on conflict (id) do nothing")
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+        include: list[str] | None = None,
+    ) -> dict[str, Any]:
+        include = ["documents", "metadatas"] if include is None else include
+        clause, params = self._filter(ids, where)
+        query = sql.SQL(
+            "select dc.id, dc.metadata, dc.content from document_chunks dc where {} "
+            "order by dc.created_at, dc.chunk_index"
+        ).format(clause)
+        with self.backend.pool.connection() as conn:
+            self.backend._begin(conn, self.department_id)
+            rows = conn.execute(query, params).fetchall()
+        return {
+            "ids": [_chunk_id(row_id, metadata) for row_id, metadata, _ in rows],
+            "documents": [content for _, _, content in rows] if "documents" in include else None,
+            "metadatas": [_public_metadata(m) for _, m, _ in rows] if "metadatas" in include else None,
+        }
+
+    def update(self, ids: list[str], metadatas: list[dict[str, Any]]) -> None:
+        with self.backend.pool.connection() as conn:
+            self.backend._begin(conn, self.department_id)
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "update document_chunks set metadata = %s::jsonb, chunk_index = %s "
+                    "where id = %s and department_id = %s",
+                    [
+                        (
+                            json.dumps({**metadata, "chunk_id": chunk_id}),
+                            int(metadata.get("chunk_index", 0)),
+                            _chunk_uuid(self.department_id, chunk_id),
+                            self.department_id,
+                        )
+                        for chunk_id, metadata in zip(ids, metadatas, strict=True)
+                    ],
+                )
+
+    def delete(self, ids: list[str] | None = None, where: dict[str, Any] | None = None) -> None:
+        clause, params = self._filter(ids, where)
+        with self.backend.pool.connection() as conn:
+            self.backend._begin(conn, self.department_id)
+            conn.execute(sql.SQL("delete from document_chunks dc where {}").format(clause), params)
+            # Drop documents left without chunks
+            conn.execute(
+                """
+                delete from documents d
+                where d.department_id = %s
+                  and not exists (select 1 from document_chunks c where c.document_id = d.id)
+                """,
+                (self.department_id,),
+            )
+
+    def query(
+        self,
+        query_embeddings: list[Any],
+        n_results: int = 10,
+        where: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        clause, params = self._filter(None, where)
+        query = sql.SQL(
+            "select dc.id, dc.metadata, dc.content, dc.embedding <=> %s::vector as distance "
+            "from document_chunks dc where {} and dc.embedding is not null "
+            "order by distance limit %s"
+        ).format(clause)
+        result: dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self.backend.pool.connection() as conn:
+            self.backend._begin(conn, self.department_id, n_results)
+            for embedding in query_embeddings:
+                rows = conn.execute(query, [_vector_literal(embedding), *params, n_results]).fetchall()
+                result["ids"].append([_chunk_id(row_id, metadata) for row_id, metadata, _, _ in rows])
+                result["documents"].append([content for _, _, content, _ in rows])
+                result["metadatas"].append([_public_metadata(m) for _, m, _, _ in rows])
+                result["distances"].append([2 * float(d) for _, _, _, d in rows])
+        return result
+
+    def count(self) -> int:
+        """Number of chunks."""
+        with self.backend.pool.connection() as conn:
+            self.backend._begin(conn, self.department_id)
+            return conn.execute(
+                "select count(*) from document_chunks where department_id = %s", (self.department_id,)
+            ).fetchone()[0]
+
+
+__all__ = [
+    "SENSITIVITY_TIERS",
+    "PgVectorBackend",
+    "PgVectorCollection",
+]
@@ -0,0 +1,136 @@
+"""Concurrent web source refresh.
+
+Refreshing sources one at a time lets a single slow site stall the whole
+cycle. WebRefreshEngine runs the refresh as two bounded stages:
+
+- Fetch: a thread pool downloads pages (streamed, size-limited, with
+  conditional requests). At most ``per_host_limit`` requests run against
+  one host at a time, and hosts are served round-robin so a site with many
+  sources cannot starve the others.
+- Ingest: a smaller pool chunks and embeds the fetched pages. Fetching
+  pauses while ``max_pending_ingest`` pages are waiting, so memory stays
+  bounded when embedding is slower than the network.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    from packages.core.knowledge import KnowledgeManager, WebSource
+
+DEFAULT_FETCH_WORKERS = 16
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_INGEST_WORKERS = 2
+
+
+def source_host(url: str) -> str:
+    """Host a politeness limit applies to."""
+    return urlparse(url).netloc.lower()
+
+
+class WebRefreshEngine:
+    """Refreshes many web sources concurrently with per-host limits."""
+
+    def __init__(
+        self,
+        manager: KnowledgeManager,
+        fetch_workers: int = DEFAULT_FETCH_WORKERS,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        ingest_workers: int = DEFAULT_INGEST_WORKERS,
+        max_pending_ingest: int | None = None,
+    ) -> None:
+        self.manager = manager
+        self.fetch_workers = max(1, fetch_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.ingest_workers = max(1, ingest_workers)
+        self.max_pending_ingest = max_pending_ingest or self.ingest_workers * 4
+
+    def refresh(self, sources: list[WebSource]) -> dict[str, str]:
+        """Refresh the given sources.
+
+        Returns: Dict mapping source_id to its refresh status
+        """
+        pending: dict[str, deque[WebSource]] = {}
+        for source in sources:
+            pending.setdefault(source_host(source.url), deque()).append(source)
+
+        active: dict[str, int] = {}
+        fetching: dict[Future[Any], tuple[str, WebSource]] = {}
+        ingesting: dict[Future[Any], WebSource] = {}
+        results: dict[str, str] = {}
+        refreshed: list[WebSource] = []
+
+        with ThreadPoolExecutor(
+            max_workers=self.fetch_workers, thread_name_prefix="knowledge-fetch"
+        ) as fetch_pool, ThreadPoolExecutor(
+            max_workers=self.ingest_workers, thread_name_prefix="knowledge-ingest"
+        ) as ingest_pool:
+            while True:
+                self._dispatch(pending, active, fetching, ingesting, fetch_pool)
+                if not fetching and not ingesting:
+                    break
+
+                done, _ = wait([*fetching, *ingesting], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetching:
+                        host, source = fetching.pop(future)
+                        active[host] -= 1
+                        page, status = future.result()
+                        ingest = ingest_pool.submit(
+                            self.manager._apply_refresh, source, page, status
+                        )
+                        ingesting[ingest] = source
+                    else:
+                        source = ingesting.pop(future)
+                        refreshed.append(source)
+                        try:
+                            future.result()
+                            results[source.id] = source.last_refresh_status
+                        except Exception as e:
+                            status = f"error: {str(e)[:100]}"
+                            self.manager._record_refresh_status(source, status)
+                            results[source.id] = status
+
+        if results:
+            self.manager._save_web_sources(refreshed, existing_only=True)
+            for source_id in results:
+                self.manager._notify_source_changed(source_id)
+        return results
+
+    def _dispatch(
+        self,
+        pending: dict[str, deque[WebSource]],
+        active: dict[str, int],
+        fetching: dict[Future[Any], tuple[str, WebSource]],
+        ingesting: dict[Future[Any], WebSource],
+        fetch_pool: ThreadPoolExecutor,
+    ) -> None:
+        """Start fetches round-robin across hosts while slots are free."""
+        progressed = True
+        while progressed:
+            progressed = False
+            for host in list(pending):
+                if len(fetching) >= self.fetch_workers:
+                    return
+                if len(ingesting) >= self.max_pending_ingest:
+                    return  # let ingestion catch up
+                if active.get(host, 0) >= self.per_host_limit:
+                    continue
+                queue = pending[host]
+                source = queue.popleft()
+                if not queue:
+                    del pending[host]
+                active[host] = active.get(host, 0) + 1
+                future = fetch_pool.submit(self.manager._fetch_for_refresh, source)
+                fetching[future] = (host, source)
+                progressed = True
+
+
+__all__ = [
+    "WebRefreshEngine",
+    "source_host",
+]
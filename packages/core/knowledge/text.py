@@ -0,0 +1,132 @@
+"""Streaming document text extraction and chunking.
+
+Documents are read and chunked as a stream of pieces (pages, paragraphs
+or blocks), so a large upload is never held in memory as one string.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+# Document processing imports
+try:
+    from PyPDF2 import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    from docx import Document as DocxDocument
+except ImportError:
+    DocxDocument = None
+
+# Extraction and ingestion batch sizes
+TEXT_READ_BLOCK = 64 * 1024  # Characters read from text files at a time
+EMBED_BATCH_SIZE = 256  # Chunks embedded and stored per call
+
+
+def iter_text(file_path: Path, file_type: str) -> Iterator[str]:
+    """Yield a document's text in pieces (pages, paragraphs or blocks).
+
+    Joined, the pieces are the document's full text, but only one piece is
+    held in memory at a time.
+    """
+    if file_type == "txt":
+        with open(file_path, encoding="utf-8", errors="ignore") as f:
+            while block := f.read(TEXT_READ_BLOCK):
+                yield block
+
+    elif file_type == "pdf" and PdfReader:
+        reader = PdfReader(str(file_path))
+        for i, page in enumerate(reader.pages):
+            text = page.extract_text() or ""
+            yield "\n" + text if i else text
+
+    elif file_type == "docx" and DocxDocument:
+        doc = DocxDocument(str(file_path))
+        for i, para in enumerate(doc.paragraphs):
+            yield "\n" + para.text if i else para.text
+
+    else:
+        # Try to read as text
+        try:
+            with open(file_path, encoding="utf-8", errors="ignore") as f:
+                while block := f.read(TEXT_READ_BLOCK):
+                    yield block
+        except Exception:
+            return
+
+
+def extract_text(file_path: Path, file_type: str) -> str:
+    """Extract text from a document."""
+    return "".join(iter_text(file_path, file_type))
+
+
+def iter_chunks(
+    pieces: Iterable[str], chunk_size: int = 1000, overlap: int = 200
+) -> Iterator[str]:
+    """Split streamed text into overlapping chunks.
+
+    Yields the same chunks as chunk_text on the joined pieces, buffering
+    only about one chunk beyond the current position.
+    """
+    pieces = iter(pieces)
+    buffer = ""
+    start = 0  # Position of the next chunk in buffer
+    exhausted = False
+    while True:
+        # Buffer past the chunk's end, so we know whether the text ends inside it
+        while not exhausted and len(buffer) - start <= chunk_size:
+            piece = next(pieces, None)
+            if piece is None:
+                exhausted = True
+            else:
+                buffer += piece
+        if start >= len(buffer):
+            return
+
+        end = start + chunk_size
+        chunk = buffer[start:end]
+
+        # Try to break at sentence boundary
+        if end < len(buffer):
+            last_period = chunk.rfind(".")
+            last_newline = chunk.rfind("\n")
+            break_point = max(last_period, last_newline)
+            if break_point > chunk_size // 2:
+                chunk = chunk[: break_point + 1]
+                end = start + break_point + 1
+
+        chunk = chunk.strip()
+        if chunk:
+            yield chunk
+        start = end - overlap
+
+        # Drop consumed text once it is most of the buffer (amortized O(n))
+        if start > len(buffer) // 2:
+            buffer = buffer[start:]
+            start = 0
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+    """Split text into overlapping chunks."""
+    return list(iter_chunks([text], chunk_size, overlap))
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Yield lists of up to size items."""
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+__all__ = [
+    "EMBED_BATCH_SIZE",
+    "batched",
+    "chunk_text",
+    "extract_text",
+    "iter_chunks",
+    "iter_text",
+]
@@ -0,0 +1,377 @@
+"""Shared one-pass text signal scanner.
+
+Governance and concierge both look for keywords and regex patterns in the
+same query text. Instead of each consumer looping over its own lists, the
+patterns are registered as features of a TextScanner:
+
+- Keywords are literal substrings of the lowercased text. They are compiled
+  into a single Aho-Corasick automaton, so one pass finds all of them.
+- Regexes are reduced to the literal strings a match must contain (e.g.
+  ``{"ssn", "social security"}`` for ``\\b(ssn|social security)\\b``). Those
+  literals join the same automaton, and a regex is only run when one of its
+  literals occurred in the text.
+
+``scan()`` returns a ScanResult (the set of feature ids that hit), which every
+consumer reads from. Results for recent texts are cached, so classifying and
+risk-checking the same query scans it once.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from re import Pattern
+from re import _constants as sre_constants  # type: ignore[attr-defined]
+from re import _parser as sre_parse  # type: ignore[attr-defined]
+
+DEFAULT_CACHE_SIZE = 256
+
+_REPEATS = (
+    sre_constants.MAX_REPEAT,
+    sre_constants.MIN_REPEAT,
+    sre_constants.POSSESSIVE_REPEAT,
+)
+
+
+# =============================================================================
+# Aho-Corasick Automaton
+# =============================================================================
+
+
+class Automaton:
+    """Aho-Corasick automaton with incremental insertion.
+
+    Patterns are added to the trie immediately; failure links are rebuilt
+    lazily on the next search after any change.
+    """
+
+    def __init__(self) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._terminal: list[set[str]] = [set()]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[str, ...]] = [()]
+        self._dirty = False
+
+    def add(self, pattern: str) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._terminal.append(set())
+            node = nxt
+        self._terminal[node].add(pattern)
+        self._dirty = True
+
+    def discard(self, pattern: str) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                return
+            node = nxt
+        self._terminal[node].discard(pattern)
+        self._dirty = True
+
+    def copy(self) -> Automaton:
+        """Independent automaton with the same patterns."""
+        clone = Automaton()
+        clone._goto = [dict(edges) for edges in self._goto]
+        clone._terminal = [set(patterns) for patterns in self._terminal]
+        clone._fail = list(self._fail)
+        clone._out = list(self._out)
+        clone._dirty = self._dirty
+        return clone
+
+    def _build(self) -> None:
+        size = len(self._goto)
+        fail = [0] * size
+        out: list[tuple[str, ...]] = [()] * size
+        out[0] = tuple(self._terminal[0])
+        queue: deque[int] = deque()
+        for child in self._goto[0].values():
+            queue.append(child)
+            out[child] = tuple(self._terminal[child])
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                link = fail[node]
+                while link and ch not in self._goto[link]:
+                    link = fail[link]
+                target = self._goto[link].get(ch, 0)
+                fail[child] = target if target != child else 0
+                out[child] = tuple(self._terminal[child]) + out[fail[child]]
+                queue.append(child)
+        # Swap in complete tables so concurrent searches never see partial links
+        self._fail, self._out = fail, out
+        self._dirty = False
+
+    def search(self, text: str) -> set[str]:
+        """Return every pattern occurring in text."""
+        if self._dirty:
+            self._build()
+        found: set[str] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+# =============================================================================
+# Regex Literal Extraction
+# =============================================================================
+
+
+def _best(candidates: list[frozenset[str]]) -> frozenset[str] | None:
+    """Pick the most selective literal set (longest shortest literal)."""
+    if not candidates:
+        return None
+    return max(candidates, key=lambda s: (min(len(lit) for lit in s), -len(s)))
+
+
+def _sequence_literals(items: Iterable[tuple[object, object]]) -> frozenset[str] | None:
+    """Literals required by a parsed sequence, or None if none are known."""
+    candidates: list[frozenset[str]] = []
+    run: list[str] = []
+
+    for op, av in items:
+        if op == sre_constants.LITERAL and av < 128:  # type: ignore[operator]
+            run.append(chr(av).lower())  # type: ignore[arg-type]
+            continue
+        if op == sre_constants.AT:
+            continue  # zero-width anchors do not break a literal run
+
+        if run:
+            candidates.append(frozenset(["".join(run)]))
+            run = []
+
+        required: frozenset[str] | None = None
+        if op == sre_constants.SUBPATTERN:
+            required = _sequence_literals(av[-1])  # type: ignore[index]
+        elif op == sre_constants.ATOMIC_GROUP:
+            required = _sequence_literals(av)  # type: ignore[arg-type]
+        elif op == sre_constants.BRANCH:
+            required = _branch_literals(av[1])  # type: ignore[index]
+        elif op in _REPEATS and av[0] >= 1:  # type: ignore[index]
+            required = _sequence_literals(av[2])  # type: ignore[index]
+        if required:
+            candidates.append(required)
+
+    if run:
+        candidates.append(frozenset(["".join(run)]))
+    return _best(candidates)
+
+
+def _branch_literals(branches: Iterable[Iterable[tuple[object, object]]]) -> frozenset[str] | None:
+    """Every alternative must contribute a literal for the branch to have one."""
+    combined: set[str] = set()
+    for branch in branches:
+        required = _sequence_literals(branch)
+        if required is None:
+            return None
+        combined.update(required)
+    return frozenset(combined)
+
+
+def required_literals(regex: Pattern[str]) -> frozenset[str] | None:
+    """Return lowercase literals of which any match must contain at least one.
+
+    Only ASCII literals are used, so the check is exact against ``str.lower()``
+    of ASCII text. Returns None when no literal can be derived; such regexes
+    are run on every scan.
+    """
+    try:
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+    except (re.error, TypeError):
+        return None
+    return _sequence_literals(parsed)
+
+
+# =============================================================================
+# Scanner
+# =============================================================================
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    """Feature hits for one text."""
+
+    hits: frozenset[int]
+
+    def __contains__(self, feature_id: object) -> bool:
+        return feature_id in self.hits
+
+    def any(self, feature_ids: Iterable[int]) -> bool:
+        """True if any of the features hit."""
+        return any(fid in self.hits for fid in feature_ids)
+
+    def count(self, feature_ids: Iterable[int]) -> int:
+        """Number of the given feature ids that hit (duplicates count)."""
+        return sum(1 for fid in feature_ids if fid in self.hits)
+
+
+EMPTY_SCAN = ScanResult(hits=frozenset())
+
+
+class TextScanner:
+    """Registry of keyword and regex features scanned in a single pass.
+
+    Registering the same keyword or the same (pattern, flags) regex twice
+    returns the same feature id, so consumers can share features freely.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self._lock = threading.RLock()
+        self._automaton = Automaton()
+        self._keyword_ids: dict[str, int] = {}
+        self._regex_ids: dict[tuple[str, int, bool], int] = {}
+        self._regexes: dict[int, tuple[Pattern[str], bool]] = {}
+        # literal -> keyword features it proves / regex features it nominates
+        self._keyword_literals: dict[str, list[int]] = {}
+        self._regex_literals: dict[str, list[int]] = {}
+        self._always_keywords: list[int] = []
+        self._unfiltered_regexes: list[int] = []
+        self._ignorecase_regexes: list[int] = []
+        self._next_id = 0
+        self._cache: OrderedDict[str, ScanResult] = OrderedDict()
+        self._cache_size = cache_size
+
+    @property
+    def feature_count(self) -> int:
+        return self._next_id
+
+    # -------------------------------------------------------------------------
+    # Registration
+    # -------------------------------------------------------------------------
+
+    def _new_id(self) -> int:
+        feature_id = self._next_id
+        self._next_id += 1
+        self._cache.clear()
+        return feature_id
+
+    def keyword(self, keyword: str) -> int:
+        """Register a case-insensitive substring feature."""
+        literal = keyword.lower()
+        with self._lock:
+            feature_id = self._keyword_ids.get(literal)
+            if feature_id is not None:
+                return feature_id
+            feature_id = self._new_id()
+            self._keyword_ids[literal] = feature_id
+            if literal:
+                self._keyword_literals.setdefault(literal, []).append(feature_id)
+                self._automaton.add(literal)
+            else:
+                self._always_keywords.append(feature_id)  # "" is in every text
+            return feature_id
+
+    def keywords(self, keywords: Iterable[str]) -> list[int]:
+        """Register several keywords, returning their ids in order."""
+        return [self.keyword(kw) for kw in keywords]
+
+    def regex(
+        self,
+        pattern: Pattern[str] | str,
+        flags: int = 0,
+        lowercase: bool = False,
+    ) -> int:
+        """Register a regex feature that hits when ``search`` finds a match.
+
+        With ``lowercase=True`` the regex is searched in the lowercased text
+        rather than the original.
+        """
+        compiled = pattern if isinstance(pattern, Pattern) else re.compile(pattern, flags)
+        key = (compiled.pattern, compiled.flags, lowercase)
+        with self._lock:
+            feature_id = self._regex_ids.get(key)
+            if feature_id is not None:
+                return feature_id
+            feature_id = self._new_id()
+            self._regex_ids[key] = feature_id
+            self._regexes[feature_id] = (compiled, lowercase)
+            literals = required_literals(compiled)
+            if literals is None:
+                self._unfiltered_regexes.append(feature_id)
+            else:
+                for literal in literals:
+                    self._regex_literals.setdefault(literal, []).append(feature_id)
+                    self._automaton.add(literal)
+                if compiled.flags & re.IGNORECASE:
+                    self._ignorecase_regexes.append(feature_id)
+            return feature_id
+
+    def regexes(
+        self,
+        patterns: Iterable[Pattern[str] | str],
+        flags: int = 0,
+        lowercase: bool = False,
+    ) -> list[int]:
+        """Register several regexes, returning their ids in order."""
+        return [self.regex(p, flags, lowercase) for p in patterns]
+
+    # -------------------------------------------------------------------------
+    # Scanning
+    # -------------------------------------------------------------------------
+
+    def scan(self, text: str) -> ScanResult:
+        """Return the features that occur in text."""
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            text_lower = text.lower()
+            literals = self._automaton.search(text_lower)
+
+            hits: set[int] = set(self._always_keywords)
+            candidates: set[int] = set(self._unfiltered_regexes)
+            for literal in literals:
+                hits.update(self._keyword_literals.get(literal, ()))
+                candidates.update(self._regex_literals.get(literal, ()))
+            if not text.isascii():
+                # Case-insensitive regexes can match non-ASCII case variants
+                # of their literals, so the prefilter is skipped for them
+                candidates.update(self._ignorecase_regexes)
+
+            for feature_id in candidates:
+                regex, lowercase = self._regexes[feature_id]
+                if regex.search(text_lower if lowercase else text):
+                    hits.add(feature_id)
+
+            result = ScanResult(hits=frozenset(hits))
+            self._cache[text] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return result
+
+
+_default_scanner: TextScanner | None = None
+
+
+def get_text_scanner() -> TextScanner:
+    """Get the shared scanner singleton."""
+    global _default_scanner
+    if _default_scanner is None:
+        _default_scanner = TextScanner()
+    return _default_scanner
+
+
+__all__ = [
+    "EMPTY_SCAN",
+    "Automaton",
+    "ScanResult",
+    "TextScanner",
+    "get_text_scanner",
+    "required_literals",
+]
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import uuid
+from collections.abc import Mapping
 from datetime import UTC, datetime
 from typing import Any
 
@@ -10,6 +11,7 @@ from pydantic import BaseModel, Field
 
 from packages.core.concierge import classify_intent, detect_risks
 from packages.core.governance import PolicySet, evaluate_governance
+from packages.core.governance.compiler import CompiledPolicySet, compile_policy_set
 from packages.core.schemas.models import (
     GovernanceDecision,
     Intent,
@@ -45,10 +47,40 @@ class BatchSimulationResult(BaseModel):
 
 
 class SimulationRunner:
-    """Run simulations without executing tools."""
+    """Run simulations without executing tools.
 
-    def __init__(self, policy_set: PolicySet) -> None:
+    Tenants with an entry in ``tenant_policies`` are evaluated against that
+    overlay layered over ``policy_set``; the base is compiled once and
+    shared by every overlay.
+    """
+
+    def __init__(
+        self,
+        policy_set: PolicySet,
+        tenant_policies: Mapping[str, PolicySet] | None = None,
+    ) -> None:
         self.policy_set = policy_set
+        self.tenant_policies = dict(tenant_policies or {})
+        self._compiled_base: CompiledPolicySet | None = None
+        self._compiled_tenants: dict[str, CompiledPolicySet] = {}
+
+    def _evaluate(
+        self,
+        intent: Intent,
+        risk: RiskSignals,
+        ctx: UserContext,
+    ) -> GovernanceDecision:
+        overlay = self.tenant_policies.get(ctx.tenant_id)
+        if overlay is None:
+            return evaluate_governance(intent, risk, ctx, self.policy_set)
+
+        compiled = self._compiled_tenants.get(ctx.tenant_id)
+        if compiled is None:
+            if self._compiled_base is None:
+                self._compiled_base = compile_policy_set(self.policy_set)
+            compiled = compile_policy_set(overlay, parent=self._compiled_base)
+            self._compiled_tenants[ctx.tenant_id] = compiled
+        return compiled.evaluate(intent, risk, ctx)
 
     def simulate_single(
         self,
@@ -69,7 +101,7 @@ class SimulationRunner:
             department=department,
         )
 
-        governance = evaluate_governance(intent, risk, ctx, self.policy_set)
+        governance = self._evaluate(intent, risk, ctx)
         agent_id = AGENT_MAP.get(intent.domain, "research_agent")
 
         audit_stub = {
@@ -133,9 +165,10 @@ def simulate_batch(
     inputs: list[dict[str, Any]],
     tenant_id: str,
     policy_set: PolicySet,
+    tenant_policies: Mapping[str, PolicySet] | None = None,
 ) -> BatchSimulationResult:
     """Convenience function for batch simulation."""
-    runner = SimulationRunner(policy_set=policy_set)
+    runner = SimulationRunner(policy_set=policy_set, tenant_policies=tenant_policies)
     return runner.simulate_batch(inputs=inputs, tenant_id=tenant_id)
 
 
@@ -13,6 +13,7 @@ import hashlib
 import json
 import time
 import uuid
+from collections.abc import Iterator
 from dataclasses import dataclass, field
 from datetime import datetime, UTC
 from enum import Enum
@@ -490,6 +491,30 @@ class TraceStore:
                 continue
         return traces
 
+    def iter_traces(
+        self,
+        tenant_id: str | None = None,
+        limit: int | None = None,
+    ) -> Iterator[ExecutionTrace]:
+        """Yield full traces, newest first (used for replaying recorded traffic)."""
+        count = 0
+        for trace_file in sorted(
+            self._storage_path.glob("*.json"),
+            key=lambda f: f.stat().st_mtime,
+            reverse=True,
+        ):
+            if limit is not None and count >= limit:
+                return
+            try:
+                data = json.loads(trace_file.read_text())
+                if tenant_id and data.get("tenant_id") != tenant_id:
+                    continue
+                trace = ExecutionTrace.from_dict(data)
+            except Exception:
+                continue
+            count += 1
+            yield trace
+
     def delete(self, trace_id: str) -> bool:
         """Delete a trace."""
         trace_file = self._storage_path / f"{trace_id}.json"
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Knowledge Retrieval Benchmark
+
+Ingests a synthetic or fixture corpus through the KnowledgeManager and
+reports ingest throughput, query latency percentiles and recall@k. Runs
+offline with a deterministic embedding, so results are reproducible.
+
+Save a baseline before a backend or chunking change, then compare:
+
+Usage:
+    python -m scripts.benchmark_knowledge --chunks 10000 --output baseline.json
+    python -m scripts.benchmark_knowledge --chunks 10000 --baseline baseline.json
+    python -m scripts.benchmark_knowledge --corpus path/to/fixtures --backend local
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from packages.core.knowledge.benchmark import (
+    BenchmarkConfig,
+    BenchmarkReport,
+    QueryResult,
+    compare_reports,
+    run_benchmark,
+)
+
+
+def print_report(report: BenchmarkReport) -> None:
+    config = report.config
+    ingest = report.ingest
+    print("=" * 70)
+    print(f"KNOWLEDGE BENCHMARK  backend={config.backend}  corpus={config.corpus}  seed={config.seed}")
+    print("=" * 70)
+    print(
+        f"Ingest: {ingest.documents} documents, {ingest.chunks + ingest.canon_chunks} chunks "
+        f"({ingest.canon_chunks} canon) in {ingest.seconds:.2f}s"
+    )
+    print(f"        {ingest.chunks_per_second:.1f} chunks/s, {ingest.documents_per_second:.1f} documents/s")
+    print()
+    print(f"{'Method':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{f'recall@{config.k}':>12}")
+    for method in ("query", "query_with_canon"):
+        result: QueryResult = getattr(report, method)
+        print(
+            f"{method:<20}{result.latency.p50_ms:>10.2f}{result.latency.p95_ms:>10.2f}"
+            f"{result.latency.p99_ms:>10.2f}{result.recall:>12.3f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark knowledge ingest, query latency and recall"
+    )
+    parser.add_argument(
+        "--corpus", default="synthetic",
+        help="'synthetic' or a directory of fixture documents"
+    )
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks to ingest")
+    parser.add_argument(
+        "--chunks-per-document", type=int, default=20,
+        help="Paragraphs per synthetic document"
+    )
+    parser.add_argument(
+        "--canon-fraction", type=float, default=0.2,
+        help="Fraction of documents added to the shared canon"
+    )
+    parser.add_argument(
+        "--backend", default="chroma", choices=["chroma", "local", "pgvector"],
+        help="Vector backend"
+    )
+    parser.add_argument("--dimensions", type=int, default=128, help="Embedding dimensions")
+    parser.add_argument("--hybrid", action="store_true", help="Enable hybrid BM25 search")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per method")
+    parser.add_argument("-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus and query seed")
+    parser.add_argument(
+        "--storage", type=Path,
+        help="Keep the knowledge base here (default: a temporary directory)"
+    )
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    parser.add_argument(
+        "--baseline", type=Path,
+        help="Compare against a saved report; exit 1 on regressions"
+    )
+    parser.add_argument(
+        "--latency-tolerance", type=float, default=0.2,
+        help="Allowed fractional latency increase"
+    )
+    parser.add_argument(
+        "--throughput-tolerance", type=float, default=0.2,
+        help="Allowed fractional ingest throughput decrease"
+    )
+    parser.add_argument(
+        "--recall-tolerance", type=float, default=0.01,
+        help="Allowed absolute recall decrease"
+    )
+
+    args = parser.parse_args()
+
+    config = BenchmarkConfig(
+        corpus=args.corpus,
+        chunks=args.chunks,
+        chunks_per_document=args.chunks_per_document,
+        canon_fraction=args.canon_fraction,
+        backend=args.backend,
+        dimensions=args.dimensions,
+        hybrid_search=args.hybrid,
+        queries=args.queries,
+        k=args.k,
+        seed=args.seed,
+    )
+    report = run_benchmark(config, args.storage)
+    print_report(report)
+
+    if args.output:
+        args.output.write_text(report.model_dump_json(indent=2))
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        baseline = BenchmarkReport.model_validate_json(args.baseline.read_text())
+        try:
+            regressions = compare_reports(
+                baseline,
+                report,
+                latency_tolerance=args.latency_tolerance,
+                throughput_tolerance=args.throughput_tolerance,
+                recall_tolerance=args.recall_tolerance,
+            )
+        except ValueError as e:
+            print(f"\n{e}")
+            return 2
+        if regressions:
+            print(f"\nREGRESSIONS against {args.baseline}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
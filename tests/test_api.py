@@ -6,6 +6,8 @@ import pytest
 from fastapi.testclient import TestClient
 
 from packages.api import app
+from packages.api import governance as governance_api
+from packages.core.governance.feed import PolicyConflictError
 
 
 @pytest.fixture
@@ -179,3 +181,104 @@ class TestSimulationEndpoint:
         assert data["total"] == 2
         assert len(data["results"]) == 2
         assert data["tools_executed"] == 0
+
+
+class TestGovernanceBatchEndpoint:
+    """Tests for the batch governance evaluation endpoint."""
+
+    def test_evaluate_batch_returns_results_in_order(self, client: TestClient) -> None:
+        """Batch evaluation returns one result per query."""
+        response = client.post(
+            "/governance/evaluate/batch",
+            json={
+                "queries": ["What are the pool hours?", "Review the contract", "What are the pool hours?"],
+                "agent_id": "parks-recreation",
+                "domain": "ParksRec",
+            },
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert len(data["results"]) == 3
+        assert data["results"][0] == data["results"][2]
+
+    def test_evaluate_batch_rejects_mismatched_contexts(self, client: TestClient) -> None:
+        """Contexts must line up with queries."""
+        response = client.post(
+            "/governance/evaluate/batch",
+            json={
+                "queries": ["One", "Two"],
+                "contexts": [{"tenant_id": "t1"}],
+            },
+        )
+        assert response.status_code == 400
+
+
+class TestGovernanceReplayEndpoint:
+    """Tests for replaying recorded traffic against policy versions."""
+
+    def test_replay_unknown_version_returns_404(self, client: TestClient) -> None:
+        """Replay needs both versions to exist."""
+        response = client.post(
+            "/governance/versions/compare/missing-1/missing-2/replay",
+            json={"source": "inline", "queries": [{"query": "What are the pool hours?"}]},
+        )
+        assert response.status_code == 404
+
+    def test_replay_rejects_unknown_source(self, client: TestClient) -> None:
+        """Only analytics, traces and inline sources are supported."""
+        response = client.post(
+            "/governance/versions/compare/missing-1/missing-2/replay",
+            json={"source": "audit"},
+        )
+        assert response.status_code == 400
+
+    def test_preview_unknown_change_returns_400(self, client: TestClient) -> None:
+        """A dry run needs a pending change to apply."""
+        response = client.post(
+            "/governance/approval/changes/missing/preview",
+            json={"source": "inline", "queries": [{"query": "What are the pool hours?"}]},
+        )
+        assert response.status_code == 400
+
+
+class TestTenantPoliciesEndpoint:
+    """Tests for per-tenant policy overlays."""
+
+    def test_unknown_tenant_returns_404(self, client: TestClient) -> None:
+        """Tenants without an overlay have nothing to return or remove."""
+        assert client.get("/governance/tenants/no-such-tenant/policies").status_code == 404
+        assert client.delete("/governance/tenants/no-such-tenant/policies").status_code == 404
+
+    def test_overlay_with_constitutional_rules_returns_400(self, client: TestClient) -> None:
+        """Constitutional rules are shared and cannot be set per tenant."""
+        response = client.put(
+            "/governance/tenants/acme/policies",
+            json={
+                "constitutional_rules": [{
+                    "id": "tenant-const-001",
+                    "name": "Tenant constitutional rule",
+                    "conditions": [{"field": "intent.task", "value": "inquiry"}],
+                    "action": {"hitl_mode": "DRAFT"},
+                }],
+            },
+        )
+        assert response.status_code == 400
+
+
+class TestPolicyConflict:
+    """Tests for changes that lose their version to another replica."""
+
+    def test_conflict_returns_409_with_current_version(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A discarded change is reported as a conflict naming the winning version."""
+        class ConflictingManager:
+            def add_prohibited_topic(self, topic: str) -> None:
+                raise PolicyConflictError("lost", version_number=7, current_version=8)
+
+        monkeypatch.setattr(governance_api, "get_governance_manager", ConflictingManager)
+        response = client.post("/governance/prohibited-topics", json={"topic": "parks"})
+
+        assert response.status_code == 409
+        assert response.json()["detail"]["current_version"] == 8
@@ -0,0 +1,163 @@
+"""Unit tests for the persistent embedding cache."""
+
+from pathlib import Path
+
+import pytest
+
+from packages.core.cache import EmbeddingCache
+from packages.core.cache.embeddings import embedding_model_name
+
+
+class CountingEmbedding:
+    """Embeds text as [length, vowels, 0.5] and records each call."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(sum(c in "aeiou" for c in t)), 0.5] for t in texts]
+
+
+class NamedEmbedding:
+    """A Chroma-style embedding function of a named provider and model."""
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    @staticmethod
+    def name() -> str:
+        return "openai"
+
+    def get_config(self) -> dict:
+        return {"model_name": self.model_name, "api_key_env_var": "OPENAI_API_KEY"}
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+@pytest.fixture
+def cache(tmp_path: Path) -> EmbeddingCache:
+    return EmbeddingCache(tmp_path)
+
+
+@pytest.fixture
+def embedding() -> CountingEmbedding:
+    return CountingEmbedding()
+
+
+# ============================================================================
+# Test: EmbeddingCache
+# ============================================================================
+
+class TestEmbeddingCache:
+    """Test caching embeddings by model and content hash."""
+
+    def test_only_uncached_texts_are_embedded(
+        self, cache: EmbeddingCache, embedding: CountingEmbedding
+    ):
+        """Cached text is not sent to the embedding function again."""
+        first = cache.embed("model", ["pools", "parks"], embedding)
+        second = cache.embed("model", ["parks", "dogs", "pools"], embedding)
+
+        assert embedding.calls == [["pools", "parks"], ["dogs"]]
+        assert second == [first[1], [4.0, 1.0, 0.5], first[0]]
+
+    def test_repeated_texts_are_embedded_once(
+        self, cache: EmbeddingCache, embedding: CountingEmbedding
+    ):
+        """Duplicate chunks in one call share an embedding."""
+        vectors = cache.embed("model", ["footer", "body", "footer"], embedding)
+
+        assert embedding.calls == [["footer", "body"]]
+        assert vectors[0] == vectors[2]
+        assert cache.count("model") == 2
+
+    def test_models_are_cached_separately(
+        self, cache: EmbeddingCache, embedding: CountingEmbedding
+    ):
+        """The same text embedded by another model is a miss."""
+        cache.embed("small", ["pools"], embedding)
+        cache.embed("large", ["pools"], embedding)
+
+        assert len(embedding.calls) == 2
+        assert cache.count("small") == cache.count("large") == 1
+
+    def test_vectors_are_float32(self, cache: EmbeddingCache):
+        """Fresh and cached vectors are rounded the same way."""
+        fresh = cache.embed("model", ["pools"], lambda texts: [[0.1, 0.2, 0.3]])
+        cached = cache.embed("model", ["pools"], lambda texts: pytest.fail("re-embedded"))
+
+        assert fresh == cached
+        assert fresh[0] != [0.1, 0.2, 0.3]
+        assert fresh[0] == pytest.approx([0.1, 0.2, 0.3])
+
+    def test_cache_persists(self, tmp_path: Path, embedding: CountingEmbedding):
+        """A new cache on the same directory reads earlier vectors."""
+        vectors = EmbeddingCache(tmp_path).embed("model", ["pools", "parks"], embedding)
+
+        reopened = EmbeddingCache(tmp_path)
+        assert reopened.get_many("model", ["parks", "pools", "dogs"]) == [
+            vectors[1], vectors[0], None
+        ]
+
+    def test_cache_grows_across_reads(self, cache: EmbeddingCache, embedding: CountingEmbedding):
+        """Vectors appended after the file was mapped are readable."""
+        for i in range(50):
+            cache.embed("model", [f"chunk {i}"], embedding)
+            assert cache.get_many("model", ["chunk 0"]) == [[7.0, 1.0, 0.5]]
+
+        assert cache.count("model") == 50
+
+    def test_torn_write_is_dropped(self, tmp_path: Path, embedding: CountingEmbedding):
+        """Index rows without a complete vector are discarded on load."""
+        cache = EmbeddingCache(tmp_path)
+        cache.embed("model", ["pools", "parks"], embedding)
+        cache.close()
+        vectors_path = tmp_path / "model.f32"
+        vectors_path.write_bytes(vectors_path.read_bytes()[:-2])
+
+        reopened = EmbeddingCache(tmp_path)
+        assert reopened.count("model") == 1
+        reopened.embed("model", ["parks", "dogs"], embedding)
+        assert embedding.calls[-1] == ["parks", "dogs"]
+        assert reopened.get_many("model", ["pools", "parks", "dogs"])[2] == [4.0, 1.0, 0.5]
+
+    def test_mismatched_dimensions_are_not_cached(self, cache: EmbeddingCache):
+        """Vectors of another dimension are returned but not stored."""
+        cache.embed("model", ["pools"], lambda texts: [[1.0, 2.0]])
+        vectors = cache.embed("model", ["parks"], lambda texts: [[1.0, 2.0, 3.0]])
+
+        assert vectors == [[1.0, 2.0, 3.0]]
+        assert cache.get_many("model", ["parks"]) == [None]
+
+    def test_clear(self, tmp_path: Path, embedding: CountingEmbedding):
+        """Clearing removes persisted vectors."""
+        cache = EmbeddingCache(tmp_path)
+        cache.embed("model", ["pools", "parks"], embedding)
+
+        assert cache.clear() == 2
+        assert EmbeddingCache(tmp_path).get_many("model", ["pools"]) == [None]
+
+    def test_models_of_one_provider_are_cached_separately(self):
+        """Functions sharing a provider name but not a model get their own key."""
+        small = embedding_model_name(NamedEmbedding("text-embedding-3-small"))
+        large = embedding_model_name(NamedEmbedding("text-embedding-3-large"))
+
+        assert small == "openai:text-embedding-3-small"
+        assert small != large
+        assert embedding_model_name(CountingEmbedding()) == "CountingEmbedding"
+
+    def test_caches_sharing_a_directory(self, tmp_path: Path, embedding: CountingEmbedding):
+        """Interleaved appends from two caches map every key to its own vector."""
+        first = EmbeddingCache(tmp_path)
+        second = EmbeddingCache(tmp_path)
+        first.embed("model", ["pools"], embedding)
+        second.embed("model", ["parks", "dog"], embedding)
+        first.embed("model", ["lake"], embedding)
+
+        expected = [[5.0, 2.0, 0.5], [5.0, 1.0, 0.5], [3.0, 1.0, 0.5], [4.0, 2.0, 0.5]]
+        for cache in (first, second, EmbeddingCache(tmp_path)):
+            assert cache.get_many("model", ["pools", "parks", "dog", "lake"]) == expected
+        assert embedding.calls == [["pools"], ["parks", "dog"], ["lake"]]
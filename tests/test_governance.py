@@ -17,6 +17,7 @@ from packages.core.governance import (
     PolicySet,
     RuleAction,
     RuleCondition,
+    compile_policy_set,
     evaluate_governance,
 )
 
@@ -548,3 +549,153 @@ class TestRiskSignalsContains:
         """contains() should return False for empty signals."""
         risk = RiskSignals(signals=[])
         assert risk.contains("PII") is False
+
+
+# ============================================================================
+# Test: Compiled Policy Evaluation
+# ============================================================================
+
+class TestCompiledPolicySet:
+    """Test that the compiled engine matches evaluate_governance."""
+
+    @pytest.mark.parametrize(
+        ("domain", "task", "audience", "impact", "signals"),
+        [
+            ("Comms", "draft_statement", "public", "medium", ["PUBLIC_STATEMENT"]),
+            ("Legal", "contract_review", "internal", "high", ["LEGAL_CONTRACT"]),
+            ("Legal", "contract_review", "internal", "medium", []),
+            ("HR", "lookup_employee", "internal", "medium", ["PII"]),
+            ("General", "answer_question", "internal", "low", []),
+            ("Legal", "contract_review", "public", "high", ["PII", "LEGAL_CONTRACT"]),
+        ],
+    )
+    def test_matches_reference_evaluation(
+        self,
+        default_ctx: UserContext,
+        sample_policy_set: PolicySet,
+        domain: str,
+        task: str,
+        audience: str,
+        impact: str,
+        signals: list[str],
+    ):
+        """Compiled decisions are identical to the linear evaluator."""
+        intent = Intent(
+            domain=domain, task=task, audience=audience, impact=impact, confidence=0.9
+        )
+        risk = RiskSignals(signals=signals)
+
+        compiled = compile_policy_set(sample_policy_set)
+
+        assert compiled.evaluate(intent, risk, default_ctx) == evaluate_governance(
+            intent, risk, default_ctx, sample_policy_set
+        )
+
+    def test_non_indexable_conditions_still_apply(self, default_ctx: UserContext):
+        """neq/contains conditions and ctx fields are evaluated correctly."""
+        policy_set = PolicySet(
+            organization_rules=OrganizationRules(
+                default=[
+                    PolicyRule(
+                        id="rule_not_internal",
+                        name="Not Internal",
+                        conditions=[
+                            RuleCondition(
+                                field="intent.audience",
+                                operator=ConditionOperator.NOT_EQUALS,
+                                value="internal",
+                            )
+                        ],
+                        action=RuleAction(hitl_mode=HITLMode.DRAFT),
+                    ),
+                    PolicyRule(
+                        id="rule_employee_contract",
+                        name="Employee Contract",
+                        conditions=[
+                            RuleCondition(field="ctx.role", value="employee"),
+                            RuleCondition(
+                                field="intent.task",
+                                operator=ConditionOperator.CONTAINS,
+                                value="contract",
+                            ),
+                        ],
+                        action=RuleAction(tools_allowed=False),
+                        priority=10,
+                    ),
+                ]
+            ),
+        )
+        intent = Intent(domain="Legal", task="contract_review", audience="public")
+        risk = RiskSignals(signals=[])
+
+        decision = compile_policy_set(policy_set).evaluate(intent, risk, default_ctx)
+
+        assert decision == evaluate_governance(intent, risk, default_ctx, policy_set)
+        assert decision.policy_trigger_ids == ["rule_employee_contract", "rule_not_internal"]
+        assert decision.tools_allowed is False
+
+    def test_only_matching_department_is_indexed(
+        self, default_ctx: UserContext, sample_policy_set: PolicySet
+    ):
+        """Department rules are only candidates for their own domain."""
+        compiled = compile_policy_set(sample_policy_set)
+        intent = Intent(domain="Comms", task="contract_review")
+
+        matched = compiled.matching_rules(intent, RiskSignals(), default_ctx)
+
+        assert [r.id for r in matched] == []
+        assert compiled.rule_count == 6
+
+    def test_overlay_matches_merged_policy_set(
+        self, default_ctx: UserContext, sample_policy_set: PolicySet
+    ):
+        """An overlay evaluates like its rules appended to the base tiers."""
+        overlay = PolicySet(
+            organization_rules=OrganizationRules(
+                default=[
+                    PolicyRule(
+                        id="tenant_pii_draft",
+                        name="Tenant PII Draft",
+                        conditions=[RuleCondition(field="risk.contains", value="PII")],
+                        action=RuleAction(hitl_mode=HITLMode.DRAFT),
+                    ),
+                ]
+            ),
+            department_rules={
+                "Legal": DepartmentRules(
+                    defaults=[
+                        PolicyRule(
+                            id="tenant_legal_tools",
+                            name="Tenant Legal Tools",
+                            conditions=[RuleCondition(field="intent.task", value="contract_review")],
+                            action=RuleAction(tools_allowed=False),
+                            priority=300,  # ties with dept_legal_contract
+                        ),
+                    ]
+                ),
+            },
+        )
+        merged = sample_policy_set.model_copy(deep=True)
+        merged.organization_rules.default.extend(overlay.organization_rules.default)
+        merged.department_rules["Legal"].defaults.extend(overlay.department_rules["Legal"].defaults)
+
+        base = compile_policy_set(sample_policy_set)
+        layered = compile_policy_set(overlay, parent=base)
+
+        assert layered.parent is base
+        assert layered.rule_count == base.rule_count + 2
+        for intent, risk in [
+            (Intent(domain="HR", task="lookup_employee"), RiskSignals(signals=["PII"])),
+            (Intent(domain="Legal", task="contract_review", impact="high"), RiskSignals(signals=["LEGAL_CONTRACT"])),
+            (Intent(domain="Legal", task="contract_review", audience="public"), RiskSignals(signals=["PII"])),
+            (Intent(domain="Comms", task="contract_review"), RiskSignals()),
+        ]:
+            assert layered.evaluate(intent, risk, default_ctx) == evaluate_governance(
+                intent, risk, default_ctx, merged
+            )
+        # The base is shared, not modified
+        assert base.evaluate(
+            Intent(domain="HR", task="lookup_employee"), RiskSignals(signals=["PII"]), default_ctx
+        ) == evaluate_governance(
+            Intent(domain="HR", task="lookup_employee"), RiskSignals(signals=["PII"]), default_ctx, sample_policy_set
+        )
@@ -0,0 +1,854 @@
+"""Unit tests for the GovernanceManager."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from packages.core.governance import (
+    ConditionOperator,
+    DepartmentRules,
+    OrganizationRules,
+    PolicyRule,
+    PolicySet,
+    RuleAction,
+    RuleCondition,
+)
+from packages.core.governance import manager as manager_module
+from packages.core.governance import replay as replay_module
+from packages.core.governance.feed import (
+    LocalFeedTransport,
+    PolicyChangeEvent,
+    PolicyConflictError,
+    PolicyFeedTransport,
+    SQLiteFeedTransport,
+)
+from packages.core.governance.history import PolicyHistoryLog
+from packages.core.governance.manager import GovernanceManager
+from packages.core.governance.prohibitions import GLOBAL_SCOPE, ProhibitionIndex
+from packages.core.governance.replay import ReplayQuery
+from packages.core.schemas.models import HITLMode, UserContext
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+@pytest.fixture
+def manager(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> GovernanceManager:
+    """Governance manager backed by a temporary data directory."""
+    monkeypatch.setattr(manager_module, "POLICY_HISTORY_PATH", tmp_path / "history.json")
+    monkeypatch.setattr(manager_module, "PENDING_POLICY_PATH", tmp_path / "pending.json")
+    return GovernanceManager(policy_path=tmp_path / "policies.json")
+
+
+# ============================================================================
+# Test: Compiled Policies
+# ============================================================================
+
+class TestCompiledPolicies:
+    """Test that the compiled policy set tracks policy changes."""
+
+    def test_compiled_version_tracks_policy_hash(self, manager: GovernanceManager):
+        """Compiled policies are keyed by the current version and hash."""
+        compiled = manager.get_compiled_policies()
+
+        assert compiled.version == (manager.get_current_version(), manager.get_policy_hash())
+
+    def test_rule_change_recompiles(self, manager: GovernanceManager):
+        """A new department rule is enforced immediately after it is added."""
+        before = manager.get_compiled_policies()
+        manager.add_department_rule(
+            "Parks",
+            PolicyRule(
+                id="dept-parks-001",
+                name="Park Reservations",
+                conditions=[
+                    RuleCondition(
+                        field="intent.task",
+                        operator=ConditionOperator.EQUALS,
+                        value="create",
+                    )
+                ],
+                action=RuleAction(hitl_mode=HITLMode.ESCALATE),
+            ),
+        )
+
+        assert manager.get_compiled_policies() is not before
+        decision = manager.evaluate("Create a new pavilion booking", domain="Parks")
+        assert decision.hitl_mode == HITLMode.ESCALATE
+        assert "dept-parks-001" in decision.policy_trigger_ids
+
+        other = manager.evaluate("Create a new pavilion booking", domain="Finance")
+        assert "dept-parks-001" not in other.policy_trigger_ids
+
+
+# ============================================================================
+# Test: Prohibition Index
+# ============================================================================
+
+class TestProhibitionIndex:
+    """Test single-pass prohibited topic matching."""
+
+    def test_match_groups_topics_by_scope(self):
+        """One match call returns hits for every scope."""
+        index = ProhibitionIndex([
+            "Park Authority",
+            "agent:public-health:vaccines",
+            "domain:Finance:lottery",
+            "agent:hr:salary",
+        ])
+
+        matches = index.match("Is the Park Authority offering a vaccine at the lottery?")
+
+        assert matches == {
+            GLOBAL_SCOPE: ["Park Authority"],
+            "agent:public-health": ["vaccines"],
+            "domain:Finance": ["lottery"],
+        }
+
+    def test_fuzzy_matching_handles_plurals(self):
+        """Agent and domain topics match singular/plural variations."""
+        index = ProhibitionIndex(["agent:a:policies", "agent:a:vaccine"])
+
+        assert index.match("What is the policy?") == {"agent:a": ["policies"]}
+        assert index.match("Vaccines, please.") == {"agent:a": ["vaccine"]}
+
+    def test_global_topics_match_substrings_only(self):
+        """Global topics do not use fuzzy stem matching."""
+        index = ProhibitionIndex(["vaccines"])
+
+        assert index.match("Tell me about the vaccine") == {}
+        assert index.match("Tell me about VACCINES") == {GLOBAL_SCOPE: ["vaccines"]}
+
+    def test_short_words_do_not_match_every_topic(self):
+        """Articles and stray punctuation are not treated as topic fragments."""
+        index = ProhibitionIndex(["agent:a:park authority"])
+
+        assert index.match("Can I get a permit - today?") == {}
+        assert index.match("Who runs the park?") == {"agent:a": ["park authority"]}
+
+    def test_incremental_add_and_remove(self):
+        """Topics can be added and removed without rebuilding the index."""
+        index = ProhibitionIndex(["agent:a:budget"])
+        assert index.match("budget question") == {"agent:a": ["budget"]}
+
+        index.add("agent:a:zoning")
+        index.remove("agent:a:budget")
+
+        assert index.match("budget question") == {}
+        assert index.match("zoning variance") == {"agent:a": ["zoning"]}
+        assert index.topics("agent:a") == ["zoning"]
+
+
+class TestScopedProhibitions:
+    """Test prohibition enforcement through the manager."""
+
+    def test_agent_prohibition_escalates(self, manager: GovernanceManager):
+        """Agent prohibitions block only the affected agent."""
+        manager.add_agent_prohibition("public-health", "vaccines")
+
+        decision = manager.evaluate_for_agent("Where can I get a vaccine?", "public-health")
+        assert decision.hitl_mode == HITLMode.ESCALATE
+        assert decision.policy_trigger_ids == ["agent-prohibition:public-health:vaccines"]
+
+        other = manager.evaluate_for_agent("Where can I get a vaccine?", "311")
+        assert other.policy_trigger_ids == []
+
+    def test_domain_and_global_prohibitions(self, manager: GovernanceManager):
+        """Domain prohibitions apply before global ones."""
+        manager.add_domain_prohibition("Finance", "lottery")
+        manager.add_prohibited_topic("Park Authority")
+
+        decision = manager.evaluate_for_agent(
+            "Lottery funds for the Park Authority", "finance", domain="Finance"
+        )
+        assert decision.policy_trigger_ids == ["domain-prohibition:Finance:lottery"]
+
+        decision = manager.evaluate_for_agent(
+            "Lottery funds for the Park Authority", "311", domain="311"
+        )
+        assert decision.policy_trigger_ids == ["prohibited-topic"]
+        assert manager.get_domain_prohibitions("Finance") == ["lottery"]
+
+    def test_removed_prohibition_no_longer_applies(self, manager: GovernanceManager):
+        """Removing a prohibition updates the index immediately."""
+        manager.add_agent_prohibition("hr", "salary")
+        assert manager.remove_agent_prohibition("hr", "salary") is True
+
+        decision = manager.evaluate_for_agent("What is the salary range?", "hr")
+        assert "agent-prohibition:hr:salary" not in decision.policy_trigger_ids
+        assert manager.get_agent_prohibitions("hr") == []
+
+
+# ============================================================================
+# Test: Batch Evaluation
+# ============================================================================
+
+class TestEvaluateMany:
+    """Test batch evaluation against a single policy snapshot."""
+
+    QUERIES = (
+        "Delete the employee salary records",
+        "What are the pool hours?",
+        "Create a new pavilion booking",
+        "Where can I get a vaccine?",
+        "Lottery funds for the Park Authority",
+        "What are the pool hours?",
+        "Our attorney needs the procurement contract",
+    )
+
+    @pytest.fixture
+    def configured(self, manager: GovernanceManager) -> GovernanceManager:
+        manager.add_agent_prohibition("public-health", "vaccines")
+        manager.add_domain_prohibition("Finance", "lottery")
+        manager.add_organization_rule(
+            PolicyRule(
+                id="org-create-001",
+                name="Create Review",
+                conditions=[
+                    RuleCondition(
+                        field="intent.task",
+                        operator=ConditionOperator.EQUALS,
+                        value="create",
+                    ),
+                    RuleCondition(
+                        field="ctx.role",
+                        operator=ConditionOperator.NOT_EQUALS,
+                        value="director",
+                    ),
+                ],
+                action=RuleAction(hitl_mode=HITLMode.DRAFT),
+            )
+        )
+        return manager
+
+    @pytest.mark.parametrize("agent_id,domain", [
+        (None, "General"),
+        ("public-health", "PublicHealth"),
+        ("finance", "Finance"),
+    ])
+    def test_matches_single_evaluation(
+        self, configured: GovernanceManager, agent_id: str | None, domain: str
+    ):
+        """Batch decisions equal per-query evaluation."""
+        decisions = configured.evaluate_many(self.QUERIES, agent_id=agent_id, domain=domain)
+
+        for query, decision in zip(self.QUERIES, decisions, strict=True):
+            if agent_id is None:
+                expected = configured.evaluate(query, domain=domain)
+            else:
+                expected = configured.evaluate_for_agent(query, agent_id, domain=domain)
+            assert decision == expected
+
+    def test_per_query_contexts(self, configured: GovernanceManager):
+        """Each query is evaluated with its own user context."""
+        contexts = [
+            UserContext(tenant_id="t1", role="director"),
+            UserContext(tenant_id="t1", role="clerk"),
+            None,
+        ]
+        queries = ["Create a new pavilion booking"] * 3
+
+        decisions = configured.evaluate_many(queries, contexts=contexts)
+
+        assert [d.policy_trigger_ids for d in decisions] == [
+            [],
+            ["org-create-001"],
+            ["org-create-001"],
+        ]
+
+    def test_results_are_independent(self, configured: GovernanceManager):
+        """Repeated queries do not share mutable decision objects."""
+        first, second = configured.evaluate_many(["Create a new pavilion booking"] * 2)
+
+        first.policy_trigger_ids.append("extra")
+
+        assert second.policy_trigger_ids == ["org-create-001"]
+
+    def test_context_count_must_match(self, manager: GovernanceManager):
+        """Mismatched contexts are rejected."""
+        with pytest.raises(ValueError):
+            manager.evaluate_many(["a", "b"], contexts=[None])
+
+
+# ============================================================================
+# Test: Decision Cache
+# ============================================================================
+
+class TestDecisionCache:
+    """Test memoization of governance decisions."""
+
+    def test_repeated_queries_hit_the_cache(self, manager: GovernanceManager):
+        """Identical requests after normalization reuse the cached decision."""
+        first = manager.evaluate("What are the pool hours?")
+        second = manager.evaluate("  WHAT are the pool hours?")
+
+        stats = manager.get_decision_cache_stats()
+        assert second == first
+        assert (stats.hits, stats.misses) == (1, 1)
+
+    def test_key_includes_agent_domain_and_context(self, manager: GovernanceManager):
+        """Different agents, domains and contexts are cached separately."""
+        query = "What are the pool hours?"
+        manager.evaluate_for_agent(query, "parks-recreation", domain="ParksRec")
+        manager.evaluate_for_agent(query, "311", domain="ParksRec")
+        manager.evaluate_for_agent(query, "311", domain="311")
+        manager.evaluate_for_agent(
+            query, "311", domain="311",
+            user_context=UserContext(tenant_id="default", role="director"),
+        )
+
+        stats = manager.get_decision_cache_stats()
+        assert (stats.hits, stats.misses, stats.entries) == (0, 4, 4)
+
+    def test_cached_decisions_are_copies(self, manager: GovernanceManager):
+        """Mutating a returned decision does not change the cached one."""
+        manager.evaluate("Delete the salary records").policy_trigger_ids.append("extra")
+
+        assert "extra" not in manager.evaluate("Delete the salary records").policy_trigger_ids
+
+    def test_policy_change_invalidates(self, manager: GovernanceManager):
+        """Adding a prohibition changes the hash and drops cached decisions."""
+        query = "Where can I get a vaccine?"
+        assert manager.evaluate_for_agent(query, "public-health").policy_trigger_ids == []
+
+        manager.add_agent_prohibition("public-health", "vaccines")
+
+        decision = manager.evaluate_for_agent(query, "public-health")
+        assert decision.policy_trigger_ids == ["agent-prohibition:public-health:vaccines"]
+        assert manager.get_decision_cache_stats().invalidations == 1
+
+    def test_rollback_invalidates(self, manager: GovernanceManager):
+        """Rolling back restores the old decision instead of a cached one."""
+        query = "Where can I get a vaccine?"
+        before = manager.get_current_version()
+        manager.add_agent_prohibition("public-health", "vaccines")
+        assert manager.evaluate_for_agent(query, "public-health").hitl_mode == HITLMode.ESCALATE
+
+        version = manager.get_version_by_number(before)
+        assert manager.rollback_to_version(version.version_id)
+
+        assert manager.evaluate_for_agent(query, "public-health").policy_trigger_ids == []
+
+
+# ============================================================================
+# Test: Version History
+# ============================================================================
+
+def _snapshot(topics: list[str], rules: list[str]) -> dict:
+    return {
+        "constitutional_rules": [{"id": r, "name": r.upper()} for r in rules],
+        "organization_rules": {"default": []},
+        "department_rules": {},
+        "prohibited_topics": topics,
+        "immutable_rules": [],
+    }
+
+
+def _meta(number: int) -> dict:
+    return {
+        "version_id": f"v{number}",
+        "version_number": number,
+        "created_at": "2026-01-01T00:00:00",
+        "created_by": "test",
+        "change_description": f"Change {number}",
+        "policy_hash": f"hash{number}",
+    }
+
+
+class TestPolicyHistoryLog:
+    """Test the append-only, delta-encoded history log."""
+
+    def test_snapshots_round_trip(self, tmp_path: Path):
+        """Every version materializes exactly as it was appended."""
+        log = PolicyHistoryLog(tmp_path / "history.json", checkpoint_interval=3)
+        expected = {}
+        topics: list[str] = []
+        rules = ["const-001"]
+        for n in range(1, 11):
+            if n % 2:
+                topics = [*topics, f"topic-{n}"]
+            else:
+                rules = [f"const-{n:03d}", *rules[1:]] if n % 4 == 0 else [*rules, f"const-{n:03d}"]
+            expected[n] = _snapshot(topics, rules)
+            log.append(_meta(n), expected[n])
+
+        reopened = PolicyHistoryLog(tmp_path / "history.json")
+        assert [e.kind for e in reopened.entries()][:4] == ["checkpoint", "delta", "delta", "checkpoint"]
+        assert reopened.snapshots(list(expected)) == expected
+        assert reopened.snapshot(7) == expected[7]
+        assert reopened.snapshot(2) == expected[2]
+
+    def test_append_does_not_rewrite(self, tmp_path: Path):
+        """Appending a version leaves earlier bytes untouched."""
+        path = tmp_path / "history.json"
+        log = PolicyHistoryLog(path)
+        log.append(_meta(1), _snapshot(["a"], []))
+        before = path.read_bytes()
+
+        log.append(_meta(2), _snapshot(["a", "b"], []))
+
+        after = path.read_bytes()
+        assert after.startswith(before)
+        assert after.count(b"\n") == 2
+
+    def test_migrates_legacy_history(self, tmp_path: Path):
+        """A single-document history from older releases is converted."""
+        path = tmp_path / "history.json"
+        versions = [dict(_meta(n), policy_snapshot=_snapshot([f"t{n}"], [])) for n in (1, 2)]
+        path.write_text(json.dumps({"versions": versions}, indent=2), encoding="utf-8")
+
+        log = PolicyHistoryLog(path)
+
+        assert [e.version_id for e in log.entries()] == ["v1", "v2"]
+        assert log.snapshot(2) == _snapshot(["t2"], [])
+        assert PolicyHistoryLog(path).snapshot(1) == _snapshot(["t1"], [])
+
+    def test_ignores_torn_trailing_write(self, tmp_path: Path):
+        """A partially written last line is skipped, then dropped by the next writer."""
+        path = tmp_path / "history.json"
+        log = PolicyHistoryLog(path)
+        log.append(_meta(1), _snapshot(["a"], []))
+        with open(path, "ab") as f:
+            f.write(b'{"version_id":"v2"')
+
+        torn = path.read_bytes()
+        reopened = PolicyHistoryLog(path)
+        assert len(reopened) == 1
+        assert path.read_bytes() == torn  # readers never truncate
+        reopened.append(_meta(2), _snapshot(["b"], []))
+        assert PolicyHistoryLog(path).snapshot(2) == _snapshot(["b"], [])
+
+    def test_writers_sharing_a_log(self, tmp_path: Path):
+        """Each writer deltas against versions the other appended."""
+        path = tmp_path / "history.json"
+        first = PolicyHistoryLog(path)
+        second = PolicyHistoryLog(path)
+        first.append(_meta(1), _snapshot(["a"], []))
+        second.append(_meta(2), _snapshot(["a", "b"], []))
+        first.append(_meta(3), _snapshot(["a", "b", "c"], []))
+
+        expected = {
+            1: _snapshot(["a"], []),
+            2: _snapshot(["a", "b"], []),
+            3: _snapshot(["a", "b", "c"], []),
+        }
+        assert [e.kind for e in PolicyHistoryLog(path).entries()] == ["checkpoint", "delta", "delta"]
+        assert PolicyHistoryLog(path).snapshots([1, 2, 3]) == expected
+        assert first.snapshots([1, 2, 3]) == expected
+
+    def test_refresh_indexes_other_writers(self, tmp_path: Path):
+        """Refreshing keeps the loaded index and adds versions appended elsewhere."""
+        path = tmp_path / "history.json"
+        reader = PolicyHistoryLog(path)
+        writer = PolicyHistoryLog(path)
+        writer.append(_meta(1), _snapshot(["a"], []))
+        assert len(reader) == 1
+
+        writer.append(_meta(2), _snapshot(["a", "b"], []))
+        reader.refresh()
+
+        assert reader.find("v2") is not None
+        assert reader.snapshot(2) == _snapshot(["a", "b"], [])
+
+    def test_concurrent_first_reads(self, tmp_path: Path):
+        """Threads reading a log being loaded all see every version."""
+        path = tmp_path / "history.json"
+        writer = PolicyHistoryLog(path)
+        for n in range(1, 201):
+            writer.append(_meta(n), _snapshot([f"t{n}"], []))
+
+        log = PolicyHistoryLog(path)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            found = list(pool.map(lambda _: log.find("v200"), range(32)))
+
+        assert all(entry is not None for entry in found)
+
+
+class TestVersionHistory:
+    """Test versioning through the manager."""
+
+    def test_history_survives_restart_and_rolls_back(
+        self, manager: GovernanceManager, tmp_path: Path
+    ):
+        """Versions are read lazily by a new manager and can be rolled back."""
+        manager.add_prohibited_topic("Park Authority")
+        base = manager.get_current_version()
+        manager.add_agent_prohibition("hr", "salary")
+        manager.remove_prohibited_topic("Park Authority")
+
+        restarted = GovernanceManager(policy_path=tmp_path / "policies.json")
+        history = restarted.get_version_history()
+        assert [v["version_number"] for v in history[:3]] == [base + 2, base + 1, base]
+        assert history[0]["policy_snapshot"]["prohibited_topics"] == ["agent:hr:salary"]
+
+        version = restarted.get_version_by_number(base)
+        diff = restarted.compare_versions(version.version_id, history[0]["version_id"])
+        assert {"type": "removed", "tier": "prohibited_topic", "topic": "Park Authority"} in diff["changes"]
+
+        assert restarted.rollback_to_version(version.version_id)
+        assert restarted.list_prohibited_topics() == ["Park Authority"]
+
+
+class TestPolicySnapshots:
+    """Test published snapshots and policy file watching."""
+
+    def test_writes_publish_a_new_snapshot(self, manager: GovernanceManager):
+        """A write swaps in a new snapshot and leaves the old one untouched."""
+        before = manager.get_policy_snapshot()
+
+        manager.add_prohibited_topic("Park Authority")
+
+        after = manager.get_policy_snapshot()
+        assert after is not before
+        assert after.version == before.version + 1
+        assert "Park Authority" not in before.prohibited_topics
+        assert before.prohibitions.match("Park Authority budget") == {}
+        assert after.prohibitions.match("Park Authority budget")[GLOBAL_SCOPE] == ["Park Authority"]
+
+    def test_snapshot_reuses_unchanged_structures(self, manager: GovernanceManager):
+        """A prohibition change edits the previous index and keeps the compiled rules."""
+        manager.set_tenant_policies("acme", _tenant_overlay())
+        manager.add_prohibited_topic("Park Authority")
+        before = manager.get_policy_snapshot()
+
+        manager.add_prohibited_topic("Water Board")
+        manager.remove_prohibited_topic("Park Authority")
+
+        after = manager.get_policy_snapshot()
+        assert after.policy_set is before.policy_set
+        assert after.compiled.base is before.compiled.base
+        assert after.compiled.version == (after.version, after.policy_hash)
+        assert after.tenants["acme"].parent is after.compiled
+        assert after.tenant_policies["acme"] is before.tenant_policies["acme"]
+        assert after.prohibitions is not before.prohibitions
+        assert after.prohibitions.match("Park Authority and Water Board") == {
+            GLOBAL_SCOPE: ["Water Board"]
+        }
+        assert before.prohibitions.match("Park Authority and Water Board") == {
+            GLOBAL_SCOPE: ["Park Authority"]
+        }
+
+    def test_snapshot_is_isolated_from_working_state(self, manager: GovernanceManager):
+        """Rules added later do not appear in an earlier snapshot's policy set."""
+        before = manager.get_policy_set()
+        count = len(before.organization_rules.default)
+
+        manager.add_organization_rule(PolicyRule(
+            id="org-snapshot-001",
+            name="Snapshot test",
+            conditions=[],
+            action=RuleAction(hitl_mode=HITLMode.DRAFT),
+        ))
+
+        assert len(before.organization_rules.default) == count
+        assert len(manager.get_policy_set().organization_rules.default) == count + 1
+
+    def test_watcher_reloads_external_edits(self, manager: GovernanceManager, tmp_path: Path):
+        """An external edit of the policy file is picked up by the watcher."""
+        path = tmp_path / "policies.json"
+        assert manager.check_file_drift()["drift_detected"] is False
+        assert manager._watcher.check() is False
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        data["prohibited_topics"] = ["Park Authority"]
+        path.write_text(json.dumps(data) + "\n", encoding="utf-8")
+
+        assert manager.check_file_drift()["drift_detected"] is True
+        assert manager._watcher.check() is True
+        assert manager.list_prohibited_topics() == ["Park Authority"]
+        assert manager.check_file_drift()["drift_detected"] is False
+
+    def test_file_drift_skips_unchanged_file(
+        self, manager: GovernanceManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """The policy file is not parsed while its stat signature is unchanged."""
+        def fail_read(*args, **kwargs):
+            raise AssertionError("policy file was read")
+
+        monkeypatch.setattr(Path, "read_text", fail_read)
+
+        assert manager.check_file_drift()["status"] == "ok"
+
+
+@pytest.fixture(params=["local", "sqlite"])
+def feed_transports(request, tmp_path: Path):
+    """Factory for transports of one shared feed."""
+    created: list[PolicyFeedTransport] = []
+
+    def make() -> PolicyFeedTransport:
+        if request.param == "local":
+            transport: PolicyFeedTransport = LocalFeedTransport(tmp_path / "feed.log")
+        else:
+            transport = SQLiteFeedTransport(tmp_path / "feed.db")
+        created.append(transport)
+        return transport
+
+    yield make
+    for transport in created:
+        transport.close()
+
+
+class TestPolicyFeed:
+    """Test propagation of policy changes between replicas."""
+
+    def test_replica_applies_published_changes(
+        self, manager: GovernanceManager, tmp_path: Path, feed_transports,
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        """Changes made on one replica are applied in order on another."""
+        replica = GovernanceManager(policy_path=tmp_path / "policies.json")
+        manager.attach_policy_feed(feed_transports(), start=False)
+        replica.attach_policy_feed(feed_transports(), start=False)
+
+        manager.add_prohibited_topic("Park Authority")
+        manager.add_agent_prohibition("hr", "salary")
+
+        def fail_hash(self):
+            raise AssertionError("policy hash was recomputed")
+
+        monkeypatch.setattr(GovernanceManager, "_compute_policy_hash", fail_hash)
+        assert replica._feed.poll() == 2
+        assert replica.get_current_version() == manager.get_current_version()
+        assert replica.get_policy_hash() == manager.get_policy_hash()
+        assert replica.list_prohibited_topics() == ["Park Authority", "agent:hr:salary"]
+        assert replica.evaluate("Park Authority budget").hitl_mode == HITLMode.ESCALATE
+
+    def test_replica_catches_up_from_history(
+        self, manager: GovernanceManager, tmp_path: Path, feed_transports
+    ):
+        """A version whose base was missed is loaded from the version history."""
+        transport = feed_transports()
+        replica = GovernanceManager(policy_path=tmp_path / "policies.json")
+        manager.attach_policy_feed(transport, start=False)
+        replica.attach_policy_feed(feed_transports(), start=False)
+
+        manager.add_prohibited_topic("Park Authority")
+        manager.add_prohibited_topic("Lawsuit")
+        latest = transport.read_since(replica.get_current_version())[-1]
+
+        assert replica.apply_policy_change(latest)
+        assert replica.list_prohibited_topics() == ["Park Authority", "Lawsuit"]
+        assert replica._feed.poll() == 0
+
+    def test_conflicting_replicas_converge(
+        self, manager: GovernanceManager, tmp_path: Path, feed_transports
+    ):
+        """A replica that loses a version number discards its change and adopts the winner."""
+        replica = GovernanceManager(policy_path=tmp_path / "policies.json")
+        manager.attach_policy_feed(feed_transports(), start=False)
+        replica.attach_policy_feed(feed_transports(), start=False)
+        base = manager.get_current_version()
+
+        manager.add_prohibited_topic("alpha")
+        with pytest.raises(PolicyConflictError):
+            replica.add_prohibited_topic("beta")
+
+        assert replica.get_current_version() == base + 1
+        assert replica.list_prohibited_topics() == ["alpha"]
+        assert replica.get_policy_hash() == manager.get_policy_hash()
+        history = PolicyHistoryLog(tmp_path / "history.json")
+        assert [e.version_number for e in history.entries()].count(base + 1) == 1
+        written = json.loads((tmp_path / "policies.json").read_text(encoding="utf-8"))
+        assert written["prohibited_topics"] == ["alpha"]
+
+        replica.add_prohibited_topic("beta")
+        assert manager._feed.poll() == 1
+        assert manager.get_current_version() == replica.get_current_version() == base + 2
+        assert manager.list_prohibited_topics() == replica.list_prohibited_topics() == [
+            "alpha", "beta"
+        ]
+        assert manager.get_policy_hash() == replica.get_policy_hash()
+        assert replica.get_policy_feed_status()["conflicts"] == 1
+
+    def test_duplicate_versions_are_rejected(self, manager: GovernanceManager, feed_transports):
+        """Only the first event published for a version number is kept."""
+        transport = feed_transports()
+        manager.attach_policy_feed(transport, start=False)
+        manager.add_prohibited_topic("Park Authority")
+        event = transport.read_since(0)[-1]
+
+        assert transport.publish(event) is False
+        assert [e.version_number for e in transport.read_since(0)] == [event.version_number]
+
+    def test_local_transport_drops_read_events(self, tmp_path: Path):
+        """Events behind the read cursor leave memory but can still be read back."""
+        transport = LocalFeedTransport(tmp_path / "feed.log")
+        try:
+            events = [
+                PolicyChangeEvent(
+                    version_number=n, policy_hash=f"h{n}", base_version=n - 1,
+                    base_hash=f"h{n - 1}", delta=[], origin="test",
+                )
+                for n in range(1, 6)
+            ]
+            for event in events:
+                transport.publish(event)
+
+            assert transport.read_since(3) == events[3:]
+            assert list(transport._events) == [4, 5]
+            assert transport.read_since(0) == events
+            assert transport.publish(events[1]) is False
+        finally:
+            transport.close()
+
+    def test_local_transport_wakes_subscribers(self, tmp_path: Path):
+        """Publishing on a local feed wakes other subscribers without polling."""
+        publisher = LocalFeedTransport(tmp_path / "feed.log")
+        subscriber = LocalFeedTransport(tmp_path / "feed.log")
+        try:
+            assert subscriber.wait(0.01) is False
+            event = PolicyChangeEvent(
+                version_number=1,
+                policy_hash="abc",
+                base_version=0,
+                base_hash="",
+                delta=[],
+                origin="test",
+            )
+            publisher.publish(event)
+            assert subscriber.wait(5) is True
+            assert subscriber.read_since(0) == [event]
+        finally:
+            publisher.close()
+            subscriber.close()
+
+
+
+class TestPolicyReplay:
+    """Test behavioral what-if replay of recorded queries."""
+
+    QUERIES = (
+        ReplayQuery("What is the Park Authority budget?"),
+        ReplayQuery("what is the park authority budget?  "),
+        ReplayQuery("What is the Park Authority budget?", agent_id="311"),
+        ReplayQuery("What are the pool hours?"),
+    )
+
+    def test_compare_versions_reports_decision_changes(self, manager: GovernanceManager):
+        """Replay counts the queries whose decisions change between versions."""
+        before = manager.get_current_version()
+        manager.add_prohibited_topic("Park Authority")
+        v1 = manager.get_version_by_number(before)
+        v2 = manager.get_version_by_number(manager.get_current_version())
+
+        diff = manager.compare_versions(v1.version_id, v2.version_id, queries=self.QUERIES)
+
+        behavior = diff["behavior"]
+        assert behavior["total_queries"] == 4
+        assert behavior["unique_queries"] == 3
+        assert behavior["changed_queries"] == 3
+        assert behavior["triggers_added"] == {"prohibited-topic": 3}
+        assert sum(behavior["hitl_mode_changes"].values()) == 3
+        assert behavior["examples"][0]["after"]["hitl_mode"] == "ESCALATE"
+        assert "behavior" not in manager.compare_versions(v1.version_id, v2.version_id)
+
+    def test_process_pool_matches_in_process(
+        self, manager: GovernanceManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Chunked replay in worker processes gives the same report."""
+        before = manager.get_version_by_number(manager.get_current_version()).policy_snapshot
+        manager.add_agent_prohibition("311", "budget")
+        after = manager.get_version_by_number(manager.get_current_version()).policy_snapshot
+
+        expected = replay_module.replay_queries(before, after, self.QUERIES, workers=1)
+        monkeypatch.setattr(replay_module, "MIN_PARALLEL_REQUESTS", 0)
+        monkeypatch.setattr(replay_module.os, "cpu_count", lambda: 2)  # workers are capped at it
+        pooled = replay_module.replay_queries(before, after, self.QUERIES, workers=2, chunk_size=1)
+
+        assert pooled == expected
+        assert pooled.changed_queries == 1
+
+    def test_preview_change_does_not_apply_it(self, manager: GovernanceManager):
+        """Previewing a pending change replays it without saving anything."""
+        version = manager.get_current_version()
+        change = manager.propose_rule_change(
+            change_type="add_prohibition",
+            description="Block Park Authority",
+            data={"topic": "Park Authority", "scope": "global"},
+        )
+
+        result = manager.preview_change(change.change_id, self.QUERIES)
+
+        assert result["success"] is True
+        assert result["behavior"]["changed_queries"] == 3
+        assert manager.get_current_version() == version
+        assert manager.list_prohibited_topics() == []
+        assert manager.get_change(change.change_id).status == "pending"
+
+
+def _tenant_overlay(rule_id: str = "tenant-hr-001") -> PolicySet:
+    return PolicySet(
+        department_rules={
+            "HR": DepartmentRules(defaults=[
+                PolicyRule(
+                    id=rule_id,
+                    name="Tenant HR Review",
+                    conditions=[RuleCondition(field="intent.task", value="inquiry")],
+                    action=RuleAction(hitl_mode=HITLMode.DRAFT),
+                ),
+            ]),
+        },
+    )
+
+
+class TestTenantPolicies:
+    """Test per-tenant policy overlays over the shared base."""
+
+    def test_overlay_applies_only_to_its_tenant(self, manager: GovernanceManager):
+        """Requests are evaluated against their own tenant's overlay."""
+        manager.set_tenant_policies("acme", _tenant_overlay())
+
+        acme = manager.evaluate("What is the leave policy?", "HR", UserContext(tenant_id="acme"))
+        other = manager.evaluate("What is the leave policy?", "HR", UserContext(tenant_id="globex"))
+
+        assert "tenant-hr-001" in acme.policy_trigger_ids
+        assert acme.hitl_mode == HITLMode.DRAFT
+        assert "tenant-hr-001" not in other.policy_trigger_ids
+        assert manager.evaluate_many(
+            ["What is the leave policy?"], domain="HR", contexts=[UserContext(tenant_id="acme")]
+        )[0] == acme
+
+    def test_overlays_share_the_compiled_base(self, manager: GovernanceManager):
+        """Each tenant compiles only its own rules on top of one base."""
+        manager.set_tenant_policies("acme", _tenant_overlay())
+        manager.set_tenant_policies("globex", _tenant_overlay("tenant-hr-002"))
+
+        base = manager.get_compiled_policies()
+        acme = manager.get_compiled_policies("acme")
+        globex = manager.get_compiled_policies("globex")
+
+        assert acme.parent is base
+        assert globex.parent is base
+        assert acme.rule_count == base.rule_count + 1
+        assert manager.get_compiled_policies("initech") is base
+        assert manager.list_policy_tenants() == ["acme", "globex"]
+
+    def test_overlays_persist_and_roll_back(self, manager: GovernanceManager, tmp_path: Path):
+        """Overlays are saved with the policies and versioned with them."""
+        before = manager.get_current_version()
+        manager.set_tenant_policies("acme", _tenant_overlay())
+
+        restarted = GovernanceManager(policy_path=tmp_path / "policies.json")
+        assert restarted.get_policy_hash() == manager.get_policy_hash()
+        overlay = restarted.get_tenant_policies("acme")
+        assert overlay is not None
+        assert overlay.department_rules["HR"].defaults[0].id == "tenant-hr-001"
+
+        manager.rollback_to_version(manager.get_version_by_number(before).version_id)
+        assert manager.get_tenant_policies("acme") is None
+        assert manager.remove_tenant_policies("acme") is False
+
+    def test_overlay_cannot_shadow_base_rules(self, manager: GovernanceManager):
+        """Overlays cannot add constitutional rules or reuse base rule IDs."""
+        base_rule = manager.get_all_rules()["constitutional"][0]
+
+        with pytest.raises(ValueError, match="constitutional"):
+            manager.set_tenant_policies("acme", PolicySet(constitutional_rules=[base_rule]))
+        with pytest.raises(ValueError, match="already exists"):
+            manager.set_tenant_policies(
+                "acme",
+                PolicySet(organization_rules=OrganizationRules(default=[base_rule])),
+            )
+        assert manager.list_policy_tenants() == []
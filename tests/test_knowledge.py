@@ -0,0 +1,1372 @@
+"""Unit tests for the KnowledgeManager."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from packages.core import knowledge as knowledge_module
+from packages.core.knowledge import (
+    REFRESH_RETRY_BASE_SECONDS,
+    SHARED_CANON_ID,
+    FetchedPage,
+    IngestionJob,
+    IngestionQueue,
+    KnowledgeDocument,
+    KnowledgeManager,
+    KnowledgeScheduler,
+    LexicalIndex,
+    LocalVectorBackend,
+    PgVectorBackend,
+    WebRefreshEngine,
+    WebSource,
+    chunk_text,
+    context_token_budget,
+    fuse_results,
+    iter_chunks,
+    pack_context,
+    parse_query,
+)
+from packages.core.knowledge.benchmark import (
+    BenchmarkConfig,
+    BenchmarkReport,
+    IngestResult,
+    LatencyStats,
+    QueryResult,
+    compare_reports,
+    run_benchmark,
+)
+
+
+class HashEmbedding(EmbeddingFunction):
+    """Deterministic bag-of-words embedding that counts its calls."""
+
+    DIMENSIONS = 64
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def __call__(self, input: Documents) -> Embeddings:  # noqa: A002 - Chroma's signature
+        self.calls.append(list(input))
+        vectors = []
+        for text in input:
+            vector = [0.0] * self.DIMENSIONS
+            for word in text.lower().split():
+                digest = hashlib.sha256(word.strip(".,?!").encode()).digest()
+                vector[digest[0] % self.DIMENSIONS] += 1.0
+            norm = sum(v * v for v in vector) ** 0.5 or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "test-hash"
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashEmbedding":
+        return HashEmbedding()
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+@pytest.fixture
+def embedding() -> HashEmbedding:
+    return HashEmbedding()
+
+
+@pytest.fixture
+def knowledge(tmp_path: Path, embedding: HashEmbedding) -> KnowledgeManager:
+    """Knowledge manager backed by a temporary directory."""
+    return KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding)
+
+
+# ============================================================================
+# Test: Streaming Chunking
+# ============================================================================
+
+class TestStreamingChunks:
+    """Test chunking text that arrives in pieces."""
+
+    def test_chunks_do_not_depend_on_piece_boundaries(self):
+        """Streamed pieces chunk exactly like the joined text."""
+        text = "\n".join(f"Section {i}. Parks open at {i % 12 + 1} o'clock." for i in range(400))
+        expected = chunk_text(text)
+
+        for size in (1, 7, 150, 999, 5000):
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+            assert list(iter_chunks(pieces)) == expected
+
+    def test_pieces_are_read_lazily(self):
+        """Only about one chunk of text is buffered ahead of the output."""
+        read = 0
+
+        def pieces():
+            nonlocal read
+            for _ in range(1000):
+                read += 1
+                yield "Pools open at noon. "
+
+        chunks = iter_chunks(pieces(), chunk_size=100, overlap=20)
+        next(chunks)
+        assert read <= 10
+
+    def test_spool_file_is_removed(self, knowledge: KnowledgeManager):
+        """Ingestion cleans up the extracted chunk spool."""
+        ingestion = IngestionQueue(knowledge, extract_workers=1, embed_batch_size=2)
+        text = " ".join(f"Rule {i} for pool safety." for i in range(300)).encode()
+
+        job = _wait_for(ingestion, ingestion.submit("parks", [("rules.txt", text)]))
+
+        assert job.status == "completed"
+        assert list(ingestion.spool_dir.iterdir()) == []
+
+
+# ============================================================================
+# Test: Embedding Reuse
+# ============================================================================
+
+class TestEmbeddingReuse:
+    """Test that recurring chunks are embedded once."""
+
+    def test_same_text_is_embedded_once_across_agents(
+        self, knowledge: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """A document shared with the canon reuses the agent's embeddings."""
+        knowledge.add_document("parks", "hours.txt", b"Pools open at noon in summer.")
+        calls = len(embedding.calls)
+
+        knowledge.add_to_canon("hours.txt", b"Pools open at noon in summer.")
+
+        assert len(embedding.calls) == calls
+        results = knowledge.query(SHARED_CANON_ID, "When do pools open?", n_results=1)
+        assert results[0]["text"] == "Pools open at noon in summer."
+
+    def test_cache_survives_restart(self, tmp_path: Path, embedding: HashEmbedding):
+        """A new manager on the same storage reuses persisted embeddings."""
+        KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding).add_document(
+            "parks", "hours.txt", b"Parks close at dusk."
+        )
+        embedding.calls.clear()
+
+        restarted = KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding)
+        restarted.add_document("library", "hours.txt", b"Parks close at dusk.")
+
+        assert embedding.calls == []
+
+
+# ============================================================================
+# Test: Local Vector Backend
+# ============================================================================
+
+def _vectors(count: int, dim: int = 8, seed: int = 7) -> list[list[float]]:
+    import random
+
+    rng = random.Random(seed)
+    return [[rng.uniform(-1, 1) for _ in range(dim)] for _ in range(count)]
+
+
+def _brute_force(vectors: list[list[float]], query: list[float], k: int) -> list[int]:
+    distances = [sum((a - b) ** 2 for a, b in zip(v, query, strict=True)) for v in vectors]
+    return sorted(range(len(vectors)), key=distances.__getitem__)[:k]
+
+
+class TestLocalVectorBackend:
+    """Test the in-process vector collections."""
+
+    def _fill(self, collection, vectors: list[list[float]]) -> None:
+        collection.add(
+            ids=[f"c{i}" for i in range(len(vectors))],
+            documents=[f"chunk {i}" for i in range(len(vectors))],
+            metadatas=[{"document_id": f"d{i % 3}", "chunk_index": i} for i in range(len(vectors))],
+            embeddings=vectors,
+        )
+
+    def test_query_matches_brute_force(self, tmp_path: Path):
+        """Nearest neighbors and squared L2 distances are exact."""
+        vectors = _vectors(50)
+        collection = LocalVectorBackend(tmp_path).get_collection("parks")
+        self._fill(collection, vectors)
+
+        query = _vectors(1, seed=1)[0]
+        results = collection.query(query_embeddings=[query], n_results=5)
+
+        expected = _brute_force(vectors, query, 5)
+        assert results["ids"][0] == [f"c{i}" for i in expected]
+        nearest = vectors[expected[0]]
+        assert results["distances"][0][0] == pytest.approx(
+            sum((a - b) ** 2 for a, b in zip(nearest, query, strict=True)), rel=1e-4
+        )
+
+    def test_filters_by_document_and_source(self, tmp_path: Path):
+        """where filters select chunks for get, delete and query."""
+        collection = LocalVectorBackend(tmp_path).get_collection("parks")
+        self._fill(collection, _vectors(9))
+
+        assert collection.get(where={"document_id": "d1"})["ids"] == ["c1", "c4", "c7"]
+        results = collection.query(query_embeddings=[_vectors(1)[0]], n_results=9, where={"document_id": "d2"})
+        assert sorted(results["ids"][0]) == ["c2", "c5", "c8"]
+
+        collection.delete(ids=collection.get(where={"document_id": "d0"})["ids"])
+        assert collection.count() == 6
+        assert collection.get(where={"document_id": "d0"})["ids"] == []
+
+    def test_changes_persist(self, tmp_path: Path):
+        """Adds, updates and deletes survive reopening the backend."""
+        collection = LocalVectorBackend(tmp_path).get_collection("parks")
+        vectors = _vectors(6)
+        self._fill(collection, vectors)
+        collection.update(ids=["c1"], metadatas=[{"source_id": "web_1", "chunk_index": 9}])
+        collection.delete(ids=["c2"])
+
+        reopened = LocalVectorBackend(tmp_path).get_collection("parks")
+        stored = reopened.get()
+        assert stored["ids"] == ["c0", "c1", "c3", "c4", "c5"]
+        assert reopened.get(where={"source_id": "web_1"})["ids"] == ["c1"]
+        results = reopened.query(query_embeddings=[vectors[4]], n_results=1)
+        assert results["ids"][0] == ["c4"]
+
+    def test_deletes_are_compacted(self, tmp_path: Path):
+        """Deleting most rows rewrites the files with the live rows only."""
+        collection = LocalVectorBackend(tmp_path).get_collection("parks")
+        vectors = _vectors(10)
+        self._fill(collection, vectors)
+
+        collection.delete(ids=[f"c{i}" for i in range(7)])
+
+        assert (collection.path / "vectors.f32").stat().st_size == 3 * 8 * 4
+        results = collection.query(query_embeddings=[vectors[8]], n_results=5)
+        assert results["ids"][0][0] == "c8" and len(results["ids"][0]) == 3
+        assert LocalVectorBackend(tmp_path).get_collection("parks").get()["ids"] == ["c7", "c8", "c9"]
+
+    def test_quantized_vectors_are_a_quarter_the_size(self, tmp_path: Path):
+        """int8 storage keeps the ranking of well-separated neighbors."""
+        vectors = _vectors(40, dim=32)
+        full = LocalVectorBackend(tmp_path / "full").get_collection("parks")
+        quantized = LocalVectorBackend(tmp_path / "int8", quantize=True).get_collection("parks")
+        self._fill(full, vectors)
+        self._fill(quantized, vectors)
+
+        for query in vectors[:5]:
+            assert (
+                quantized.query(query_embeddings=[query], n_results=1)["ids"]
+                == full.query(query_embeddings=[query], n_results=1)["ids"]
+            )
+        assert (quantized.path / "vectors.i8").stat().st_size * 4 == (full.path / "vectors.f32").stat().st_size
+
+    def test_large_collections_use_hnsw(self, tmp_path: Path):
+        """Above the threshold, searches go through the HNSW graph."""
+        pytest.importorskip("hnswlib")
+        vectors = _vectors(300, dim=16)
+        collection = LocalVectorBackend(tmp_path, hnsw_threshold=100).get_collection("parks")
+        self._fill(collection, vectors)
+
+        query = _vectors(1, dim=16, seed=3)[0]
+        results = collection.query(query_embeddings=[query], n_results=3)
+
+        assert collection._hnsw is not None
+        assert results["ids"][0] == [f"c{i}" for i in _brute_force(vectors, query, 3)]
+
+        collection.delete(ids=results["ids"][0][:1])
+        assert collection.query(query_embeddings=[query], n_results=1)["ids"][0] == [results["ids"][0][1]]
+
+    def test_manager_on_local_backend(self, tmp_path: Path, embedding: HashEmbedding):
+        """The knowledge manager works unchanged on the local backend."""
+        knowledge = KnowledgeManager(
+            storage_path=str(tmp_path), embedding_function=embedding, vector_backend="local"
+        )
+        doc = knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        knowledge.add_to_canon("dogs.txt", b"Dogs must be leashed in all parks.")
+
+        results = knowledge.query_with_canon("parks", "When do pools open?", n_results=2)
+        assert results[0]["metadata"]["filename"] == "pools.txt"
+        assert {r["metadata"]["source_type"] for r in results} == {"canon", "agent"}
+
+        assert knowledge.delete_document(doc.id)
+        assert knowledge.query("parks", "When do pools open?") == []
+
+
+# ============================================================================
+# Test: pgvector Backend
+# ============================================================================
+
+@pytest.fixture
+def pg_backend():
+    """pgvector backend in a scratch schema of KNOWLEDGE_TEST_DATABASE_URL."""
+    dsn = os.environ.get("KNOWLEDGE_TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("KNOWLEDGE_TEST_DATABASE_URL is not set")
+    psycopg = pytest.importorskip("psycopg")
+
+    schema = f"knowledge_test_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("create extension if not exists vector")
+    backend = PgVectorBackend(
+        dsn, dimensions=HashEmbedding.DIMENSIONS, citywide_departments=[SHARED_CANON_ID], schema=schema
+    )
+    yield backend
+    backend.close()
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f"drop schema {schema} cascade")
+
+
+class TestPgVectorBackend:
+    """Test the PostgreSQL/pgvector backend against a local database."""
+
+    def test_collection_api(self, pg_backend: PgVectorBackend, embedding: HashEmbedding):
+        """Chunks can be added, filtered, updated and deleted."""
+        collection = pg_backend.get_collection("parks")
+        texts = ["Pools open at noon.", "Parks close at dusk.", "Dogs must be leashed."]
+        collection.add(
+            ids=["a_0", "a_1", "web_1"],
+            documents=texts,
+            metadatas=[
+                {"document_id": "a", "chunk_index": 0, "filename": "a.txt"},
+                {"document_id": "a", "chunk_index": 1, "filename": "a.txt"},
+                {"source_id": "web", "chunk_index": 0, "url": "https://example.gov"},
+            ],
+            embeddings=embedding(texts),
+        )
+
+        assert collection.get(where={"document_id": "a"})["ids"] == ["a_0", "a_1"]
+        results = collection.query(query_embeddings=embedding(["When do pools open?"]), n_results=1)
+        assert results["ids"][0] == ["a_0"]
+        assert results["metadatas"][0][0]["filename"] == "a.txt"
+
+        collection.update(ids=["web_1"], metadatas=[{"source_id": "web", "chunk_index": 5}])
+        assert collection.get(ids=["web_1"])["metadatas"] == [{"source_id": "web", "chunk_index": 5}]
+
+        collection.delete(ids=collection.get(where={"document_id": "a"})["ids"])
+        assert collection.get()["ids"] == ["web_1"]
+
+    def test_scoped_query_respects_visibility(self, pg_backend: PgVectorBackend, embedding: HashEmbedding):
+        """Agents see their own and citywide chunks, not other agents' chunks."""
+        for agent_id, text in [
+            ("parks", "Pools open at noon."),
+            (SHARED_CANON_ID, "City hall opens at nine."),
+            ("library", "Library opens at ten."),
+        ]:
+            pg_backend.get_collection(agent_id).add(
+                ids=[f"{agent_id}_0"],
+                documents=[text],
+                metadatas=[{"document_id": f"{agent_id}_doc", "chunk_index": 0}],
+                embeddings=embedding([text]),
+            )
+
+        hits = pg_backend.query_scoped("parks", embedding(["When does it open?"])[0], 5, 5)
+
+        assert {(text, scope) for text, _, _, scope in hits} == {
+            ("Pools open at noon.", "agent"),
+            ("City hall opens at nine.", "canon"),
+        }
+        assert pg_backend.query_scoped("parks", embedding(["open"])[0], 5, 5, max_sensitivity="public") == []
+
+    def test_manager_on_pgvector(
+        self, tmp_path: Path, pg_backend: PgVectorBackend, embedding: HashEmbedding
+    ):
+        """The knowledge manager works unchanged on the pgvector backend."""
+        knowledge = KnowledgeManager(
+            storage_path=str(tmp_path), embedding_function=embedding, vector_backend=pg_backend
+        )
+        doc = knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        knowledge.add_to_canon("dogs.txt", b"Dogs must be leashed in all parks.")
+
+        results = knowledge.query_with_canon("parks", "When do pools open?", n_results=2)
+        assert results[0]["metadata"]["filename"] == "pools.txt"
+        assert {r["metadata"]["source_type"] for r in results} == {"canon", "agent"}
+
+        assert knowledge.delete_document(doc.id)
+        assert knowledge.query("parks", "When do pools open?") == []
+
+
+# ============================================================================
+# Test: Context Packing
+# ============================================================================
+
+def _result(text: str, relevance: float, **metadata) -> dict:
+    return {"text": text, "relevance": relevance, "metadata": metadata}
+
+
+class TestContextPacker:
+    """Test packing query results into a token-budgeted context."""
+
+    def test_overlapping_chunks_are_merged(self):
+        """Consecutive chunks of a document become one passage without repeats."""
+        text = " ".join(f"Rule {i}: pools close at {i % 12 + 1} pm on holidays." for i in range(40))
+        chunks = chunk_text(text)
+        results = [
+            _result(chunk, 0.9 - i / 10, document_id="rules", chunk_index=i, filename="rules.txt")
+            for i, chunk in enumerate(chunks[:3])
+        ]
+
+        packed = pack_context(results, max_tokens=10_000)
+
+        assert len(packed.passages) == 1 and packed.merged_chunks == 2
+        assert packed.passages[0].text in text
+        assert packed.passages[0].text.startswith(chunks[0]) and packed.passages[0].text.endswith(chunks[2])
+        assert packed.text.count("[Source: rules.txt]") == 1
+
+    def test_near_duplicates_are_dropped(self):
+        """Boilerplate returned from canon and agent appears once."""
+        footer = "This page is maintained by the City of Cleveland Department of Parks and Recreation."
+        packed = pack_context([
+            _result(footer, 0.9, document_id="canon_doc", filename="canon.txt"),
+            _result(footer + " Updated daily.", 0.7, document_id="agent_doc", filename="agent.txt"),
+            _result("Dogs must be leashed in all parks.", 0.5, document_id="dogs", filename="dogs.txt"),
+        ])
+
+        assert [p.label for p in packed.passages] == ["canon.txt", "dogs.txt"]
+        assert packed.dropped_duplicates == 1
+
+    def test_budget_keeps_most_relevant(self):
+        """Passages are added by relevance until the budget is spent."""
+        results = [
+            _result(f"Fact {i}. " + "word " * 200, 0.1 * i, document_id=f"doc{i}", filename=f"{i}.txt")
+            for i in range(5)
+        ]
+
+        packed = pack_context(results, max_tokens=600)
+
+        assert packed.token_count <= 600
+        assert [p.label for p in packed.passages][:2] == ["4.txt", "3.txt"]
+        assert packed.passages[-1].truncated
+        assert packed.dropped_over_budget > 0
+
+    def test_budget_per_model(self):
+        """Budgets are looked up by the longest matching model prefix."""
+        assert context_token_budget("gpt-4o-mini-2024-07-18") < context_token_budget("gpt-4o")
+        assert context_token_budget("claude-sonnet-4-20250514") == context_token_budget("claude")
+        assert context_token_budget("unknown-model") == context_token_budget(None)
+
+
+# ============================================================================
+# Test: Query With Canon
+# ============================================================================
+
+class TestQueryWithCanon:
+    """Test combined canon and agent retrieval."""
+
+    def test_query_is_embedded_once(
+        self, knowledge: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """One query embedding is shared by the canon and agent searches."""
+        knowledge.add_to_canon("hours.txt", b"City hall is open from nine to five.")
+        knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        embedding.calls.clear()
+
+        results = knowledge.query_with_canon("parks", "When do the pools open?", n_results=2)
+
+        assert embedding.calls == [["When do the pools open?"]]
+        assert {r["metadata"]["source_type"] for r in results} == {"canon", "agent"}
+        assert results[0]["metadata"]["filename"] == "pools.txt"
+        assert results[0]["relevance"] >= results[1]["relevance"]
+
+    def test_collection_handles_are_cached(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Repeated queries do not call get_or_create_collection again."""
+        knowledge.query_with_canon("parks", "pool hours")
+        calls = []
+        original = knowledge._backend.client.get_or_create_collection
+        monkeypatch.setattr(
+            knowledge._backend.client,
+            "get_or_create_collection",
+            lambda *args, **kwargs: calls.append(kwargs) or original(*args, **kwargs),
+        )
+
+        knowledge.query_with_canon("parks", "pool hours")
+        knowledge.query("parks", "pool hours")
+
+        assert calls == []
+        assert knowledge._get_collection(SHARED_CANON_ID) is knowledge._get_collection(SHARED_CANON_ID)
+
+    def test_empty_knowledge_returns_no_results(self, knowledge: KnowledgeManager):
+        """Querying collections without documents returns an empty list."""
+        assert knowledge.query_with_canon("parks", "pool hours") == []
+        assert knowledge.query(SHARED_CANON_ID, "pool hours") == []
+
+
+# ============================================================================
+# Test: Hybrid Search
+# ============================================================================
+
+class TestHybridSearch:
+    """Test BM25 retrieval alongside vector search."""
+
+    @pytest.fixture
+    def ordinances(self, knowledge: KnowledgeManager) -> KnowledgeManager:
+        knowledge.add_to_canon("codes.txt", b"Ordinance 367.01 limits noise in parks after ten.")
+        knowledge.add_document("parks", "forms.txt", b"Vendors file Form W-9 with the parks office.")
+        knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        return knowledge
+
+    def test_identifier_query_skips_embedding(
+        self, ordinances: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """Exact identifier matches are returned without vector search."""
+        embedding.calls.clear()
+
+        results = ordinances.query_with_canon("parks", "What does ordinance 367.01 say?")
+
+        assert embedding.calls == []
+        assert [r["metadata"]["filename"] for r in results] == ["codes.txt"]
+        assert results[0]["metadata"]["source_type"] == "canon"
+        assert results[0]["relevance"] == 1.0
+
+        assert ordinances.query("parks", "where do I send a w-9")[0]["metadata"]["filename"] == "forms.txt"
+        assert embedding.calls == []
+
+    def test_other_queries_fuse_both_rankings(
+        self, ordinances: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """Queries without identifiers are embedded and fused."""
+        embedding.calls.clear()
+
+        results = ordinances.query_with_canon("parks", "When do pools open?", n_results=3)
+
+        assert embedding.calls == [["When do pools open?"]]
+        assert results[0]["metadata"]["filename"] == "pools.txt"
+        assert [r["relevance"] for r in results] == sorted((r["relevance"] for r in results), reverse=True)
+
+    def test_common_numbers_do_not_short_circuit(
+        self, knowledge: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """A plain number in a question is fused with vector search, not the whole answer."""
+        knowledge.add_document("streets", "budget.txt", b"The 311 call center budget grew this year.")
+        knowledge.add_document("streets", "potholes.txt", b"Report a pothole online or by phone.")
+        embedding.calls.clear()
+
+        results = knowledge.query("streets", "how do I report a pothole to 311")
+
+        assert embedding.calls == [["how do I report a pothole to 311"]]
+        assert results[0]["metadata"]["filename"] == "potholes.txt"
+
+    def test_rare_numbers_are_decisive(self):
+        """A number found in few chunks of a large collection is an exact match."""
+        index = LexicalIndex()
+        index.add([f"c{i}" for i in range(200)], [f"Parks notice {i % 7} about trails." for i in range(200)])
+        index.add(["permit"], ["Parks permit 4417 covers the trails."])
+
+        hits = index.search(parse_query("parks permit 4417"), 5)
+        assert hits[0].id == "permit" and hits[0].exact
+
+        index.add([f"d{i}" for i in range(10)], ["Parks permit 4417 renewal." for _ in range(10)])
+        assert not any(hit.exact for hit in index.search(parse_query("parks permit 4417"), 5))
+
+    def test_index_follows_adds_and_deletes(
+        self, ordinances: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """Documents added or deleted after the index is built are reflected."""
+        ordinances.query("parks", "form w-9")
+        doc = ordinances.add_document("parks", "permits.txt", b"Permit PRK-2024-115 covers food trucks.")
+
+        assert ordinances.query("parks", "PRK-2024-115")[0]["metadata"]["filename"] == "permits.txt"
+
+        ordinances.delete_document(doc.id)
+        embedding.calls.clear()
+        results = ordinances.query("parks", "PRK-2024-115")
+        assert embedding.calls == [["PRK-2024-115"]]
+        assert "permits.txt" not in {r["metadata"]["filename"] for r in results}
+
+    def test_hybrid_search_can_be_disabled(self, tmp_path: Path, embedding: HashEmbedding):
+        """Without hybrid search every query is a vector search."""
+        knowledge = KnowledgeManager(
+            storage_path=str(tmp_path), embedding_function=embedding, hybrid_search=False
+        )
+        knowledge.add_document("parks", "forms.txt", b"Vendors file Form W-9 with the parks office.")
+        embedding.calls.clear()
+
+        assert knowledge.query("parks", "form w-9")[0]["metadata"]["filename"] == "forms.txt"
+        assert embedding.calls == [["form w-9"]]
+
+    def test_fusion_favors_results_in_both_rankings(self):
+        """Reciprocal rank fusion ranks agreement above a single first place."""
+        def hit(name: str) -> dict:
+            return {"text": name, "metadata": {"document_id": name, "chunk_index": 0}, "relevance": 0.0}
+
+        fused = fuse_results([[hit("a"), hit("b")], [hit("c"), hit("b")]], n_results=3)
+
+        assert [r["text"] for r in fused] == ["b", "a", "c"]
+        assert all(0 < r["relevance"] < 1 for r in fused)
+
+
+# ============================================================================
+# Test: Retrieval Cache
+# ============================================================================
+
+class TestRetrievalCache:
+    """Test caching query results by collection version."""
+
+    def test_repeated_query_is_served_from_cache(
+        self, knowledge: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """Repeats of a query, up to case and spacing, are not embedded again."""
+        knowledge.add_to_canon("trash.txt", b"Trash is picked up every Tuesday morning.")
+        knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        first = knowledge.query_with_canon("parks", "trash pickup schedule")
+        embedding.calls.clear()
+
+        assert knowledge.query_with_canon("parks", "  Trash pickup   SCHEDULE") == first
+        assert embedding.calls == []
+        assert knowledge._retrieval_cache.stats().hits == 1
+
+        knowledge.query_with_canon("parks", "trash pickup schedule", n_results=1)
+        assert embedding.calls == [["trash pickup schedule"]]
+
+    def test_writes_invalidate_cached_results(
+        self, knowledge: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """Adding or deleting chunks in a searched collection retires its entries."""
+        knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        assert len(knowledge.query_with_canon("parks", "When do pools open?")) == 1
+
+        canon_doc = knowledge.add_to_canon("pools.txt", b"City pools open at ten on weekends.")
+        assert len(knowledge.query_with_canon("parks", "When do pools open?")) == 2
+
+        knowledge.delete_document(canon_doc.id)
+        assert len(knowledge.query_with_canon("parks", "When do pools open?")) == 1
+
+        # Another agent's changes keep the entry
+        knowledge.add_document("library", "hours.txt", b"Libraries open at nine.")
+        embedding.calls.clear()
+        knowledge.query_with_canon("parks", "When do pools open?")
+        assert embedding.calls == []
+
+    def test_cached_results_are_copies(self, knowledge: KnowledgeManager):
+        """Callers mutating results do not change the cached entry."""
+        knowledge.add_document("parks", "pools.txt", b"Public pools open at noon in summer.")
+        results = knowledge.query("parks", "When do pools open?")
+        results[0]["metadata"]["filename"] = "changed.txt"
+
+        assert knowledge.query("parks", "When do pools open?")[0]["metadata"]["filename"] == "pools.txt"
+
+
+# ============================================================================
+# Test: Near-Duplicate Chunks
+# ============================================================================
+
+NOTICE = (
+    "Residents may appeal a parking citation within twenty one days of the date it was issued "
+    "by filing the appeal form with the Clerk of Courts, either in person at the Justice Center "
+    "or by mail, and a hearing officer will review the citation, any photographs and the "
+    "statement of the issuing officer before deciding whether the fine stands or is dismissed."
+)
+
+
+VARIANT = NOTICE.replace("Justice Center", "Justice Centre")
+
+
+def _stored(knowledge: KnowledgeManager, agent_id: str) -> dict:
+    return knowledge._get_collection(agent_id).get(include=["documents", "metadatas"])
+
+
+class TestChunkDedupe:
+    """Test storing near-duplicate chunks once per collection."""
+
+    def test_duplicate_is_stored_once(self, knowledge: KnowledgeManager, embedding: HashEmbedding):
+        """A near-copy in a second document is not embedded or stored again."""
+        knowledge.add_document("parking", "appeals.txt", NOTICE.encode())
+        embedding.calls.clear()
+
+        doc = knowledge.add_document("parking", "faq.txt", VARIANT.encode())
+
+        assert doc.chunk_count == 1
+        assert embedding.calls == []
+        assert len(_stored(knowledge, "parking")["ids"]) == 1
+        assert knowledge._fingerprints.count("parking") == (1, 2)
+        assert len(knowledge.query("parking", "How do I appeal a parking citation?")) == 1
+
+    def test_collections_are_deduplicated_separately(self, knowledge: KnowledgeManager):
+        """Another agent's copy of a text is stored in its own collection."""
+        knowledge.add_document("parking", "appeals.txt", NOTICE.encode())
+        knowledge.add_document("courts", "appeals.txt", NOTICE.encode())
+
+        assert len(_stored(knowledge, "parking")["ids"]) == 1
+        assert len(_stored(knowledge, "courts")["ids"]) == 1
+
+    def test_chunk_outlives_its_first_document(self, knowledge: KnowledgeManager):
+        """Deleting the stored chunk's document hands it to a remaining reference.
+
+        The survivor stores its own text, not the deleted document's.
+        """
+        first = knowledge.add_document("parking", "appeals.txt", NOTICE.encode())
+        second = knowledge.add_document("parking", "faq.txt", VARIANT.encode())
+
+        knowledge.delete_document(first.id)
+
+        stored = _stored(knowledge, "parking")
+        assert [m["document_id"] for m in stored["metadatas"]] == [second.id]
+        assert stored["documents"] == [VARIANT]
+        results = knowledge.query("parking", "How do I appeal a parking citation?")
+        assert results[0]["metadata"]["filename"] == "faq.txt"
+
+        knowledge.delete_document(second.id)
+
+        assert _stored(knowledge, "parking")["ids"] == []
+        assert knowledge._fingerprints.count("parking") == (0, 0)
+
+    def test_chunks_with_different_numbers_are_kept(self, knowledge: KnowledgeManager):
+        """Near-copies that state different figures are both stored."""
+        old = "The permit fee is $25 per application. " + NOTICE
+        new = "The permit fee is $40 per application. " + NOTICE
+        old_doc = knowledge.add_document("permits", "old_fees.txt", old.encode())
+        knowledge.add_document("permits", "new_fees.txt", new.encode())
+
+        assert sorted(_stored(knowledge, "permits")["documents"]) == sorted([old, new])
+
+        knowledge.delete_document(old_doc.id)
+
+        results = knowledge.query("permits", "What is the permit fee?")
+        assert [r["text"] for r in results] == [new]
+        assert results[0]["metadata"]["filename"] == "new_fees.txt"
+
+    def test_dedupe_can_be_disabled(self, tmp_path: Path, embedding: HashEmbedding):
+        """Without deduplication every document stores its own chunks."""
+        knowledge = KnowledgeManager(
+            storage_path=str(tmp_path), embedding_function=embedding, dedupe_chunks=False
+        )
+        knowledge.add_document("parking", "appeals.txt", NOTICE.encode())
+        knowledge.add_document("parking", "faq.txt", VARIANT.encode())
+
+        assert len(_stored(knowledge, "parking")["ids"]) == 2
+        assert not (tmp_path / "fingerprints.db").exists()
+
+
+# ============================================================================
+# Test: Incremental Web Refresh
+# ============================================================================
+
+def _page_text(*paragraphs: str) -> str:
+    return "\n".join(p * 40 for p in paragraphs)
+
+
+class FakeWeb:
+    """Serves queued pages and records the validators it was sent."""
+
+    def __init__(self) -> None:
+        self.pages: list[FetchedPage] = []
+        self.requests: list[tuple[str | None, str | None]] = []
+
+    def __call__(self, url, selector=None, etag=None, last_modified=None) -> FetchedPage:
+        self.requests.append((etag, last_modified))
+        return self.pages.pop(0)
+
+
+class TestWebRefresh:
+    """Test conditional, chunk-level web source refreshes."""
+
+    @pytest.fixture
+    def web(self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch) -> FakeWeb:
+        web = FakeWeb()
+        monkeypatch.setattr(knowledge_module, "HAS_WEB_SCRAPING", True)
+        monkeypatch.setattr(knowledge, "_fetch_web_page", web)
+        return web
+
+    def _chunks(self, knowledge: KnowledgeManager, source_id: str) -> dict[str, str]:
+        collection = knowledge._get_collection("parks")
+        stored = collection.get(where={"source_id": source_id})
+        return dict(zip(stored["ids"], stored["documents"], strict=True))
+
+    def test_not_modified_page_is_skipped(
+        self, knowledge: KnowledgeManager, web: FakeWeb, embedding: HashEmbedding
+    ):
+        """A 304 response leaves the stored chunks untouched."""
+        web.pages.append(FetchedPage(text=_page_text("Pools open at noon. "), title="Pools", etag='"v1"'))
+        source = knowledge.add_web_source("parks", "https://example.gov/pools")
+        before = self._chunks(knowledge, source.id)
+        embedding.calls.clear()
+
+        web.pages.append(FetchedPage(etag='"v1"', not_modified=True))
+        refreshed = knowledge.refresh_web_source(source.id)
+
+        assert web.requests[-1] == ('"v1"', None)
+        assert embedding.calls == []
+        assert self._chunks(knowledge, source.id) == before
+        assert refreshed.last_refresh_status == "success"
+        assert refreshed.chunk_count == len(before)
+
+    def test_only_changed_chunks_are_embedded(
+        self, knowledge: KnowledgeManager, web: FakeWeb, embedding: HashEmbedding
+    ):
+        """Chunks whose text did not change keep their ID and embedding."""
+        old_text = _page_text("Pools open at noon. ", "Parks close at dusk. ", "Dogs must be leashed. ")
+        new_text = _page_text("Pools open at noon. ", "Parks close at dusk. ", "Cats must be leashed. ")
+        web.pages.append(FetchedPage(text=old_text, title="Parks"))
+        source = knowledge.add_web_source("parks", "https://example.gov/parks")
+        before = self._chunks(knowledge, source.id)
+        embedding.calls.clear()
+
+        web.pages.append(FetchedPage(text=new_text, title="Parks"))
+        knowledge.refresh_web_source(source.id)
+
+        after = self._chunks(knowledge, source.id)
+        embedded = [text for call in embedding.calls for text in call]
+        assert sorted(after.values()) == sorted(knowledge._chunk_text(new_text))
+        assert 0 < len(embedded) < len(after)
+        assert set(embedded) == set(after.values()) - set(before.values())
+        assert set(before) & set(after)
+
+        # The same text again re-embeds nothing
+        embedding.calls.clear()
+        web.pages.append(FetchedPage(text=new_text, title="Parks"))
+        knowledge.refresh_web_source(source.id)
+        assert embedding.calls == []
+        assert self._chunks(knowledge, source.id) == after
+
+    def test_failed_fetch_keeps_existing_chunks(self, knowledge: KnowledgeManager, web: FakeWeb):
+        """A fetch error does not wipe previously ingested content."""
+        web.pages.append(FetchedPage(text=_page_text("Pools open at noon. "), title="Pools"))
+        source = knowledge.add_web_source("parks", "https://example.gov/pools")
+        before = self._chunks(knowledge, source.id)
+
+        def fail(*args, **kwargs):
+            raise ConnectionError("timed out")
+
+        knowledge._fetch_web_page = fail
+        refreshed = knowledge.refresh_web_source(source.id)
+
+        assert refreshed.last_refresh_status.startswith("error")
+        assert self._chunks(knowledge, source.id) == before
+
+
+    def test_failed_embedding_keeps_existing_chunks(
+        self, knowledge: KnowledgeManager, web: FakeWeb, monkeypatch: pytest.MonkeyPatch
+    ):
+        """An embedding error is a failed refresh that keeps the old content."""
+        web.pages.append(FetchedPage(text=_page_text("Pools open at noon. "), title="Pools", etag='"v1"'))
+        source = knowledge.add_web_source("parks", "https://example.gov/pools")
+        before = self._chunks(knowledge, source.id)
+
+        def fail(chunks):
+            raise RuntimeError("embedding service unavailable")
+
+        embed = knowledge._embed_chunks
+        monkeypatch.setattr(knowledge, "_embed_chunks", fail)
+        web.pages.append(FetchedPage(text=_page_text("Pools open at ten. "), title="Pools", etag='"v2"'))
+        refreshed = knowledge.refresh_web_source(source.id)
+
+        assert refreshed.last_refresh_status.startswith("error")
+        assert refreshed.consecutive_failures == 1
+        assert refreshed.etag == '"v1"'
+        assert self._chunks(knowledge, source.id) == before
+
+        # The next refresh fetches and stores the new page in full
+        monkeypatch.setattr(knowledge, "_embed_chunks", embed)
+        web.pages.append(FetchedPage(text=_page_text("Pools open at ten. "), title="Pools", etag='"v2"'))
+        refreshed = knowledge.refresh_web_source(source.id)
+
+        assert web.requests[-1] == ('"v1"', None)
+        assert refreshed.last_refresh_status == "success"
+        assert refreshed.consecutive_failures == 0
+        assert sorted(self._chunks(knowledge, source.id).values()) == sorted(
+            knowledge._chunk_text(_page_text("Pools open at ten. "))
+        )
+
+
+# ============================================================================
+# Test: Concurrent Refresh Engine
+# ============================================================================
+
+class SlowWeb:
+    """Fetches that take a while and track concurrency per host."""
+
+    def __init__(self, delay: float = 0.02) -> None:
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active: dict[str, int] = {}
+        self.peak: dict[str, int] = {}
+        self.peak_total = 0
+
+    def __call__(self, url, selector=None, etag=None, last_modified=None) -> FetchedPage:
+        host = url.split("/")[2]
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+            self.peak_total = max(self.peak_total, sum(self.active.values()))
+        time.sleep(self.delay)
+        with self.lock:
+            self.active[host] -= 1
+        if "broken" in url:
+            raise ConnectionError("connection reset")
+        return FetchedPage(text=f"Content of {url}.", title=url)
+
+
+class TestWebRefreshEngine:
+    """Test the concurrent fetch and ingest stages."""
+
+    def _sources(self, knowledge: KnowledgeManager, urls: list[str]) -> list[WebSource]:
+        sources = []
+        for i, url in enumerate(urls):
+            source = WebSource(id=f"web_parks_{i}", agent_id="parks", url=url, name=url)
+            knowledge._save_web_sources([source])
+            sources.append(source)
+        return sources
+
+    def test_per_host_limit_is_respected(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Hosts are fetched in parallel but never beyond the per-host cap."""
+        web = SlowWeb()
+        monkeypatch.setattr(knowledge, "_fetch_web_page", web)
+        urls = [f"https://{host}.example.gov/page{i}" for host in "abc" for i in range(6)]
+        sources = self._sources(knowledge, urls)
+
+        engine = WebRefreshEngine(knowledge, fetch_workers=8, per_host_limit=2)
+        results = engine.refresh(sources)
+
+        assert results == {s.id: "success" for s in sources}
+        assert max(web.peak.values()) <= 2
+        assert web.peak_total > 2
+        assert all(s.chunk_count == 1 for s in sources)
+
+    def test_failures_are_reported_per_source(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """One failing site does not affect the other sources."""
+        monkeypatch.setattr(knowledge, "_fetch_web_page", SlowWeb(delay=0))
+        ok, broken = self._sources(
+            knowledge, ["https://a.example.gov/ok", "https://b.example.gov/broken"]
+        )
+
+        results = WebRefreshEngine(knowledge).refresh([ok, broken])
+
+        assert results[ok.id] == "success"
+        assert results[broken.id].startswith("error: connection reset")
+        assert knowledge.get_web_source(broken.id).last_refresh_status == results[broken.id]
+
+    def test_ingest_errors_count_as_failures(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """A source whose ingest raises is saved as failed, for backoff."""
+        monkeypatch.setattr(knowledge, "_fetch_web_page", SlowWeb(delay=0))
+        (source,) = self._sources(knowledge, ["https://a.example.gov/ok"])
+
+        def fail(source, page, status):
+            raise RuntimeError("chunker crashed")
+
+        monkeypatch.setattr(knowledge, "_apply_refresh", fail)
+        results = WebRefreshEngine(knowledge).refresh([source])
+
+        saved = knowledge.get_web_source(source.id)
+        assert results[source.id] == saved.last_refresh_status == "error: chunker crashed"
+        assert saved.consecutive_failures == 1
+
+    def test_download_size_is_limited(self, knowledge: KnowledgeManager):
+        """Bodies over the limit are rejected while streaming."""
+        class Response:
+            def __init__(self, headers: dict[str, str]) -> None:
+                self.headers = headers
+
+            def iter_content(self, chunk_size: int):
+                for _ in range(10):
+                    yield b"x" * 100
+
+        assert knowledge._read_limited(Response({}), max_bytes=1000) == b"x" * 1000
+        with pytest.raises(ValueError, match="exceeds"):
+            knowledge._read_limited(Response({}), max_bytes=999)
+        with pytest.raises(ValueError, match="limit"):
+            knowledge._read_limited(Response({"Content-Length": "5000"}), max_bytes=1000)
+
+
+# ============================================================================
+# Test: Refresh Scheduler
+# ============================================================================
+
+class TestKnowledgeScheduler:
+    """Test the deadline-ordered refresh scheduler."""
+
+    def _source(
+        self, knowledge: KnowledgeManager, name: str, refreshed_ago: timedelta | None, **kwargs
+    ) -> WebSource:
+        last = (datetime.utcnow() - refreshed_ago).isoformat() if refreshed_ago is not None else None
+        source = WebSource(
+            id=f"web_parks_{name}",
+            agent_id="parks",
+            url=f"https://{name}.example.gov/",
+            name=name,
+            last_refreshed=last,
+            **kwargs,
+        )
+        knowledge._save_web_sources([source])
+        return source
+
+    def _refreshed(self, scheduler: KnowledgeScheduler) -> tuple[threading.Event, list[str]]:
+        done = threading.Event()
+        refreshed: list[str] = []
+        scheduler.add_callback(lambda source_id, status: (refreshed.append(source_id), done.set()))
+        return done, refreshed
+
+    def test_failures_back_off_exponentially(self, knowledge: KnowledgeManager):
+        """Failed sources are retried sooner, doubling up to the refresh interval."""
+        source = self._source(knowledge, "a", timedelta(0), last_refresh_status="error: timeout")
+        last = datetime.fromisoformat(source.last_refreshed)
+        delays = []
+        for failures in (1, 2, 3, 20):
+            source.consecutive_failures = failures
+            delays.append((knowledge.next_refresh_time(source) - last).total_seconds())
+
+        base = REFRESH_RETRY_BASE_SECONDS
+        assert delays == [base, base * 2, base * 4, 24 * 3600]
+
+        source.auto_refresh = False
+        assert knowledge.next_refresh_time(source) is None
+
+    def test_sleeps_until_the_next_due_source(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """The loop wakes when the earliest source is due, not on a poll interval."""
+        monkeypatch.setattr(knowledge, "_fetch_web_page", SlowWeb(delay=0))
+        self._source(knowledge, "later", timedelta(hours=1))
+        soon = self._source(knowledge, "soon", timedelta(hours=24, seconds=-0.3))
+        scheduler = KnowledgeScheduler(knowledge, jitter=0)
+        done, refreshed = self._refreshed(scheduler)
+
+        started = time.monotonic()
+        scheduler.start()
+        try:
+            assert done.wait(5)
+            elapsed = time.monotonic() - started
+        finally:
+            scheduler.stop()
+
+        assert refreshed == [soon.id]
+        assert 0.2 <= elapsed < 2
+        source_id, wait = scheduler.next_due()
+        assert source_id == "web_parks_later"
+        assert wait > 22 * 3600
+
+    def test_trigger_refreshes_early(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Triggered sources are refreshed immediately, then rescheduled normally."""
+        monkeypatch.setattr(knowledge, "_fetch_web_page", SlowWeb(delay=0))
+        source = self._source(knowledge, "a", timedelta(minutes=5))
+        scheduler = KnowledgeScheduler(knowledge, jitter=0)
+        done, refreshed = self._refreshed(scheduler)
+
+        scheduler.start()
+        try:
+            assert scheduler.trigger(source.id)
+            assert not scheduler.trigger("web_parks_missing")
+            assert done.wait(5)
+        finally:
+            scheduler.stop()
+
+        assert refreshed == [source.id]
+        assert knowledge.get_web_source(source.id).last_refresh_status == "success"
+        assert scheduler.next_due()[1] > 23 * 3600
+
+    def test_deleted_sources_are_unscheduled(self, knowledge: KnowledgeManager):
+        """Deleting a source removes it from the schedule."""
+        source = self._source(knowledge, "a", timedelta(hours=1))
+        scheduler = KnowledgeScheduler(knowledge)
+        scheduler.reschedule(source.id)
+        assert scheduler.next_due()[0] == source.id
+
+        knowledge.delete_web_source(source.id)
+
+        assert scheduler.next_due() is None
+
+
+# ============================================================================
+# Test: Metadata Store
+# ============================================================================
+
+class TestMetadataStore:
+    """Test document and web source records in SQLite."""
+
+    def test_documents_are_listed_by_agent_in_pages(self, knowledge: KnowledgeManager):
+        """Listing is per agent, in upload order, with limit and offset."""
+        for i in range(5):
+            knowledge.add_document("parks", f"rules{i}.txt", f"Rule {i} for parks.".encode())
+        knowledge.add_document("library", "hours.txt", b"Libraries open at nine.")
+
+        assert [d.filename for d in knowledge.list_documents("parks", limit=2, offset=1)] == [
+            "rules1.txt", "rules2.txt"
+        ]
+        assert knowledge.count_documents("parks") == 5
+        assert [d.filename for d in knowledge.list_documents("library")] == ["hours.txt"]
+
+    def test_records_persist(self, tmp_path: Path, embedding: HashEmbedding):
+        """A new manager on the same storage sees earlier records."""
+        knowledge = KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding)
+        doc = knowledge.add_document("parks", "pools.txt", b"Pools open at noon.")
+        source = WebSource(id="web_parks_a", agent_id="parks", url="https://a.gov/", name="a")
+        knowledge._save_web_sources([source])
+
+        reopened = KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding)
+        assert reopened.get_document(doc.id) == doc
+        assert reopened.get_web_source("web_parks_a").url == "https://a.gov/"
+
+        assert reopened.delete_document(doc.id)
+        assert reopened.get_document(doc.id) is None
+        assert not reopened.delete_document(doc.id)
+
+    def test_json_records_are_migrated(self, tmp_path: Path, embedding: HashEmbedding):
+        """Records in the old JSON files are imported once."""
+        doc = KnowledgeDocument(
+            id="parks_1", agent_id="parks", filename="a.txt", file_type="txt", file_size=1, chunk_count=1
+        )
+        source = WebSource(id="web_parks_a", agent_id="parks", url="https://a.gov/", name="a")
+        (tmp_path / "documents.json").write_text(json.dumps({"documents": [doc.model_dump()]}))
+        (tmp_path / "web_sources.json").write_text(json.dumps({"sources": [source.model_dump()]}))
+
+        knowledge = KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding)
+
+        assert knowledge.list_documents("parks") == [doc]
+        assert knowledge.list_web_sources("parks") == [source]
+        assert not (tmp_path / "documents.json").exists()
+        assert (tmp_path / "web_sources.json.migrated").exists()
+
+    def test_due_sources_come_from_the_refresh_index(self, knowledge: KnowledgeManager):
+        """Only sources past their next refresh time are due, most overdue first."""
+        def source(name: str, refreshed_ago: timedelta | None, **kwargs) -> WebSource:
+            last = (datetime.utcnow() - refreshed_ago).isoformat() if refreshed_ago is not None else None
+            return WebSource(
+                id=f"web_parks_{name}", agent_id="parks", url=f"https://{name}.gov/", name=name,
+                last_refreshed=last, **kwargs,
+            )
+
+        knowledge._save_web_sources([
+            source("fresh", timedelta(hours=1)),
+            source("stale", timedelta(hours=25)),
+            source("staler", timedelta(hours=48)),
+            source("manual", timedelta(hours=48), auto_refresh=False),
+        ])
+
+        assert [s.name for s in knowledge.get_sources_needing_refresh()] == ["staler", "stale"]
+
+    def test_refresh_does_not_recreate_deleted_source(self, knowledge: KnowledgeManager):
+        """Saving a refreshed source that was deleted meanwhile is a no-op."""
+        source = WebSource(id="web_parks_a", agent_id="parks", url="https://a.gov/", name="a")
+        knowledge._save_web_sources([source])
+        assert knowledge.delete_web_source(source.id)
+
+        knowledge._save_web_sources([source], existing_only=True)
+
+        assert knowledge.get_web_source(source.id) is None
+        assert knowledge.count_web_sources() == 0
+
+
+# ============================================================================
+# Test: Retrieval Benchmark
+# ============================================================================
+
+class TestRetrievalBenchmark:
+    """Test the offline ingest, latency and recall benchmark."""
+
+    @pytest.fixture
+    def config(self) -> BenchmarkConfig:
+        return BenchmarkConfig(chunks=200, chunks_per_document=10, backend="local", queries=20)
+
+    def test_exact_backend_has_full_recall(self, config, tmp_path: Path):
+        """Brute-force search finds every ground-truth neighbour."""
+        report = run_benchmark(config, tmp_path)
+
+        assert report.ingest.chunks + report.ingest.canon_chunks >= 200
+        assert report.ingest.chunks_per_second > 0
+        assert report.query.queries == 20
+        assert report.query.recall == 1.0
+        assert 0 < report.query.latency.p50_ms <= report.query.latency.p99_ms
+        assert report.query_with_canon.recall > 0.9
+
+    def test_runs_are_reproducible(self, config, tmp_path: Path):
+        """The same config ingests the same corpus and asks the same queries."""
+        first = run_benchmark(config, tmp_path / "a")
+        second = run_benchmark(config, tmp_path / "b")
+
+        assert first.ingest.documents == second.ingest.documents
+        assert first.ingest.chunks == second.ingest.chunks
+        assert first.query.recall == second.query.recall
+
+    def test_regressions_are_reported(self, config):
+        """Slower queries, slower ingest and lower recall are regressions."""
+        def report(latency_ms: float, throughput: float, recall: float, **overrides) -> BenchmarkReport:
+            result = QueryResult(
+                queries=20,
+                latency=LatencyStats(p50_ms=latency_ms, p95_ms=latency_ms, p99_ms=latency_ms),
+                recall=recall,
+            )
+            return BenchmarkReport(
+                config=config.model_copy(update=overrides),
+                environment={},
+                created_at="",
+                ingest=IngestResult(chunks_per_second=throughput),
+                query=result,
+                query_with_canon=result,
+            )
+
+        baseline = report(1.0, 1000.0, 0.95)
+        assert compare_reports(baseline, report(1.1, 900.0, 0.945)) == []
+
+        regressions = compare_reports(baseline, report(2.0, 500.0, 0.9))
+        assert len(regressions) == 1 + 2 * 4
+        assert regressions[0].startswith("ingest")
+
+        with pytest.raises(ValueError):
+            compare_reports(baseline, report(1.0, 1000.0, 0.95, backend="chroma"))
+
+
+# ============================================================================
+# Test: Ingestion Queue
+# ============================================================================
+
+def _wait_for(ingestion: IngestionQueue, job: IngestionJob, timeout: float = 60) -> IngestionJob:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        current = ingestion.get_job(job.id)
+        if current.completed_at:
+            return current
+        time.sleep(0.02)
+    raise AssertionError(f"job {job.id} did not finish")
+
+
+class TestIngestionQueue:
+    """Test background extraction and batched embedding."""
+
+    def test_documents_are_embedded_in_shared_batches(self, tmp_path: Path):
+        """Chunks from documents waiting together are embedded in one call."""
+        gate = threading.Event()
+
+        class GatedEmbedding(HashEmbedding):
+            def __call__(self, input: Documents) -> Embeddings:  # noqa: A002 - Chroma's signature
+                gate.wait(10)
+                return super().__call__(input)
+
+        embedding = GatedEmbedding()
+        knowledge = KnowledgeManager(storage_path=str(tmp_path), embedding_function=embedding)
+        ingestion = IngestionQueue(knowledge, extract_workers=1, embed_batch_size=64)
+        files = [
+            ("pools.txt", b"Public pools open at noon in summer."),
+            ("parks.txt", b"Parks close at dusk every day."),
+            ("dogs.txt", b"Dogs must be leashed in all parks."),
+        ]
+        job = ingestion.submit("parks", files)
+        assert job.status == "running" and job.total_files == 3
+
+        # The first document is held at the embedder while the others queue up
+        deadline = time.monotonic() + 10
+        while ingestion.get_job(job.id).total_chunks < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gate.set()
+        job = _wait_for(ingestion, job)
+
+        assert job.status == "completed"
+        assert job.embedded_chunks == job.total_chunks == 3
+        assert sum(len(call) for call in embedding.calls) == 3
+        assert len(embedding.calls) < 3
+        assert {d.filename for d in knowledge.list_documents("parks")} == {f for f, _ in files}
+        results = knowledge.query("parks", "When do pools open?", n_results=1)
+        assert results[0]["metadata"]["filename"] == "pools.txt"
+
+    def test_large_documents_are_split_into_batches(
+        self, knowledge: KnowledgeManager, embedding: HashEmbedding
+    ):
+        """No embedding call exceeds the batch size."""
+        text = " ".join(f"Paragraph {i} about city services." for i in range(500)).encode()
+        ingestion = IngestionQueue(knowledge, extract_workers=1, embed_batch_size=4)
+
+        job = _wait_for(ingestion, ingestion.submit("parks", [("manual.txt", text)]))
+
+        assert job.files[0].chunk_count > 4
+        assert max(len(call) for call in embedding.calls) <= 4
+        assert knowledge.get_document(job.files[0].document_id).chunk_count == job.files[0].chunk_count
+
+    def test_failed_file_does_not_fail_the_job(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Per-file errors are reported without stopping the other files."""
+        store = knowledge._store_upload
+
+        def flaky(agent_id, filename, content):
+            if filename == "bad.txt":
+                raise OSError("disk full")
+            return store(agent_id, filename, content)
+
+        monkeypatch.setattr(knowledge, "_store_upload", flaky)
+        ingestion = IngestionQueue(knowledge, extract_workers=1)
+
+        job = _wait_for(ingestion, ingestion.submit("parks", [("bad.txt", b"x"), ("ok.txt", b"Fine.")]))
+
+        assert job.status == "completed"
+        assert job.failed_files == 1 and job.processed_files == 2
+        assert [f.status for f in job.files] == ["failed", "completed"]
+        assert job.files[0].error == "disk full"
+
+    def test_cancelled_extraction_fails_the_file(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """A file whose extraction is cancelled is reported as failed."""
+
+        class CancellingPool:
+            def submit(self, *args: object) -> Future:
+                future: Future = Future()
+                future.cancel()
+                return future
+
+        ingestion = IngestionQueue(knowledge, extract_workers=1)
+        monkeypatch.setattr(ingestion, "_start", CancellingPool)
+
+        job = ingestion.get_job(ingestion.submit("parks", [("pools.txt", b"Pools open at noon.")]).id)
+
+        assert job.status == "failed"
+        assert job.files[0].status == "failed"
+        assert job.files[0].error == "Extraction was cancelled"
+
+    def test_embedder_survives_record_errors(
+        self, knowledge: KnowledgeManager, monkeypatch: pytest.MonkeyPatch
+    ):
+        """A failed metadata write fails that job, and later jobs still run."""
+        save = knowledge._save_documents
+        calls = []
+
+        def flaky(docs):
+            calls.append(docs)
+            if len(calls) == 1:
+                raise OSError("database is locked")
+            save(docs)
+
+        monkeypatch.setattr(knowledge, "_save_documents", flaky)
+        ingestion = IngestionQueue(knowledge, extract_workers=1)
+
+        failed = _wait_for(ingestion, ingestion.submit("parks", [("pools.txt", b"Pools open at noon.")]))
+        assert failed.status == "failed"
+        assert failed.files[0].error == "database is locked"
+        assert knowledge.query("parks", "When do pools open?") == []
+
+        job = _wait_for(ingestion, ingestion.submit("parks", [("parks.txt", b"Parks close at dusk.")]))
+        assert job.status == "completed"
+
+    def test_identical_files_in_one_upload(self, knowledge: KnowledgeManager):
+        """Copies of a file in one upload get their own spools and all complete."""
+        ingestion = IngestionQueue(knowledge, extract_workers=1)
+        text = b"Pools open at noon."
+
+        job = _wait_for(ingestion, ingestion.submit("parks", [("a.txt", text), ("b.txt", text)]))
+
+        assert [f.status for f in job.files] == ["completed", "completed"]
+        assert [f.chunk_count for f in job.files] == [1, 1]
+        assert list((knowledge.storage_path / "ingest").iterdir()) == []
+
+    def test_extraction_runs_in_worker_processes(self, knowledge: KnowledgeManager):
+        """Multiple extract workers use a process pool."""
+        ingestion = IngestionQueue(knowledge, extract_workers=2)
+        try:
+            job = _wait_for(ingestion, ingestion.submit("parks", [("pools.txt", b"Pools open at noon.")]))
+        finally:
+            ingestion.shutdown()
+
+        assert job.status == "completed"
+        assert knowledge.list_documents("parks")[0].chunk_count == 1
@@ -0,0 +1,103 @@
+"""Unit tests for the shared text scanner."""
+
+import re
+
+import pytest
+
+from packages.core.scanner import TextScanner, required_literals
+
+# ============================================================================
+# Test: required_literals
+# ============================================================================
+
+class TestRequiredLiterals:
+    """Test literal extraction used to prefilter regexes."""
+
+    @pytest.mark.parametrize(
+        "pattern,expected",
+        [
+            (r"\b(salary|compensation)\b", {"salary", "compensation"}),
+            (r"(home\s+)?address", {"address"}),
+            (r"Public\s+health", {"public"}),
+            (r"employee\s+.{0,20}(info|lookup)", {"employee"}),
+            (r"(nda|agreement|legal\s+question)", {"nda", "agreement", "question"}),
+        ],
+    )
+    def test_extracts_required_literals(self, pattern: str, expected: set[str]):
+        """Any match must contain one of the extracted literals."""
+        assert required_literals(re.compile(pattern, re.IGNORECASE)) == expected
+
+    def test_unfilterable_patterns(self):
+        """Patterns without a required literal return None."""
+        assert required_literals(re.compile(r"\d{3}\s\d{4}")) is None
+        assert required_literals(re.compile(r"(abc)?\w+")) is None
+
+
+# ============================================================================
+# Test: TextScanner
+# ============================================================================
+
+class TestTextScanner:
+    """Test single-pass keyword and regex scanning."""
+
+    def test_keywords_and_regexes_in_one_scan(self):
+        """A scan reports every keyword and regex feature that occurs."""
+        scanner = TextScanner()
+        budget = scanner.keyword("Budget")
+        missing = scanner.keyword("lawsuit")
+        salary = scanner.regex(r"\b(salary|pay)\b", re.IGNORECASE)
+        phone = scanner.regex(r"\d{3}\s\d{4}")
+
+        result = scanner.scan("What is the BUDGET for salary? Call 555 1234")
+
+        assert budget in result
+        assert salary in result
+        assert phone in result
+        assert missing not in result
+
+    def test_overlapping_features_all_hit(self):
+        """Features that match the same span are reported independently."""
+        scanner = TextScanner()
+        ids = [
+            scanner.regex(r"payment", re.IGNORECASE),
+            scanner.regex(r"(invoice|payment)", re.IGNORECASE),
+            scanner.keyword("pay"),
+            scanner.keyword("payment"),
+        ]
+
+        assert scanner.scan("Late payment notice").count(ids) == 4
+
+    def test_literal_present_but_regex_does_not_match(self):
+        """The literal prefilter only nominates regexes; they still must match."""
+        scanner = TextScanner()
+        fire = scanner.regex(r"\bfire\b", re.IGNORECASE)
+
+        assert fire not in scanner.scan("Check the firewall")
+        assert fire in scanner.scan("Can we fire him?")
+
+    def test_non_ascii_case_variants(self):
+        """Case-insensitive regexes still match non-ASCII case variants."""
+        scanner = TextScanner()
+        salary = scanner.regex(r"salary", re.IGNORECASE)
+
+        # U+017F (long s) matches "s" under IGNORECASE but not after lower()
+        assert salary in scanner.scan("\u017falary review")
+
+    def test_duplicate_registration_is_shared(self):
+        """Registering the same feature twice returns the same id."""
+        scanner = TextScanner()
+
+        assert scanner.keyword("HR") == scanner.keyword("hr")
+        assert scanner.regex(r"pto", re.IGNORECASE) == scanner.regex(re.compile(r"pto", re.IGNORECASE))
+        assert scanner.regex(r"pto") != scanner.regex(r"pto", re.IGNORECASE)
+        assert scanner.feature_count == 3
+
+    def test_new_features_invalidate_cached_scans(self):
+        """Features added after a scan are seen by the next scan of the same text."""
+        scanner = TextScanner()
+        scanner.keyword("permit")
+        assert scanner.scan("zoning permit") is scanner.scan("zoning permit")
+
+        zoning = scanner.keyword("zoning")
+
+        assert zoning in scanner.scan("zoning permit")
@@ -241,6 +241,37 @@ class TestBatchSimulation:
         assert result.results[1].audit_event_stub["user_id"] == "user2"
         assert result.results[1].audit_event_stub["department"] == "Finance"
 
+    def test_batch_uses_tenant_overlay(self, sample_policy_set: PolicySet):
+        """A tenant's overlay applies on top of the shared policy set."""
+        overlay = PolicySet(
+            organization_rules=OrganizationRules(default=[
+                PolicyRule(
+                    id="tenant_weather_escalate",
+                    name="Tenant Weather Escalation",
+                    conditions=[RuleCondition(field="intent.task", value="answer_question")],
+                    action=RuleAction(hitl_mode=HITLMode.ESCALATE),
+                ),
+            ]),
+        )
+        inputs = [{"text": "What is the weather?"}]
+
+        acme = simulate_batch(
+            inputs=inputs,
+            tenant_id="acme",
+            policy_set=sample_policy_set,
+            tenant_policies={"acme": overlay},
+        )
+        other = simulate_batch(
+            inputs=inputs,
+            tenant_id="globex",
+            policy_set=sample_policy_set,
+            tenant_policies={"acme": overlay},
+        )
+
+        assert acme.results[0].governance.hitl_mode == HITLMode.ESCALATE
+        assert acme.results[0].governance.policy_trigger_ids == ["tenant_weather_escalate"]
+        assert other.results[0].governance.hitl_mode == HITLMode.INFORM
+
 
 # ============================================================================
 # Test: Policy Evaluation